@@ -3,6 +3,7 @@ import sys
 import os
 import re
 import json
+from contextlib import nullcontext
 from datetime import datetime
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -148,6 +149,34 @@ def extract_and_render_plotly_charts(response):
     
     return cleaned_response.strip()
 
+def render_artifact(artifact):
+    """Render one chart or table artifact produced by a tool."""
+    if artifact["kind"] == "chart":
+        st.plotly_chart(artifact["data"], use_container_width=True)
+    else:
+        data = artifact["data"]
+        st.dataframe(data.to_dataframe() if hasattr(data, "to_dataframe") else data, use_container_width=True)
+    if artifact.get("description"):
+        st.caption(f"{'📊' if artifact['kind'] == 'chart' else '📋'} {artifact['description']}")
+
+def render_turn_artifacts(response, artifacts):
+    """
+    Render the artifacts a response references straight from the turn's artifact store.
+    Charts the model did not reference are still shown after the referenced artifacts.
+    Returns the response without reference markers and the rendered artifacts.
+    """
+    artifact_ids = [a for a in referenced_artifact_ids(response) if a in artifacts]
+    artifact_ids += [a for a in artifacts.ids() if a not in artifact_ids and artifacts.get(a)["kind"] == "chart"]
+    rendered = []
+    for artifact_id in artifact_ids:
+        artifact = artifacts.get(artifact_id)
+        try:
+            render_artifact(artifact)
+            rendered.append(artifact)
+        except Exception as e:
+            st.error(f"Error rendering {artifact_id}: {str(e)}")
+    return strip_artifact_references(response), rendered
+
 def check_for_plotly_figures_in_result(result):
     """
     Check if the supervisor result contains Plotly Figure objects and render them.
@@ -276,12 +305,21 @@ def delete_session(session_id):
 
 # Import supervisor
 try:
+    import supervisor_agent
     from supervisor_agent import supervisor, create_dynamic_supervisor
+    from run_recorder import RunRecorder, install_backend_recording
+    from artifact_store import artifact_turn, referenced_artifact_ids, strip_artifact_references
     supervisor_available = True
 except ImportError as e:
     supervisor_available = False
     import_error = str(e)
 
+# Optional: record every turn for offline replay (see run_recorder.py)
+record_dir = os.environ.get("JARVIS_RECORD_DIR")
+if record_dir and supervisor_available:
+    # Calls are recorded by the recorder of the calling session only (see capture_backends)
+    install_backend_recording(supervisor_agent)
+
 # Header with model selection
 col1, col2, col3 = st.columns([2.5, 1, 0.5])
 with col1:
@@ -774,6 +812,8 @@ st.header("Conversation")
 for i, message in enumerate(st.session_state.messages):
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
+        for artifact in message.get("artifacts", []):
+            render_artifact(artifact)
         if message["role"] == "assistant" and "timestamp" in message:
             caption_parts = [f"⏱️ {message['timestamp']}"]
             if "response_time" in message:
@@ -812,22 +852,47 @@ if prompt := st.chat_input("Ask me anything about your infrastructure..."):
             with st.spinner("🤔 Jarvis is thinking..."):
                 start_time = datetime.now()
                 
-                # Choose supervisor based on model type
-                if st.session_state.selected_model_type == "standard":
-                    # Use original supervisor with fixed temperature (0.1)
-                    result = supervisor.invoke({
-                        "messages": [("user", context_prompt)]
-                    })
-                else:
-                    # Use dynamic supervisor with selected temperature and custom prompts
-                    dynamic_supervisor = create_dynamic_supervisor(
-                        temperature=st.session_state.selected_temperature,
-                        session_context=st.session_state.context,
-                        custom_prompts=st.session_state.custom_prompts
+                # Record the run (LLM calls, tool calls, backend payloads) when enabled
+                recorder = None
+                invoke_config = {}
+                if record_dir:
+                    if st.session_state.selected_model_type == "standard":
+                        recorder = RunRecorder(graph="standard")
+                    else:
+                        recorder = RunRecorder(
+                            graph="dynamic",
+                            temperature=st.session_state.selected_temperature,
+                            session_context=st.session_state.context.copy(),
+                            custom_prompts=st.session_state.custom_prompts
+                        )
+                    invoke_config = {"callbacks": [recorder]}
+                
+                # Charts and large tables produced by tools land in this turn's artifact store
+                with artifact_turn() as artifacts, \
+                        (recorder.capture_backends() if recorder else nullcontext()):
+                    # Choose supervisor based on model type
+                    if st.session_state.selected_model_type == "standard":
+                        # Use original supervisor with fixed temperature (0.1)
+                        result = supervisor.invoke({
+                            "messages": [("user", context_prompt)]
+                        }, config=invoke_config)
+                    else:
+                        # Use dynamic supervisor with selected temperature and custom prompts
+                        dynamic_supervisor = create_dynamic_supervisor(
+                            temperature=st.session_state.selected_temperature,
+                            session_context=st.session_state.context,
+                            custom_prompts=st.session_state.custom_prompts
+                        )
+                        result = dynamic_supervisor.invoke({
+                            "messages": [("user", context_prompt)]
+                        }, config=invoke_config)
+                
+                if recorder:
+                    os.makedirs(record_dir, exist_ok=True)
+                    recorder.save(
+                        os.path.join(record_dir, f"{st.session_state.session_id}_{start_time.strftime('%H%M%S')}.jsonl.gz"),
+                        {"messages": [("user", context_prompt)]}
                     )
-                    result = dynamic_supervisor.invoke({
-                        "messages": [("user", context_prompt)]
-                    })
                 
                 end_time = datetime.now()
                 response_time = (end_time - start_time).total_seconds()
@@ -843,14 +908,15 @@ if prompt := st.chat_input("Ask me anything about your infrastructure..."):
                 with st.expander("🐛 Raw Agent Response (Debug)", expanded=False):
                     st.code(response, language='text')
                     
-                    # Check for chart data
-                    if '"type": "plotly_figure"' in response:
-                        st.success("✅ Chart data detected in response")
+                    # Check for chart artifacts
+                    if len(artifacts):
+                        st.success(f"✅ Artifacts stored this turn: {', '.join(artifacts.ids())}")
                     else:
-                        st.warning("⚠️ No chart data found in response")
+                        st.warning("⚠️ No artifacts stored this turn")
             
-            # Extract and render any Plotly charts, get cleaned response
-            cleaned_response = extract_and_render_plotly_charts(response)
+            # Render the artifacts the response references, then any legacy inline chart JSON
+            cleaned_response, rendered_artifacts = render_turn_artifacts(response, artifacts)
+            cleaned_response = extract_and_render_plotly_charts(cleaned_response)
             
             # Display the cleaned response (without JSON chart data)
             if cleaned_response.strip():
@@ -876,7 +942,8 @@ if prompt := st.chat_input("Ask me anything about your infrastructure..."):
                 "response_time": f"{response_time:.2f}s",
                 "temperature": st.session_state.selected_temperature,
                 "temperature_label": temp_label,
-                "model_type": st.session_state.selected_model_type
+                "model_type": st.session_state.selected_model_type,
+                "artifacts": rendered_artifacts
             }
             st.session_state.messages.append(assistant_message)
             
@@ -0,0 +1,221 @@
+"""
+Vectorized anomaly detection over Prometheus range query results.
+
+Instead of the model eyeballing raw samples, every series of a matrix response is put on a
+shared time grid (one row per series) and scored by detectors that work on the whole matrix
+at once:
+
+- "zscore": distance from the mean of the previous `window` points, in standard deviations,
+- "ewma": residual against an exponentially weighted moving average, scaled by the EW
+  variance of earlier residuals,
+- "seasonal": difference from the same series one offset (e.g. a week) earlier, scaled by
+  the series' median absolute deviation. Needs a baseline response for the earlier window.
+
+A point is anomalous when at least `min_votes` detectors (all of them when fewer ran) score it
+above the threshold; the interval around it extends over neighbouring points flagged by any
+detector, and nearby points merge. Only those intervals are returned: series labels, start/end,
+direction, peak and expected value, score and the detectors that fired.
+
+Detectors are registered by name, like the downsampling modes in series_downsampling.py.
+"""
+
+import warnings
+
+import numpy as np
+
+from series_downsampling import series_arrays
+from tabular_result import TabularResult
+from time_alignment import format_utc
+from tool_result_encoding import label_text, split_labels
+
+DETECTORS = {}
+
+
+def register_detector(name):
+    """
+    Register a function (values, baseline=None, **options) -> (scores, expected) as a detector.
+    `values` is a (series, points) matrix with NaN for missing samples; the function returns
+    None when it cannot run (e.g. no baseline).
+    """
+    def decorator(func):
+        DETECTORS[name] = func
+        return func
+    return decorator
+
+
+def series_matrix(response):
+    """
+    Matrix response -> (timestamps, values, metrics): the sorted union of all timestamps and a
+    (series, points) float64 matrix with NaN where a series has no sample.
+    """
+    series = response.get("data", {}).get("result", []) if isinstance(response, dict) else []
+    arrays = [series_arrays(s) for s in series]
+    if not arrays:
+        return np.empty(0), np.empty((0, 0)), []
+    timestamps = np.unique(np.concatenate([x for x, _ in arrays]))
+    values = np.full((len(arrays), len(timestamps)), np.nan)
+    for row, (x, y) in enumerate(arrays):
+        values[row, np.searchsorted(timestamps, x)] = y
+    return timestamps, values, [s.get("metric", {}) for s in series]
+
+
+def align_baseline(metrics, timestamps, baseline_response, offset_seconds):
+    """
+    Values of `baseline_response` (the same query `offset_seconds` earlier) on the grid of
+    `timestamps`, matched to `metrics` by label set; NaN where there is no earlier sample.
+    """
+    base_times, base_values, base_metrics = series_matrix(baseline_response)
+    aligned = np.full((len(metrics), len(timestamps)), np.nan)
+    if not base_metrics:
+        return aligned
+    rows = {tuple(sorted(m.items())): i for i, m in enumerate(base_metrics)}
+    shifted = base_times + offset_seconds
+    positions = np.searchsorted(shifted, timestamps)
+    found = positions < len(shifted)
+    found[found] = shifted[positions[found]] == timestamps[found]
+    for row, metric in enumerate(metrics):
+        base_row = rows.get(tuple(sorted(metric.items())))
+        if base_row is not None:
+            aligned[row, found] = base_values[base_row, positions[found]]
+    return aligned
+
+
+def _scale_floor(center):
+    # A flat series still needs a finite scale; changes below 0.1% of its level are not anomalies
+    return 1e-3 * np.abs(center) + 1e-12
+
+
+@register_detector("zscore")
+def rolling_zscore(values, window=30, **options):
+    """Score against the mean and standard deviation of the previous `window` points (cumulative sums)."""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    zeros = np.zeros((values.shape[0], 1))
+    sums = np.hstack([zeros, np.cumsum(filled, axis=1)])
+    squares = np.hstack([zeros, np.cumsum(filled ** 2, axis=1)])
+    counts = np.hstack([zeros, np.cumsum(valid, axis=1)])
+    hi = np.arange(values.shape[1])
+    lo = np.maximum(hi - window, 0)
+    n = counts[:, hi] - counts[:, lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (sums[:, hi] - sums[:, lo]) / n
+        variance = np.maximum((squares[:, hi] - squares[:, lo]) / n - mean ** 2, 0.0) * n / np.maximum(n - 1, 1)
+        scores = (values - mean) / np.maximum(np.sqrt(variance), _scale_floor(mean))
+    scores[n < max(window // 2, 2)] = np.nan
+    return scores, mean
+
+
+@register_detector("ewma")
+def ewma_residuals(values, alpha=0.3, warmup=6, **options):
+    """Score the residual against the EWMA forecast by the EW standard deviation of earlier residuals."""
+    series, points = values.shape
+    level = np.full(series, np.nan)
+    variance = np.zeros(series)
+    seen = np.zeros(series, dtype=np.int64)
+    scores = np.full(values.shape, np.nan)
+    expected = np.full(values.shape, np.nan)
+    for t in range(points):
+        x = values[:, t]
+        present = ~np.isnan(x)
+        tracked = present & ~np.isnan(level)
+        residual = np.where(tracked, x - level, 0.0)
+        ready = tracked & (seen >= warmup)
+        expected[:, t] = level
+        scores[ready, t] = residual[ready] / np.maximum(np.sqrt(variance[ready]), _scale_floor(level[ready]))
+        variance = np.where(tracked, (1 - alpha) * (variance + alpha * residual ** 2), variance)
+        level = np.where(tracked, level + alpha * residual, np.where(present, x, level))
+        seen += present
+    return scores, expected
+
+
+@register_detector("seasonal")
+def seasonal_baseline(values, baseline=None, **options):
+    """Score the difference from the baseline (same window one offset earlier) by its median absolute deviation."""
+    if baseline is None or np.isnan(baseline).all():
+        return None
+    residual = values - baseline
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # series without any baseline sample
+        center = np.nanmedian(residual, axis=1, keepdims=True)
+        mad = 1.4826 * np.nanmedian(np.abs(residual - center), axis=1, keepdims=True)
+        level = np.nanmean(np.abs(baseline), axis=1, keepdims=True)
+    scale = np.maximum(np.nan_to_num(mad), _scale_floor(np.nan_to_num(level)))
+    return (residual - center) / scale, baseline + center
+
+
+def _runs(flags, max_gap):
+    """(start, end) index pairs of True runs, joining runs separated by at most `max_gap` False points."""
+    indices = np.flatnonzero(flags)
+    if len(indices) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(indices) > max_gap + 1)
+    starts = np.r_[indices[0], indices[breaks + 1]]
+    ends = np.r_[indices[breaks], indices[-1]]
+    return list(zip(starts, ends))
+
+
+def detect_anomalies(response, detectors=("zscore", "ewma", "seasonal"), baseline=None, threshold=4.0, min_votes=2,
+                     report_start=None, max_gap=1, max_intervals=50, **options):
+    """
+    Find anomalous intervals in a Prometheus matrix response.
+
+    Args:
+        response: Prometheus range query response
+        detectors: Names from DETECTORS
+        baseline: (series, points) matrix from align_baseline, for "seasonal"
+        threshold: Absolute score above which a detector flags a point
+        min_votes: Detectors that must flag a point for it to be anomalous (a single noisy
+            detector over thousands of points always finds something)
+        report_start: Epoch seconds; earlier points (detector warm-up) are not reported
+        max_gap: Normal points allowed inside one interval
+        max_intervals: Highest-scoring intervals kept
+        options: Detector settings (window, alpha, warmup)
+
+    Returns:
+        (TabularResult with one row per interval, highest score first; {"series", "points", "detectors"})
+    """
+    timestamps, values, metrics = series_matrix(response)
+    stats = {"series": len(metrics), "points": int((~np.isnan(values)).sum()), "detectors": []}
+    columns = ["Series", "Start", "End", "Points", "Direction", "Peak", "Expected", "Score", "Detectors"]
+    if not metrics:
+        return TabularResult.from_rows(columns, []), stats
+
+    names, scores, expected = [], [], []
+    for name in detectors:
+        outcome = DETECTORS[name](values, baseline=baseline, **options)
+        if outcome is not None:
+            names.append(name)
+            scores.append(np.abs(outcome[0]))
+            expected.append(outcome[1])
+    stats["detectors"] = names
+    if not names:
+        return TabularResult.from_rows(columns, []), stats
+
+    scores = np.nan_to_num(np.stack(scores), nan=0.0)  # (detector, series, points)
+    fired = scores > threshold
+    if report_start is not None:
+        fired[:, :, timestamps < report_start] = False
+    core = fired.sum(axis=0) >= min(min_votes, len(names))
+    flagged = fired.any(axis=0)
+    best = scores.argmax(axis=0)
+    best_score = scores.max(axis=0)
+
+    _, distinct = split_labels([{"metric": m} for m in metrics])
+    rows = []
+    for row in np.flatnonzero(core.any(axis=1)):
+        for start, end in _runs(flagged[row], max_gap):
+            span = slice(start, end + 1)
+            if not core[row, span].any():
+                continue
+            peak = start + int(np.argmax(np.where(flagged[row, span], best_score[row, span], -1.0)))
+            detector = best[row, peak]
+            predicted = expected[detector][row, peak]
+            direction = "spike" if values[row, peak] >= predicted or np.isnan(predicted) else "dip"
+            fired_names = [n for i, n in enumerate(names) if fired[i, row, span].any()]
+            rows.append([label_text(distinct[row]), format_utc(timestamps[start]), format_utc(timestamps[end]),
+                         int(flagged[row, span].sum()), direction, float(values[row, peak]),
+                         None if np.isnan(predicted) else float(predicted), float(best_score[row, peak]),
+                         ",".join(fired_names)])
+    rows.sort(key=lambda r: -r[7])
+    return TabularResult.from_rows(columns, rows[:max_intervals],
+                                   ["string", "string", "string", "long", "string", "real", "real", "real", "string"]), stats
@@ -0,0 +1,107 @@
+"""
+Per-turn artifact store for charts and large tables.
+
+Charts used to reach the UI only if the model copied a `{"type": "plotly_figure", ...}` JSON
+blob into its final answer, which made chart turns spend thousands of output tokens on figure
+JSON. Tools now put figures and large tables into the store of the current turn and return a
+short reference such as `[artifact:chart-1]`; the UI renders the referenced artifacts straight
+from the store.
+
+The active store is held in a context variable. LangGraph runs tools with a copy of the
+caller's context, so a store opened around `supervisor.invoke(...)` is visible to every tool
+of that turn:
+
+    with artifact_turn() as artifacts:
+        result = supervisor.invoke(...)
+    for artifact_id in referenced_artifact_ids(answer): ...
+"""
+
+import contextvars
+import re
+import threading
+from contextlib import contextmanager
+from itertools import count
+
+ARTIFACT_REFERENCE = re.compile(r"\[artifact:([A-Za-z0-9_\-]+)\]")
+
+_current_store = contextvars.ContextVar("artifact_store", default=None)
+
+
+class ArtifactStore:
+    """Thread-safe, insertion-ordered store of the artifacts produced during one turn."""
+
+    def __init__(self):
+        self._artifacts = {}
+        self._lock = threading.Lock()
+        self._counter = count(1)
+
+    def put(self, kind, data, description=""):
+        """
+        Store an artifact and return its ID.
+
+        Args:
+            kind: "chart" (a plotly Figure) or "table" (a TabularResult or DataFrame)
+            data: The artifact object itself (not serialized)
+            description: Short caption shown under the artifact
+        """
+        with self._lock:
+            artifact_id = f"{kind}-{next(self._counter)}"
+            self._artifacts[artifact_id] = {"id": artifact_id, "kind": kind, "data": data, "description": description}
+        return artifact_id
+
+    def get(self, artifact_id):
+        return self._artifacts.get(artifact_id)
+
+    def ids(self):
+        return list(self._artifacts)
+
+    def __len__(self):
+        return len(self._artifacts)
+
+    def __contains__(self, artifact_id):
+        return artifact_id in self._artifacts
+
+
+def current_store():
+    """The artifact store of the current turn, or None outside of a turn."""
+    return _current_store.get()
+
+
+@contextmanager
+def artifact_turn(store=None):
+    """Open an artifact store for the duration of one turn."""
+    store = store if store is not None else ArtifactStore()
+    token = _current_store.set(store)
+    try:
+        yield store
+    finally:
+        _current_store.reset(token)
+
+
+def store_artifact(kind, data, description=""):
+    """
+    Put an artifact into the current turn's store.
+    Returns the reference text to hand to the model, or None when no turn store is open.
+    """
+    store = current_store()
+    if store is None:
+        return None
+    return reference(store.put(kind, data, description))
+
+
+def reference(artifact_id):
+    return f"[artifact:{artifact_id}]"
+
+
+def referenced_artifact_ids(text):
+    """Artifact IDs referenced in a response, in order of first appearance."""
+    seen = []
+    for artifact_id in ARTIFACT_REFERENCE.findall(text or ""):
+        if artifact_id not in seen:
+            seen.append(artifact_id)
+    return seen
+
+
+def strip_artifact_references(text):
+    """Response text without the artifact reference markers."""
+    return re.sub(r"[ \t]*" + ARTIFACT_REFERENCE.pattern, "", text or "").strip()
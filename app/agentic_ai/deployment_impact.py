@@ -0,0 +1,151 @@
+"""
+Deployment impact scoring across many metrics at once.
+
+"Did deployment X hurt anything?" used to mean a dozen hand-picked range queries, one per
+model turn. Here a set of golden metrics is fetched for the window before the deployment and
+the window after it, and every series of every metric is scored in one vectorized pass:
+
+- effect size: Hedges' g, the difference of the after and before means in pooled standard
+  deviations (small-sample corrected), next to the plain percentage change,
+- change point: the split of the whole before + after series that best separates two means
+  (the largest |mean_left - mean_right| * sqrt(n_left * n_right / n), from cumulative sums),
+  reported as minutes relative to the deployment start; a change well before the deployment
+  was not caused by it.
+
+Series are matched across the two windows by label set, so golden metric queries should
+aggregate away labels that change with a rollout (pod names): sum by (container), not by (pod).
+"""
+
+import numpy as np
+
+from anomaly_detection import series_matrix
+from series_downsampling import series_arrays
+from tabular_result import TabularResult
+from time_alignment import format_utc
+from tool_result_encoding import label_text, split_labels
+
+COLUMNS = ["Metric", "Series", "BeforeMean", "AfterMean", "ChangePct", "EffectSize", "Direction",
+           "ChangePoint", "ChangePointMinutes"]
+TYPES = ["string", "string", "real", "real", "real", "real", "string", "string", "real"]
+
+
+def merge_windows(before, after):
+    """
+    One matrix response holding the series of both windows, joined by label set (series that
+    exist in only one window keep just those samples).
+    """
+    merged = {}
+    for response in (before, after):
+        series = response.get("data", {}).get("result", []) if isinstance(response, dict) else []
+        for s in series:
+            metric = s.get("metric", {})
+            x, y = series_arrays(s)
+            entry = merged.setdefault(tuple(sorted(metric.items())), {"metric": metric, "parts": []})
+            entry["parts"].append(np.column_stack([x, y]))
+    result = [{"metric": entry["metric"], "values": np.concatenate(entry["parts"])} for entry in merged.values()]
+    return {"status": "success", "data": {"resultType": "matrix", "result": result}}
+
+
+def _moments(values, mask):
+    """Count, mean and sample variance of each row over the columns in `mask`, ignoring NaN."""
+    part = values[:, mask]
+    valid = ~np.isnan(part)
+    n = valid.sum(axis=1)
+    filled = np.where(valid, part, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = filled.sum(axis=1) / n
+        variance = np.where(valid, (part - mean[:, None]) ** 2, 0.0).sum(axis=1) / np.maximum(n - 1, 1)
+    return n, mean, variance
+
+
+def effect_sizes(values, before, after):
+    """
+    Hedges' g of every row between the columns in `before` and `after` (boolean masks).
+
+    Returns:
+        (before_mean, after_mean, g, n_before, n_after)
+    """
+    n_b, mean_b, var_b = _moments(values, before)
+    n_a, mean_a, var_a = _moments(values, after)
+    dof = np.maximum(n_b + n_a - 2, 1)
+    pooled = np.sqrt(((n_b - 1).clip(0) * var_b + (n_a - 1).clip(0) * var_a) / dof)
+    # A flat series still needs a finite scale; shifts below 0.1% of its level do not count
+    scale = np.maximum(np.nan_to_num(pooled), 1e-3 * np.abs(np.nan_to_num(mean_b)) + 1e-12)
+    correction = 1 - 3 / np.maximum(4 * (n_b + n_a) - 9, 1)
+    with np.errstate(invalid="ignore"):
+        g = (mean_a - mean_b) / scale * correction
+    return mean_b, mean_a, g, n_b, n_a
+
+
+def change_points(values, min_segment=3):
+    """
+    Index of the best mean-shift split of every row (the first point after the shift) and its
+    strength; -1 where the row has fewer than 2 * min_segment samples.
+    """
+    series, points = values.shape
+    valid = ~np.isnan(values)
+    zeros = np.zeros((series, 1))
+    sums = np.hstack([zeros, np.cumsum(np.where(valid, values, 0.0), axis=1)])
+    counts = np.hstack([zeros, np.cumsum(valid, axis=1)])
+    total_n, total_sum = counts[:, -1:], sums[:, -1:]
+    left_n, left_sum = counts[:, 1:points], sums[:, 1:points]  # split before column k = 1..points-1
+    right_n, right_sum = total_n - left_n, total_sum - left_sum
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shift = np.abs(left_sum / left_n - right_sum / right_n) * np.sqrt(left_n * right_n / total_n)
+    shift[(left_n < min_segment) | (right_n < min_segment) | ~valid[:, 1:points]] = -1.0
+    if points < 2:
+        return np.full(series, -1), np.zeros(series)
+    best = np.argmax(shift, axis=1)
+    strength = shift[np.arange(series), best]
+    return np.where(strength >= 0, best + 1, -1), np.maximum(strength, 0.0)
+
+
+def score_deployment_impact(windows, deployment_start, deployment_end=None, min_effect=0.8, min_points=3, max_rows=30):
+    """
+    Rank how much every series of every metric changed across a deployment.
+
+    Args:
+        windows: {metric name: (before response, after response)} Prometheus matrix responses
+        deployment_start / deployment_end: Epoch seconds; samples while the deployment ran
+            (start..end) belong to neither window
+        min_effect: Smallest |EffectSize| reported
+        min_points: Samples needed in each window (and each change point segment)
+        max_rows: Rows kept, largest |EffectSize| first
+
+    Returns:
+        (TabularResult with COLUMNS, stats {"metrics", "series", "compared", "impacted", "errors"})
+    """
+    deployment_end = deployment_start if deployment_end is None else max(deployment_end, deployment_start)
+    stats = {"metrics": len(windows), "series": 0, "compared": 0, "impacted": 0, "errors": {}}
+    rows = []
+    for name, (before, after) in windows.items():
+        failed = [r for r in (before, after) if not isinstance(r, dict) or r.get("status") != "success"]
+        if failed:
+            stats["errors"][name] = str(failed[0].get("error", failed[0]) if isinstance(failed[0], dict) else failed[0])
+            continue
+        timestamps, values, metrics = series_matrix(merge_windows(before, after))
+        stats["series"] += len(metrics)
+        if not metrics:
+            continue
+        before_mask, after_mask = timestamps < deployment_start, timestamps >= deployment_end
+        mean_b, mean_a, g, n_b, n_a = effect_sizes(values, before_mask, after_mask)
+        compared = (n_b >= min_points) & (n_a >= min_points)
+        stats["compared"] += int(compared.sum())
+        impacted = compared & (np.abs(np.nan_to_num(g)) >= min_effect)
+        stats["impacted"] += int(impacted.sum())
+        if not impacted.any():
+            continue
+
+        split, _ = change_points(values[impacted], min_points)
+        _, distinct = split_labels([{"metric": m} for m in metrics])
+        for k, row in enumerate(np.flatnonzero(impacted)):
+            change = timestamps[split[k]] if split[k] >= 0 else None
+            rows.append([
+                name, label_text(distinct[row]) or name, float(mean_b[row]), float(mean_a[row]),
+                float((mean_a[row] - mean_b[row]) / abs(mean_b[row]) * 100) if mean_b[row] else None,
+                float(g[row]), "up" if g[row] > 0 else "down",
+                format_utc(change) if change is not None else None,
+                round((change - deployment_start) / 60, 1) if change is not None else None,
+            ])
+    rows.sort(key=lambda r: -abs(r[5]))
+    return TabularResult.from_rows(COLUMNS, rows[:max_rows], TYPES), stats
@@ -0,0 +1,107 @@
+"""
+Time-series figures that stay fast with many pods and many points.
+
+Charts used to be built with one `go.Scatter` per series from rows of ISO timestamp strings,
+so every point crossed the Streamlit websocket as JSON text (a ~22 character date plus the
+value) and the browser drew everything with SVG. Figures built here:
+
+- switch to `go.Scattergl` (WebGL) once the total point count passes a threshold,
+- keep x and y as float64 NumPy arrays (x in epoch milliseconds on a date axis), which
+  plotly >= 6 serializes as base64 typed buffers instead of JSON number lists,
+- share one x-axis across traces: series on a common regular grid are written as x0/dx with
+  no x array at all, series with identical timestamps reuse one array.
+"""
+
+import numpy as np
+import plotly.graph_objects as go
+
+from series_downsampling import series_arrays
+
+WEBGL_THRESHOLD = 5000
+
+
+def series_label(metric):
+    """Trace name for a Prometheus label set (same naming as format_prometheus_range_data_for_charts)."""
+    name = metric.get("__name__", "unknown_metric")
+    label_parts = []
+    for key, value in metric.items():
+        if key != "__name__":
+            clean_value = str(value).replace('-', '_').replace('.', '_').replace('/', '_')
+            label_parts.append(f"{key}_{clean_value}")
+    return f"{name}_{'_'.join(label_parts)}" if label_parts else name
+
+
+def prometheus_series(prometheus_response):
+    """(name, epoch seconds array, value array) for every series of a range query response."""
+    series = []
+    for result in prometheus_response.get("data", {}).get("result", []) or []:
+        timestamps, values = series_arrays(result)
+        series.append((series_label(result.get("metric", {})), timestamps, values))
+    return series
+
+
+def shared_x_axis(series):
+    """
+    How the traces can share their x values.
+
+    Returns:
+        ("grid", start_seconds, step_seconds, grid_length) when every series lies on one regular grid,
+        ("shared", timestamps) when every series has identical timestamps,
+        ("per_series", None) otherwise
+    """
+    non_empty = [t for _, t, _ in series if len(t)]
+    if not non_empty:
+        return ("per_series", None)
+    start = min(t[0] for t in non_empty)
+    end = max(t[-1] for t in non_empty)
+    diffs = np.concatenate([np.diff(t) for t in non_empty])
+    if len(diffs):
+        step = float(diffs.min())
+        if step > 0 and all(np.allclose(np.mod(t - start, step), 0) for t in non_empty):
+            length = int(round((end - start) / step)) + 1
+            # Only worth it when the grid is mostly filled (downsampled series are sparse)
+            if sum(len(t) for t in non_empty) >= 0.5 * length * len(non_empty):
+                return ("grid", start, step, length)
+    first = non_empty[0]
+    if all(len(t) == len(first) and np.array_equal(t, first) for t in non_empty):
+        return ("shared", first)
+    return ("per_series", None)
+
+
+def create_timeseries_figure(series, title="Time Series", y_label="Value", webgl_threshold=WEBGL_THRESHOLD):
+    """
+    Line chart with one trace per series.
+
+    Args:
+        series: List of (name, epoch seconds array, value array)
+        title: Chart title
+        y_label: Y-axis title
+        webgl_threshold: Total point count above which traces are drawn with WebGL
+    """
+    total_points = sum(len(values) for _, _, values in series)
+    trace_type = go.Scattergl if total_points > webgl_threshold else go.Scatter
+    layout = shared_x_axis(series)
+
+    # One millisecond x array for every trace that shares the time axis
+    shared_x = np.asarray(layout[1], dtype=np.float64) * 1000.0 if layout[0] == "shared" else None
+
+    fig = go.Figure()
+    for name, timestamps, values in series:
+        values = np.asarray(values, dtype=np.float64)
+        if layout[0] == "grid":
+            _, start, step, length = layout
+            y = np.full(length, np.nan)
+            y[np.rint((timestamps - start) / step).astype(np.int64)] = values
+            fig.add_trace(trace_type(x0=start * 1000.0, dx=step * 1000.0, y=y, mode="lines", name=name, connectgaps=True))
+        else:
+            x = shared_x if shared_x is not None else np.asarray(timestamps, dtype=np.float64) * 1000.0
+            fig.add_trace(trace_type(x=x, y=values, mode="lines", name=name, connectgaps=True))
+
+    fig.update_layout(title=title, yaxis_title=y_label, hovermode="x unified")
+    fig.update_xaxes(type="date", title="Time (UTC)")
+    return fig
+
+
+def create_prometheus_figure(prometheus_response, title="Prometheus Metrics", y_label="Value", webgl_threshold=WEBGL_THRESHOLD):
+    """Line chart of a Prometheus range query response."""
+    return create_timeseries_figure(prometheus_series(prometheus_response), title, y_label, webgl_threshold)
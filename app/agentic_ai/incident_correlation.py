@@ -0,0 +1,137 @@
+"""
+Incident / deployment correlation in code.
+
+Given incident rows and deployment rows, find for every incident the deployments that could
+have caused it: deployments that started at most `lookback` before the incident was created,
+or that were still running within that window. The join is vectorized:
+
+- deployments are sorted by start time once; for each incident np.searchsorted finds the
+  slice of candidates (widened by the longest deployment so long-running ones are not missed),
+- the (incident, deployment) pairs are expanded with np.repeat and filtered as arrays,
+- every pair is scored by recency, whether the deployment was still running when the
+  incident started, and whether the deployed service is named in the incident's text.
+
+The result is a small ranked table: the model reads a few candidate pairs instead of working
+out time overlaps from hundreds of rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+from tabular_result import TabularResult
+
+# Score weights: recency is 0..1 (1 = deployed right before the incident)
+RUNNING_WEIGHT = 0.5
+SERVICE_MATCH_WEIGHT = 1.0
+_NAT = np.iinfo(np.int64).min
+
+
+def _epoch_ns(values):
+    """Datetime-like column (datetime64, ISO strings, None) -> int64 nanoseconds; missing -> NaT sentinel."""
+    times = pd.to_datetime(pd.Series(values), utc=True, errors="coerce")
+    return times.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]").astype(np.int64)
+
+
+def _column(table, name):
+    if name is None or name not in table.columns:
+        return None
+    return table.columns[name]
+
+
+def correlate_incidents_with_deployments(incidents, deployments, incident_time_column, deployment_start_column,
+                                         deployment_end_column=None, lookback_seconds=6 * 3600, top=3,
+                                         incident_id_column="IncidentId", incident_text_columns=("Title", "OwningTeam", "OwningTeamName"),
+                                         deployment_columns=("DeploymentId", "Service", "Version", "Status"),
+                                         service_column="Service"):
+    """
+    Rank candidate causal deployments for every incident.
+
+    Args:
+        incidents, deployments: TabularResult (or anything TabularResult.coerce accepts)
+        incident_time_column: Incident creation time column
+        deployment_start_column / deployment_end_column: Deployment start and (optional) end columns
+        lookback_seconds: How long before an incident a deployment may have started (or still run)
+        top: Candidates kept per incident
+        incident_text_columns: Incident columns searched for the deployed service name
+        deployment_columns: Deployment columns copied to the result
+        service_column: Deployment column with the service name
+
+    Returns:
+        TabularResult with one row per (incident, candidate deployment): the incident id, the
+        deployment columns, MinutesBeforeIncident, RunningAtIncident, ServiceMentioned, Score
+        and Rank (1 = most likely), ordered by incident and rank.
+    """
+    incidents = TabularResult.coerce(incidents)
+    deployments = TabularResult.coerce(deployments)
+    out_deployment_columns = [c for c in deployment_columns if c in deployments.columns]
+    empty = TabularResult.from_rows(
+        [incident_id_column] + out_deployment_columns + ["MinutesBeforeIncident", "RunningAtIncident", "ServiceMentioned", "Score", "Rank"], [])
+    if incidents.row_count == 0 or deployments.row_count == 0 or incident_time_column not in incidents.columns \
+            or deployment_start_column not in deployments.columns:
+        return empty
+
+    incident_times = _epoch_ns(incidents.columns[incident_time_column])
+    starts = _epoch_ns(deployments.columns[deployment_start_column])
+    end_values = _column(deployments, deployment_end_column)
+    ends = _epoch_ns(end_values) if end_values is not None else starts.copy()
+    ends = np.where(ends == _NAT, starts, np.maximum(ends, starts))  # unfinished or missing end -> start
+
+    valid_incidents = np.flatnonzero(incident_times != _NAT)
+    valid_deployments = np.flatnonzero(starts != _NAT)
+    if len(valid_incidents) == 0 or len(valid_deployments) == 0:
+        return empty
+    order = valid_deployments[np.argsort(starts[valid_deployments], kind="stable")]
+    sorted_starts = starts[order]
+
+    lookback = int(lookback_seconds * 1e9)
+    longest = int((ends[order] - sorted_starts).max())
+    t = incident_times[valid_incidents]
+    left = np.searchsorted(sorted_starts, t - lookback - longest, side="left")
+    right = np.searchsorted(sorted_starts, t, side="right")
+    counts = np.maximum(right - left, 0)
+    if counts.sum() == 0:
+        return empty
+
+    # Expand the (incident, deployment) candidate pairs
+    pair_incident = np.repeat(np.arange(len(valid_incidents)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    pair_deployment = order[np.repeat(left, counts) + offsets]
+    pair_time = t[pair_incident]
+    keep = ends[pair_deployment] >= pair_time - lookback
+    pair_incident, pair_deployment, pair_time = pair_incident[keep], pair_deployment[keep], pair_time[keep]
+    if len(pair_incident) == 0:
+        return empty
+
+    minutes_before = (pair_time - starts[pair_deployment]) / 6e10
+    running = ends[pair_deployment] >= pair_time
+    recency = np.clip(1.0 - minutes_before * 6e10 / max(lookback, 1), 0.0, 1.0)
+
+    mentioned = np.zeros(len(pair_incident), dtype=bool)
+    services = _column(deployments, service_column)
+    text_columns = [incidents.columns[c] for c in incident_text_columns if c in incidents.columns]
+    if services is not None and text_columns:
+        incident_rows = valid_incidents[pair_incident]
+        texts = [" ".join(str(column[i]).lower() for column in text_columns) for i in incident_rows]
+        names = [str(services[j]).lower() if services[j] is not None else "" for j in pair_deployment]
+        mentioned = np.fromiter((bool(n) and n in text for n, text in zip(names, texts)), dtype=bool, count=len(names))
+
+    score = recency + RUNNING_WEIGHT * running + SERVICE_MATCH_WEIGHT * mentioned
+
+    # Rank within each incident: sort by incident, then score descending
+    ranking = np.lexsort((-score, pair_incident))
+    pair_incident, pair_deployment = pair_incident[ranking], pair_deployment[ranking]
+    minutes_before, running, mentioned, score = minutes_before[ranking], running[ranking], mentioned[ranking], score[ranking]
+    first = np.r_[0, np.flatnonzero(np.diff(pair_incident)) + 1]
+    rank = np.arange(len(pair_incident)) - np.repeat(first, np.diff(np.r_[first, len(pair_incident)])) + 1
+    selected = rank <= top
+
+    incident_ids = incidents.columns[incident_id_column] if incident_id_column in incidents.columns else np.arange(incidents.row_count)
+    columns = {incident_id_column: incident_ids[valid_incidents[pair_incident[selected]]]}
+    for name in out_deployment_columns:
+        columns[name] = deployments.columns[name][pair_deployment[selected]]
+    columns["MinutesBeforeIncident"] = np.round(minutes_before[selected], 1)
+    columns["RunningAtIncident"] = running[selected]
+    columns["ServiceMentioned"] = mentioned[selected]
+    columns["Score"] = np.round(score[selected], 3)
+    columns["Rank"] = rank[selected].astype(np.int64)
+    return TabularResult(columns)
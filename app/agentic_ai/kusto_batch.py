@@ -0,0 +1,89 @@
+"""
+Several Kusto queries in one request.
+
+Correlating an incident with deployments used to take an incident query, a deployment query
+and often two schema calls, each a separate round trip and a separate agent step. KQL runs a
+batch of tabular statements separated by ';' in a single request and returns one result table
+per statement, so these helpers build such batches:
+
+- build_batch joins named queries (plus shared `let` statements) into one batch; results come
+  back in statement order and are matched to the names by position,
+- incident_deployment_window builds the common incident + deployments-around-it pattern, with
+  the incident time computed on the cluster so both tables come from the same request.
+"""
+
+import re
+
+from query_validation import scan_query, split_top_level
+
+_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class BatchError(ValueError):
+    """A batch could not be built from the given queries."""
+
+
+def _statements(query):
+    code, _ = scan_query(query, "\"'", comment="//")
+    return [query[s:e].strip() for s, e in split_top_level(code, ";") if code[s:e].strip()]
+
+
+def build_batch(named_queries, lets=()):
+    """
+    Join named tabular queries into one KQL batch.
+
+    Args:
+        named_queries: {result name: tabular query}; each must be a single statement
+        lets: `let` statements shared by all queries, placed first
+
+    Returns:
+        (batch text, result names in statement order)
+    """
+    if not named_queries:
+        raise BatchError("the batch has no queries")
+    names = list(named_queries)
+    for name in names:
+        if not _NAME.match(name):
+            raise BatchError(f"result name '{name}' must be a plain identifier")
+        statements = _statements(named_queries[name])
+        if len(statements) != 1:
+            raise BatchError(f"query '{name}' must be a single tabular statement; put shared let statements in `lets`")
+        if re.match(r"let\b", statements[0]):
+            raise BatchError(f"query '{name}' is a let statement; put it in `lets`")
+    parts = [let.strip().rstrip(";") for let in lets] + [_statements(named_queries[name])[0] for name in names]
+    return ";\n".join(parts), names
+
+
+def kql_literal(value):
+    """A KQL literal for an id given as number or text."""
+    text = str(value).strip()
+    if re.fullmatch(r"-?\d+", text):
+        return text
+    return "'" + text.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def incident_deployment_window(incident_id, incident_table, deployment_table, incident_time_column,
+                               deployment_start_column, deployment_end_column=None, before="6h", after="1h",
+                               deployment_filter=None, max_rows=200):
+    """
+    Queries for an incident and the deployments around it, to run as one batch.
+
+    Deployments are included when they ran between `before` ahead of the incident's creation and
+    `after` it (with an end column, deployments still running at the start of the window count too).
+
+    Returns:
+        ({"incident": query, "deployments": query}, lets) for build_batch
+    """
+    start, end = deployment_start_column, deployment_end_column
+    lets = [
+        f"let _incident = {incident_table} | where IncidentId == {kql_literal(incident_id)} | take 1",
+        f"let _t0 = toscalar(_incident | project {incident_time_column})",
+    ]
+    overlap = (f"{start} <= _t0 + {after} and coalesce({end}, {start}) >= _t0 - {before}" if end
+               else f"{start} between ((_t0 - {before}) .. (_t0 + {after}))")
+    deployments = f"{deployment_table} | where {overlap}"
+    if deployment_filter:
+        deployments += f" | where {deployment_filter}"
+    deployments += (f" | extend MinutesBeforeIncident = round((_t0 - {start}) / 1m, 1)"
+                    f" | order by {start} desc | take {max_rows}")
+    return {"incident": "_incident", "deployments": deployments}, lets
@@ -0,0 +1,194 @@
+"""
+Bounding rewrites for Kusto queries on the incident and deployment tables.
+
+The agents often send KQL without a time filter or row limit, so a question about "recent
+incidents" could scan all of IcMDataWarehouse and return every column of every row. These scans
+are the slowest and most throttled Kusto calls. Before a query runs, bound_query:
+
+- adds `| where <time column> > ago(<lookback>)` right after the source table unless a filter
+  already compares a datetime (any datetime column, or ago()/datetime()/now()...) or looks rows
+  up by a lookup column such as IncidentId; when the table's time column is not known yet (no
+  cached schema, none configured) such a query can be rejected with a hint instead,
+- caps the rows with `| take <max_rows>` (existing take/limit/top above the cap are lowered),
+- projects the columns the question needs (those given by the agent, or for wide tables the
+  columns the query uses plus a few key columns) when the query returns whole rows.
+
+Every change is returned as a short description so it can be logged and shown to the agent.
+"""
+
+import re
+
+from query_validation import (QueryValidationError, assigned_names, column_references, scan_query, split_top_level,
+                              stage_operator)
+
+# Preferred time columns, in order, among the datetime columns of a table
+TIME_COLUMN_PREFERENCE = ["CreateDate", "CreatedDate", "TimeGenerated", "Timestamp", "StartTime", "EventTime",
+                          "PreciseTimeStamp", "ModifiedDate"]
+# Operators after which the result no longer has the source table's columns
+_RESHAPING = {"project", "project-away", "project-keep", "project-rename", "project-reorder", "summarize",
+              "count", "distinct", "top-nested", "make-series", "evaluate", "join", "lookup", "union",
+              "mv-expand", "mv-apply", "parse", "parse-where", "getschema", "as", "facet", "fork", "partition",
+              "reduce", "scan", "invoke"}
+_NOT_TABLES = {"print", "range", "union", "datatable", "find", "search", "evaluate", "externaldata"}
+_ROW_LIMITS = {"take", "limit", "top", "sample", "sample-distinct", "count"}
+_DATETIME_CALL = re.compile(r"\b(ago|now|datetime|todatetime|startofday|startofweek|startofmonth|startofyear|endofday|"
+                            r"endofweek|endofmonth|endofyear|datetime_add|unixtime_\w+_todatetime)\s*\(")
+_COMPARISON = re.compile(r"<|>|==|!=|\bbetween\b|\bin\s*\(")
+
+
+def _time_bounded(body, datetime_columns):
+    """A filter body that compares a datetime column or a datetime expression."""
+    if not _COMPARISON.search(body):
+        return False
+    return bool(_DATETIME_CALL.search(body)) or any(column in datetime_columns for column in column_references(body))
+
+
+def _key_lookup(body, lookup_columns):
+    """A filter body with an equality (==, =~, in) on one of `lookup_columns`."""
+    return any(re.search(rf"\b{re.escape(column)}\s*(==|=~|in\s*\()", body) for column in lookup_columns)
+
+
+def _table_pipeline(query):
+    """
+    (code with strings and comments blanked, [(start, end) of each pipe stage]) for the last
+    statement of `query`, or None when it does not start with a plain table name.
+    """
+    code, errors = scan_query(query, "\"'", comment="//")
+    if errors:
+        return None
+    statements = [(s, e) for s, e in split_top_level(code, ";") if code[s:e].strip()]
+    if not statements:
+        return None
+    start, end = statements[-1]
+    stages = [(start + s, start + e) for s, e in split_top_level(code[start:end], "|")]
+    source = code[stages[0][0]:stages[0][1]].strip()
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", source) or source.lower() in _NOT_TABLES:
+        return None
+    return code, stages
+
+
+def source_table(query):
+    """Source table of the last statement of a KQL query, or None."""
+    pipeline = _table_pipeline(query)
+    if pipeline is None:
+        return None
+    code, stages = pipeline
+    return code[stages[0][0]:stages[0][1]].strip()
+
+
+def pick_time_column(datetime_columns, preferred=TIME_COLUMN_PREFERENCE):
+    """The table's time column: the first preferred name among its datetime columns, else the first one."""
+    for name in preferred:
+        if name in datetime_columns:
+            return name
+    return sorted(datetime_columns)[0] if datetime_columns else None
+
+
+def bound_query(query, time_column=None, lookback="7d", max_rows=1000, columns=None, requested_columns=None,
+                key_columns=(), max_columns=20, datetime_columns=(), lookup_columns=(), unknown_time_column="allow"):
+    """
+    Bound a KQL query.
+
+    Args:
+        query: KQL query whose last statement starts with the source table
+        time_column: Time column of the source table (no time filter is added without one)
+        lookback: Default time window, e.g. "7d"
+        max_rows: Row cap
+        columns: Column names of the source table, when the schema is cached
+        requested_columns: Columns the question needs (projected when the query returns whole rows)
+        key_columns: Columns always kept when projecting a wide table
+        max_columns: Tables with more columns than this are projected even without requested_columns
+        datetime_columns: Datetime columns of the source table; comparing any of them bounds the time range
+        lookup_columns: Columns whose equality filter (e.g. an incident ID lookup) needs no time range
+        unknown_time_column: "reject" or "allow" a query without a time range when neither
+            `time_column` nor the schema (`columns`) is known
+
+    Returns:
+        (rewritten query, list of changes)
+
+    Raises:
+        QueryValidationError: no time range, the time column is unknown and unknown_time_column is "reject"
+    """
+    pipeline = _table_pipeline(query)
+    if pipeline is None:
+        return query, []
+    code, stages = pipeline
+
+    operators = [stage_operator(code[s:e]) for s, e in stages[1:]]
+    bodies = [code[s:e].strip()[len(op):] for (s, e), op in zip(stages[1:], operators)]
+    changes = []
+    # Pieces inserted after the source table and before the end of the query
+    after_source, at_end = [], []
+
+    # Time filter, unless the rows are already bounded while they come straight from the source table
+    reshaped = False
+    filtered = False
+    datetime_columns = set(datetime_columns) | ({time_column} if time_column else set())
+    for operator, body in zip(operators, bodies):
+        if operator in _RESHAPING:
+            reshaped = True
+        if not reshaped and operator in ("where", "filter") and (
+                _time_bounded(body, datetime_columns) or _key_lookup(body, lookup_columns)):
+            filtered = True
+    if time_column and not filtered:
+        after_source.append(f"where {time_column} > ago({lookback})")
+        changes.append(f"added time filter: where {time_column} > ago({lookback})")
+    elif not filtered and columns is None and unknown_time_column == "reject":
+        lookups = f", or look rows up by {' / '.join(lookup_columns)}" if lookup_columns else ""
+        table = code[stages[0][0]:stages[0][1]].strip()
+        raise QueryValidationError("Kusto", [
+            f"the query has no time range and the time column of {table} is not known yet: add a filter such as "
+            f"`| where <time column> > ago({lookback})` right after the table{lookups}, or fetch its schema first"
+        ])
+
+    # Projection, only while the result still has the source table's columns
+    whole_rows = not any(op in _RESHAPING for op in operators)
+    if columns and whole_rows and (requested_columns or len(columns) > max_columns):
+        used, extended = set(), []
+        for operator, body in zip(operators, bodies):
+            used.update(column_references(body))
+            if operator == "extend":
+                extended += sorted(assigned_names(body))
+        wanted = list(requested_columns or []) + list(key_columns) + ([time_column] if time_column else []) + sorted(used)
+        keep = [c for c in dict.fromkeys(wanted) if c in columns]
+        added = [c for c in dict.fromkeys(extended) if c not in columns]
+        if keep and len(keep) < len(columns):
+            at_end.append("project " + ", ".join(keep + added))
+            changes.append(f"projected {len(keep) + len(added)} of {len(columns)} columns")
+
+    # Row cap: lower existing limits, or add take
+    rewritten_stages = {}
+    limited = False
+    for index, (operator, body) in enumerate(zip(operators, bodies)):
+        if operator in ("take", "limit", "top"):
+            limited = True
+            number = re.match(r"\s*(\d+)", body)
+            if number and int(number.group(1)) > max_rows:
+                s, e = stages[index + 1]
+                text = query[s:s + len(code[s:e].rstrip())]
+                rewritten_stages[index + 1] = text.replace(number.group(1), str(max_rows), 1)
+                changes.append(f"lowered {operator} {number.group(1)} to {max_rows}")
+        elif operator in _ROW_LIMITS:
+            limited = True
+    last = operators[-1] if operators else ""
+    if not limited and not (last == "summarize" and not re.search(r"\bby\b", bodies[-1])):
+        at_end.append(f"take {max_rows}")
+        changes.append(f"capped rows with take {max_rows}")
+
+    if not changes:
+        return query, []
+
+    pieces = [query[:stages[0][0] + len(code[stages[0][0]:stages[0][1]].rstrip())]]
+    pieces += [f" | {piece}" for piece in after_source]
+    render = None
+    for index, (s, e) in enumerate(stages[1:], start=1):
+        # code has comments blanked, so this drops a trailing // comment that would hide what follows
+        text = rewritten_stages.get(index, query[s:s + len(code[s:e].rstrip())]).strip()
+        if index == len(stages) - 1 and operators[-1] == "render":
+            render = text  # render stays last
+            continue
+        pieces.append(f" | {text}")
+    pieces += [f" | {piece}" for piece in at_end]
+    if render:
+        pieces.append(f" | {render}")
+    return "".join(pieces), changes
@@ -0,0 +1,522 @@
+"""
+Optional local replica of the incident and deployment tables in SQLite.
+
+Most questions are about the last few days of IcMDataWarehouse and DeploymentEvents, yet every
+question went to the shared Kusto cluster. KustoReplica keeps a local copy of recent rows:
+
+- sync() pulls rows incrementally by ingestion time (`ingestion_time()` above the last
+  watermark); rows with the same key columns replace older versions, so an incident shows its
+  latest state. The first sync pulls `retention` worth of rows; older rows are pruned,
+- answer(query) translates a common KQL subset (where with comparisons / has / contains / in /
+  between / ago(), project, take, sort, top, count, distinct, summarize count() by) to SQL and
+  runs it locally, but only when the query's time filter starts inside the replicated window.
+  Anything else returns None and goes to the cluster.
+
+Datetimes are stored as fixed-width ISO strings ('2025-08-08T09:00:00.000000Z') so they compare
+correctly as text.
+"""
+
+import json
+import math
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from query_validation import scan_query, split_top_level, stage_operator
+from range_query_cache import parse_step
+from tabular_result import TabularResult
+
+_ISO_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+_TOKEN = re.compile(r"""
+    (?P<datetime>datetime\(\s*[^)]*\))
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<timespan>\d+(?:\.\d+)?(?:ms|d|h|m|s)\b)
+  | (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+  | (?P<op>==|!=|<=|>=|=~|!~|<|>|\.\.|\(|\)|,|\+|-)
+  | (?P<word>!?[A-Za-z_][A-Za-z0-9_]*~?)
+  | (?P<space>\s+)
+""", re.VERBOSE)
+_COMPARISONS = {"==": "=", "!=": "!=", "<": "<", ">": ">", "<=": "<=", ">=": ">="}
+_LIKE_OPERATORS = {"contains": ("%", "%"), "startswith": ("", "%"), "endswith": ("%", "")}
+
+
+_TYPE_BY_KIND = {"M": "datetime", "i": "long", "u": "long", "f": "real", "b": "bool"}
+
+
+class UnsupportedQuery(ValueError):
+    """The query uses KQL the replica does not translate; it goes to the cluster instead."""
+
+
+def iso_time(epoch_seconds):
+    """Epoch seconds -> fixed-width UTC ISO string."""
+    return datetime.fromtimestamp(epoch_seconds, tz=timezone.utc).strftime(_ISO_FORMAT)
+
+
+def _parse_datetime_literal(text):
+    text = text.strip()
+    if text.startswith("datetime("):
+        text = text[len("datetime("):-1].strip()
+    text = text.strip("'\"")
+    parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class _Tokens:
+    def __init__(self, text):
+        self.items = []
+        position = 0
+        while position < len(text):
+            match = _TOKEN.match(text, position)
+            if not match:
+                raise UnsupportedQuery(f"cannot translate {text[position:position + 20]!r}")
+            position = match.end()
+            if match.lastgroup != "space":
+                self.items.append((match.lastgroup, match.group()))
+        self.index = 0
+
+    def peek(self, offset=0):
+        index = self.index + offset
+        return self.items[index] if index < len(self.items) else (None, None)
+
+    def next(self):
+        item = self.peek()
+        self.index += 1
+        return item
+
+    def expect(self, value):
+        kind, text = self.next()
+        if text != value:
+            raise UnsupportedQuery(f"expected {value!r}, got {text!r}")
+
+
+class _WhereTranslator:
+    """Translates a KQL where predicate into SQL with parameters, noting the time lower bound."""
+
+    def __init__(self, text, columns, time_column, now):
+        self.tokens = _Tokens(text)
+        self.columns = columns
+        self.time_column = time_column
+        self.now = now
+        self.params = []
+        self.lower_bound = None
+        self.has_or = False
+
+    def translate(self):
+        sql = self._expression()
+        if self.tokens.peek()[0] is not None:
+            raise UnsupportedQuery(f"unexpected {self.tokens.peek()[1]!r}")
+        if self.has_or:
+            self.lower_bound = None  # a bound under 'or' does not bound the result
+        return sql
+
+    def _expression(self):
+        parts = [self._term()]
+        while self.tokens.peek()[1] in ("and", "or"):
+            keyword = self.tokens.next()[1]
+            self.has_or |= keyword == "or"
+            parts.append(keyword.upper())
+            parts.append(self._term())
+        return " ".join(parts)
+
+    def _term(self):
+        kind, text = self.tokens.peek()
+        if text == "(":
+            self.tokens.next()
+            inner = self._expression()
+            self.tokens.expect(")")
+            return f"({inner})"
+        if text == "not":
+            self.tokens.next()
+            self.tokens.expect("(")
+            inner = self._expression()
+            self.tokens.expect(")")
+            self.has_or = True  # negated bounds are not lower bounds
+            return f"NOT ({inner})"
+        if text in ("isempty", "isnotempty", "isnull", "isnotnull"):
+            self.tokens.next()
+            self.tokens.expect("(")
+            column = self._column()
+            self.tokens.expect(")")
+            return {"isempty": f"({column} IS NULL OR {column} = '')", "isnotempty": f"({column} IS NOT NULL AND {column} != '')",
+                    "isnull": f"{column} IS NULL", "isnotnull": f"{column} IS NOT NULL"}[text]
+        return self._comparison()
+
+    def _column(self):
+        kind, text = self.tokens.next()
+        if kind != "word" or text not in self.columns:
+            raise UnsupportedQuery(f"unknown column {text!r}")
+        return f'"{text}"'
+
+    def _comparison(self):
+        name = self.tokens.peek()[1]
+        column = self._column()
+        kind, operator = self.tokens.next()
+        negate = operator.startswith("!") and operator not in ("!=", "!~")
+        base = operator.lstrip("!")
+        if operator in _COMPARISONS:
+            value = self._value()
+            if name == self.time_column and operator in (">", ">=") and isinstance(value, str):
+                self._bound(value)
+            self.params.append(value)
+            return f"{column} {_COMPARISONS[operator]} ?"
+        if operator in ("=~", "!~"):
+            self.params.append(self._value())
+            return f"{column} {'=' if operator == '=~' else '!='} ? COLLATE NOCASE"
+        if base == "has":
+            self.params.append(str(self._value()))
+            return f"{'NOT ' if negate else ''}kql_has({column}, ?)"
+        if base in _LIKE_OPERATORS:
+            prefix, suffix = _LIKE_OPERATORS[base]
+            value = str(self._value())
+            self.params.append(prefix + value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + suffix)
+            return f"{column} {'NOT ' if negate else ''}LIKE ? ESCAPE '\\'"
+        if base in ("in", "in~"):
+            self.tokens.expect("(")
+            values = [self._value()]
+            while self.tokens.peek()[1] == ",":
+                self.tokens.next()
+                values.append(self._value())
+            self.tokens.expect(")")
+            self.params.extend(values)
+            collate = " COLLATE NOCASE" if base == "in~" else ""
+            return f"{column}{collate} {'NOT ' if negate else ''}IN ({', '.join('?' for _ in values)})"
+        if base == "between":
+            self.tokens.expect("(")
+            low = self._value()
+            self.tokens.expect("..")
+            high = self._value()
+            self.tokens.expect(")")
+            if name == self.time_column and not negate and isinstance(low, str):
+                self._bound(low)
+            self.params.extend([low, high])
+            return f"{column} {'NOT ' if negate else ''}BETWEEN ? AND ?"
+        raise UnsupportedQuery(f"operator {operator!r} is not translated")
+
+    def _bound(self, iso_value):
+        try:
+            bound = _parse_datetime_literal(iso_value)
+        except ValueError:
+            return
+        self.lower_bound = bound if self.lower_bound is None else max(self.lower_bound, bound)
+
+    def _value(self):
+        kind, text = self.tokens.next()
+        if kind == "string":
+            return re.sub(r"\\(.)", r"\1", text[1:-1])
+        if kind == "datetime":
+            return iso_time(self._datetime_arithmetic(_parse_datetime_literal(text)))
+        if kind == "number":
+            return float(text) if any(c in text for c in ".eE") else int(text)
+        if text in ("true", "false"):
+            return int(text == "true")
+        if text in ("ago", "now"):
+            self.tokens.expect("(")
+            seconds = self.now - self._timespan(self.tokens.next()[1]) if text == "ago" else self.now
+            self.tokens.expect(")")
+            return iso_time(self._datetime_arithmetic(seconds))
+        raise UnsupportedQuery(f"value {text!r} is not translated")
+
+    def _datetime_arithmetic(self, seconds):
+        while self.tokens.peek()[1] in ("+", "-") and self.tokens.peek(1)[0] == "timespan":
+            sign = 1 if self.tokens.next()[1] == "+" else -1
+            seconds += sign * self._timespan(self.tokens.next()[1])
+        return seconds
+
+    @staticmethod
+    def _timespan(text):
+        try:
+            return parse_step(text)
+        except (TypeError, ValueError):
+            raise UnsupportedQuery(f"timespan {text!r} is not translated")
+
+
+def kql_has(text, term):
+    """KQL 'has': `term` appears in `text` as a whole token, ignoring case (SQLite function)."""
+    if text is None:
+        return 0
+    return int(re.search(rf"(?<![0-9A-Za-z_]){re.escape(term)}(?![0-9A-Za-z_])", str(text), re.IGNORECASE) is not None)
+
+
+def _column_list(text, columns):
+    names = [name.strip() for name in text.split(",")]
+    for name in names:
+        if name not in columns:
+            raise UnsupportedQuery(f"cannot translate column list {text!r}")
+    return names
+
+
+def _order_terms(text, columns):
+    terms = []
+    for part in text.split(","):
+        words = part.split()
+        if not words or words[0] not in columns or len(words) > 2 or (len(words) == 2 and words[1] not in ("asc", "desc")):
+            raise UnsupportedQuery(f"cannot translate sort {text!r}")
+        terms.append(f'"{words[0]}" {(words[1] if len(words) == 2 else "desc").upper()}')
+    return ", ".join(terms)
+
+
+def translate_kql(query, table, columns, time_column, now=None):
+    """
+    Translate a KQL query on `table` into SQLite (the connection needs the kql_has function).
+    Each stage becomes a subquery around the previous one.
+
+    Returns:
+        (sql, params, lower bound of the time filter in epoch seconds or None); only filters
+        before the first take / top / count / distinct / summarize bound the rows read
+
+    Raises:
+        UnsupportedQuery: for anything outside the translated subset
+    """
+    now = time.time() if now is None else now
+    query = query.strip().rstrip(";")
+    code, errors = scan_query(query, "\"'", comment="//")
+    if errors or ";" in code or code != scan_query(query, "\"'")[0]:
+        raise UnsupportedQuery("only single statements without comments are translated")
+    stages = [query[s:e].strip() for s, e in split_top_level(code, "|")]
+    if stages[0] != table:
+        raise UnsupportedQuery(f"query does not start with {table}")
+    sql, params, lower_bound, reduced = f'SELECT * FROM "{table}"', [], None, False
+    columns = list(columns)
+    for stage in stages[1:]:
+        operator = stage_operator(stage)
+        body = stage[len(operator):].strip()
+        if operator in ("where", "filter"):
+            where = _WhereTranslator(body, columns, time_column, now)
+            condition = where.translate()
+            params += where.params
+            if where.lower_bound is not None and not reduced:
+                lower_bound = max(lower_bound or where.lower_bound, where.lower_bound)
+            sql = f"SELECT * FROM ({sql}) WHERE {condition}"
+        elif operator == "project":
+            columns = _column_list(body, columns)
+            sql = f"SELECT {', '.join(f'{chr(34)}{c}{chr(34)}' for c in columns)} FROM ({sql})"
+        elif operator in ("take", "limit"):
+            if not body.isdigit():
+                raise UnsupportedQuery(f"cannot translate {operator} {body!r}")
+            sql = f"SELECT * FROM ({sql}) LIMIT {int(body)}"
+        elif operator in ("sort", "order"):
+            if not body.startswith("by "):
+                raise UnsupportedQuery(f"cannot translate {operator} {body!r}")
+            sql = f"SELECT * FROM ({sql}) ORDER BY {_order_terms(body[3:], columns)}"
+        elif operator == "top":
+            match = re.fullmatch(r"(\d+)\s+by\s+(.+)", body)
+            if not match:
+                raise UnsupportedQuery(f"cannot translate top {body!r}")
+            sql = f"SELECT * FROM ({sql}) ORDER BY {_order_terms(match.group(2), columns)} LIMIT {int(match.group(1))}"
+        elif operator == "count" and not body:
+            columns = ["Count"]
+            sql = f'SELECT COUNT(*) AS "Count" FROM ({sql})'
+        elif operator == "distinct":
+            columns = _column_list(body, columns)
+            sql = f"SELECT DISTINCT {', '.join(f'{chr(34)}{c}{chr(34)}' for c in columns)} FROM ({sql})"
+        elif operator == "summarize":
+            match = re.fullmatch(r"(?:([A-Za-z_]\w*)\s*=\s*)?count\(\)(?:\s+by\s+(.+))?", body)
+            if not match:
+                raise UnsupportedQuery(f"cannot translate summarize {body!r}")
+            alias = match.group(1) or "count_"
+            by = _column_list(match.group(2), columns) if match.group(2) else []
+            quoted = ", ".join(f'"{c}"' for c in by)
+            sql = (f'SELECT {quoted + ", " if by else ""}COUNT(*) AS "{alias}" FROM ({sql})'
+                   + (f" GROUP BY {quoted}" if by else ""))
+            columns = by + [alias]
+        else:
+            raise UnsupportedQuery(f"operator {operator!r} is not translated")
+        reduced |= operator in ("take", "limit", "top", "count", "distinct", "summarize")
+    return sql, params, lower_bound
+
+
+def _sql_value(value, column_type):
+    """Column value -> SQLite value (datetimes as fixed-width ISO text, NaN/NaT as NULL)."""
+    if value is None:
+        return None
+    if isinstance(value, np.datetime64):
+        return None if np.isnat(value) else np.datetime_as_string(value, unit="us") + "Z"
+    if isinstance(value, (np.floating, float)):
+        return None if math.isnan(value) else float(value)
+    if isinstance(value, (np.integer, np.bool_)):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if column_type in ("datetime", "date"):
+        try:
+            return iso_time(_parse_datetime_literal(str(value)))
+        except ValueError:
+            return None
+    return value
+
+
+class KustoReplica:
+    """
+    SQLite copy of recent rows of a few Kusto tables.
+
+    Args:
+        path: SQLite file (":memory:" for a throwaway replica)
+        tables: {table: {"time_column": ..., "key_columns": [...]}}
+        retention_seconds: How far back rows are kept (and pulled on the first sync)
+        max_staleness_seconds: answer() syncs first when the last sync is older than this
+        batch_rows: Rows per incremental pull; pulls repeat until a smaller batch arrives
+        clock: Time source (for tests)
+    """
+
+    def __init__(self, path, tables, retention_seconds=14 * 86400, max_staleness_seconds=300, batch_rows=50000, clock=time.time):
+        self.tables = tables
+        self.retention_seconds = retention_seconds
+        self.max_staleness_seconds = max_staleness_seconds
+        self.batch_rows = batch_rows
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.create_function("kql_has", 2, kql_has, deterministic=True)
+        self._db.execute("CREATE TABLE IF NOT EXISTS _replica_meta (name TEXT PRIMARY KEY, value TEXT)")
+
+    # --- Metadata ---
+    def _meta(self, name, default=None):
+        row = self._db.execute("SELECT value FROM _replica_meta WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, name, value):
+        self._db.execute("INSERT OR REPLACE INTO _replica_meta VALUES (?, ?)", (name, json.dumps(value)))
+
+    def columns(self, table):
+        """{column: Kusto type} of a replicated table (empty before its first sync)."""
+        return self._meta(f"{table}.columns", {})
+
+    def status(self, table):
+        """{'synced_at', 'covered_from', 'watermark', 'rows'} for a table."""
+        with self._lock:
+            rows = self._db.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] if self.columns(table) else 0
+            return {"synced_at": self._meta(f"{table}.synced_at"), "covered_from": self._meta(f"{table}.covered_from"),
+                    "watermark": self._meta(f"{table}.watermark"), "rows": rows}
+
+    def is_fresh(self, table):
+        synced_at = self._meta(f"{table}.synced_at")
+        return synced_at is not None and self.clock() - synced_at <= self.max_staleness_seconds
+
+    # --- Sync ---
+    def _store(self, table, result):
+        """Upsert rows, creating the table (keyed on its key columns) or adding new columns first."""
+        known = self.columns(table)
+        types = {name: result.column_types.get(name) or _TYPE_BY_KIND.get(array.dtype.kind, "string")
+                 for name, array in result.columns.items()}
+        if not known:
+            keys = [c for c in self.tables[table].get("key_columns", []) if c in types]
+            primary = f", PRIMARY KEY ({', '.join(f'{chr(34)}{c}{chr(34)}' for c in keys)})" if keys else ""
+            self._db.execute(f'CREATE TABLE "{table}" ({", ".join(f"{chr(34)}{c}{chr(34)}" for c in types)}{primary})')
+        else:
+            for name in types:
+                if name not in known:
+                    self._db.execute(f'ALTER TABLE "{table}" ADD COLUMN "{name}"')
+        self._set_meta(f"{table}.columns", {**types, **known})
+
+        names = result.column_names
+        rows = zip(*[[_sql_value(v, types[name]) for v in result.columns[name]] for name in names])
+        self._db.executemany(
+            f'INSERT OR REPLACE INTO "{table}" ({", ".join(f"{chr(34)}{n}{chr(34)}" for n in names)}) '
+            f'VALUES ({", ".join("?" for _ in names)})', rows)
+
+    def sync(self, fetch, max_pulls=20):
+        """
+        Pull new rows for every table. `fetch(query)` runs KQL on the cluster and returns a
+        TabularResult; it should read at least `batch_rows` rows. A table that is still behind
+        after `max_pulls` (or whose pull was cut short) keeps its progress but is not marked
+        synced, so the next answer() pulls again.
+
+        Returns:
+            {table: rows pulled}
+        """
+        pulled = {}
+        with self._lock:
+            now = self.clock()
+            covered_from = now - self.retention_seconds
+            for table, settings in self.tables.items():
+                time_column = settings["time_column"]
+                watermark = self._meta(f"{table}.watermark")
+                pulled[table] = 0
+                # True once every row ingested at the watermark time is stored
+                past_watermark = False
+                caught_up = False
+                for _ in range(max_pulls):
+                    if watermark is None:
+                        source = f"{table} | where {time_column} > datetime({iso_time(covered_from)})"
+                    else:
+                        # >= because rows ingested together share a time; the key columns dedupe the overlap
+                        source = f"{table} | where ingestion_time() {'>' if past_watermark else '>='} datetime({watermark})"
+                    result = TabularResult.coerce(fetch(
+                        f"{source} | extend _IngestedAt = ingestion_time() | order by _IngestedAt asc | take {self.batch_rows}"))
+                    if result.row_count == 0:
+                        caught_up = True
+                        break
+                    latest = self._pull(table, result)
+                    pulled[table] += result.row_count
+                    # A batch cut short by the reader is not the end of the table either
+                    if not result.truncated and result.row_count < self.batch_rows:
+                        watermark = latest
+                        caught_up = True
+                        break
+                    if latest != watermark:
+                        watermark, past_watermark = latest, False
+                        continue
+                    # More than a batch was ingested at the watermark time: pull that time whole, then move past it
+                    tied = TabularResult.coerce(fetch(
+                        f"{table} | where ingestion_time() == datetime({watermark}) | extend _IngestedAt = ingestion_time()"))
+                    self._pull(table, tied)
+                    pulled[table] += tied.row_count
+                    if tied.truncated:
+                        print(f"Replica of {table}: more than {tied.row_count} rows were ingested at {watermark}")
+                        break
+                    past_watermark = True
+                self._set_meta(f"{table}.watermark", watermark)
+                if not caught_up:
+                    print(f"Replica of {table} is still behind after {pulled[table]} rows")
+                    continue
+                self._set_meta(f"{table}.synced_at", now)
+                self._set_meta(f"{table}.covered_from", covered_from)
+                if self.columns(table):
+                    self._db.execute(f'DELETE FROM "{table}" WHERE "{time_column}" < ?', (iso_time(covered_from),))
+            self._db.commit()
+        return pulled
+
+    def _pull(self, table, result):
+        """Store a pulled batch (without its _IngestedAt column); returns its latest ingestion time."""
+        ingested = [_sql_value(v, "datetime") for v in result.columns["_IngestedAt"]]
+        self._store(table, result.select([c for c in result.column_names if c != "_IngestedAt"]))
+        return max((v for v in ingested if v is not None), default=None)
+
+    # --- Queries ---
+    def answer(self, query, table, fetch=None):
+        """
+        Run `query` locally when it is translatable and its time filter starts inside the
+        replicated window; otherwise None. With `fetch`, a stale table is synced first (a failed
+        sync also returns None, so the caller asks the cluster).
+        """
+        if table not in self.tables:
+            return None
+        with self._lock:
+            if fetch is not None and not self.is_fresh(table):
+                try:
+                    self.sync(fetch)
+                except Exception as e:
+                    print(f"Replica sync failed ({e}); querying the cluster")
+                    return None
+            columns = self.columns(table)
+            covered_from = self._meta(f"{table}.covered_from")
+            if not columns or covered_from is None or not self.is_fresh(table):
+                return None
+            try:
+                sql, params, lower_bound = translate_kql(query, table, columns, self.tables[table]["time_column"], self.clock())
+            except UnsupportedQuery as e:
+                print(f"Replica skipped ({e})")
+                return None
+            if lower_bound is None or lower_bound < covered_from:
+                return None
+            cursor = self._db.execute(sql, params)
+            names = [d[0] for d in cursor.description]
+            rows = cursor.fetchall()
+        # Names outside the schema are summarize/count aliases
+        return TabularResult.from_rows(names, rows, [columns.get(name, "long") for name in names])
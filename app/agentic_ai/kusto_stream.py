@@ -0,0 +1,85 @@
+"""
+Progressive reading of Kusto query results.
+
+`client.execute()` downloads and parses the whole response before the first row can be
+used, and building the columnar TabularResult from it briefly holds the rows twice. With
+the SDK's streaming query support the primary result is read frame by frame instead:
+
+- rows are taken from the stream in chunks of `chunk_rows` and each chunk is converted to
+  column arrays right away, so at most one chunk of Python row lists is alive at a time,
+- reading stops at a row budget; the caller then closes the client, which drops the
+  connection instead of downloading the rest of the result,
+- `on_chunk` sees every converted chunk, e.g. to report progress while a large pull runs.
+
+Batches (several ';'-separated statements, see kusto_batch.py) return one primary result
+per statement; stream_kusto_batch reads each of them with its own row budget.
+"""
+
+from itertools import islice
+
+from tabular_result import TabularResult
+
+
+def read_kusto_stream(table, max_rows=None, chunk_rows=5000, on_chunk=None):
+    """
+    Read a Kusto result table (streaming or not) into a TabularResult chunk by chunk.
+
+    Args:
+        table: Result table with `columns` and `raw_rows` (KustoStreamingResultTable or KustoResultTable)
+        max_rows: Stop after this many rows; the result is then marked `truncated`
+        chunk_rows: Rows converted to column arrays at a time
+        on_chunk: Optional callback(chunk TabularResult, rows read so far)
+
+    Returns:
+        TabularResult
+    """
+    names = [column.column_name for column in table.columns]
+    types = [column.column_type for column in table.columns]
+    rows = iter(table.raw_rows)
+    parts, count, truncated = [], 0, False
+    while True:
+        limit = chunk_rows if max_rows is None else min(chunk_rows, max_rows - count)
+        if limit <= 0:
+            truncated = next(rows, None) is not None
+            break
+        chunk = list(islice(rows, limit))
+        if not chunk:
+            break
+        part = TabularResult.from_rows(names, chunk, types)
+        del chunk
+        parts.append(part)
+        count += part.row_count
+        if on_chunk is not None:
+            on_chunk(part, count)
+    result = TabularResult.concat(parts, names, types)
+    result.truncated = truncated
+    return result
+
+
+def stream_kusto_query(client, database, query, properties=None, max_rows=None, chunk_rows=5000, on_chunk=None):
+    """
+    Run `query` with client.execute_streaming_query and read its first primary result with
+    read_kusto_stream. The client is closed afterwards, which also abandons an unread remainder.
+    """
+    try:
+        response = client.execute_streaming_query(database, query, properties=properties)
+        table = next(response.iter_primary_results(), None)
+        if table is None:
+            return TabularResult({})
+        return read_kusto_stream(table, max_rows, chunk_rows, on_chunk)
+    finally:
+        client.close()
+
+
+def stream_kusto_batch(client, database, query, properties=None, max_rows=None, chunk_rows=5000):
+    """
+    Run a batch query with client.execute_streaming_query and read every primary result, in
+    statement order, with read_kusto_stream. A result cut at `max_rows` is skipped to reach the next.
+    """
+    try:
+        response = client.execute_streaming_query(database, query, properties=properties)
+        if hasattr(response, "set_skip_incomplete_tables"):
+            response.set_skip_incomplete_tables(True)
+        return [read_kusto_stream(table, max_rows, chunk_rows) for table in response.iter_primary_results()]
+    finally:
+        client.close()
@@ -0,0 +1,197 @@
+"""
+Cached label and label-value index for Prometheus.
+
+To find a pod, namespace or container the agent used to guess label values or run broad
+trial queries. The index keeps, for a configured set of labels, every value with its series
+count and the related values along a hierarchy (namespace -> pod -> container), so selectors
+can be built from a single fast lookup:
+
+    checkout-7d9f  ->  pod=checkout-7d9f series=412 namespace=prod container=app,istio-proxy
+
+It is built from the Prometheus labels API plus one `count by (<hierarchy>)` query over the
+container and pod metrics (see fetch_prometheus_label_index in supervisor_agent.py) and refreshed
+in a background thread. The labels API returns values without counts, so only values of the
+hierarchy labels have a series count; other values (job, node, __name__, ...) show none.
+"""
+
+import bisect
+import difflib
+import threading
+import time
+from collections import defaultdict
+
+
+class LabelIndex:
+    """
+    Label values with series counts and related labels.
+
+    Args:
+        values: {label: {value: series count or None}}
+        related: {(label, value): {other label: {other value: series count}}}
+        label_names: All label names known to the workspace
+    """
+
+    def __init__(self, values, related=None, label_names=None, built_at=None):
+        self.values = values
+        self.related = related or {}
+        self.label_names = sorted(label_names or values)
+        self.built_at = built_at or time.time()
+        # Lower-cased, sorted values per label for prefix search with bisect; the keys alone
+        # (bisect input) and the first value per key (fuzzy match input) are built once here
+        self._sorted = {
+            label: sorted((str(value).lower(), value) for value in label_values)
+            for label, label_values in values.items()
+        }
+        self._keys = {label: [key for key, _ in entries] for label, entries in self._sorted.items()}
+        self._by_key = {}
+        for label, entries in self._sorted.items():
+            by_key = self._by_key[label] = {}
+            for key, value in entries:
+                by_key.setdefault(key, value)
+
+    @classmethod
+    def from_payload(cls, payload):
+        """
+        Build from fetch_prometheus_label_index output:
+        {"label_names": [...], "values": {label: [values]}, "hierarchy": [labels],
+         "hierarchy_counts": [{"labels": {label: value}, "count": n}, ...]}
+        """
+        values = {label: dict.fromkeys(label_values) for label, label_values in payload.get("values", {}).items()}
+        related = defaultdict(lambda: defaultdict(dict))
+        for row in payload.get("hierarchy_counts", []):
+            labels, count = row["labels"], int(row["count"])
+            for label, value in labels.items():
+                bucket = values.setdefault(label, {})
+                bucket[value] = (bucket.get(value) or 0) + count
+                for other, other_value in labels.items():
+                    if other != label:
+                        related_values = related[(label, value)][other]
+                        related_values[other_value] = related_values.get(other_value, 0) + count
+        related = {key: {other: dict(v) for other, v in others.items()} for key, others in related.items()}
+        return cls(values, related, payload.get("label_names"))
+
+    def __len__(self):
+        return sum(len(v) for v in self.values.values())
+
+    def series_count(self, label, value):
+        return self.values.get(label, {}).get(value)
+
+    def lookup(self, search, label=None, limit=10, fuzzy=True):
+        """
+        Find label values matching `search`: prefix matches first, then substring matches,
+        then (when fuzzy) close matches. Within each group values with more series come first.
+
+        Returns:
+            List of {"label", "value", "series", "match", "related"}
+        """
+        needle = search.strip().lower()
+        labels = [label] if label else list(self.values)
+        found = {}
+
+        def add(lab, value, match):
+            if (lab, value) not in found:
+                found[(lab, value)] = match
+
+        for lab in labels:
+            entries = self._sorted.get(lab, [])
+            keys = self._keys.get(lab, [])
+            start = bisect.bisect_left(keys, needle)
+            end = bisect.bisect_right(keys, needle + "\uffff")
+            for _, value in entries[start:end]:
+                add(lab, value, "prefix")
+            for key, value in entries:
+                if needle in key:
+                    add(lab, value, "substring")
+
+        if fuzzy and len(found) < limit:
+            for lab in labels:
+                by_key = self._by_key.get(lab, {})
+                for key in difflib.get_close_matches(needle, by_key, n=limit, cutoff=0.6):
+                    add(lab, by_key[key], "fuzzy")
+
+        rank = {"prefix": 0, "substring": 1, "fuzzy": 2}
+        ordered = sorted(found.items(), key=lambda item: (rank[item[1]], -(self.series_count(*item[0]) or 0), str(item[0][1])))
+        return [
+            {"label": lab, "value": value, "series": self.series_count(lab, value), "match": match,
+             "related": self.related.get((lab, value), {})}
+            for (lab, value), match in ordered[:limit]
+        ]
+
+    def lookup_label_names(self, search, limit=10):
+        """Label names matching `search` by prefix, substring or close match."""
+        needle = search.strip().lower()
+        names = [n for n in self.label_names if n.lower().startswith(needle)]
+        names += [n for n in self.label_names if needle in n.lower() and n not in names]
+        names += [n for n in difflib.get_close_matches(needle, self.label_names, n=limit, cutoff=0.6) if n not in names]
+        return names[:limit]
+
+
+def format_lookup(results, max_related=5):
+    """One line per match, e.g. 'pod=checkout-1 series=412 namespace=prod container=app,istio-proxy'."""
+    lines = []
+    for result in results:
+        parts = [f"{result['label']}={result['value']}"]
+        if result["series"] is not None:
+            parts.append(f"series={result['series']}")
+        for other, other_values in sorted(result["related"].items()):
+            top = sorted(other_values, key=other_values.get, reverse=True)
+            more = f",+{len(top) - max_related} more" if len(top) > max_related else ""
+            parts.append(f"{other}={','.join(map(str, top[:max_related]))}{more}")
+        if result["match"] == "fuzzy":
+            parts.append("(fuzzy match)")
+        lines.append(" ".join(parts))
+    return "\n".join(lines)
+
+
+class BackgroundIndex:
+    """
+    Holds the latest index built by `loader` and rebuilds it every `refresh_seconds` in a daemon thread.
+    The first get() builds the index synchronously and starts the refresh thread.
+    """
+
+    def __init__(self, loader, refresh_seconds=600):
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds
+        self.last_error = None
+        self._index = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def refresh(self):
+        """Rebuild the index now; on failure the previous index is kept."""
+        try:
+            index = self.loader()
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Label index refresh failed: {e}")
+            return self._index
+        with self._lock:
+            self._index = index
+            self.last_error = None
+        return index
+
+    @property
+    def current(self):
+        """The index built so far, without building it (None before the first build)."""
+        return self._index
+
+    def get(self):
+        """The current index (built on first use), or None if it could not be built."""
+        if self._index is None:
+            self.refresh()
+        self._start()
+        return self._index
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="label-index-refresh", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_seconds):
+            self.refresh()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,381 @@
+"""
+Load-test driver simulating concurrent on-call users against the supervisor.
+
+Virtual investigators hold chat sessions against the same compiled supervisor graph
+the Ask Jarvis page uses. Each session asks a number of questions drawn from a weighted
+question mix, with think time between turns. The LLM and the Kusto/Prometheus/Log Analytics
+backends are local stand-ins that answer from run recordings (see run_recorder.py) or
+from the built-in synthetic mix, with realistic latencies.
+
+Turns are served by a fixed number of slots per worker process (Streamlit runs each
+script run on its own thread), so turns queue up once every slot is busy. The report
+gives p50/p95/p99 turn latency, queue depth, RSS and CPU for every worker.
+
+Usage:
+    python load_test.py --users 20 --workers 2 --slots 8 --latency-scale 1.0
+    python load_test.py --recordings ./recordings --users 50 --output capacity.json
+"""
+
+import argparse
+import contextvars
+import glob
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, message_to_dict, messages_from_dict
+
+from run_recorder import BACKEND_FUNCTIONS, ReplayBackends, ReplayChatModel, load_recording
+from tabular_result import TabularResult
+
+# Secrets read from Key Vault at import time; stand-in values keep the load test offline
+OFFLINE_SECRETS = ("KUSTOCLIENTID", "TENANTID", "PROMETHEUSCLIENTID", "LOGANALYTICSCLIENTID", "AZUREOPENAIKEY")
+
+# Per-turn replay state; LangGraph copies the context into its tool threads
+_current_model = contextvars.ContextVar("load_test_model")
+_current_backends = contextvars.ContextVar("load_test_backends")
+
+
+# === Question mix ===
+def _scripted_turn(question, agent, tool_calls, backend_calls, answer, llm_seconds=1.5, answer_seconds=3.0):
+    """
+    Build an in-memory recording for one turn: supervisor hands off to `agent`,
+    the agent calls `tool_calls` (list of (tool, args)) and answers, the supervisor relays the answer.
+    `backend_calls` is a list of (backend helper name, payload, seconds).
+    """
+    responses = [(AIMessage(content="", tool_calls=[{"name": f"transfer_to_{agent}", "args": {}, "id": "handoff"}]), llm_seconds)]
+    for i, (tool_name, args) in enumerate(tool_calls):
+        responses.append((AIMessage(content="", tool_calls=[{"name": tool_name, "args": args, "id": f"call_{i}"}]), llm_seconds))
+    responses.append((AIMessage(content=answer), answer_seconds))
+    responses.append((AIMessage(content=answer), answer_seconds))
+
+    return {
+        "meta": {"graph": "standard", "input": [message_to_dict(HumanMessage(content=question))]},
+        "llm": [{"request": [], "response": message_to_dict(m), "seconds": s} for m, s in responses],
+        "backend": [{"name": name, "result": payload, "seconds": s} for name, payload, s in backend_calls],
+    }
+
+
+def _incident_rows(count):
+    return TabularResult.from_records([
+        {"IncidentId": 100000 + i, "Severity": 2 + i % 3, "Status": "Active", "Title": f"Pod restarts in checkout service ({i})",
+         "CreatedDate": f"2025-08-08T{9 + i % 10:02d}:{i % 60:02d}:00Z", "OwningTeam": "Argus"}
+        for i in range(count)
+    ])
+
+
+def _deployment_rows(count):
+    return TabularResult.from_records([
+        {"DeploymentId": f"dep-{i}", "Service": "checkout", "Version": f"1.4.{i}", "Status": "Succeeded",
+         "StartTime": f"2025-08-08T{8 + i % 10:02d}:00:00Z", "EndTime": f"2025-08-08T{8 + i % 10:02d}:20:00Z"}
+        for i in range(count)
+    ])
+
+
+def _matrix(series, points, step=300):
+    return {
+        "status": "success",
+        "data": {"resultType": "matrix", "result": [
+            {"metric": {"__name__": "container_cpu_usage_seconds_total", "pod": f"checkout-{s}", "namespace": "prod"},
+             "values": [[1723104000 + p * step, str(0.2 + 0.05 * s + 0.01 * (p % 7))] for p in range(points)]}
+            for s in range(series)
+        ]},
+    }
+
+
+def _log_rows(count):
+    return TabularResult.from_records([
+        {"TimeGenerated": f"2025-08-08T09:{i % 60:02d}:00Z", "PodName": f"checkout-{i % 4}",
+         "LogMessage": f"ERROR request {i} failed: upstream timeout after 30000ms", "LogLevel": "error"}
+        for i in range(count)
+    ])
+
+
+def default_question_mix():
+    """Weighted synthetic question mix modelled on common on-call questions."""
+    return [
+        (0.35, _scripted_turn(
+            "Show me the latest Sev2 incidents", "kusto_agent",
+            [("kusto_incident_query_tool", {"query": "IcMDataWarehouse | where Severity == 2 | take 20"})],
+            [("query_kusto_table", _incident_rows(20), 0.8)],
+            "There are 20 active Sev2 incidents, most of them pod restarts in the checkout service.")),
+        (0.30, _scripted_turn(
+            "Show me CPU usage for the checkout pods over the last hour", "prometheus_agent",
+            [("promql_range_query_tool", {"promql_query": "rate(container_cpu_usage_seconds_total{namespace='prod'}[5m])"})],
+            [("count_prometheus_series", {"container_cpu_usage_seconds_total{namespace='prod'}": 6}, 0.1),
+             ("cached_promql_range_query", _matrix(series=6, points=120, step=30), 0.5)],
+            "CPU usage for the checkout pods stayed between 0.2 and 0.5 cores over the last hour.")),
+        (0.20, _scripted_turn(
+            "Get error logs from the last hour", "log_analytics_agent",
+            [("query_log_analytics_tool", {"query": "ContainerLogV2 | where LogLevel == 'error' | take 50"})],
+            [("query_log_analytics", _log_rows(50), 1.2)],
+            "50 error logs in the last hour, all upstream timeouts from the checkout pods.")),
+        (0.15, _scripted_turn(
+            "Did the last deployment cause incident 100003?", "kusto_agent",
+            [("kusto_incident_query_tool", {"query": "IcMDataWarehouse | where IncidentId == 100003"}),
+             ("kusto_deployment_query_tool", {"query": "DeploymentEvents | where Service == 'checkout' | take 10"})],
+            [("query_kusto_table", _incident_rows(1), 0.6), ("query_kusto_table", _deployment_rows(10), 0.7)],
+            "Deployment dep-3 (checkout 1.4.3) finished 20 minutes before incident 100003 was created.")),
+    ]
+
+
+def recorded_question_mix(directory):
+    """Question mix built from run recordings, each weighted equally."""
+    paths = sorted(glob.glob(os.path.join(directory, "*.jsonl.gz")))
+    if not paths:
+        raise ValueError(f"No recordings (*.jsonl.gz) found in {directory}")
+    return [(1.0, load_recording(path)) for path in paths]
+
+
+# === Stand-ins ===
+class DispatchingChatModel(BaseChatModel):
+    """Chat model shared by the compiled graph that answers from the current turn's replay model."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "load-test-dispatch"
+
+    def bind_tools(self, tools, *, parallel_tool_calls=None, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return _current_model.get()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+def _install_backend_stand_ins(module):
+    """Replace the backend helpers with stand-ins that serve the current turn's payloads."""
+    def stand_in(name):
+        def served(*args, **kwargs):
+            return _current_backends.get().serve(name, *args, **kwargs)
+        return served
+
+    for name in BACKEND_FUNCTIONS:
+        if hasattr(module, name):
+            setattr(module, name, stand_in(name))
+
+
+def _rss_mb():
+    """Current resident set size in MB (falls back to peak RSS outside Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Latency percentiles rounded to milliseconds; empty input gives None."""
+    if len(values) == 0:
+        return {f"p{p}": None for p in points}
+    result = np.percentile(np.asarray(values, dtype=float), points)
+    return {f"p{p}": round(float(v), 3) for p, v in zip(points, result)}
+
+
+# === Worker ===
+def run_worker(options):
+    """
+    Run one worker process worth of virtual users and return its statistics.
+
+    Options (dict): worker_id, users, slots, min_turns, max_turns, think_time,
+    ramp_up, latency_scale, recordings, seed.
+    """
+    for name in OFFLINE_SECRETS:
+        os.environ.setdefault(name, "load-test")
+    import supervisor_agent
+
+    rng = random.Random(options.get("seed", 0) + options.get("worker_id", 0))
+    if options.get("recordings"):
+        mix = recorded_question_mix(options["recordings"])
+    else:
+        mix = default_question_mix()
+    weights = [w for w, _ in mix]
+    latency_scale = options.get("latency_scale", 1.0)
+
+    _install_backend_stand_ins(supervisor_agent)
+    graph = supervisor_agent.create_standard_supervisor(model=DispatchingChatModel())
+
+    lock = threading.Lock()
+    state = {"queued": 0, "running": 0}
+    turn_latencies, service_times, queue_waits = [], [], []
+    errors = []
+    samples = []
+
+    def serve_turn(recording, submitted):
+        started = time.perf_counter()
+        with lock:
+            state["queued"] -= 1
+            state["running"] += 1
+        try:
+            _current_model.set(ReplayChatModel(recorded=recording["llm"], latency_scale=latency_scale))
+            _current_backends.set(ReplayBackends(recording["backend"], latency_scale=latency_scale))
+            graph.invoke({"messages": messages_from_dict(recording["meta"]["input"])})
+        except Exception as e:
+            with lock:
+                errors.append(f"{type(e).__name__}: {e}")
+        finally:
+            finished = time.perf_counter()
+            with lock:
+                state["running"] -= 1
+                turn_latencies.append(finished - submitted)
+                service_times.append(finished - started)
+                queue_waits.append(started - submitted)
+
+    executor = ThreadPoolExecutor(max_workers=options.get("slots", 4), thread_name_prefix="turn")
+
+    def virtual_user(user_id):
+        user_rng = random.Random(rng.random())
+        time.sleep(user_rng.uniform(0, options.get("ramp_up", 0.0)))
+        for _ in range(user_rng.randint(options.get("min_turns", 2), options.get("max_turns", 6))):
+            recording = user_rng.choices(mix, weights=weights)[0][1]
+            with lock:
+                state["queued"] += 1
+            context = contextvars.copy_context()
+            executor.submit(context.run, serve_turn, recording, time.perf_counter()).result()
+            # Think time between turns: exponential around the configured mean
+            think = options.get("think_time", 20.0)
+            if think:
+                time.sleep(user_rng.expovariate(1.0 / think))
+
+    stop_sampling = threading.Event()
+
+    def sample():
+        while not stop_sampling.is_set():
+            with lock:
+                samples.append((state["queued"], state["running"], _rss_mb()))
+            stop_sampling.wait(0.1)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    cpu_start, wall_start = os.times(), time.perf_counter()
+    sampler.start()
+
+    users = [threading.Thread(target=virtual_user, args=(i,)) for i in range(options.get("users", 1))]
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+
+    stop_sampling.set()
+    sampler.join()
+    executor.shutdown()
+    cpu_end, wall = os.times(), time.perf_counter() - wall_start
+    cpu_seconds = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+
+    queue_depths = [q for q, _, _ in samples] or [0]
+    rss = [r for _, _, r in samples] or [_rss_mb()]
+    return {
+        "worker_id": options.get("worker_id", 0),
+        "pid": os.getpid(),
+        "users": options.get("users", 1),
+        "slots": options.get("slots", 4),
+        "turns": len(turn_latencies),
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "turn_latencies": turn_latencies,
+        "service_times": service_times,
+        "queue_waits": queue_waits,
+        "queue_depth": {"max": max(queue_depths), "mean": round(float(np.mean(queue_depths)), 2)},
+        "rss_mb": {"peak": round(max(rss), 1), "mean": round(float(np.mean(rss)), 1)},
+        "cpu_seconds": round(cpu_seconds, 3),
+        "cpu_percent": round(100.0 * cpu_seconds / wall, 1) if wall else 0.0,
+    }
+
+
+def summarize(worker_stats):
+    """Aggregate worker statistics into a capacity-planning report."""
+    latencies = [t for w in worker_stats for t in w["turn_latencies"]]
+    wall = max((w["wall_seconds"] for w in worker_stats), default=0.0)
+    return {
+        "workers": len(worker_stats),
+        "users": sum(w["users"] for w in worker_stats),
+        "turns": len(latencies),
+        "errors": sum(len(w["errors"]) for w in worker_stats),
+        "throughput_turns_per_minute": round(60.0 * len(latencies) / wall, 2) if wall else 0.0,
+        "turn_latency": percentiles(latencies),
+        "service_time": percentiles([t for w in worker_stats for t in w["service_times"]]),
+        "queue_wait": percentiles([t for w in worker_stats for t in w["queue_waits"]]),
+        "per_worker": [
+            {
+                "worker_id": w["worker_id"],
+                "pid": w["pid"],
+                "users": w["users"],
+                "turns": w["turns"],
+                "errors": len(w["errors"]),
+                "turn_latency": percentiles(w["turn_latencies"]),
+                "queue_depth": w["queue_depth"],
+                "rss_mb": w["rss_mb"],
+                "cpu_seconds": w["cpu_seconds"],
+                "cpu_percent": w["cpu_percent"],
+            }
+            for w in worker_stats
+        ],
+    }
+
+
+def run_load_test(users=10, workers=1, slots=4, min_turns=2, max_turns=6, think_time=20.0,
+                  ramp_up=10.0, latency_scale=1.0, recordings=None, seed=0):
+    """
+    Run a load test and return the summary report.
+    Users are spread evenly over `workers` processes; a single worker runs in-process.
+    """
+    per_worker = [users // workers + (1 if i < users % workers else 0) for i in range(workers)]
+    options = [
+        {"worker_id": i, "users": n, "slots": slots, "min_turns": min_turns, "max_turns": max_turns,
+         "think_time": think_time, "ramp_up": ramp_up, "latency_scale": latency_scale,
+         "recordings": recordings, "seed": seed}
+        for i, n in enumerate(per_worker) if n
+    ]
+    if len(options) == 1:
+        stats = [run_worker(options[0])]
+    else:
+        with get_context("spawn").Pool(len(options)) as pool:
+            stats = pool.map(run_worker, options)
+    return summarize(stats)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent on-call users against the supervisor.")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual investigators")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (users are split across them)")
+    parser.add_argument("--slots", type=int, default=4, help="Turns served concurrently per worker")
+    parser.add_argument("--min-turns", type=int, default=2, help="Shortest session, in questions")
+    parser.add_argument("--max-turns", type=int, default=6, help="Longest session, in questions")
+    parser.add_argument("--think-time", type=float, default=20.0, help="Mean seconds between a response and the next question")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="Seconds over which users join")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for stand-in LLM/backend latencies")
+    parser.add_argument("--recordings", help="Directory of run recordings to use as the question mix")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the full report to this JSON file")
+    args = parser.parse_args(argv)
+
+    report = run_load_test(
+        users=args.users, workers=args.workers, slots=args.slots,
+        min_turns=args.min_turns, max_turns=args.max_turns, think_time=args.think_time,
+        ramp_up=args.ramp_up, latency_scale=args.latency_scale, recordings=args.recordings, seed=args.seed,
+    )
+
+    latency = report["turn_latency"]
+    print(f"👥 {report['users']} users on {report['workers']} worker(s): {report['turns']} turns, {report['errors']} errors, "
+          f"{report['throughput_turns_per_minute']} turns/min")
+    print(f"⏱️ Turn latency p50={latency['p50']}s p95={latency['p95']}s p99={latency['p99']}s "
+          f"(queue wait p95={report['queue_wait']['p95']}s)")
+    for worker in report["per_worker"]:
+        print(f"   worker {worker['worker_id']} (pid {worker['pid']}): {worker['turns']} turns, "
+              f"p95={worker['turn_latency']['p95']}s, queue max={worker['queue_depth']['max']}, "
+              f"RSS peak={worker['rss_mb']['peak']}MB, CPU={worker['cpu_percent']}%")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
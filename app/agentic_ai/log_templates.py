@@ -0,0 +1,210 @@
+"""
+Log template mining for container log results.
+
+Error-log queries return thousands of lines that differ only in ids, numbers and durations.
+LogTemplateMiner is a Drain-style streaming clusterer that turns them into a few templates:
+
+- each message is masked (words with digits: numbers, ids, UUIDs, IPs, durations -> <*>) and
+  split into tokens,
+- a fixed-depth tree keyed on the token count and the first tokens picks a small group of
+  candidate templates; the message joins the most similar one (share of equal tokens at or
+  above `similarity`) and positions that differ become <*>, otherwise it starts a new template,
+- messages already seen (raw or masked) are looked up in a dict, so repeated lines cost one hash.
+
+mine_log_templates() runs the miner over a TabularResult and returns one row per template
+with its count, first/last timestamps, example parameters and affected pods. 100k lines take
+well under a second on one core:
+
+    python log_templates.py   # prints the timing for synthetic container logs
+"""
+
+import json
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from tabular_result import TabularResult
+
+WILDCARD = "<*>"
+MESSAGE_COLUMNS = ("LogMessage", "LogEntry", "Message", "msg", "RenderedDescription")
+# Tokens (or the part after a '/', '=' ...) that contain a digit: numbers, durations, hex ids,
+# UUIDs, IPs, versions, pod suffixes
+_MASK = re.compile(r"(?<![\w.:-])[A-Za-z_.:-]*\d[\w.:-]*")
+
+
+class _Template:
+    __slots__ = ("id", "tokens")
+
+    def __init__(self, template_id, tokens):
+        self.id = template_id
+        self.tokens = tokens
+
+
+class LogTemplateMiner:
+    """
+    Drain-style streaming log clusterer.
+
+    Args:
+        similarity: Share of equal tokens needed to join a template (0..1)
+        depth: Tree depth; the first `depth - 2` tokens route a message to its candidate group
+        max_children: Children per tree node; further tokens share a wildcard branch
+    """
+
+    def __init__(self, similarity=0.5, depth=4, max_children=100):
+        self.similarity = similarity
+        self.prefix_tokens = max(depth - 2, 1)
+        self.max_children = max_children
+        self.templates = []
+        self._tree = {}
+        self._seen = {}
+
+    @staticmethod
+    def mask(message):
+        return _MASK.sub(WILDCARD, message)
+
+    def add(self, message):
+        """Add a message; returns the id of its template."""
+        template_id = self._seen.get(message)
+        if template_id is None:
+            masked = self.mask(message)
+            template_id = self._seen.get(masked)
+            if template_id is None:
+                template_id = self._add_masked(masked.split())
+                self._seen[masked] = template_id
+            self._seen[message] = template_id
+        return template_id
+
+    def _add_masked(self, tokens):
+        node = self._tree.setdefault(len(tokens), {})
+        for token in tokens[:self.prefix_tokens]:
+            key = WILDCARD if WILDCARD in token or any(c.isdigit() for c in token) else token
+            if key not in node and len(node) >= self.max_children:
+                key = WILDCARD
+            node = node.setdefault(key, {})
+        group = node.setdefault(None, [])
+
+        best, best_score = None, -1.0
+        for template in group:
+            same = sum(t == c for t, c in zip(tokens, template.tokens))
+            score = same / len(tokens) if tokens else 1.0
+            if score > best_score:
+                best, best_score = template, score
+        if best is not None and best_score >= self.similarity:
+            best.tokens = [c if t == c else WILDCARD for t, c in zip(tokens, best.tokens)]
+            return best.id
+        template = _Template(len(self.templates), tokens)
+        self.templates.append(template)
+        group.append(template)
+        return template.id
+
+    def template(self, template_id):
+        return " ".join(self.templates[template_id].tokens)
+
+
+def _message_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return str(value)
+
+
+def find_message_column(result, candidates=MESSAGE_COLUMNS):
+    """First column of `result` that holds log messages, or None."""
+    return next((name for name in candidates if name in result.columns), None)
+
+
+def _example_params(template, line, limit=5):
+    """Values of `line` at the template's wildcard positions."""
+    params = [raw for raw, token in zip(line.split(), template.split()) if WILDCARD in token]
+    return ", ".join(params[:limit])
+
+
+def mine_log_templates(result, message_column=None, time_column="TimeGenerated", pod_column="PodName",
+                       similarity=0.5, depth=4, max_children=100, max_templates=50, max_pods=5):
+    """
+    Cluster the log lines of `result` into templates.
+
+    Args:
+        result: TabularResult with a message column
+        message_column: Column with the log text (default: the first of MESSAGE_COLUMNS present)
+        time_column / pod_column: Optional columns for first/last seen and affected pods
+        similarity, depth, max_children: LogTemplateMiner settings
+        max_templates: Most frequent templates kept
+        max_pods: Pods listed per template
+
+    Returns:
+        TabularResult with Template, Count, FirstSeen, LastSeen, Pods, PodCount and
+        ExampleParams, most frequent first (time and pod columns only when present)
+    """
+    message_column = message_column or find_message_column(result)
+    if message_column is None or message_column not in result.columns:
+        raise ValueError(f"no log message column in {result.column_names}")
+    miner = LogTemplateMiner(similarity, depth, max_children)
+    messages = [_message_text(value) for value in result.columns[message_column]]
+    ids = np.fromiter((miner.add(message) for message in messages), dtype=np.int64, count=len(messages))
+
+    counts = np.bincount(ids, minlength=len(miner.templates))
+    top = np.argsort(-counts, kind="stable")[:max_templates]
+    top = top[counts[top] > 0]
+    first_index = np.full(len(miner.templates), -1)
+    first_index[ids[::-1]] = np.arange(len(ids))[::-1]  # first row of every template
+    columns = {
+        "Template": np.array([miner.template(t) for t in top], dtype=object),
+        "Count": counts[top].astype(np.int64),
+    }
+
+    # Per-template times and pods, from the rows of the kept templates only
+    rank = np.full(len(miner.templates), -1)
+    rank[top] = np.arange(len(top))
+    kept = rank[ids] >= 0
+    frame = pd.DataFrame({"rank": rank[ids][kept]})
+    if time_column in result.columns and result.columns[time_column].dtype.kind == "M":
+        frame["time"] = result.columns[time_column][kept]
+        times = frame.groupby("rank")["time"].agg(["min", "max"]).reindex(range(len(top)))
+        columns["FirstSeen"] = times["min"].to_numpy(dtype="datetime64[ns]")
+        columns["LastSeen"] = times["max"].to_numpy(dtype="datetime64[ns]")
+    if pod_column in result.columns:
+        frame["pod"] = result.columns[pod_column][kept]
+        pod_counts = frame.dropna(subset=["pod"]).groupby(["rank", "pod"]).size().sort_values(ascending=False, kind="stable")
+        pods = [[] for _ in top]
+        for (template_rank, pod), _ in pod_counts.items():
+            pods[template_rank].append(str(pod))
+        columns["Pods"] = np.array([", ".join(names[:max_pods]) + (", ..." if len(names) > max_pods else "") for names in pods], dtype=object)
+        columns["PodCount"] = np.array([len(names) for names in pods], dtype=np.int64)
+    columns["ExampleParams"] = np.array([_example_params(columns["Template"][i], messages[first_index[t]])
+                                         for i, t in enumerate(top)], dtype=object)
+    return TabularResult(columns)
+
+
+def _benchmark(lines=100_000):
+    rng = np.random.default_rng(0)
+    patterns = [
+        "Request {id} to /api/orders/{n} failed after {ms}ms with status 503",
+        "Connection to 10.0.{a}.{b}:5432 timed out after {s}s",
+        "User {id} not authorized for resource orders/{n}",
+        "Retrying payment {id} attempt {a} of 5",
+        "GC pause {ms}ms heap {n}MiB",
+    ]
+    messages = [patterns[i].format(id=f"{rng.integers(1 << 40):x}", n=rng.integers(10000), ms=rng.integers(1000),
+                                   a=rng.integers(256), b=rng.integers(256), s=rng.integers(60))
+                for i in rng.integers(len(patterns), size=lines)]
+    base = np.datetime64("2025-08-08T09:00:00", "ns")
+    result = TabularResult({
+        "TimeGenerated": base + np.sort(rng.integers(0, 3600 * 10**9, size=lines)).astype("timedelta64[ns]"),
+        "PodName": np.array([f"api-{i}" for i in rng.integers(8, size=lines)], dtype=object),
+        "LogMessage": np.array(messages, dtype=object),
+    })
+    start = time.perf_counter()
+    templates = mine_log_templates(result)
+    elapsed = time.perf_counter() - start
+    print(f"{lines} lines -> {templates.row_count} templates in {elapsed * 1000:.0f} ms")
+    for row in templates.to_records():
+        print(f"  {row['Count']:>6}  {row['Template']}")
+
+
+if __name__ == "__main__":
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,140 @@
+"""
+Lagged correlation of a target series against many candidate series.
+
+"What else changed when latency spiked?" means comparing one series with hundreds. The
+target and every candidate are put on one grid (time_alignment.align_sources), optionally
+differenced so shared trends do not look like causes, and correlated at every lag from
+-max_lag to +max_lag in one pass:
+
+- all lags of all candidates come from FFT cross-correlations of the (candidate, point)
+  matrix with the target, so the cost is a few FFTs instead of a loop over lags,
+- missing samples are masked rather than filled: the sums Pearson's r needs (n, Σx, Σy, Σx²,
+  Σy², Σxy over the overlapping points) are cross-correlations of the masked series too, so
+  every lag gets the exact correlation over the samples both series have.
+
+A positive lag means the candidate moved first (the candidate at t - lag matches the target
+at t), which is what a root-cause hint looks for.
+"""
+
+import numpy as np
+
+from series_downsampling import series_arrays
+from tabular_result import TabularResult
+from time_alignment import align_sources
+from tool_result_encoding import label_text, split_labels
+
+COLUMNS = ["Metric", "Series", "Correlation", "LagSeconds", "Relation", "Points"]
+TYPES = ["string", "string", "real", "real", "string", "long"]
+
+
+def _cross_sums(target, candidates, max_lag):
+    """
+    Σ target[t] * candidates[:, t - lag] for lag = -max_lag..max_lag, via FFT.
+    target: (points,), candidates: (series, points) -> (series, 2 * max_lag + 1)
+    """
+    points = target.shape[-1]
+    size = 1 << int(np.ceil(np.log2(2 * points)))
+    product = np.fft.rfft(target, size) * np.conj(np.fft.rfft(candidates, size, axis=-1))
+    full = np.fft.irfft(product, size, axis=-1)
+    lags = np.arange(-max_lag, max_lag + 1)
+    return full[..., lags % size]
+
+
+def lagged_correlations(target, candidates, max_lag, min_points=10):
+    """
+    Pearson correlation of `target` with every row of `candidates` at every lag.
+
+    Args:
+        target: (points,) values on the shared grid, NaN where missing
+        candidates: (series, points) values on the same grid
+        max_lag: Largest shift in grid steps, both directions
+        min_points: Overlapping samples needed; fewer give NaN
+
+    Returns:
+        (series, 2 * max_lag + 1) correlations; column max_lag + k is lag k
+    """
+    max_lag = int(min(max_lag, max(target.shape[-1] - 1, 0)))
+    target_mask = (~np.isnan(target)).astype(np.float64)
+    candidate_mask = (~np.isnan(candidates)).astype(np.float64)
+    x = np.nan_to_num(target)
+    y = np.nan_to_num(candidates)
+    # Centre on the overall means first so the sums below do not lose precision
+    x = np.where(target_mask > 0, x - x.sum() / max(target_mask.sum(), 1), 0.0)
+    y = np.where(candidate_mask > 0, y - (y.sum(axis=1) / np.maximum(candidate_mask.sum(axis=1), 1))[:, None], 0.0)
+
+    n = _cross_sums(target_mask, candidate_mask, max_lag)
+    sum_x = _cross_sums(x, candidate_mask, max_lag)
+    sum_y = _cross_sums(target_mask, y, max_lag)
+    sum_xx = _cross_sums(x * x, candidate_mask, max_lag)
+    sum_yy = _cross_sums(target_mask, y * y, max_lag)
+    sum_xy = _cross_sums(x, y, max_lag)
+    n = np.rint(n)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        covariance = sum_xy - sum_x * sum_y / n
+        variance_x = sum_xx - sum_x ** 2 / n
+        variance_y = sum_yy - sum_y ** 2 / n
+        r = covariance / np.sqrt(variance_x * variance_y)
+    # Near-constant overlaps are noise, not correlation
+    flat = (variance_x <= 1e-12 * np.maximum(sum_xx, 1e-300)) | (variance_y <= 1e-12 * np.maximum(sum_yy, 1e-300))
+    r[(n < min_points) | flat] = np.nan
+    return np.clip(r, -1.0, 1.0)
+
+
+def correlate_with_target(target_response, candidate_responses, step, max_lag_seconds, difference=True, top=15,
+                          min_points=10):
+    """
+    Rank the candidate series by their strongest lagged correlation with the target.
+
+    Args:
+        target_response: Prometheus matrix response; several series are averaged into one
+        candidate_responses: {metric name: Prometheus matrix response}
+        step: Grid step in seconds (the query step)
+        max_lag_seconds: Largest lead or lag searched
+        difference: Correlate step-to-step changes instead of levels
+        top: Rows kept, highest |Correlation| first
+        min_points: Overlapping samples needed per lag
+
+    Returns:
+        (TabularResult with COLUMNS, stats {"candidates", "target_series", "lags"})
+    """
+    names, labels, sources = [], [], []
+    for metric, response in candidate_responses.items():
+        series = response.get("data", {}).get("result", []) if isinstance(response, dict) else []
+        _, distinct = split_labels(series)
+        for s, own in zip(series, distinct):
+            times, values = series_arrays(s)
+            names.append(metric)
+            labels.append(label_text(own) or metric)
+            sources.append((f"{metric}/{len(sources)}", times, values))
+    target_series = target_response.get("data", {}).get("result", []) if isinstance(target_response, dict) else []
+    max_lag = int(max_lag_seconds // step)
+    stats = {"candidates": len(sources), "target_series": len(target_series), "lags": 2 * max_lag + 1}
+    empty = TabularResult.from_rows(COLUMNS, [], TYPES)
+    if not target_series or not sources:
+        return empty, stats
+
+    targets = [(f"target/{i}", *series_arrays(s)) for i, s in enumerate(target_series)]
+    frame = align_sources(targets + sources, step)
+    with np.errstate(invalid="ignore"):
+        target = np.nanmean(frame.values[:len(targets)], axis=0) if len(targets) > 1 else frame.values[0]
+    candidates = frame.values[len(targets):]
+    if difference:
+        target, candidates = np.diff(target), np.diff(candidates, axis=1)
+    if target.shape[-1] == 0:
+        return empty, stats
+
+    r = lagged_correlations(target, candidates, max_lag, min_points)
+    usable = ~np.isnan(r).all(axis=1)
+    strength = np.where(np.isnan(r), -1.0, np.abs(r))
+    best = strength.argmax(axis=1)
+    lag_steps = best - (r.shape[1] - 1) // 2
+    best_r = r[np.arange(len(r)), best]
+    overlap = np.count_nonzero(~np.isnan(candidates), axis=1)
+
+    order = [i for i in np.argsort(-strength.max(axis=1), kind="stable") if usable[i]][:top]
+    rows = []
+    for i in order:
+        lag = float(lag_steps[i] * step)
+        relation = "moves first" if lag > 0 else "moves after" if lag < 0 else "moves together"
+        rows.append([names[i], labels[i], round(float(best_r[i]), 3), lag, relation, int(overlap[i])])
+    return TabularResult.from_rows(COLUMNS, rows, TYPES), stats
@@ -0,0 +1,154 @@
+"""
+Streaming decoder for large Prometheus query responses.
+
+`response.json()` builds the whole body as Python objects (a list, an int and a str per
+point) before anything can look at it, which roughly doubles peak memory on big matrix
+results. This module reads the body incrementally with ijson and decodes one series at a time
+straight into a float64 NumPy array of [timestamp, value] rows:
+
+- the response keeps the Prometheus shape ({"status", "data": {"resultType", "result"}}),
+  so the encoders, downsampling, charts and the range cache consume it unchanged,
+- reading stops as soon as a series or point budget is reached; the response is then marked
+  with "truncated" and a Prometheus-style warning the agent can see.
+
+Without ijson the body is loaded with json and converted afterwards (same result, no memory
+savings).
+"""
+
+import json
+from array import array
+
+import numpy as np
+
+try:
+    import ijson
+except ImportError:  # optional: fall back to json.load
+    ijson = None
+
+_POINT = "data.result.item.values.item.item"
+_SERIES = "data.result.item"
+_LABEL = "data.result.item.metric"
+_LABEL_VALUE = _LABEL + "."
+_SAMPLE = "data.result.item.value.item"
+
+
+def _series_record(metric, flat, sample):
+    if sample is not None:
+        return {"metric": metric, "value": sample}
+    return {"metric": metric, "values": np.frombuffer(flat, dtype=np.float64).reshape(-1, 2)}
+
+
+def iter_prometheus_series(stream, header):
+    """
+    Yield the series of a Prometheus query response one at a time while it is being read.
+
+    Matrix series come as {"metric", "values": (n, 2) float64 array}, vector samples as
+    {"metric", "value": [timestamp, "value"]}. Everything else in the body (status, resultType,
+    error, warnings, scalar/string results) is stored in `header` as it is read.
+    """
+    metric, flat, sample, label, in_series = {}, array("d"), None, None, False
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if prefix == _POINT:
+            flat.append(float(value))
+        elif prefix == _LABEL:
+            if event == "map_key":
+                label = value
+        elif event == "string" and prefix.startswith(_LABEL_VALUE):
+            metric[label] = value
+        elif prefix == _SERIES:
+            if event == "start_map":
+                metric, flat, sample, in_series = {}, array("d"), None, True
+            elif event == "end_map":
+                in_series = False
+                yield _series_record(metric, flat, sample)
+            elif not in_series and event in ("number", "string"):
+                header.setdefault("result", []).append(value)  # scalar/string result
+        elif prefix == _SAMPLE:
+            if sample is None:
+                sample = []
+            sample.append(value)
+        elif prefix in ("status", "errorType", "error", "data.resultType"):
+            header[prefix.split(".")[-1]] = value
+        elif prefix in ("warnings.item", "infos.item"):
+            header.setdefault(prefix.split(".")[0], []).append(value)
+
+
+def _iter_loaded_series(stream, header):
+    """Fallback for iter_prometheus_series without ijson: load everything, then convert."""
+    body = json.load(stream)
+    data = body.get("data", {})
+    for key in ("status", "errorType", "error", "warnings", "infos"):
+        if key in body:
+            header[key] = body[key]
+    if "resultType" in data:
+        header["resultType"] = data["resultType"]
+    result = data.get("result", [])
+    if not isinstance(result, list) or (result and not isinstance(result[0], dict)):
+        header["result"] = result
+        return
+    for series in result:
+        if "values" in series:
+            values = np.array([[float(t), float(v)] for t, v in series["values"]], dtype=np.float64).reshape(-1, 2)
+            yield {"metric": series.get("metric", {}), "values": values}
+        else:
+            yield series
+
+
+def parse_prometheus_response(stream, max_series=None, max_points=None):
+    """
+    Decode a Prometheus query response from a binary stream, stopping early at a budget.
+
+    Args:
+        stream: File-like object with the JSON body (e.g. requests' response.raw)
+        max_series: Stop after this many series
+        max_points: Stop once this many matrix points were read (the last series is cut)
+
+    Returns:
+        Prometheus response dict; matrix values are float64 arrays of [timestamp, value] rows.
+        When a budget was hit it carries "truncated": {"series", "points"} and a warning.
+    """
+    header = {}
+    series_iter = iter_prometheus_series(stream, header) if ijson else _iter_loaded_series(stream, header)
+    result, points, truncated = [], 0, False
+    for series in series_iter:
+        if max_series is not None and len(result) >= max_series:
+            truncated = True
+            break
+        values = series.get("values")
+        if values is not None and max_points is not None and points + len(values) > max_points:
+            truncated = True
+            if points < max_points:
+                series["values"] = values[:max_points - points]
+                points = max_points
+                result.append(series)
+            break
+        points += len(values) if values is not None else 0
+        result.append(series)
+    if truncated and hasattr(series_iter, "close"):
+        series_iter.close()
+
+    response = {"status": header.get("status", "success"), "data": {
+        "resultType": header.get("resultType", "matrix"),
+        "result": header["result"] if "result" in header else result,
+    }}
+    for key in ("errorType", "error", "warnings", "infos"):
+        if key in header:
+            response[key] = header[key]
+    if truncated:
+        response["truncated"] = {"series": len(result), "points": points}
+        response.setdefault("warnings", []).append(
+            f"result truncated to {len(result)} series / {points} points; narrow the selector or the time range"
+        )
+    return response
+
+
+def read_prometheus_response(response, max_series=None, max_points=None):
+    """
+    parse_prometheus_response for a `requests` response opened with stream=True.
+    The connection is released when reading stops, also after an early stop.
+    """
+    try:
+        response.raw.decode_content = True  # let urllib3 undo gzip/deflate
+        return parse_prometheus_response(response.raw, max_series, max_points)
+    finally:
+        response.close()
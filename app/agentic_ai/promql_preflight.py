@@ -0,0 +1,210 @@
+"""
+Series-cardinality preflight for PromQL queries.
+
+An unfiltered selector such as `container_memory_rss` can return thousands of series, which
+are then pivoted, charted and sent to the LLM. Before a query runs, the selectors it uses are
+extracted, their series counts are estimated (through the /api/v1/series endpoint, cached for a
+few minutes) and queries above the configured threshold are either wrapped in `topk`/`sum by`
+or rejected with guidance for the agent.
+
+The network call lives in supervisor_agent.py (count_prometheus_series) so it is recorded and
+replayed with the other backend helpers; this module only parses, caches and decides.
+"""
+
+import re
+import threading
+import time
+
+# Identifiers that are part of the PromQL grammar rather than metric names
+_KEYWORDS = {"by", "without", "on", "ignoring", "group_left", "group_right", "bool", "offset",
+             "and", "or", "unless", "atan2", "inf", "nan"}
+# Keywords followed by a parenthesized label list, not an expression
+_LABEL_LIST_KEYWORDS = {"by", "without", "on", "ignoring", "group_left", "group_right"}
+_AGGREGATION_OPERATORS = {"sum", "avg", "min", "max", "count", "group", "stddev", "stdvar", "topk", "bottomk",
+                          "quantile", "count_values", "limitk", "limit_ratio"}
+# Keywords and aggregation operators are case-insensitive in PromQL ("SUM BY" works)
+_AGGREGATION = re.compile(r"^\s*(" + "|".join(sorted(_AGGREGATION_OPERATORS)) + r")\b\s*(\(|by\b|without\b)", re.IGNORECASE)
+_GROUPING = re.compile(r"(by|without)\b", re.IGNORECASE)
+_IDENT_START = re.compile(r"[A-Za-z_:]")
+_IDENT_CHAR = re.compile(r"[A-Za-z0-9_:]")
+
+
+class PreflightRejected(Exception):
+    """Raised when a query selects too many series and the configured action is 'reject'."""
+
+
+def _skip_string(expr, i):
+    quote = expr[i]
+    i += 1
+    while i < len(expr) and expr[i] != quote:
+        i += 2 if expr[i] == "\\" else 1
+    return i + 1
+
+
+def _skip_balanced(expr, i, open_char, close_char):
+    """Index just past the bracket closing the one at expr[i] (strings inside are skipped)."""
+    depth = 0
+    while i < len(expr):
+        char = expr[i]
+        if char in "\"'`":
+            i = _skip_string(expr, i)
+            continue
+        if char == open_char:
+            depth += 1
+        elif char == close_char:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _next_non_space(expr, i):
+    while i < len(expr) and expr[i].isspace():
+        i += 1
+    return i
+
+
+def extract_selectors(expr):
+    """
+    Series selectors used by a PromQL expression, e.g.
+    'sum(rate(http_requests_total{job="api"}[5m])) by (pod)' -> ['http_requests_total{job="api"}'].
+    """
+    selectors = []
+    i = 0
+    while i < len(expr):
+        char = expr[i]
+        if char in "\"'`":
+            i = _skip_string(expr, i)
+        elif char == "[":
+            i = _skip_balanced(expr, i, "[", "]")
+        elif char == "{":
+            end = _skip_balanced(expr, i, "{", "}")
+            selectors.append(expr[i:end])
+            i = end
+        elif char.isdigit() or (char == "." and i + 1 < len(expr) and expr[i + 1].isdigit()):
+            # Numbers and durations (5m, 1.5, 0x1f)
+            while i < len(expr) and (_IDENT_CHAR.match(expr[i]) or expr[i] == "."):
+                i += 1
+        elif _IDENT_START.match(char):
+            start = i
+            while i < len(expr) and _IDENT_CHAR.match(expr[i]):
+                i += 1
+            ident = expr[start:i]
+            following = _next_non_space(expr, i)
+            next_char = expr[following] if following < len(expr) else ""
+            if next_char == "(":
+                if ident.lower() in _LABEL_LIST_KEYWORDS:
+                    i = _skip_balanced(expr, following, "(", ")")
+                # Otherwise a function or aggregation: keep scanning its arguments
+            elif ident.lower() in _KEYWORDS:
+                continue
+            elif ident.lower() in _AGGREGATION_OPERATORS and _GROUPING.match(expr, following):
+                continue  # "sum by (...) (...)": the grouping clause is skipped next
+            elif next_char == "{":
+                end = _skip_balanced(expr, following, "{", "}")
+                selectors.append(ident + expr[following:end])
+                i = end
+            else:
+                selectors.append(ident)
+        else:
+            i += 1
+    return list(dict.fromkeys(selectors))
+
+
+def is_aggregated(expr):
+    """True when the outermost operation is an aggregation (sum, topk, count by, ...)."""
+    return bool(_AGGREGATION.match(expr))
+
+
+def rewrite_query(expr, action, topk=20, sum_by=("namespace",)):
+    """Bound an expression: wrap it in topk(k, ...) or sum by (labels) (...)."""
+    if action == "topk":
+        return f"topk({int(topk)}, {expr})"
+    if action == "sum_by":
+        return f"sum by ({', '.join(sum_by)}) ({expr})"
+    raise ValueError(f"Unknown preflight action '{action}'")
+
+
+class SeriesCountCache:
+    """Series counts per (endpoint, selector), kept for `ttl_seconds`."""
+
+    def __init__(self, ttl_seconds=300):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, endpoint, selector):
+        with self._lock:
+            entry = self._entries.get((endpoint, selector))
+        if entry and time.monotonic() - entry[1] < self.ttl_seconds:
+            return entry[0]
+        return None
+
+    def put(self, endpoint, selector, count):
+        with self._lock:
+            self._entries[(endpoint, selector)] = (count, time.monotonic())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def preflight(expr, count_series, max_series=500, action="topk", topk=20, sum_by=("namespace",),
+              cache=None, endpoint=""):
+    """
+    Estimate how many series `expr` returns and bound it when needed.
+
+    Args:
+        expr: PromQL expression
+        count_series: Callable(list of selectors) -> {selector: series count}; counts may be capped
+        max_series: Threshold above which the query is rewritten or rejected
+        action: "topk", "sum_by" or "reject"
+        cache: Optional SeriesCountCache shared between calls
+        endpoint: Cache key for the Prometheus endpoint
+
+    Returns:
+        (query to run, estimated series count or None, note for the agent or None)
+
+    Raises:
+        PreflightRejected: when the estimate exceeds max_series and action is "reject"
+    """
+    if is_aggregated(expr):
+        return expr, None, None
+    selectors = extract_selectors(expr)
+    if not selectors:
+        return expr, None, None
+
+    counts = {}
+    missing = []
+    for selector in selectors:
+        cached = cache.get(endpoint, selector) if cache else None
+        if cached is None:
+            missing.append(selector)
+        else:
+            counts[selector] = cached
+    if missing:
+        fetched = count_series(missing)
+        for selector in missing:
+            count = fetched.get(selector)
+            if count is None:
+                continue
+            counts[selector] = count
+            if cache:
+                cache.put(endpoint, selector, count)
+    if not counts:
+        return expr, None, None
+
+    estimate = max(counts.values())
+    if estimate <= max_series:
+        return expr, estimate, None
+
+    worst = max(counts, key=counts.get)
+    guidance = (
+        f"{worst} matches more than {max_series} series. Add label filters "
+        f"(e.g. namespace, pod or container), aggregate with sum by (...) or use topk(...)."
+    )
+    if action == "reject" or expr.rstrip().endswith("]"):
+        raise PreflightRejected(f"Query rejected by series preflight: {guidance}")
+    rewritten = rewrite_query(expr, action, topk, sum_by)
+    return rewritten, estimate, f"preflight: {guidance} Ran `{rewritten}` instead."
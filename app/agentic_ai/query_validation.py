@@ -0,0 +1,420 @@
+"""
+Local syntax and name validation for PromQL and KQL queries.
+
+A malformed query used to travel to Prometheus, Kusto or Log Analytics, fail there, and cost
+another agent hop to fix. The tools now validate a query before sending it:
+
+- syntax: unbalanced brackets, unterminated strings, bad range durations and label
+  matchers (PromQL), empty pipe stages, unknown tabular operators, SQL and '=' comparisons (KQL),
+- names: unknown functions, and metric, label, table and column names that are not in the
+  names already cached by the tools (label index, metric list, table schemas); no backend
+  call is made to fetch names for validation.
+
+Every rejected query is a backend round trip saved; ValidationStats counts them.
+"""
+
+import difflib
+import re
+import threading
+import time
+
+from promql_preflight import extract_selectors
+
+
+class QueryValidationError(Exception):
+    """Raised when a query fails local validation; `errors` lists every problem found."""
+
+    def __init__(self, backend, errors):
+        self.backend = backend
+        self.errors = errors
+        super().__init__(
+            f"Query not sent to {backend}, it failed validation:\n" + "\n".join(f"- {e}" for e in errors)
+            + "\nFix the query and try again."
+        )
+
+
+def _suggest(name, candidates):
+    close = difflib.get_close_matches(name, list(candidates), n=1, cutoff=0.75)
+    return f" (did you mean '{close[0]}'?)" if close else ""
+
+
+def scan_query(text, quotes, comment=None):
+    """
+    Split `text` into code outside string literals, checking brackets and quotes.
+
+    Returns:
+        (code with string contents blanked to spaces, list of errors)
+    """
+    errors = []
+    stack = []
+    code = []
+    pairs = {")": "(", "]": "[", "}": "{"}
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if comment and text.startswith(comment, i):
+            end = text.find("\n", i)
+            end = len(text) if end == -1 else end
+            code.append(" " * (end - i))
+            i = end
+            continue
+        if char in quotes:
+            j = i + 1
+            while j < len(text) and text[j] != char:
+                j += 2 if text[j] == "\\" and char != "`" else 1
+            if j >= len(text):
+                errors.append(f"unterminated string starting at position {i}")
+                code.append(char + " " * (len(text) - i - 1))
+                break
+            code.append(char + " " * (j - i - 1) + char)
+            i = j + 1
+            continue
+        if char in "([{":
+            stack.append((char, i))
+        elif char in ")]}":
+            if not stack or stack[-1][0] != pairs[char]:
+                errors.append(f"unexpected '{char}' at position {i}")
+            else:
+                stack.pop()
+        code.append(char)
+        i += 1
+    for open_char, position in stack:
+        errors.append(f"unclosed '{open_char}' at position {position}")
+    return "".join(code), errors
+
+
+# === PromQL ===
+PROMQL_FUNCTIONS = {
+    "abs", "absent", "absent_over_time", "acos", "acosh", "asin", "asinh", "atan", "atanh", "avg_over_time",
+    "ceil", "changes", "clamp", "clamp_max", "clamp_min", "cos", "cosh", "count_over_time", "day_of_month",
+    "day_of_week", "day_of_year", "days_in_month", "deg", "delta", "deriv", "double_exponential_smoothing",
+    "exp", "floor", "histogram_avg", "histogram_count", "histogram_fraction", "histogram_quantile",
+    "histogram_stddev", "histogram_stdvar", "histogram_sum", "holt_winters", "hour", "idelta", "increase",
+    "info", "irate", "label_join", "label_replace", "last_over_time", "ln", "log10", "log2", "mad_over_time",
+    "max_over_time", "min_over_time", "minute", "month", "pi", "predict_linear", "present_over_time",
+    "quantile_over_time", "rad", "rate", "resets", "round", "scalar", "sgn", "sin", "sinh", "sort",
+    "sort_by_label", "sort_by_label_desc", "sort_desc", "sqrt", "stddev_over_time", "stdvar_over_time",
+    "sum_over_time", "tan", "tanh", "time", "timestamp", "vector", "year",
+}
+PROMQL_AGGREGATIONS = {"sum", "avg", "min", "max", "count", "group", "stddev", "stdvar", "topk", "bottomk",
+                       "quantile", "count_values", "limitk", "limit_ratio"}
+# Keywords that may be followed by "(" (label lists, set operators, bool modifier)
+_PROMQL_KEYWORDS = {"by", "without", "on", "ignoring", "group_left", "group_right", "and", "or", "unless",
+                    "bool", "atan2"}
+_PROMQL_CALL = re.compile(r"(@\s*)?([A-Za-z_:][A-Za-z0-9_:]*)\s*\(")
+# Only valid after the @ modifier, e.g. rate(x[5m] @ end())
+_PROMQL_AT_FUNCTIONS = {"start", "end"}
+_PROMQL_RANGE = re.compile(r"\[([^\[\]]*)\]")
+_DURATION = r"(\d+(ms|s|m|h|d|w|y))+"
+_RANGE_BODY = re.compile(rf"^\s*({_DURATION})?\s*(:\s*({_DURATION})?)?\s*$")
+_MATCHER = re.compile(r"""^\s*([A-Za-z_][A-Za-z0-9_]*|"[^"]*")\s*(=~|!~|!=|=)\s*("[^"]*"|'[^']*'|`[^`]*`)\s*$""")
+_BARE_NAME = re.compile(r"""^\s*("[^"]*"|'[^']*')\s*$""")
+_METRIC_NAME = re.compile(r"^[A-Za-z_:][A-Za-z0-9_:]*")
+# Functions that add labels to their result; by/on/... lists may then use labels no series has
+_PROMQL_LABEL_MAKERS = re.compile(r"\b(label_replace|label_join|count_values)\b")
+
+
+def _matchers(selector):
+    """Label matchers of a selector, split on commas outside strings."""
+    body = selector[selector.index("{") + 1:selector.rindex("}")] if "{" in selector else ""
+    parts, current, quote = [], "", None
+    for char in body:
+        if quote:
+            quote = None if char == quote else quote
+        elif char in "\"'`":
+            quote = char
+        elif char == ",":
+            parts.append(current)
+            current = ""
+            continue
+        current += char
+    parts.append(current)
+    return [p for p in parts if p.strip()]
+
+
+def validate_promql(expr, metric_names=None, label_names=None):
+    """
+    Problems found in a PromQL expression (empty list when it looks valid).
+
+    Args:
+        expr: PromQL expression
+        metric_names: Known metric names; unknown metrics are reported when given
+        label_names: Known label names; unknown labels are reported when given
+    """
+    if not expr or not expr.strip():
+        return ["the query is empty"]
+    code, errors = scan_query(expr, "\"'`")
+    if errors:
+        return errors
+
+    for match in _PROMQL_CALL.finditer(code):
+        name = match.group(2)
+        if name in PROMQL_FUNCTIONS or name.lower() in _PROMQL_KEYWORDS | PROMQL_AGGREGATIONS:
+            continue
+        if match.group(1) and name in _PROMQL_AT_FUNCTIONS:
+            continue
+        errors.append(f"unknown function '{name}'{_suggest(name, PROMQL_FUNCTIONS | PROMQL_AGGREGATIONS)}")
+
+    for match in _PROMQL_RANGE.finditer(code):
+        if not _RANGE_BODY.match(match.group(1)) or not match.group(1).strip():
+            errors.append(f"invalid range '[{expr[match.start(1):match.end(1)]}]', use a duration like [5m] or [1h:1m]")
+
+    if re.search(r"(\+|-|\*|/|%|\^|==|!=|>=|<=|>|<|\band|\bor|\bunless)\s*$", code):
+        errors.append("the query ends with a binary operator")
+
+    labels_used = set()
+    for selector in extract_selectors(expr):
+        name_match = _METRIC_NAME.match(selector)
+        name = name_match.group(0) if name_match else None
+        for matcher in _matchers(selector):
+            parsed = _MATCHER.match(matcher)
+            if parsed:
+                labels_used.add(parsed.group(1))
+            elif _BARE_NAME.match(matcher) and name is None:
+                name = matcher.strip()[1:-1]
+            else:
+                hint = " (use == only in comparisons; matchers use =, !=, =~ or !~ with a quoted value)" if "==" in matcher else ""
+                errors.append(f"invalid label matcher '{matcher.strip()}'{hint}")
+        if name and metric_names is not None and name not in metric_names:
+            errors.append(f"unknown metric '{name}'{_suggest(name, metric_names)}")
+
+    if not _PROMQL_LABEL_MAKERS.search(code):
+        for match in re.finditer(r"\b(by|without|on|ignoring|group_left|group_right)\s*\(([^()]*)\)", code):
+            labels_used.update(label.strip() for label in expr[match.start(2):match.end(2)].split(",") if label.strip())
+    if label_names is not None:
+        for label in sorted(labels_used):
+            if label.startswith('"') or label == "__name__":
+                continue
+            if label not in label_names:
+                errors.append(f"unknown label '{label}'{_suggest(label, label_names)}")
+    return errors
+
+
+# === KQL ===
+KQL_OPERATORS = {
+    "as", "consume", "count", "distinct", "evaluate", "extend", "facet", "find", "fork", "getschema",
+    "invoke", "join", "limit", "lookup", "make-series", "mv-apply", "mv-expand", "order", "parse",
+    "parse-kv", "parse-where", "partition", "project", "project-away", "project-keep", "project-rename",
+    "project-reorder", "range", "reduce", "render", "sample", "sample-distinct", "scan", "search",
+    "serialize", "sort", "summarize", "take", "top", "top-hitters", "top-nested", "union", "where",
+    "filter", "extend-schema",
+}
+# Words inside KQL expressions that are not column references
+_KQL_WORDS = {
+    "and", "or", "not", "in", "between", "by", "asc", "desc", "nulls", "first", "last", "true", "false",
+    "has", "has_cs", "hasprefix", "hasprefix_cs", "hassuffix", "hassuffix_cs", "contains", "contains_cs",
+    "startswith", "startswith_cs", "endswith", "endswith_cs", "matches", "regex", "has_any", "has_all",
+    "like", "notlike", "with", "kind", "on", "to", "step", "from", "of", "typeof", "null", "dynamic",
+    "datetime", "timespan", "time", "bool", "int", "long", "real", "double", "string", "guid", "decimal",
+    "inner", "outer", "leftouter", "rightouter", "fullouter", "leftanti", "rightanti", "leftsemi",
+    "rightsemi", "innerunique", "anti", "semi", "isfuzzy", "withsource", "d", "h", "m", "s", "ms",
+}
+_KQL_IDENT = re.compile(r"(?<![\w.$'\"])([A-Za-z_][A-Za-z0-9_]*)(?![\w])")
+_KQL_STATEMENT_START = re.compile(r"^\s*(let|set|declare|alias|restrict)\b", re.IGNORECASE)
+_KQL_SUBQUERY_CALL = re.compile(r"\b(toscalar|materialize)\s*$", re.IGNORECASE)
+
+
+def split_top_level(code, separator):
+    """Split on `separator` outside brackets (strings are already blanked)."""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(code):
+        if char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append((start, i))
+            start = i + 1
+    parts.append((start, len(code)))
+    return parts
+
+
+def blank_subqueries(code):
+    """
+    `code` with the insides of subqueries blanked to spaces: parenthesized groups that hold a
+    top-level '|' (e.g. `in ((T | project A))`) and toscalar()/materialize() arguments. Their
+    tables and columns are not the outer query's, so they are not checked against it.
+    """
+    chars = list(code)
+    opened = []
+    for i, char in enumerate(code):
+        if char == "(":
+            opened.append(i)
+        elif char == ")" and opened:
+            start = opened.pop()
+            inner = code[start + 1:i]
+            if len(split_top_level(inner, "|")) > 1 or _KQL_SUBQUERY_CALL.search(code[:start]):
+                chars[start + 1:i] = " " * len(inner)
+    return "".join(chars)
+
+
+def stage_operator(stage):
+    """Lower-cased tabular operator of a pipe stage ('where', 'project-away', ...)."""
+    match = re.match(r"\s*([A-Za-z][A-Za-z0-9_-]*)", stage)
+    return match.group(1).lower() if match else ""
+
+
+def assigned_names(clause):
+    """Names on the left of '=' in a comma-separated clause ('a = x, b' -> {'a'})."""
+    return {m.group(1) for m in re.finditer(r"(?:^|,)\s*([A-Za-z_][A-Za-z0-9_]*)\s*=(?![=~])", clause)}
+
+
+def column_references(clause):
+    """Identifiers used as column references: not functions, keywords, property names or numbers."""
+    names = []
+    for match in _KQL_IDENT.finditer(clause):
+        name = match.group(1)
+        following = clause[match.end():].lstrip()
+        if following.startswith("(") or name.lower() in _KQL_WORDS:
+            continue
+        if re.match(r"\d", clause[max(0, match.start() - 1):match.start()]):
+            continue  # timespan literals like 1d
+        if following.startswith("=") and not following.startswith("=="):
+            continue  # alias being assigned
+        names.append(name)
+    return names
+
+
+def validate_kql(query, columns_by_table=None, known_tables=None):
+    """
+    Problems found in a KQL query (empty list when it looks valid).
+
+    Args:
+        query: KQL query; statements before the last ';' (let, set, ...) are allowed
+        columns_by_table: {table: column names} for tables whose schema is cached; columns used
+            in where/project/sort/summarize-by stages are checked while the column set is known
+        known_tables: Known table names; a source table that is not one of them but closely
+            resembles one (a likely typo) is reported
+    """
+    if not query or not query.strip():
+        return ["the query is empty"]
+    code, errors = scan_query(query, "\"'", comment="//")
+    if errors:
+        return errors
+    if re.match(r"^\s*(select|with)\b", code, re.IGNORECASE) and re.search(r"\bfrom\b", code, re.IGNORECASE):
+        return ["this looks like SQL; write KQL (Table | where ... | project ...)"]
+
+    statements = [(s, e) for s, e in split_top_level(code, ";") if code[s:e].strip()]
+    if not statements:
+        return ["the query is empty"]
+    defined = set()
+    for s, e in statements[:-1]:
+        match = re.match(r"\s*let\s+([A-Za-z_][A-Za-z0-9_]*)", code[s:e])
+        if match:
+            defined.add(match.group(1))
+    start, end = statements[-1]
+    if _KQL_STATEMENT_START.match(code[start:end]):
+        return errors
+    code = blank_subqueries(code)
+
+    stages = split_top_level(code[start:end], "|")
+    columns = None
+    for number, (s, e) in enumerate(stages):
+        stage = code[start + s:start + e]
+        if not stage.strip():
+            errors.append(f"empty pipe stage #{number + 1}" if number else "the query starts with '|'; it must start with a table name")
+            continue
+        if number == 0:
+            source = stage.strip()
+            table_match = re.match(r"^([A-Za-z_][A-Za-z0-9_]*)$", source)
+            if table_match:
+                table = table_match.group(1)
+                if table in defined:
+                    continue
+                if columns_by_table and table in columns_by_table:
+                    columns = set(columns_by_table[table])
+                elif known_tables is not None and table not in known_tables and _suggest(table, known_tables):
+                    errors.append(f"unknown table '{table}'{_suggest(table, known_tables)}")
+            continue
+
+        operator = stage_operator(stage)
+        if operator not in KQL_OPERATORS:
+            errors.append(f"unknown operator '{operator or stage.strip()[:20]}'{_suggest(operator, KQL_OPERATORS)}")
+            columns = None
+            continue
+        body = stage.strip()[len(operator):]
+        if operator in ("where", "filter"):
+            if re.search(r"(?<![=!<>~])=(?![=~])", body):
+                errors.append(f"'=' in where is an assignment; use '==' to compare (stage #{number + 1})")
+
+        checked = None
+        if operator in ("where", "filter", "project", "project-away", "project-keep", "project-reorder"):
+            checked = body
+        elif operator in ("sort", "order", "top"):
+            by = re.search(r"\bby\b", body)
+            checked = body[by.end():] if by else None
+        elif operator == "summarize":
+            by = re.search(r"\bby\b", body)
+            checked = body[by.end():] if by else None
+        if columns is not None and checked:
+            for name in column_references(checked):
+                if name not in columns and name not in defined:
+                    errors.append(f"unknown column '{name}' in stage #{number + 1} ({operator}){_suggest(name, columns)}")
+
+        # Track the columns available to the next stage while that is simple to know
+        if columns is None:
+            continue
+        if operator == "extend":
+            columns |= assigned_names(body)
+        elif operator == "project":
+            columns = {n for n in assigned_names(body)} | {
+                n for n in column_references(body) if n in columns
+            }
+        elif operator == "project-away":
+            columns -= set(column_references(body))
+        elif operator in ("where", "filter", "sort", "order", "take", "limit", "top", "render",
+                          "distinct", "serialize", "sample", "project-reorder"):
+            if operator == "distinct":
+                columns = set(column_references(body)) & columns
+        else:
+            columns = None  # summarize, join, parse, mv-expand, ...: stop checking columns
+    return errors
+
+
+# === Name cache and statistics ===
+class NameCache:
+    """Names (metric names, table columns, ...) recorded by the tools, kept for `ttl_seconds`."""
+
+    def __init__(self, ttl_seconds=3600):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def put(self, key, names):
+        with self._lock:
+            self._entries[key] = (set(names), time.monotonic())
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and time.monotonic() - entry[1] < self.ttl_seconds:
+            return entry[0]
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class ValidationStats:
+    """Queries validated and rejected per backend; each rejection is a backend call saved."""
+
+    def __init__(self):
+        self.validated = {}
+        self.rejected = {}
+        self._lock = threading.Lock()
+
+    def record(self, backend, errors):
+        with self._lock:
+            self.validated[backend] = self.validated.get(backend, 0) + 1
+            if errors:
+                self.rejected[backend] = self.rejected.get(backend, 0) + 1
+
+    @property
+    def saved_calls(self):
+        return sum(self.rejected.values())
+
+    def summary(self):
+        with self._lock:
+            return {backend: {"validated": count, "rejected": self.rejected.get(backend, 0)}
+                    for backend, count in self.validated.items()}
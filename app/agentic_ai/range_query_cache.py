@@ -0,0 +1,247 @@
+"""
+Incremental, step-aligned result cache for Prometheus range queries.
+
+Follow-up questions usually extend or shift the previous range query ("now the last 3 hours",
+"refresh"), and every one of them used to refetch the whole window. Like a Prometheus query
+frontend, this cache:
+
+- aligns start/end to multiples of the step, so evaluation timestamps are identical between
+  requests (a request may therefore return points up to one step earlier than asked),
+- splits the timeline into fixed chunks of `points_per_chunk` steps, keyed by query and step;
+  each chunk remembers the contiguous interval it holds,
+- fetches only what is missing (adjacent gaps in one request); points within the last
+  `max_fresh_seconds`, where data may still change, are never kept, so a refresh fetches just
+  the recent tail,
+- keeps every series of a chunk as an (n, 2) float64 array of [timestamp, value] rows and
+  merges cached and fetched arrays (np.concatenate / np.unique) into a single matrix response
+  whose "values" are such arrays too, like read_prometheus_response() returns them,
+- is bounded by the total number of cached points (`max_points`) as well as by the number of
+  (query, step) entries; least recently used entries are dropped first.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import numpy as np
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h|d|w|y)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800, "y": 31536000}
+
+
+def parse_step(step):
+    """Prometheus duration ('5m', '1h30m', '30s') or number of seconds -> seconds."""
+    if isinstance(step, (int, float)):
+        return float(step)
+    text = str(step).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(text)
+    if not parts or "".join(n + u for n, u in parts) != text:
+        raise ValueError(f"Invalid step '{step}'")
+    return sum(float(n) * _UNIT_SECONDS[u] for n, u in parts)
+
+
+def parse_time(value):
+    """ISO 8601 ('2025-08-08T09:00:00Z') or unix timestamp -> epoch seconds (naive times are UTC)."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _series_key(metric):
+    return tuple(sorted(metric.items()))
+
+
+def _as_points(values):
+    """Prometheus [[timestamp, "value"], ...] (or an (n, 2) array) -> (n, 2) float64 array."""
+    return np.asarray(values, dtype=np.float64).reshape(-1, 2)
+
+
+def _merge_points(arrays):
+    """Concatenate point arrays sorted by timestamp; for repeated timestamps the last array wins."""
+    if len(arrays) == 1:
+        return arrays[0]
+    points = np.concatenate(arrays[::-1])
+    _, first = np.unique(points[:, 0], return_index=True)
+    return points[first]
+
+
+class RangeQueryCache:
+    """
+    Step-aligned chunk cache for range query results.
+
+    Args:
+        points_per_chunk: Steps per cached chunk
+        max_fresh_seconds: Points within this many seconds of now are never kept
+        max_queries: Number of (query, step) entries kept (least recently used are dropped)
+        max_points: Total cached points over all entries (least recently used are dropped)
+        clock: Returns the current epoch time (injectable for tests)
+    """
+
+    def __init__(self, points_per_chunk=120, max_fresh_seconds=300, max_queries=256, max_points=2_000_000,
+                 clock=time.time):
+        self.points_per_chunk = points_per_chunk
+        self.max_fresh_seconds = max_fresh_seconds
+        self.max_queries = max_queries
+        self.max_points = max_points
+        self.clock = clock
+        self.last_stats = {}
+        self.points = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def _chunks_for(self, key):
+        with self._lock:
+            chunks = self._entries.pop(key, None)
+            if chunks is None:
+                chunks = {}
+                self._sizes[key] = 0
+            self._entries[key] = chunks
+            self._evict()
+            return chunks
+
+    def _evict(self):
+        """Drop least recently used entries (never the most recent one) until both limits hold."""
+        while len(self._entries) > 1 and (len(self._entries) > self.max_queries or self.points > self.max_points):
+            key, _ = self._entries.popitem(last=False)
+            self.points -= self._sizes.pop(key)
+
+    def query(self, key, start, end, step, fetch):
+        """
+        Range query through the cache.
+
+        Args:
+            key: Identifies the query (e.g. (endpoint, promql))
+            start, end: ISO strings or unix timestamps
+            step: Prometheus duration or seconds
+            fetch: Callable(start_seconds, end_seconds) -> Prometheus range query response
+
+        Returns:
+            A Prometheus matrix response; non-success responses from `fetch` are returned as is
+        """
+        step_seconds = parse_step(step)
+        start_s = (parse_time(start) // step_seconds) * step_seconds
+        end_s = (parse_time(end) // step_seconds) * step_seconds
+        span = step_seconds * self.points_per_chunk
+        first, last = int(start_s // span), int(end_s // span)
+        # Newest evaluation timestamp that is old enough to be kept
+        fresh_cut = -(-(self.clock() - self.max_fresh_seconds) // step_seconds) * step_seconds - step_seconds
+
+        cache_key = (key, step_seconds)
+        chunks = self._chunks_for(cache_key)
+
+        # Gaps per chunk; a chunk covers one contiguous interval [from, through], so gaps
+        # before/after the covered interval are extended until they touch it
+        gaps = []
+        with self._lock:
+            for index in range(first, last + 1):
+                needed_from = max(index * span, start_s)
+                needed_to = min((index + 1) * span - step_seconds, end_s)
+                entry = chunks.get(index)
+                if entry is None:
+                    gaps.append((index, needed_from, needed_to))
+                    continue
+                if needed_from < entry["from"]:
+                    gaps.append((index, needed_from, entry["from"] - step_seconds))
+                if needed_to > entry["through"]:
+                    gaps.append((index, entry["through"] + step_seconds, needed_to))
+
+        # Adjacent gaps (usually across chunk boundaries) are fetched with one request
+        requests = []
+        for _, gap_from, gap_to in sorted(gaps, key=lambda gap: gap[1]):
+            if requests and gap_from <= requests[-1][1] + step_seconds:
+                requests[-1][1] = max(requests[-1][1], gap_to)
+            else:
+                requests.append([gap_from, gap_to])
+
+        fetched = OrderedDict()
+        warnings = []
+        truncated = None
+        for request_from, request_to in requests:
+            response = fetch(request_from, request_to)
+            if not isinstance(response, dict) or response.get("status") != "success":
+                return response
+            if response.get("data", {}).get("resultType") != "matrix":
+                return response
+            warnings.extend(response.get("warnings", []))
+            if response.get("truncated"):
+                truncated = response["truncated"]
+                gaps = []  # partial results are returned (marked truncated) but never cached
+            for series in response["data"].get("result", []):
+                metric = series.get("metric", {})
+                fetched.setdefault(_series_key(metric), (metric, []))[1].append(_as_points(series.get("values", [])))
+        fetched = OrderedDict((k, (metric, _merge_points(arrays))) for k, (metric, arrays) in fetched.items())
+
+        # Store what was fetched for each gap, up to the freshness cut
+        with self._lock:
+            added = 0
+            for index, gap_from, gap_to in gaps:
+                keep_to = min(gap_to, fresh_cut)
+                if keep_to < gap_from:
+                    continue
+                entry = chunks.get(index)
+                if entry is None:
+                    entry = chunks[index] = {"from": gap_from, "through": keep_to, "series": {}}
+                elif gap_to < entry["from"]:
+                    entry["from"] = gap_from
+                else:
+                    entry["through"] = max(entry["through"], keep_to)
+                for series_key, (metric, points) in fetched.items():
+                    kept = points[(points[:, 0] >= gap_from) & (points[:, 0] <= keep_to)]
+                    if not len(kept):
+                        continue
+                    stored = entry["series"].get(series_key)
+                    merged_points = kept if stored is None else _merge_points([stored[1], kept])
+                    added += len(merged_points) - (0 if stored is None else len(stored[1]))
+                    entry["series"][series_key] = (metric, merged_points)
+            if cache_key in self._sizes:  # not evicted by a concurrent query meanwhile
+                self._sizes[cache_key] += added
+                self.points += added
+                self._evict()
+
+            # Cached arrays are replaced, never changed in place, so the merge below can run unlocked
+            merged = OrderedDict()
+            for index in range(first, last + 1):
+                entry = chunks.get(index)
+                for series_key, (metric, points) in (entry["series"].items() if entry else ()):
+                    merged.setdefault(series_key, (metric, []))[1].append(points)
+        for series_key, (metric, points) in fetched.items():
+            merged.setdefault(series_key, (metric, []))[1].append(points)
+
+        self.last_stats = {
+            "chunks": last - first + 1,
+            "requests": len(requests),
+            "fetched_seconds": sum(to - frm + step_seconds for frm, to in requests),
+        }
+        result = []
+        for metric, arrays in merged.values():
+            points = _merge_points(arrays)
+            values = points[(points[:, 0] >= start_s) & (points[:, 0] <= end_s)]
+            if len(values):
+                result.append({"metric": metric, "values": values})
+        merged_response = {"status": "success", "data": {"resultType": "matrix", "result": result}}
+        if warnings:
+            merged_response["warnings"] = warnings
+        if truncated:
+            merged_response["truncated"] = truncated
+        return merged_response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.points = 0
@@ -0,0 +1,543 @@
+"""
+Record and replay supervisor runs for deterministic performance regression tests.
+
+A recording captures one supervisor invocation into a compact gzipped JSON Lines file:
+every LLM request/response, every tool call with its arguments and every backend payload
+(Kusto, Prometheus and Log Analytics calls made by the helpers in supervisor_agent.py).
+
+Backend calls are recorded by the recorder of the current context: the helpers are wrapped
+once (install_backend_recording) and the wrappers look the active recorder up in a context
+variable, like the artifact store does. Concurrent sessions of the UI therefore each record
+only their own calls, and helpers called without an active recorder go straight through.
+
+A replay compiles the same supervisor graph around a chat model that answers with the
+recorded LLM responses and patches the backend helpers to return the recorded payloads,
+so the run takes the same route offline. Replays report the time spent in every graph
+node and can flag nodes that got slower than a baseline report.
+
+Usage:
+    install_backend_recording(supervisor_agent)  # once per process
+    recorder = RunRecorder(graph="standard")
+    with recorder.capture_backends():
+        result = supervisor.invoke(inputs, config={"callbacks": [recorder]})
+    recorder.save("slow_turn.jsonl.gz", inputs)
+
+    python run_recorder.py slow_turn.jsonl.gz --baseline last_report.json --threshold 0.25
+"""
+
+import argparse
+import contextvars
+import functools
+import gzip
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import convert_to_messages, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+import numpy as np
+from pydantic import PrivateAttr
+
+from tabular_result import TabularResult
+
+RECORDING_VERSION = 1
+
+# Backend helpers in supervisor_agent.py whose payloads are recorded and replayed
+# (cached_promql_range_query is replayed as a whole, so the range cache state does not matter)
+BACKEND_FUNCTIONS = (
+    "kusto_schema_fetcher",
+    "query_kusto_table",
+    "query_kusto_batch",
+    "get_prometheus_metrics",
+    "run_promql_query",
+    "run_promql_batch",
+    "cached_promql_range_query",
+    "run_promql_range_query",
+    "count_prometheus_series",
+    "fetch_prometheus_label_index",
+    "query_log_analytics",
+    "query_log_analytics_batch",
+)
+
+# Helpers returning a list of outcome dicts ({"status", "result" or "error", ...}) whose
+# "result" is a columnar result; their payloads are tagged so replay rebuilds only those
+OUTCOME_FUNCTIONS = ("query_log_analytics_batch",)
+
+
+_current_recorder = contextvars.ContextVar("run_recorder", default=None)
+
+
+class ReplayDivergenceError(RuntimeError):
+    """Raised when a replay asks for more LLM responses or backend calls than were recorded."""
+
+
+def _json_default(obj):
+    # Columnar results are stored in their compact form and rebuilt on replay
+    if isinstance(obj, TabularResult):
+        return {"__tabular__": obj.to_payload()}
+    # Streamed Prometheus values are NumPy arrays; they are replayed as lists
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+def _to_jsonable(obj):
+    """Round-trip a payload through JSON so it can be written to a recording."""
+    return json.loads(json.dumps(obj, default=_json_default))
+
+
+def _from_jsonable(obj):
+    """Rebuild recorded payloads (e.g. columnar results) into the objects the helpers returned."""
+    if isinstance(obj, dict) and set(obj) == {"__tabular__"}:
+        return TabularResult.from_payload(obj["__tabular__"])
+    if isinstance(obj, list) and obj and isinstance(obj[0], dict) and set(obj[0]) == {"__tabular__"}:
+        return [_from_jsonable(item) for item in obj]  # batch results
+    if isinstance(obj, dict) and set(obj) == {"__outcomes__"}:  # see _record_payload
+        return [{**item, "result": _from_jsonable(item["result"])} if isinstance(item, dict) and item.get("result") is not None
+                else item for item in obj["__outcomes__"]]
+    return obj
+
+
+def _record_payload(name, result):
+    """JSON form of a backend result; outcome lists of OUTCOME_FUNCTIONS are tagged for _from_jsonable."""
+    payload = _to_jsonable(result)
+    if name in OUTCOME_FUNCTIONS and isinstance(payload, list):
+        return {"__outcomes__": payload}
+    return payload
+
+
+def _call_key(args, kwargs):
+    """Stable key used to match a backend call to its recorded payload."""
+    return json.dumps({"args": list(args), "kwargs": kwargs}, default=str, sort_keys=True)
+
+
+def _node_path(metadata):
+    """Turn a LangGraph checkpoint namespace into a readable node path (e.g. 'kusto_agent/tools')."""
+    namespace = metadata.get("langgraph_checkpoint_ns", "")
+    parts = [part.split(":")[0] for part in namespace.split("|") if part]
+    return "/".join(parts) if parts else metadata.get("langgraph_node", "unknown")
+
+
+class NodeTimer(BaseCallbackHandler):
+    """
+    Callback handler that measures wall time spent in every LangGraph node and
+    keeps the sequence of tools called (including agent handoffs) as the run's routing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = {}
+        self.node_timings = {}
+        self.routing = []
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        with self._lock:
+            self.routing.append((serialized or {}).get("name") or kwargs.get("name"))
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs):
+        metadata = metadata or {}
+        node = metadata.get("langgraph_node")
+        # Nested runnables inherit the node metadata; only time the node itself
+        if node is None or (name or (serialized or {}).get("name")) != node:
+            return
+        with self._lock:
+            self._running[run_id] = (_node_path(metadata), time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._finish_node(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._finish_node(run_id)
+
+    def _finish_node(self, run_id):
+        with self._lock:
+            started = self._running.pop(run_id, None)
+            if started is None:
+                return
+            node, start = started
+            timing = self.node_timings.setdefault(node, {"calls": 0, "total_seconds": 0.0})
+            timing["calls"] += 1
+            timing["total_seconds"] += time.perf_counter() - start
+
+
+class RunRecorder(NodeTimer):
+    """
+    Callback handler that records a supervisor run.
+
+    Pass it in the invoke config callbacks and wrap the invocation in capture_backends()
+    so backend payloads are recorded as well. The remaining keyword arguments describe how
+    the graph was built (graph='standard' or 'dynamic', temperature, custom_prompts,
+    session_context) so the replay can compile the same graph.
+    """
+
+    def __init__(self, graph="standard", **graph_options):
+        super().__init__()
+        self.meta = {"graph": graph, **graph_options}
+        self.llm_calls = []
+        self.tool_calls = []
+        self.backend_calls = []
+        self._llm_starts = {}
+        self._tool_starts = {}
+
+    # --- LLM requests/responses ---
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        with self._lock:
+            self._llm_starts[run_id] = (messages[0] if messages else [], time.perf_counter())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            request, start = self._llm_starts.pop(run_id, ([], time.perf_counter()))
+            message = response.generations[0][0].message
+            self.llm_calls.append({
+                "request": [message_to_dict(m) for m in request],
+                "response": message_to_dict(message),
+                "seconds": round(time.perf_counter() - start, 4),
+            })
+
+    # --- Tool calls ---
+    def on_tool_start(self, serialized, input_str, *, run_id, inputs=None, **kwargs):
+        super().on_tool_start(serialized, input_str, run_id=run_id, **kwargs)
+        with self._lock:
+            self._tool_starts[run_id] = (
+                (serialized or {}).get("name") or kwargs.get("name"),
+                inputs if inputs is not None else input_str,
+                time.perf_counter(),
+            )
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._finish_tool(run_id, getattr(output, "content", output), None)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._finish_tool(run_id, None, str(error))
+
+    def _finish_tool(self, run_id, output, error):
+        with self._lock:
+            name, arguments, start = self._tool_starts.pop(run_id, (None, None, time.perf_counter()))
+            self.tool_calls.append({
+                "name": name,
+                "args": _to_jsonable(arguments),
+                "output": _to_jsonable(output),
+                "error": error,
+                "seconds": round(time.perf_counter() - start, 4),
+            })
+
+    # --- Backend payloads ---
+    @contextmanager
+    def capture_backends(self, module=None, names=BACKEND_FUNCTIONS):
+        """
+        Record the backend calls made in the current context (and in contexts copied from it,
+        such as LangGraph's tool threads). With `module`, its helpers are wrapped first if needed.
+        """
+        if module is not None:
+            install_backend_recording(module, names)
+        token = _current_recorder.set(self)
+        try:
+            yield self
+        finally:
+            _current_recorder.reset(token)
+
+    def record_backend_call(self, name, func, args, kwargs):
+        """Call backend helper `func` and record its arguments, payload and duration."""
+        start = time.perf_counter()
+        entry = {"name": name, "key": _call_key(args, kwargs), "result": None, "error": None}
+        try:
+            result = func(*args, **kwargs)
+            entry["result"] = _record_payload(name, result)
+            return result
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            entry["seconds"] = round(time.perf_counter() - start, 4)
+            with self._lock:
+                self.backend_calls.append(entry)
+
+    def save(self, path, inputs):
+        """Write the recording to `path` (gzipped JSON Lines)."""
+        messages = convert_to_messages(inputs["messages"])
+        meta = {
+            "kind": "meta",
+            "version": RECORDING_VERSION,
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "input": [message_to_dict(m) for m in messages],
+            "routing": self.routing,
+            "node_timings": self.node_timings,
+            **_to_jsonable(self.meta),
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps(meta, separators=(",", ":")) + "\n")
+            for kind, events in (("llm", self.llm_calls), ("tool", self.tool_calls), ("backend", self.backend_calls)):
+                for event in events:
+                    f.write(json.dumps({"kind": kind, **event}, separators=(",", ":"), default=_json_default) + "\n")
+        return path
+
+
+def current_recorder():
+    """The recorder capturing backend calls in the current context, or None."""
+    return _current_recorder.get()
+
+
+def install_backend_recording(module, names=BACKEND_FUNCTIONS):
+    """
+    Wrap the backend helpers of `module` (once; repeated calls are no-ops) so that calls made
+    while a recorder is active in the current context are recorded by that recorder.
+    """
+    def wrap(name, func):
+        @functools.wraps(func)
+        def recorded(*args, **kwargs):
+            recorder = _current_recorder.get()
+            if recorder is None:
+                return func(*args, **kwargs)
+            return recorder.record_backend_call(name, func, args, kwargs)
+        recorded.records_backend = True
+        return recorded
+
+    for name in names:
+        func = getattr(module, name, None)
+        if func is not None and not getattr(func, "records_backend", False):
+            setattr(module, name, wrap(name, func))
+
+
+def load_recording(path):
+    """Load a recording written by RunRecorder.save()."""
+    recording = {"meta": None, "llm": [], "tool": [], "backend": []}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            kind = event.pop("kind")
+            if kind == "meta":
+                recording["meta"] = event
+            else:
+                recording[kind].append(event)
+    if recording["meta"] is None:
+        raise ValueError(f"{path} is not a run recording (missing meta line)")
+    return recording
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that answers with recorded LLM responses, in recorded order."""
+
+    recorded: List[dict]
+    latency_scale: float = 0.0
+
+    _cursor: int = PrivateAttr(default=0)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _divergences: list = PrivateAttr(default_factory=list)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    @property
+    def divergences(self):
+        return list(self._divergences)
+
+    @property
+    def remaining(self):
+        return len(self.recorded) - self._cursor
+
+    def bind_tools(self, tools, *, parallel_tool_calls: Optional[bool] = None, **kwargs):
+        # Tool calls come from the recording, so binding is a no-op
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        with self._lock:
+            index = self._cursor
+            self._cursor += 1
+        if index >= len(self.recorded):
+            raise ReplayDivergenceError(f"Replay requested LLM call #{index + 1} but only {len(self.recorded)} were recorded")
+
+        call = self.recorded[index]
+        # Only compare the message shapes: contents are expected to change when testing trimming or caching
+        expected = [m["type"] for m in call["request"]]
+        actual = [m.type for m in messages]
+        if expected and expected != actual:
+            self._divergences.append({"llm_call": index + 1, "expected": expected, "actual": actual})
+
+        if self.latency_scale:
+            time.sleep(call.get("seconds", 0.0) * self.latency_scale)
+        message = messages_from_dict([call["response"]])[0]
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class ReplayBackends:
+    """Serves recorded backend payloads in place of the live backend helpers."""
+
+    def __init__(self, backend_calls, latency_scale=0.0):
+        self.latency_scale = latency_scale
+        self.calls_served = 0
+        self._lock = threading.Lock()
+        self._pending = {}
+        for entry in backend_calls:
+            self._pending.setdefault(entry["name"], []).append(entry)
+
+    def _take(self, name, key):
+        with self._lock:
+            pending = self._pending.get(name, [])
+            if not pending:
+                raise ReplayDivergenceError(f"Unrecorded backend call: {name}{key}")
+            # Prefer the recorded call with the same arguments, otherwise go in recorded order
+            match = next((e for e in pending if e.get("key") == key), pending[0])
+            pending.remove(match)
+            self.calls_served += 1
+            return match
+
+    def serve(self, name, *args, **kwargs):
+        """Return the recorded payload for a call to backend helper `name`."""
+        entry = self._take(name, _call_key(args, kwargs))
+        if self.latency_scale:
+            time.sleep(entry.get("seconds", 0.0) * self.latency_scale)
+        if entry.get("error"):
+            raise RuntimeError(entry["error"])
+        return _from_jsonable(entry["result"])
+
+    @contextmanager
+    def patch(self, module, names=BACKEND_FUNCTIONS):
+        originals = {name: getattr(module, name) for name in names if hasattr(module, name)}
+
+        def replay(name):
+            def replayed(*args, **kwargs):
+                return self.serve(name, *args, **kwargs)
+            return replayed
+
+        for name in originals:
+            setattr(module, name, replay(name))
+        try:
+            yield self
+        finally:
+            for name, func in originals.items():
+                setattr(module, name, func)
+
+
+def _default_graph_factory(meta):
+    """Build a factory that compiles the recorded supervisor graph around a given model."""
+    import supervisor_agent
+
+    if meta.get("graph") == "dynamic":
+        return lambda model: supervisor_agent.create_dynamic_supervisor(
+            temperature=meta.get("temperature", 0.1),
+            session_context=meta.get("session_context"),
+            custom_prompts=meta.get("custom_prompts"),
+            model=model,
+        )
+    return lambda model: supervisor_agent.create_standard_supervisor(model=model)
+
+
+def compare_node_timings(baseline, current, threshold=0.25, min_delta_seconds=0.005):
+    """
+    Compare two node timing maps ({node: {"calls", "total_seconds"}}).
+    Returns the nodes whose total time grew by more than `threshold` (fraction) and
+    by at least `min_delta_seconds`, slowest regression first.
+    """
+    regressions = []
+    for node, timing in current.items():
+        before = baseline.get(node)
+        if not before:
+            continue
+        delta = timing["total_seconds"] - before["total_seconds"]
+        if delta >= min_delta_seconds and timing["total_seconds"] > before["total_seconds"] * (1 + threshold):
+            regressions.append({
+                "node": node,
+                "baseline_seconds": round(before["total_seconds"], 4),
+                "current_seconds": round(timing["total_seconds"], 4),
+                "change": round(delta / before["total_seconds"], 3) if before["total_seconds"] else None,
+            })
+    regressions.sort(key=lambda r: r["current_seconds"] - r["baseline_seconds"], reverse=True)
+    return regressions
+
+
+def replay_run(path, graph_factory=None, module=None, baseline=None, threshold=0.25, latency_scale=0.0):
+    """
+    Replay a recording offline and report per-node timings.
+
+    Args:
+        path: Recording written by RunRecorder.save()
+        graph_factory: Callable model -> compiled graph (defaults to the recorded supervisor_agent graph)
+        module: Module whose backend helpers are patched (defaults to supervisor_agent)
+        baseline: Previous replay report (or its node_timings) to check for regressions
+        threshold: Fractional slowdown per node that counts as a regression
+        latency_scale: Multiplier applied to recorded LLM/backend latencies (0 replays at full speed)
+
+    Returns:
+        Report dictionary with node timings, routing comparison and regressions
+    """
+    recording = load_recording(path)
+    meta = recording["meta"]
+    if module is None:
+        import supervisor_agent as module
+    if graph_factory is None:
+        graph_factory = _default_graph_factory(meta)
+
+    model = ReplayChatModel(recorded=recording["llm"], latency_scale=latency_scale)
+    backends = ReplayBackends(recording["backend"], latency_scale=latency_scale)
+    graph = graph_factory(model)
+    timer = NodeTimer()
+    inputs = {"messages": messages_from_dict(meta["input"])}
+
+    start = time.perf_counter()
+    with backends.patch(module):
+        graph.invoke(inputs, config={"callbacks": [timer]})
+    total_seconds = time.perf_counter() - start
+
+    routing = timer.routing
+    report = {
+        "recording": str(path),
+        "total_seconds": round(total_seconds, 4),
+        "node_timings": timer.node_timings,
+        "routing": routing,
+        "routing_matches": routing == meta.get("routing", routing),
+        "llm_calls_replayed": len(recording["llm"]) - model.remaining,
+        "llm_calls_recorded": len(recording["llm"]),
+        "backend_calls_replayed": backends.calls_served,
+        "backend_calls_recorded": len(recording["backend"]),
+        "divergences": model.divergences,
+        "regressions": [],
+    }
+    if baseline is not None:
+        baseline_timings = baseline.get("node_timings", baseline)
+        report["regressions"] = compare_node_timings(baseline_timings, timer.node_timings, threshold)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded supervisor run and report node timings.")
+    parser.add_argument("recording", help="Path to a .jsonl.gz recording")
+    parser.add_argument("--baseline", help="Previous replay report (JSON) to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Fractional slowdown that counts as a regression")
+    parser.add_argument("--latency-scale", type=float, default=0.0, help="Replay recorded latencies scaled by this factor")
+    parser.add_argument("--save-report", help="Write the replay report to this JSON file")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    report = replay_run(args.recording, baseline=baseline, threshold=args.threshold, latency_scale=args.latency_scale)
+
+    print(f"⏱️ Replayed {report['llm_calls_replayed']} LLM calls and {report['backend_calls_replayed']} backend calls in {report['total_seconds']:.3f}s")
+    for node, timing in sorted(report["node_timings"].items(), key=lambda x: -x[1]["total_seconds"]):
+        print(f"   {node:<40} {timing['calls']:>3} calls {timing['total_seconds']:.4f}s")
+    print(f"{'✅' if report['routing_matches'] else '❌'} Routing: {' -> '.join(report['routing']) or '(none)'}")
+    for divergence in report["divergences"]:
+        print(f"⚠️ LLM call {divergence['llm_call']} diverged: expected {divergence['expected']}, got {divergence['actual']}")
+    for regression in report["regressions"]:
+        print(f"❌ Regression in {regression['node']}: {regression['baseline_seconds']}s -> {regression['current_seconds']}s")
+
+    if args.save_report:
+        with open(args.save_report, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if report["regressions"] or not report["routing_matches"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
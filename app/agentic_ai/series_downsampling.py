@@ -0,0 +1,162 @@
+"""
+Downsampling and per-series summaries for Prometheus range query results.
+
+Range queries over many pods or long windows return far more points than a chart can show
+or a model needs to read. This module reduces every series of a matrix response to a target
+number of points while keeping its peaks and shape:
+
+- "lttb": Largest-Triangle-Three-Buckets, keeps the points that preserve the visual shape.
+- "minmax": keeps the minimum and maximum of every bucket, so no spike is lost.
+
+Downsampled series also carry a "summary" (min/max/avg/p95/last) computed from the full
+resolution data, which is what the LLM usually needs instead of every sample.
+"""
+
+import numpy as np
+
+DOWNSAMPLERS = {}
+
+
+def register_downsampler(name):
+    """Register a function (x, y, target_points) -> selected indices as a downsampling mode."""
+    def decorator(func):
+        DOWNSAMPLERS[name] = func
+        return func
+    return decorator
+
+
+def series_arrays(series):
+    """Timestamps and values of one Prometheus matrix series as float64 arrays ("NaN" -> nan)."""
+    values = series.get("values", [])
+    if isinstance(values, np.ndarray):  # already decoded (see prometheus_stream.py)
+        return values[:, 0], values[:, 1]
+    if not values:
+        return np.empty(0), np.empty(0)
+    pairs = np.asarray(values, dtype=object)
+    return pairs[:, 0].astype(np.float64), pairs[:, 1].astype(np.float64)
+
+
+@register_downsampler("lttb")
+def lttb_indices(x, y, target_points):
+    """
+    Indices kept by Largest-Triangle-Three-Buckets. The first and last points are always kept;
+    every bucket in between keeps the point forming the largest triangle with the previously
+    kept point and the average of the next bucket.
+    """
+    n = len(x)
+    if target_points >= n or target_points < 3:
+        return np.arange(n)
+
+    # Bucket boundaries for the n - 2 interior points
+    edges = np.floor(np.linspace(1, n - 1, target_points - 1)).astype(np.int64)
+    starts, ends = edges[:-1], np.maximum(edges[1:], edges[:-1] + 1)
+
+    # Average point of every bucket (the "next bucket" term), computed once with cumulative sums
+    y_filled = np.where(np.isnan(y), 0.0, y)
+    counts = np.concatenate(([0], np.cumsum(~np.isnan(y))))
+    x_sums = np.concatenate(([0.0], np.cumsum(x)))
+    y_sums = np.concatenate(([0.0], np.cumsum(y_filled)))
+    next_starts = np.append(starts[1:], n - 1)
+    next_ends = np.append(ends[1:], n)
+    avg_x = (x_sums[next_ends] - x_sums[next_starts]) / (next_ends - next_starts)
+    valid = counts[next_ends] - counts[next_starts]
+    avg_y = np.where(valid > 0, (y_sums[next_ends] - y_sums[next_starts]) / np.maximum(valid, 1), np.nan)
+
+    selected = np.empty(target_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket, (start, end) in enumerate(zip(starts, ends)):
+        bx, by = x[start:end], y[start:end]
+        ax, ay = x[previous], y[previous]
+        areas = np.abs((ax - avg_x[bucket]) * (by - ay) - (ax - bx) * (avg_y[bucket] - ay))
+        areas = np.where(np.isnan(areas), -1.0, areas)
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+@register_downsampler("minmax")
+def minmax_indices(x, y, target_points):
+    """
+    Indices of the minimum and maximum of every bucket (target_points // 2 buckets), in time order.
+    Buckets are equal-sized slices of the series, computed in one pass over a padded 2-D view.
+    """
+    n = len(x)
+    buckets = max(target_points // 2, 1)
+    if target_points >= n:
+        return np.arange(n)
+
+    size = int(np.ceil(n / buckets))
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    grid = padded.reshape(buckets, size)
+    all_nan = np.all(np.isnan(grid), axis=1)
+    filled_low = np.where(np.isnan(grid), np.inf, grid)
+    filled_high = np.where(np.isnan(grid), -np.inf, grid)
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.argmin(filled_low, axis=1)
+    highs = offsets + np.argmax(filled_high, axis=1)
+    # Buckets with only gaps keep their first point so the gap stays visible
+    lows = np.where(all_nan, offsets, lows)
+    highs = np.where(all_nan, offsets, highs)
+    selected = np.unique(np.concatenate((lows, highs)))
+    return selected[selected < n]
+
+
+def summarize_values(y):
+    """min/max/avg/p95/last of a value array, ignoring gaps; None for an all-gap series."""
+    finite = y[~np.isnan(y)]
+    if not len(finite):
+        return {"points": int(len(y)), "min": None, "max": None, "avg": None, "p95": None, "last": None}
+    return {
+        "points": int(len(y)),
+        "min": float(finite.min()),
+        "max": float(finite.max()),
+        "avg": float(finite.mean()),
+        "p95": float(np.percentile(finite, 95)),
+        "last": float(finite[-1]),
+    }
+
+
+def downsample_series(series, target_points=300, method="lttb"):
+    """
+    Downsampled copy of one matrix series with its full-resolution "summary" attached.
+    Values keep their form ([timestamp, "value"] pairs, or the float64 array of a streamed
+    response) so downstream consumers are unchanged.
+    """
+    x, y = series_arrays(series)
+    reduced = {key: value for key, value in series.items() if key != "values"}
+    reduced["summary"] = summarize_values(y)
+    if len(x) <= target_points:
+        reduced["values"] = series.get("values", [])
+        return reduced
+    indices = DOWNSAMPLERS[method](x, y, target_points)
+    original = series["values"]
+    reduced["values"] = original[indices] if isinstance(original, np.ndarray) else [original[i] for i in indices]
+    return reduced
+
+
+def downsample_prometheus_response(response, target_points=300, method="lttb"):
+    """
+    Downsample every series of a Prometheus range query response (resultType "matrix").
+    Other responses (instant vectors, errors) are returned unchanged.
+
+    Args:
+        response: Prometheus API response from run_promql_range_query
+        target_points: Maximum number of points kept per series
+        method: Name of a registered downsampler ("lttb" or "minmax")
+    """
+    if not isinstance(response, dict) or response.get("status") != "success":
+        return response
+    data = response.get("data", {})
+    if data.get("resultType") != "matrix":
+        return response
+    if method not in DOWNSAMPLERS:
+        raise ValueError(f"Unknown downsampling method '{method}'. Available: {sorted(DOWNSAMPLERS)}")
+    return {
+        **response,
+        "data": {
+            **data,
+            "result": [downsample_series(series, target_points, method) for series in data.get("result", [])],
+        },
+    }
@@ -4,13 +4,20 @@ from langchain_openai import AzureChatOpenAI
 from langchain_core.tools import tool
 from azure.identity import ManagedIdentityCredential,DefaultAzureCredential
 from azure.keyvault.secrets import SecretClient
-from azure.kusto.data import KustoConnectionStringBuilder, KustoClient
+from azure.kusto.data import KustoConnectionStringBuilder, KustoClient, ClientRequestProperties
 from pydantic import BaseModel, Field
 from typing import Optional
-from azure.monitor.query import LogsQueryClient, LogsQueryStatus
+from azure.monitor.query import LogsBatchQuery, LogsQueryClient, LogsQueryStatus
 from datetime import timedelta
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import time
+import re
+import uuid
 import os
+import tempfile
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
@@ -18,6 +25,26 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import json
 from datetime import datetime, timedelta
+from tabular_result import TabularResult
+from tool_result_encoding import encode_tool_result
+from series_downsampling import downsample_prometheus_response
+from artifact_store import store_artifact
+from figure_rendering import create_prometheus_figure, prometheus_series
+from promql_preflight import PreflightRejected, SeriesCountCache, preflight
+from label_index import BackgroundIndex, LabelIndex, format_lookup
+from range_query_cache import RangeQueryCache, parse_step, parse_time
+from prometheus_stream import read_prometheus_response
+from query_validation import NameCache, QueryValidationError, ValidationStats, validate_kql, validate_promql
+from kusto_bounding import bound_query, pick_time_column, source_table
+from kusto_stream import stream_kusto_batch, stream_kusto_query
+from kusto_batch import BatchError, build_batch, incident_deployment_window, kql_literal
+from incident_correlation import correlate_incidents_with_deployments
+from kusto_replica import KustoReplica
+from log_templates import find_message_column, mine_log_templates
+from anomaly_detection import align_baseline, detect_anomalies, series_matrix
+from deployment_impact import score_deployment_impact
+from metric_correlation import correlate_with_target
+from time_alignment import format_utc_array, to_epoch_seconds
 
 # Utility function for JSON serialization
 def convert_numpy_to_list(obj):
@@ -31,63 +58,44 @@ def convert_numpy_to_list(obj):
     else:
         return obj
 
-def format_prometheus_range_data_for_charts(prometheus_response):
+def to_tool_output(result):
+    """
+    Encode a backend result for the LLM using the configured tool result encodings.
+    Large tables are also stored as an artifact of the current turn; the model then only sees
+    the first rows plus a reference the UI renders the full table from.
+    """
+    artifacts = DEFAULT_CONFIG["artifacts"]
+    if isinstance(result, TabularResult) and result.row_count > artifacts["table_min_rows"]:
+        ref = store_artifact("table", result, f"{result.row_count} rows")
+        if ref:
+            text = encode_tool_result(result, **{**DEFAULT_CONFIG["tool_results"], "max_rows": artifacts["inline_rows"]})
+            return f"{text}\n# full table stored as {ref}; include {ref} in the answer to show it"
+    return encode_tool_result(result, **DEFAULT_CONFIG["tool_results"])
+
+def format_prometheus_range_data_for_charts(prometheus_response, max_points=None, method="lttb"):
     """
     Convert Prometheus range query response into format suitable for chart creation.
     
     Args:
         prometheus_response: Response from promql_range_query_tool
+        max_points: Downsample every series to at most this many points first (None keeps all)
+        method: Downsampling method, "lttb" or "minmax"
         
     Returns:
         List of dictionaries with timestamp and metric columns
     """
     try:
+        if max_points:
+            prometheus_response = downsample_prometheus_response(prometheus_response, max_points, method)
         if not prometheus_response.get('data', {}).get('result'):
             return []
         
-        formatted_data = []
-        
-        for result in prometheus_response['data']['result']:
-            metric_name = result.get('metric', {}).get('__name__', 'unknown_metric')
-            
-            # Add other labels to make metric names unique (like pod names)
-            labels = result.get('metric', {})
-            label_parts = []
-            for key, value in labels.items():
-                if key not in ['__name__']:  # Skip __name__ as we already used it
-                    # Clean label values - remove special characters that might cause issues
-                    clean_value = str(value).replace('-', '_').replace('.', '_').replace('/', '_')
-                    label_parts.append(f"{key}_{clean_value}")
-            
-            if label_parts:
-                metric_name = f"{metric_name}_{'_'.join(label_parts)}"
-            
-            # Process each timestamp/value pair
-            for timestamp, value in result.get('values', []):
-                try:
-                    # Convert Unix timestamp to ISO format
-                    dt = datetime.fromtimestamp(float(timestamp))
-                    iso_timestamp = dt.isoformat() + 'Z'
-                    
-                    # Find or create row for this timestamp
-                    existing_row = None
-                    for row in formatted_data:
-                        if row['timestamp'] == iso_timestamp:
-                            existing_row = row
-                            break
-                    
-                    if existing_row:
-                        existing_row[metric_name] = float(value)
-                    else:
-                        new_row = {'timestamp': iso_timestamp, metric_name: float(value)}
-                        formatted_data.append(new_row)
-                except (ValueError, TypeError) as e:
-                    print(f"Error processing timestamp/value pair: {timestamp}, {value} - {e}")
-                    continue
-        
-        # Sort by timestamp
-        formatted_data.sort(key=lambda x: x['timestamp'])
-        return formatted_data
+        # One row per UTC timestamp, keyed by the formatted time (series named as in the figures)
+        rows = {}
+        for metric_name, timestamps, values in prometheus_series(prometheus_response):
+            for iso_timestamp, value in zip(format_utc_array(timestamps), values.tolist()):
+                rows.setdefault(iso_timestamp, {'timestamp': iso_timestamp})[metric_name] = value
+        return [rows[iso_timestamp] for iso_timestamp in sorted(rows)]
         
     except Exception as e:
         print(f"Error formatting Prometheus data: {e}")
@@ -98,7 +106,11 @@ def get_secret_from_keyvault(secret_name, vault_url):
     """
     Reads a secret from Azure Key Vault using DefaultAzureCredential.
     DefaultAzureCredential will automatically try multiple authentication methods including managed identity.
+    An environment variable with the same name as the secret takes precedence, which lets the
+    module be imported offline (e.g. for replaying recorded runs).
     """
+    if os.environ.get(secret_name):
+        return os.environ[secret_name]
     try:
         # DefaultAzureCredential will automatically try managed identity, environment variables, etc.
         credential = DefaultAzureCredential()
@@ -154,33 +166,419 @@ DEFAULT_CONFIG = {
         "incident_table": KUSTO_INCIDENT_TABLE,
         "deployment_table": KUSTO_DEPLOYMENT_TABLE,
         "client_id": KUSTO_CLIENT_ID,
-        "tenant_id": KUSTO_TENANT_ID
+        "tenant_id": KUSTO_TENANT_ID,
+        # Default time filter, row cap and projection of queries (see kusto_bounding.py); time columns
+        # come from cached schemas unless set per table in time_columns (the incident and deployment
+        # tables default to the batch columns). unknown_time_column is "reject" or "allow" for queries
+        # without a time range on a table whose time column is not known yet
+        "bounding": {
+            "enabled": True,
+            "lookback": "7d",
+            "max_rows": 1000,
+            "max_columns": 20,
+            "time_columns": {},
+            "key_columns": ["IncidentId", "Severity", "Status", "Title", "DeploymentId", "Service", "Version"],
+            # Equality filters on these need no time range (e.g. an incident lookup)
+            "lookup_columns": ["IncidentId", "DeploymentId"],
+            "unknown_time_column": "reject"
+        },
+        # Client request properties sent with every query; 0/None leaves an option unset.
+        # Identical queries within results_cache_max_age_seconds are answered from the
+        # cluster's results cache. "tools" overrides the defaults per tool.
+        "request_properties": {
+            "application": "HeyJarvis",
+            "results_cache_max_age_seconds": 300,
+            "server_timeout_seconds": 120,
+            "truncation_max_records": 50000,
+            "tools": {
+                "kusto_schema_tool": {"results_cache_max_age_seconds": 3600},
+                "kusto_incident_schema_tool": {"results_cache_max_age_seconds": 3600},
+                "kusto_deployment_schema_tool": {"results_cache_max_age_seconds": 3600},
+                "kusto_incident_query_tool": {"results_cache_max_age_seconds": 600}
+            }
+        },
+        # Query results are read progressively and cut off at max_rows (see kusto_stream.py);
+        # keep max_rows below request_properties.truncation_max_records, so the server still
+        # sends the rows past the cut and the reader can mark the result truncated
+        "streaming": {
+            "enabled": True,
+            "chunk_rows": 5000,
+            "max_rows": 40000
+        },
+        # kusto_batch_query_tool (see kusto_batch.py); the columns are used for the
+        # incident + deployment window when the cached schema does not say otherwise
+        "batch": {
+            "max_rows_per_result": 500,
+            "incident_time_column": "CreateDate",
+            "deployment_start_column": "StartTime",
+            "deployment_end_column": "EndTime"
+        },
+        # incident_deployment_correlation_tool (see incident_correlation.py)
+        "correlation": {
+            "max_incidents": 500,
+            "max_deployments": 5000
+        },
+        # Optional local SQLite replica of the incident and deployment tables (see kusto_replica.py);
+        # query tools answer from it when the query's time filter falls inside the retention;
+        # batch_rows is capped at streaming.max_rows, since sync pulls are read by the same reader
+        "replica": {
+            "enabled": False,
+            "path": os.path.join(tempfile.gettempdir(), "heyjarvis_kusto_replica.sqlite"),
+            "retention": "14d",
+            "max_staleness_seconds": 300,
+            "batch_rows": 40000,
+            "key_columns": {
+                KUSTO_INCIDENT_TABLE: ["IncidentId"],
+                KUSTO_DEPLOYMENT_TABLE: ["DeploymentId"]
+            }
+        }
     },
     "prometheus": {
         "query_endpoint": PROMETHEUS_QUERY_ENDPOINT,
-        "client_id": PROMETHEUS_CLIENT_ID
+        "client_id": PROMETHEUS_CLIENT_ID,
+        # Concurrent requests per promql_batch_query_tool call
+        "batch_workers": 8,
+        # Series-cardinality preflight (see promql_preflight.py); action is "topk", "sum_by" or "reject"
+        "preflight": {
+            "enabled": True,
+            "max_series": 500,
+            "action": "topk",
+            "topk": 20,
+            "sum_by": ["namespace"],
+            "cache_seconds": 300
+        },
+        # Label/label-value index for prometheus_label_lookup_tool (see label_index.py). Series
+        # counts come from one count by (hierarchy) query over the series matching hierarchy_match
+        # (container and pod metrics, not the whole workspace), so only hierarchy labels have them
+        "label_index": {
+            "labels": ["namespace", "pod", "container", "job", "node", "instance", "__name__"],
+            "hierarchy": ["namespace", "pod", "container"],
+            "hierarchy_match": '__name__=~"container_.*|kube_pod_.*"',
+            "refresh_seconds": 600
+        },
+        # Query responses are decoded while streaming and cut off at these limits (see prometheus_stream.py)
+        "response_budget": {
+            "max_series": 2000,
+            "max_points": 1000000
+        },
+        # Incremental cache for range queries (see range_query_cache.py); points newer than
+        # max_fresh_seconds are always refetched; max_points bounds the cached points of all queries
+        "range_cache": {
+            "enabled": True,
+            "points_per_chunk": 120,
+            "max_fresh_seconds": 300,
+            "max_queries": 256,
+            "max_points": 2000000
+        },
+        # Range query series are downsampled before charting and LLM hand-off (see series_downsampling.py)
+        "downsampling": {
+            "method": "lttb",
+            "chart_points": 500,
+            "llm_points": 60
+        },
+        # prometheus_anomaly_tool (see anomaly_detection.py); window_points of history before the
+        # requested start are fetched to warm up the detectors
+        "anomaly": {
+            "detectors": ["zscore", "ewma", "seasonal"],
+            "threshold": 4.0,
+            "min_votes": 2,
+            "window_points": 30,
+            "ewma_alpha": 0.3,
+            "seasonal_offset": "7d",
+            "max_intervals": 30
+        },
+        # deployment_impact_tool (see deployment_impact.py); "{service}" in a query is replaced
+        # by the deployment's service. Queries aggregate by container so series survive new pod names.
+        "deployment_impact": {
+            "window": "1h",
+            "step": "1m",
+            "service_column": "Service",
+            "min_effect": 0.8,
+            "max_rows": 30,
+            "golden_metrics": {
+                "cpu": 'sum by (container) (rate(container_cpu_usage_seconds_total{pod=~"{service}.*", container!=""}[5m]))',
+                "memory": 'sum by (container) (container_memory_working_set_bytes{pod=~"{service}.*", container!=""})',
+                "restarts": 'sum by (container) (increase(kube_pod_container_status_restarts_total{pod=~"{service}.*"}[5m]))',
+                "request_rate": 'sum(rate(http_requests_total{pod=~"{service}.*"}[5m]))',
+                "error_rate": 'sum(rate(http_requests_total{pod=~"{service}.*", code=~"5.."}[5m]))',
+                "latency_p95": 'histogram_quantile(0.95, sum by (le) (rate(http_request_duration_seconds_bucket{pod=~"{service}.*"}[5m])))'
+            }
+        },
+        # metric_correlation_tool (see metric_correlation.py); candidates are used when the
+        # caller gives none. difference correlates step-to-step changes so shared trends do not match.
+        "correlation": {
+            "difference": True,
+            "min_points": 10,
+            "candidates": {
+                "cpu": 'sum by (namespace, container) (rate(container_cpu_usage_seconds_total{container!=""}[5m]))',
+                "memory": 'sum by (namespace, container) (container_memory_working_set_bytes{container!=""})',
+                "restarts": 'sum by (namespace, container) (increase(kube_pod_container_status_restarts_total[5m]))',
+                "network_rx": 'sum by (namespace) (rate(container_network_receive_bytes_total[5m]))',
+                "request_rate": 'sum by (namespace, service) (rate(http_requests_total[5m]))',
+                "error_rate": 'sum by (namespace, service) (rate(http_requests_total{code=~"5.."}[5m]))'
+            }
+        }
     },
     "log_analytics": {
         "workspace_id": LOG_ANALYTICS_WORKSPACE_ID,
-        "client_id": LOG_ANALYTICS_CLIENT_ID
+        "client_id": LOG_ANALYTICS_CLIENT_ID,
+        # Queries per log_analytics_batch_query_tool call (the batch API accepts up to 10)
+        "batch_max_queries": 10,
+        # Log results with at least min_rows lines are sent as mined templates (see log_templates.py)
+        "log_templates": {
+            "enabled": True,
+            "min_rows": 200,
+            "similarity": 0.5,
+            "depth": 4,
+            "max_children": 100,
+            "max_templates": 50,
+            "time_column": "TimeGenerated",
+            "pod_column": "PodName"
+        }
+    },
+    # How tool results are encoded into agent messages (see tool_result_encoding.py)
+    "tool_results": {
+        "tabular_encoding": "csv",
+        "prometheus_encoding": "compact",
+        "float_digits": 4,
+        "relative_time": False
+    },
+    # Local PromQL/KQL validation before queries are sent (see query_validation.py)
+    "query_validation": {
+        "enabled": True,
+        "name_cache_seconds": 3600
+    },
+    # Figures switch to WebGL traces above this many points (see figure_rendering.py)
+    "charts": {
+        "webgl_threshold": 5000
+    },
+    # Charts and tables handed to the UI out of band (see artifact_store.py)
+    "artifacts": {
+        "table_min_rows": 50,
+        "inline_rows": 50
     }
 }
 
+# === Query Validation ===
+# Metric names, table columns and source tables seen by the tools; validation only uses these
+query_names = NameCache(DEFAULT_CONFIG["query_validation"]["name_cache_seconds"])
+validation_stats = ValidationStats()
+
+def _raise_if_invalid(backend, errors):
+    validation_stats.record(backend, errors)
+    if errors:
+        print(f"Query validation rejected a {backend} query ({validation_stats.saved_calls} backend calls saved so far)")
+        raise QueryValidationError(backend, errors)
+
+def check_promql(promql_query, query_endpoint):
+    """Validates a PromQL expression against the cached label index and metric list; raises QueryValidationError."""
+    if not DEFAULT_CONFIG["query_validation"]["enabled"]:
+        return
+    index = prometheus_label_index.current
+    metric_names = query_names.get(("prometheus", query_endpoint))
+    if index is not None and "__name__" in index.values:
+        metric_names = set(index.values["__name__"]) | (metric_names or set())
+    label_names = set(index.label_names) if index is not None else None
+    _raise_if_invalid("Prometheus", validate_promql(promql_query, metric_names, label_names))
+
+def check_kql(backend, query, source):
+    """
+    Validates a KQL query against the cached schemas of `source` (a Kusto database or
+    Log Analytics workspace); raises QueryValidationError.
+    """
+    if not DEFAULT_CONFIG["query_validation"]["enabled"]:
+        return
+    tables = query_names.get((backend, source, "tables")) or set()
+    columns_by_table = {}
+    for table in tables:
+        columns = query_names.get((backend, source, table))
+        if columns is not None:
+            columns_by_table[table] = columns
+    _raise_if_invalid(backend, validate_kql(query, columns_by_table, tables or None))
+
+def remember_table(backend, source, table, columns=None):
+    """Record a table (and its columns, when known) for validation."""
+    tables = query_names.get((backend, source, "tables")) or set()
+    query_names.put((backend, source, "tables"), tables | {table})
+    if columns is not None:
+        query_names.put((backend, source, table), columns)
+
+def remember_kusto_schema(database, table, schema):
+    """Record the columns of a kusto_schema_fetcher result."""
+    if isinstance(schema, list) and schema and isinstance(schema[0], dict) and "ColumnName" in schema[0]:
+        remember_table("Kusto", database, table, [row["ColumnName"] for row in schema])
+        query_names.put(("Kusto", database, table, "datetime"),
+                        {row["ColumnName"] for row in schema if str(row.get("ColumnType", "")).lower() == "datetime"})
+    return schema
+
+def kusto_time_column(database, table, preferred=None):
+    """
+    Time column of a Kusto table: `preferred` or the configured column when the cached schema
+    has it (or no schema is cached), else the best datetime column of the cached schema.
+    """
+    kusto, batch = DEFAULT_CONFIG["kusto"], DEFAULT_CONFIG["kusto"]["batch"]
+    configured = {kusto["incident_table"]: batch["incident_time_column"],
+                  kusto["deployment_table"]: batch["deployment_start_column"], **kusto["bounding"]["time_columns"]}
+    preferred = preferred or configured.get(table)
+    datetime_columns = query_names.get(("Kusto", database, table, "datetime"))
+    if preferred and (datetime_columns is None or preferred in datetime_columns):
+        return preferred
+    return pick_time_column(datetime_columns or set())
+
+def bound_kusto_query(query, database, columns=None):
+    """
+    Adds the default time filter, row cap and projection to a Kusto query, using the cached
+    schema of its source table (see kusto_bounding.py).
+
+    Returns:
+        (query to run, note describing the rewrite or None)
+
+    Raises:
+        QueryValidationError: no time range on a table whose time column is not known yet
+            (with bounding.unknown_time_column "reject")
+    """
+    settings = DEFAULT_CONFIG["kusto"]["bounding"]
+    if not settings["enabled"]:
+        return query, None
+    table = source_table(query)
+    schema_columns = query_names.get(("Kusto", database, table)) if table else None
+    time_column = kusto_time_column(database, table)
+    bounded, changes = bound_query(
+        query, time_column, settings["lookback"], settings["max_rows"], schema_columns, columns,
+        settings["key_columns"], settings["max_columns"],
+        query_names.get(("Kusto", database, table, "datetime")) or (), settings["lookup_columns"],
+        settings["unknown_time_column"]
+    )
+    if not changes:
+        return query, None
+    print(f"Kusto query rewritten ({'; '.join(changes)}): {bounded}")
+    return bounded, "rewritten: " + "; ".join(changes)
+
 # === Kusto Tools ===
-def kusto_schema_fetcher(cluster_uri, database, table, client_id, Tenantid):
+def _kusto_timespan(seconds):
+    """Seconds as a Kusto timespan literal (d.hh:mm:ss)."""
+    days, rest = divmod(int(seconds), 86400)
+    return f"{days}.{rest // 3600:02d}:{rest % 3600 // 60:02d}:{rest % 60:02d}"
+
+def kusto_request_properties(tool=None):
+    """
+    ClientRequestProperties for a query made by `tool`: results cache max age, server timeout,
+    truncation limit and a client request id ("<application>.<tool>;<uuid>") for tracing.
+    """
+    settings = DEFAULT_CONFIG["kusto"]["request_properties"]
+    options = {**settings, **settings["tools"].get(tool, {})}
+    properties = ClientRequestProperties()
+    properties.application = options["application"]
+    properties.client_request_id = f"{options['application']}.{tool or 'query'};{uuid.uuid4()}"
+    if options.get("results_cache_max_age_seconds"):
+        properties.set_option("query_results_cache_max_age", _kusto_timespan(options["results_cache_max_age_seconds"]))
+    if options.get("server_timeout_seconds"):
+        properties.set_option(ClientRequestProperties.request_timeout_option_name,
+                              timedelta(seconds=options["server_timeout_seconds"]))
+    if options.get("truncation_max_records"):
+        properties.set_option("truncationmaxrecords", int(options["truncation_max_records"]))
+    return properties
+
+def kusto_schema_fetcher(cluster_uri, database, table, client_id, Tenantid, tool=None):
     kcsb = KustoConnectionStringBuilder.with_aad_managed_service_identity_authentication(cluster_uri, client_id)
     kcsb.authority_id = Tenantid
     client = KustoClient(kcsb)
     query = f"{table}|getschema"
-    response = client.execute(database, query)
+    properties = kusto_request_properties(tool)
+    print(f"Kusto request {properties.client_request_id}: {query}")
+    response = client.execute(database, query, properties)
     return [row.to_dict() for row in response.primary_results[0]]
 
-def query_kusto_table(cluster_uri, database, table, client_id, Tenantid, query):
+def query_kusto_table(cluster_uri, database, table, client_id, Tenantid, query, tool=None):
     kcsb = KustoConnectionStringBuilder.with_aad_managed_service_identity_authentication(cluster_uri, client_id)
     kcsb.authority_id = Tenantid
     client = KustoClient(kcsb)
-    response = client.execute(database, query)
-    return [row.to_dict() for row in response.primary_results[0]]
+    properties = kusto_request_properties(tool)
+    print(f"Kusto request {properties.client_request_id}")
+    streaming = DEFAULT_CONFIG["kusto"]["streaming"]
+    if not streaming["enabled"]:
+        response = client.execute(database, query, properties)
+        return TabularResult.from_kusto_table(response.primary_results[0])
+
+    def progress(chunk, rows):
+        if rows > streaming["chunk_rows"]:
+            print(f"Kusto request {properties.client_request_id}: {rows} rows read")
+
+    result = stream_kusto_query(client, database, query, properties, streaming["max_rows"], streaming["chunk_rows"], progress)
+    if result.truncated:
+        print(f"Kusto request {properties.client_request_id}: stopped reading at {result.row_count} rows")
+    return result
+
+def query_kusto_batch(cluster_uri, database, client_id, Tenantid, query, tool=None, max_rows=None):
+    """
+    Runs a ';'-separated batch of tabular statements; one TabularResult per statement, in order.
+    Each result is cut at `max_rows` rows (default kusto.batch.max_rows_per_result) and then marked truncated.
+    """
+    kcsb = KustoConnectionStringBuilder.with_aad_managed_service_identity_authentication(cluster_uri, client_id)
+    kcsb.authority_id = Tenantid
+    client = KustoClient(kcsb)
+    properties = kusto_request_properties(tool)
+    print(f"Kusto batch request {properties.client_request_id}")
+    return stream_kusto_batch(client, database, query, properties, max_rows or DEFAULT_CONFIG["kusto"]["batch"]["max_rows_per_result"],
+                              DEFAULT_CONFIG["kusto"]["streaming"]["chunk_rows"])
+
+_kusto_replica = None
+
+def get_kusto_replica():
+    """The local replica of the default database (created on first use), or None when disabled."""
+    global _kusto_replica
+    settings = DEFAULT_CONFIG["kusto"]["replica"]
+    if not settings["enabled"]:
+        return None
+    if _kusto_replica is None:
+        database, batch = DEFAULT_CONFIG["kusto"]["database"], DEFAULT_CONFIG["kusto"]["batch"]
+        preferred = {DEFAULT_CONFIG["kusto"]["incident_table"]: batch["incident_time_column"],
+                     DEFAULT_CONFIG["kusto"]["deployment_table"]: batch["deployment_start_column"]}
+        tables = {table: {"time_column": kusto_time_column(database, table, preferred.get(table)), "key_columns": keys}
+                  for table, keys in settings["key_columns"].items()}
+        # A pull cut at the streaming limit would otherwise look like the last, short batch
+        batch_rows = min(settings["batch_rows"], DEFAULT_CONFIG["kusto"]["streaming"]["max_rows"])
+        _kusto_replica = KustoReplica(settings["path"], tables, parse_step(settings["retention"]),
+                                      settings["max_staleness_seconds"], batch_rows)
+    return _kusto_replica
+
+def query_kusto_replica(cluster_uri, database, client_id, Tenantid, query):
+    """
+    Answers a (bounded) query from the local replica when it covers the query's time window,
+    syncing the replica first when it is stale.
+
+    Returns:
+        (TabularResult or None, note)
+    """
+    replica = get_kusto_replica()
+    table = source_table(query)
+    if replica is None or database != DEFAULT_CONFIG["kusto"]["database"] or table not in replica.tables:
+        return None, None
+
+    def fetch(kql):
+        return query_kusto_table(cluster_uri, database, table, client_id, Tenantid, kql, "kusto_replica")
+
+    result = replica.answer(query, table, fetch)
+    if result is None:
+        return None, None
+    age = int(replica.clock() - replica.status(table)["synced_at"])
+    return result, f"answered from local replica (synced {age}s ago)"
+
+def run_kusto_query(cluster_uri, database, table, client_id, Tenantid, query, tool, note=None):
+    """Runs a bounded query on the replica or the cluster and encodes the result for the agent."""
+    result, replica_note = query_kusto_replica(cluster_uri, database, client_id, Tenantid, query)
+    if result is None:
+        result = query_kusto_table(cluster_uri, database, table, client_id, Tenantid, query, tool)
+    elif replica_note:
+        note = f"{note}; {replica_note}" if note else replica_note
+    return kusto_tool_output(result, note)
+
+def kusto_tool_output(result, note=None):
+    """Encode a Kusto result for the agent, noting query rewrites and truncation."""
+    if isinstance(result, TabularResult) and result.truncated:
+        cut = f"result truncated to {result.row_count} rows; narrow the time range or add filters"
+        note = f"{note}; {cut}" if note else cut
+    return with_preflight_note(to_tool_output(result), note)
 
 class kustoconfig(BaseModel):
     cluster_uri: object = Field(default=DEFAULT_CONFIG["kusto"]["cluster_uri"], description="uri of the cluster")
@@ -203,26 +601,36 @@ def kusto_schema_tool(
     Fetch schema from kusto table. Defaults to IcMDataWarehouse (incidents).
     Use table='DeploymentEvents' for deployment data.
     """
-    return kusto_schema_fetcher(cluster_uri, database, table, client_id, tenant_id)
+    return remember_kusto_schema(database, table, kusto_schema_fetcher(cluster_uri, database, table, client_id, tenant_id, "kusto_schema_tool"))
 
 @tool
 def kusto_query_tool(
     query: str,
     table: str = "IcMDataWarehouse",
+    columns: Optional[list[str]] = None,
     cluster_uri: str = DEFAULT_CONFIG["kusto"]["cluster_uri"],
     database: str = DEFAULT_CONFIG["kusto"]["database"], 
     client_id: str = DEFAULT_CONFIG["kusto"]["client_id"],
     tenant_id: str = DEFAULT_CONFIG["kusto"]["tenant_id"]
-) -> list:
+) -> str:
     """
     Execute a Kusto query on specified table. Defaults to IcMDataWarehouse (incidents).
     Use table='DeploymentEvents' for deployment queries.
     The query should NOT include the table name - just the query operations.
+    Results are returned as a header row plus one comma-separated line per row.
+    Pass `columns` to return only the columns the question needs. Queries without a time
+    filter (or an IncidentId/DeploymentId lookup) or row limit get a default window and row
+    cap; the output notes any rewrite.
     """
     # Ensure the query starts with the table name
     if not query.strip().startswith(table):
         query = f"{table} | {query}"
-    return query_kusto_table(cluster_uri, database, "", client_id, tenant_id, query)
+    try:
+        check_kql("Kusto", query, database)
+        query, note = bound_kusto_query(query, database, columns)
+    except QueryValidationError as e:
+        return str(e)
+    return run_kusto_query(cluster_uri, database, "", client_id, tenant_id, query, "kusto_query_tool", note)
 
 @tool
 def kusto_incident_schema_tool(
@@ -234,7 +642,8 @@ def kusto_incident_schema_tool(
     """
     Fetch schema from the IcMDataWarehouse incidents table using default configuration.
     """
-    return kusto_schema_fetcher(cluster_uri, database, DEFAULT_CONFIG["kusto"]["incident_table"], client_id, tenant_id)
+    table = DEFAULT_CONFIG["kusto"]["incident_table"]
+    return remember_kusto_schema(database, table, kusto_schema_fetcher(cluster_uri, database, table, client_id, tenant_id, "kusto_incident_schema_tool"))
 
 @tool
 def kusto_deployment_schema_tool(
@@ -246,35 +655,187 @@ def kusto_deployment_schema_tool(
     """
     Fetch schema from the DeploymentEvents table using default configuration.
     """
-    return kusto_schema_fetcher(cluster_uri, database, DEFAULT_CONFIG["kusto"]["deployment_table"], client_id, tenant_id)
+    table = DEFAULT_CONFIG["kusto"]["deployment_table"]
+    return remember_kusto_schema(database, table, kusto_schema_fetcher(cluster_uri, database, table, client_id, tenant_id, "kusto_deployment_schema_tool"))
 
 @tool
 def kusto_incident_query_tool(
     query: str,
+    columns: Optional[list[str]] = None,
     cluster_uri: str = DEFAULT_CONFIG["kusto"]["cluster_uri"],
     database: str = DEFAULT_CONFIG["kusto"]["database"], 
     client_id: str = DEFAULT_CONFIG["kusto"]["client_id"],
     tenant_id: str = DEFAULT_CONFIG["kusto"]["tenant_id"]
-) -> list:
+) -> str:
     """
     Execute a Kusto query on the IcMDataWarehouse incidents table.
     Only the query parameter is required. Other parameters use defaults unless overridden.
+    Results are returned as a header row plus one comma-separated line per row.
+    Pass `columns` to return only the columns the question needs. Queries without a time
+    filter (or an IncidentId/DeploymentId lookup) or row limit get a default window and row
+    cap; the output notes any rewrite.
     """
-    return query_kusto_table(cluster_uri, database, DEFAULT_CONFIG["kusto"]["incident_table"], client_id, tenant_id, query)
+    try:
+        check_kql("Kusto", query, database)
+        query, note = bound_kusto_query(query, database, columns)
+    except QueryValidationError as e:
+        return str(e)
+    return run_kusto_query(cluster_uri, database, DEFAULT_CONFIG["kusto"]["incident_table"], client_id, tenant_id, query, "kusto_incident_query_tool", note)
 
 @tool
 def kusto_deployment_query_tool(
     query: str,
+    columns: Optional[list[str]] = None,
     cluster_uri: str = DEFAULT_CONFIG["kusto"]["cluster_uri"],
     database: str = DEFAULT_CONFIG["kusto"]["database"], 
     client_id: str = DEFAULT_CONFIG["kusto"]["client_id"],
     tenant_id: str = DEFAULT_CONFIG["kusto"]["tenant_id"]
-) -> list:
+) -> str:
     """
     Execute a Kusto query on the DeploymentEvents table.
     Only the query parameter is required. Other parameters use defaults unless overridden.
+    Results are returned as a header row plus one comma-separated line per row.
+    Pass `columns` to return only the columns the question needs. Queries without a time
+    filter (or an IncidentId/DeploymentId lookup) or row limit get a default window and row
+    cap; the output notes any rewrite.
     """
-    return query_kusto_table(cluster_uri, database, DEFAULT_CONFIG["kusto"]["deployment_table"], client_id, tenant_id, query)
+    try:
+        check_kql("Kusto", query, database)
+        query, note = bound_kusto_query(query, database, columns)
+    except QueryValidationError as e:
+        return str(e)
+    return run_kusto_query(cluster_uri, database, DEFAULT_CONFIG["kusto"]["deployment_table"], client_id, tenant_id, query, "kusto_deployment_query_tool", note)
+
+@tool
+def kusto_batch_query_tool(
+    queries: Optional[dict[str, str]] = None,
+    incident_id: Optional[str] = None,
+    window_before: str = "6h",
+    window_after: str = "1h",
+    deployment_filter: Optional[str] = None,
+    include_schemas: bool = False,
+    cluster_uri: str = DEFAULT_CONFIG["kusto"]["cluster_uri"],
+    database: str = DEFAULT_CONFIG["kusto"]["database"],
+    client_id: str = DEFAULT_CONFIG["kusto"]["client_id"],
+    tenant_id: str = DEFAULT_CONFIG["kusto"]["tenant_id"]
+) -> str:
+    """
+    Run several Kusto queries in ONE request and get each result under its name.
+    queries: {name: full query including the table}, e.g. {'sev2': 'IcMDataWarehouse | where Severity == 2 | take 20'}.
+    incident_id: adds results 'incident' (that incident) and 'deployments' (deployments from
+    window_before ahead of the incident's creation to window_after it, with MinutesBeforeIncident);
+    deployment_filter narrows them, e.g. "Service == 'checkout'".
+    include_schemas: adds the incidents and deployments table schemas ('incident_schema', 'deployment_schema').
+    Prefer this over separate calls when correlating incidents with deployments.
+    """
+    incident_table = DEFAULT_CONFIG["kusto"]["incident_table"]
+    deployment_table = DEFAULT_CONFIG["kusto"]["deployment_table"]
+    settings = DEFAULT_CONFIG["kusto"]["batch"]
+    named, lets, notes = {}, [], []
+    try:
+        for name, query in (queries or {}).items():
+            check_kql("Kusto", query, database)
+            named[name], note = bound_kusto_query(query, database)
+            if note:
+                notes.append(f"{name}: {note}")
+        if incident_id:
+            end_column = settings["deployment_end_column"]
+            if end_column not in (query_names.get(("Kusto", database, deployment_table)) or {end_column}):
+                end_column = None
+            window, lets = incident_deployment_window(
+                incident_id, incident_table, deployment_table,
+                kusto_time_column(database, incident_table, settings["incident_time_column"]),
+                kusto_time_column(database, deployment_table, settings["deployment_start_column"]),
+                end_column, window_before, window_after, deployment_filter
+            )
+            named.update(window)
+        if include_schemas:
+            named["incident_schema"] = f"{incident_table} | getschema | project ColumnName, ColumnType"
+            named["deployment_schema"] = f"{deployment_table} | getschema | project ColumnName, ColumnType"
+        batch, names = build_batch(named, lets)
+    except (QueryValidationError, BatchError) as e:
+        return str(e)
+
+    results = query_kusto_batch(cluster_uri, database, client_id, tenant_id, batch, "kusto_batch_query_tool")
+    sections = []
+    for name, result in zip(names, results):
+        if name.endswith("_schema"):
+            remember_kusto_schema(database, incident_table if name == "incident_schema" else deployment_table,
+                                  TabularResult.coerce(result).to_records())
+        sections.append(f"## {name}\n{kusto_tool_output(result)}")
+    for name in names[len(results):]:
+        sections.append(f"## {name}\n# no result returned")
+    return with_preflight_note("\n\n".join(sections), "; ".join(notes))
+
+@tool
+def incident_deployment_correlation_tool(
+    since: str = "1d",
+    lookback: str = "6h",
+    incident_filter: Optional[str] = None,
+    deployment_filter: Optional[str] = None,
+    top: int = 3,
+    cluster_uri: str = DEFAULT_CONFIG["kusto"]["cluster_uri"],
+    database: str = DEFAULT_CONFIG["kusto"]["database"],
+    client_id: str = DEFAULT_CONFIG["kusto"]["client_id"],
+    tenant_id: str = DEFAULT_CONFIG["kusto"]["tenant_id"]
+) -> str:
+    """
+    Find the deployments that most likely caused incidents, computed in code.
+    Fetches incidents created in the last `since` and deployments that started (or were still
+    running) up to `lookback` before them in one request, joins them on time and returns the
+    `top` ranked candidate deployments per incident with MinutesBeforeIncident,
+    RunningAtIncident, ServiceMentioned (service named in the incident) and Score.
+    incident_filter / deployment_filter are KQL where conditions, e.g. "Severity <= 2" or "Service == 'checkout'".
+    """
+    incident_table = DEFAULT_CONFIG["kusto"]["incident_table"]
+    deployment_table = DEFAULT_CONFIG["kusto"]["deployment_table"]
+    settings = DEFAULT_CONFIG["kusto"]["correlation"]
+    batch_settings = DEFAULT_CONFIG["kusto"]["batch"]
+    incident_time = kusto_time_column(database, incident_table, batch_settings["incident_time_column"])
+    deployment_start = kusto_time_column(database, deployment_table, batch_settings["deployment_start_column"])
+    deployment_end = batch_settings["deployment_end_column"]
+    if deployment_end not in (query_names.get(("Kusto", database, deployment_table)) or {deployment_end}):
+        deployment_end = None
+    try:
+        lookback_seconds = parse_step(lookback)
+        parse_step(since)
+    except ValueError as e:
+        return f"Invalid duration: {e}"
+
+    incidents = f"{incident_table} | where {incident_time} > ago({since})"
+    if incident_filter:
+        incidents += f" | where {incident_filter}"
+    deployed = f"coalesce({deployment_end}, {deployment_start})" if deployment_end else deployment_start
+    deployments = f"{deployment_table} | where {deployed} > ago({since}) - {lookback}"
+    if deployment_filter:
+        deployments += f" | where {deployment_filter}"
+    try:
+        check_kql("Kusto", incidents, database)
+        check_kql("Kusto", deployments, database)
+        batch, _ = build_batch({
+            "incidents": f"{incidents} | take {settings['max_incidents']}",
+            "deployments": f"{deployments} | take {settings['max_deployments']}",
+        })
+    except (QueryValidationError, BatchError) as e:
+        return str(e)
+
+    results = query_kusto_batch(cluster_uri, database, client_id, tenant_id, batch, "incident_deployment_correlation_tool",
+                                max(settings["max_incidents"], settings["max_deployments"]))
+    incident_rows, deployment_rows = (list(results) + [[], []])[:2]
+    cut = [f"{name} cut at {len(rows)} rows" for name, rows, limit in (("incidents", incident_rows, settings["max_incidents"]),
+                                                                        ("deployments", deployment_rows, settings["max_deployments"]))
+           if getattr(rows, "truncated", False) or len(rows) >= limit]
+    started = time.perf_counter()
+    ranked = correlate_incidents_with_deployments(
+        incident_rows, deployment_rows, incident_time, deployment_start, deployment_end, lookback_seconds, top
+    )
+    print(f"Correlated {len(incident_rows)} incidents with {len(deployment_rows)} deployments "
+          f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+    matched = len(set(ranked.columns["IncidentId"].tolist())) if "IncidentId" in ranked.columns else 0
+    summary = f"{len(incident_rows)} incidents, {len(deployment_rows)} deployments, {matched} incidents with candidate deployments"
+    if cut:
+        summary += f"; results truncated ({', '.join(cut)}), shorten `since` or add filters"
+    return with_preflight_note(to_tool_output(ranked), summary)
 
 # === Prometheus Tools ===
 def get_prometheus_metrics(query_endpoint, clientid):
@@ -306,15 +867,17 @@ def run_promql_query(query_endpoint, promql_query, clientid):
     credential = DefaultAzureCredential()
     token = credential.get_token("https://data.monitor.azure.com").token
 
-    url = f"{query_endpoint}/api/v1/query?query={promql_query}"
+    url = f"{query_endpoint}/api/v1/query"
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
 
-    response = requests.get(url, headers=headers)
+    budget = DEFAULT_CONFIG["prometheus"]["response_budget"]
+    # requests URL-encodes the params (PromQL has spaces, braces, quotes and '+')
+    response = get_prometheus_session().get(url, params={"query": promql_query}, headers=headers, stream=True)
     response.raise_for_status()
-    return response.json()
+    return read_prometheus_response(response, budget["max_series"], budget["max_points"])
 
 def run_promql_range_query(query_endpoint, promql_query, start_time, end_time, step, clientid):
     """
@@ -332,26 +895,228 @@ def run_promql_range_query(query_endpoint, promql_query, start_time, end_time, s
     credential = DefaultAzureCredential()
     token = credential.get_token("https://data.monitor.azure.com").token
 
-    # Build the range query URL
+    # requests URL-encodes the params (PromQL has spaces, braces, quotes and '+')
     params = {
         'query': promql_query,
         'start': start_time,
         'end': end_time,
         'step': step
     }
-    
-    # Convert params to query string
-    query_string = '&'.join([f"{key}={value}" for key, value in params.items()])
-    url = f"{query_endpoint}/api/v1/query_range?{query_string}"
+    url = f"{query_endpoint}/api/v1/query_range"
     
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
 
-    response = requests.get(url, headers=headers)
+    budget = DEFAULT_CONFIG["prometheus"]["response_budget"]
+    response = get_prometheus_session().get(url, params=params, headers=headers, stream=True)
     response.raise_for_status()
-    return response.json()
+    return read_prometheus_response(response, budget["max_series"], budget["max_points"])
+
+def submit_in_context(pool, fn, *args):
+    """pool.submit() that runs `fn` in a copy of the caller's context, so per-turn state (run recorder,
+    artifact store) reaches worker threads."""
+    return pool.submit(contextvars.copy_context().run, fn, *args)
+
+def range_result(future):
+    """A range query future's response; a request that raised becomes a Prometheus-style error response."""
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"Range query failed: {e}")
+        return {"status": "error", "error": str(e)}
+
+# Shared HTTP connection pool for concurrent PromQL requests
+PROMETHEUS_POOL_SIZE = 16
+_prometheus_session = None
+
+def get_prometheus_session():
+    """requests.Session with a connection pool sized for concurrent PromQL requests."""
+    global _prometheus_session
+    if _prometheus_session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=PROMETHEUS_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _prometheus_session = session
+    return _prometheus_session
+
+def run_promql_batch(query_endpoint, queries, clientid, max_workers=8):
+    """
+    Runs several PromQL expressions concurrently over one token and a shared connection pool.
+    
+    Args:
+        query_endpoint: The Prometheus query endpoint
+        queries: List of dicts with 'expr' and optional 'name', 'range' (bool), 'start_time', 'end_time', 'step'
+        clientid: Client ID for authentication
+        max_workers: Maximum number of requests in flight
+    
+    Returns:
+        One dict per expression, in input order: name, expr, status ('success' or 'error'),
+        result (Prometheus response) or error, and seconds
+    """
+    credential = DefaultAzureCredential()
+    token = credential.get_token("https://data.monitor.azure.com").token
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+    session = get_prometheus_session()
+    budget = DEFAULT_CONFIG["prometheus"]["response_budget"]
+
+    def run_one(index, item):
+        name = item.get("name") or f"q{index + 1}"
+        start = time.perf_counter()
+        try:
+            if item.get("range"):
+                url = f"{query_endpoint}/api/v1/query_range"
+                params = {"query": item["expr"], "start": item["start_time"], "end": item["end_time"], "step": item.get("step", "5m")}
+            else:
+                url = f"{query_endpoint}/api/v1/query"
+                params = {"query": item["expr"]}
+            response = session.get(url, params=params, headers=headers, stream=True)
+            response.raise_for_status()
+            data = read_prometheus_response(response, budget["max_series"], budget["max_points"])
+            status = "success" if data.get("status") == "success" else "error"
+            outcome = {"result": data} if status == "success" else {"error": data.get("error", str(data))}
+        except Exception as e:
+            status, outcome = "error", {"error": str(e)}
+        return {"name": name, "expr": item.get("expr"), "status": status, **outcome,
+                "seconds": round(time.perf_counter() - start, 3)}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(queries)))) as pool:
+        return list(pool.map(run_one, range(len(queries)), queries))
+
+def count_prometheus_series(query_endpoint, selectors, clientid, start_time=None, end_time=None, limit=None):
+    """
+    Counts the series matching each selector through the /api/v1/series endpoint.
+    Instant queries (no start/end) look at the last 5 minutes. With `limit`, counts stop at that value.
+    
+    Returns:
+        {selector: series count}; selectors whose lookup failed are left out
+    """
+    credential = DefaultAzureCredential()
+    token = credential.get_token("https://data.monitor.azure.com").token
+    headers = {"Authorization": f"Bearer {token}"}
+    if start_time is None:
+        end_time = time.time()
+        start_time = end_time - 300
+    counts = {}
+    for selector in selectors:
+        params = {"match[]": selector, "start": start_time, "end": end_time}
+        if limit:
+            params["limit"] = limit
+        try:
+            response = get_prometheus_session().get(f"{query_endpoint}/api/v1/series", params=params, headers=headers)
+            response.raise_for_status()
+            data = response.json()
+            if data.get("status") == "success" and isinstance(data.get("data"), list):
+                counts[selector] = min(len(data["data"]), limit) if limit else len(data["data"])
+        except Exception as e:
+            print(f"Series count failed for {selector}: {e}")
+    return counts
+
+series_count_cache = SeriesCountCache()
+
+def preflight_promql(promql_query, query_endpoint, client_id, start_time=None, end_time=None):
+    """
+    Runs the series-cardinality preflight for a PromQL query.
+    Returns (query to run, note for the agent or None); raises PreflightRejected for rejected queries.
+    Counting is best effort: when it fails the query runs unchanged.
+    """
+    settings = DEFAULT_CONFIG["prometheus"]["preflight"]
+    if not settings["enabled"]:
+        return promql_query, None
+    series_count_cache.ttl_seconds = settings["cache_seconds"]
+
+    def count(selectors):
+        try:
+            return count_prometheus_series(query_endpoint, selectors, client_id, start_time, end_time, settings["max_series"] + 1)
+        except Exception as e:
+            print(f"Series preflight skipped: {e}")
+            return {}
+
+    query, _, note = preflight(
+        promql_query, count, settings["max_series"], settings["action"], settings["topk"], settings["sum_by"],
+        cache=series_count_cache, endpoint=query_endpoint
+    )
+    return query, note
+
+def with_preflight_note(output, note):
+    """Prefix a tool output with a preflight or rewrite note, if any."""
+    if not note:
+        return output
+    if isinstance(output, str):
+        return f"# {note}\n{output}"
+    return {"preflight": note, "result": output}
+
+range_query_cache = RangeQueryCache(
+    DEFAULT_CONFIG["prometheus"]["range_cache"]["points_per_chunk"],
+    DEFAULT_CONFIG["prometheus"]["range_cache"]["max_fresh_seconds"],
+    DEFAULT_CONFIG["prometheus"]["range_cache"]["max_queries"],
+    DEFAULT_CONFIG["prometheus"]["range_cache"]["max_points"]
+)
+
+def cached_promql_range_query(query_endpoint, promql_query, start_time, end_time, step, client_id):
+    """
+    run_promql_range_query through the incremental range cache: only the parts of the window
+    that are not cached yet (and the recent, still changing tail) are fetched.
+    """
+    if not DEFAULT_CONFIG["prometheus"]["range_cache"]["enabled"]:
+        return run_promql_range_query(query_endpoint, promql_query, start_time, end_time, step, client_id)
+    return range_query_cache.query(
+        (query_endpoint, promql_query), start_time, end_time, step,
+        lambda start, end: run_promql_range_query(query_endpoint, promql_query, start, end, step, client_id)
+    )
+
+def fetch_prometheus_label_index(query_endpoint, clientid, labels, hierarchy, hierarchy_match=""):
+    """
+    Fetches what the label index is built from: all label names, the values of `labels`
+    and the series count of every `hierarchy` combination (one count by (...) query over the
+    series matching `hierarchy_match`, e.g. '__name__=~"container_.*"'; counting every series
+    of a large workspace is expensive). The labels API has no counts, so other labels get none.
+    
+    Returns:
+        {"label_names": [...], "values": {label: [...]}, "hierarchy": [...],
+         "hierarchy_counts": [{"labels": {...}, "count": n}, ...]}
+    """
+    credential = DefaultAzureCredential()
+    token = credential.get_token("https://data.monitor.azure.com").token
+    headers = {"Authorization": f"Bearer {token}"}
+    session = get_prometheus_session()
+
+    def get_data(path, params=None):
+        response = session.get(f"{query_endpoint}{path}", params=params, headers=headers)
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get("status") != "success":
+            raise RuntimeError(f"Prometheus API error for {path}: {payload}")
+        return payload["data"]
+
+    label_names = get_data("/api/v1/labels")
+    values = {label: get_data(f"/api/v1/label/{label}/values") for label in labels if label in label_names}
+    selector = "{" + ",".join([f'{label}!=""' for label in hierarchy] + ([hierarchy_match] if hierarchy_match else [])) + "}"
+    counts = get_data("/api/v1/query", {"query": f"count by ({', '.join(hierarchy)}) ({selector})"})
+    return {
+        "label_names": label_names,
+        "values": values,
+        "hierarchy": list(hierarchy),
+        "hierarchy_counts": [
+            {"labels": row.get("metric", {}), "count": int(float(row["value"][1]))}
+            for row in counts.get("result", [])
+        ],
+    }
+
+def _load_label_index():
+    settings = DEFAULT_CONFIG["prometheus"]["label_index"]
+    return LabelIndex.from_payload(fetch_prometheus_label_index(
+        DEFAULT_CONFIG["prometheus"]["query_endpoint"], DEFAULT_CONFIG["prometheus"]["client_id"],
+        settings["labels"], settings["hierarchy"], settings["hierarchy_match"]
+    ))
+
+# Built on first lookup, then refreshed in the background
+prometheus_label_index = BackgroundIndex(_load_label_index, DEFAULT_CONFIG["prometheus"]["label_index"]["refresh_seconds"])
 
 class promconfig(BaseModel):
     query_endpoint: object = Field(default=DEFAULT_CONFIG["prometheus"]["query_endpoint"], description="The Azure Monitor workspace query endpoint")
@@ -367,19 +1132,29 @@ def prometheus_metrics_fetch_tool(
     Fetch all prometheus metrics from azure monitor workspace using default configuration.
     Parameters use defaults unless overridden.
     """
-    return get_prometheus_metrics(query_endpoint, client_id)
+    metrics = get_prometheus_metrics(query_endpoint, client_id)
+    if metrics:
+        query_names.put(("prometheus", query_endpoint), metrics)
+    return metrics
 
 @tool
 def promql_query_tool(
     promql_query: str,
     query_endpoint: str = DEFAULT_CONFIG["prometheus"]["query_endpoint"],
     client_id: str = DEFAULT_CONFIG["prometheus"]["client_id"]
-) -> dict:
+):
     """
     Execute PromQL query against Azure Monitor workspace using default configuration.
     Only the promql_query parameter is required. Other parameters use defaults unless overridden.
+    Labels shared by all series are listed once; each series line only shows its own labels.
+    Queries selecting too many series are bounded (topk/sum by) or rejected with guidance.
     """
-    return run_promql_query(query_endpoint, promql_query, client_id)
+    try:
+        check_promql(promql_query, query_endpoint)
+        promql_query, note = preflight_promql(promql_query, query_endpoint, client_id)
+    except (QueryValidationError, PreflightRejected) as e:
+        return str(e)
+    return with_preflight_note(to_tool_output(run_promql_query(query_endpoint, promql_query, client_id)), note)
 
 @tool
 def promql_range_query_tool(
@@ -389,7 +1164,7 @@ def promql_range_query_tool(
     step: str = "5m",
     query_endpoint: str = DEFAULT_CONFIG["prometheus"]["query_endpoint"],
     client_id: str = DEFAULT_CONFIG["prometheus"]["client_id"]
-) -> dict:
+):
     """
     Execute PromQL range query to get time series data with timestamps.
     This is essential for creating charts as it returns data over time.
@@ -403,9 +1178,309 @@ def promql_range_query_tool(
         client_id: Client ID (uses default)
     
     Returns:
-        Time series data with timestamps suitable for chart creation
+        Time series data: shared labels once, then one line per series with a summary
+        (min/max/avg/p95/last at full resolution) and its values, downsampled to keep peaks and shape
+    """
+    downsampling = DEFAULT_CONFIG["prometheus"]["downsampling"]
+    try:
+        check_promql(promql_query, query_endpoint)
+        promql_query, note = preflight_promql(promql_query, query_endpoint, client_id, start_time, end_time)
+    except (QueryValidationError, PreflightRejected) as e:
+        return str(e)
+    response = cached_promql_range_query(query_endpoint, promql_query, start_time, end_time, step, client_id)
+    return with_preflight_note(to_tool_output(downsample_prometheus_response(response, downsampling["llm_points"], downsampling["method"])), note)
+
+@tool
+def prometheus_chart_tool(
+    promql_query: str,
+    start_time: str = "2025-08-08T09:00:00Z",
+    end_time: str = "2025-08-08T10:00:00Z",
+    step: str = "5m",
+    title: str = "Prometheus Metrics",
+    y_label: str = "Value",
+    query_endpoint: str = DEFAULT_CONFIG["prometheus"]["query_endpoint"],
+    client_id: str = DEFAULT_CONFIG["prometheus"]["client_id"]
+):
+    """
+    Run a PromQL range query and draw it as a line chart (one line per series).
+    The chart is stored for the UI; the tool returns a reference like [artifact:chart-1] that
+    must be copied unchanged into the final answer, followed by a summary of the data.
+    Never write chart data or figure JSON yourself.
     """
-    return run_promql_range_query(query_endpoint, promql_query, start_time, end_time, step, client_id)
+    downsampling = DEFAULT_CONFIG["prometheus"]["downsampling"]
+    try:
+        check_promql(promql_query, query_endpoint)
+        promql_query, note = preflight_promql(promql_query, query_endpoint, client_id, start_time, end_time)
+    except (QueryValidationError, PreflightRejected) as e:
+        return str(e)
+    response = cached_promql_range_query(query_endpoint, promql_query, start_time, end_time, step, client_id)
+    if not isinstance(response, dict) or response.get("status") != "success":
+        return response
+    chart_data = downsample_prometheus_response(response, downsampling["chart_points"], downsampling["method"])
+    ref = store_artifact("chart", create_prometheus_figure(chart_data, title, y_label, DEFAULT_CONFIG["charts"]["webgl_threshold"]), title)
+    summary = with_preflight_note(to_tool_output(downsample_prometheus_response(response, downsampling["llm_points"], downsampling["method"])), note)
+    if ref is None:
+        return f"Charts are not available in this session.\n{summary}"
+    return f"Chart stored as {ref}. Include {ref} in the final answer where the chart should appear.\n{summary}"
+
+@tool
+def prometheus_label_lookup_tool(
+    search: str,
+    label: Optional[str] = None,
+    limit: int = 10
+) -> str:
+    """
+    Look up Prometheus label values (namespace, pod, container, job, node, instance; metric names
+    with label='__name__') by prefix, substring or fuzzy match, from a cached index. Each match
+    shows its series count and related labels (e.g. the namespace and containers of a pod), so
+    precise selectors can be written without trial queries (series counts are only known for
+    namespace, pod and container values). Set label to restrict the search
+    (e.g. label='pod'); use label='__label__' to search label names instead of values.
+    """
+    index = prometheus_label_index.get()
+    if index is None:
+        return f"Label index unavailable: {prometheus_label_index.last_error}"
+    if label == "__label__":
+        names = index.lookup_label_names(search, limit)
+        return "\n".join(names) if names else f"No label names match '{search}'."
+    if label and label not in index.values:
+        return f"Label '{label}' is not indexed. Indexed labels: {', '.join(sorted(index.values))}"
+    results = index.lookup(search, label, limit)
+    return format_lookup(results) if results else f"No {label or 'label'} values match '{search}'."
+
+class PromQLBatchItem(BaseModel):
+    expr: str = Field(description="PromQL expression")
+    name: Optional[str] = Field(default=None, description="Short label for this expression, e.g. 'cpu'")
+    range: bool = Field(default=False, description="True for a range query over start_time..end_time, False for an instant query")
+    start_time: str = Field(default="2025-08-08T09:00:00Z", description="Range start (ISO format)")
+    end_time: str = Field(default="2025-08-08T10:00:00Z", description="Range end (ISO format)")
+    step: str = Field(default="5m", description="Range query resolution")
+
+@tool
+def promql_batch_query_tool(
+    queries: list[PromQLBatchItem],
+    query_endpoint: str = DEFAULT_CONFIG["prometheus"]["query_endpoint"],
+    client_id: str = DEFAULT_CONFIG["prometheus"]["client_id"]
+) -> str:
+    """
+    Run several PromQL expressions (instant or range) concurrently in one call.
+    Use this instead of repeated promql_query_tool / promql_range_query_tool calls when a question
+    needs more than one metric, e.g. CPU, memory and restarts for the same pods.
+    Returns one section per expression with its status; a failing expression does not affect the others.
+    """
+    items = [q.model_dump() if isinstance(q, BaseModel) else dict(q) for q in queries]
+    downsampling = DEFAULT_CONFIG["prometheus"]["downsampling"]
+
+    # Validate and preflight every expression; rejected ones are reported without being run
+    notes, rejected, runnable = {}, {}, []
+    for index, item in enumerate(items):
+        item["name"] = item.get("name") or f"q{index + 1}"
+        if any(other["name"] == item["name"] for other in items[:index]):
+            item["name"] = f"{item['name']}_{index + 1}"
+        try:
+            check_promql(item["expr"], query_endpoint)
+            item["expr"], notes[item["name"]] = preflight_promql(
+                item["expr"], query_endpoint, client_id,
+                item.get("start_time") if item.get("range") else None, item.get("end_time") if item.get("range") else None
+            )
+            runnable.append(item)
+        except (QueryValidationError, PreflightRejected) as e:
+            rejected[item["name"]] = str(e)
+    outcomes = {o["name"]: o for o in run_promql_batch(query_endpoint, runnable, client_id, DEFAULT_CONFIG["prometheus"]["batch_workers"])} if runnable else {}
+
+    sections = []
+    for item in items:
+        name = item["name"]
+        if name in rejected:
+            sections.append(f"## {name} [rejected] {item['expr']}\n{rejected[name]}")
+            continue
+        outcome = outcomes[name]
+        header = f"## {name} [{outcome['status']}] {outcome['expr']}"
+        if outcome["status"] != "success":
+            sections.append(f"{header}\nerror: {outcome['error']}")
+            continue
+        result = downsample_prometheus_response(outcome["result"], downsampling["llm_points"], downsampling["method"])
+        body = with_preflight_note(to_tool_output(result), notes.get(name))
+        sections.append(f"{header}\n{body if isinstance(body, str) else json.dumps(body)}")
+    return "\n\n".join(sections)
+
+@tool
+def prometheus_anomaly_tool(
+    promql_query: str,
+    start_time: str = "2025-08-08T09:00:00Z",
+    end_time: str = "2025-08-08T10:00:00Z",
+    step: str = "5m",
+    seasonal: bool = True,
+    query_endpoint: str = DEFAULT_CONFIG["prometheus"]["query_endpoint"],
+    client_id: str = DEFAULT_CONFIG["prometheus"]["client_id"]
+) -> str:
+    """
+    Find anomalies in a PromQL range query instead of reading the raw series.
+    Every series is checked with a rolling z-score, EWMA residuals and (seasonal=True) a
+    comparison with the same window one week earlier.
+    Returns only the anomalous intervals: series labels, start/end, spike or dip, peak and
+    expected value, score and the detectors that fired.
+    """
+    settings = DEFAULT_CONFIG["prometheus"]["anomaly"]
+    try:
+        check_promql(promql_query, query_endpoint)
+        promql_query, note = preflight_promql(promql_query, query_endpoint, client_id, start_time, end_time)
+        start, end, step_seconds = parse_time(start_time), parse_time(end_time), parse_step(step)
+        offset = parse_step(settings["seasonal_offset"])
+    except (QueryValidationError, PreflightRejected) as e:
+        return str(e)
+    except ValueError as e:
+        return f"Invalid time range: {e}"
+
+    detectors = [name for name in settings["detectors"] if seasonal or name != "seasonal"]
+    warmup_start = start - settings["window_points"] * step_seconds
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        current = submit_in_context(pool, cached_promql_range_query, query_endpoint, promql_query, warmup_start, end,
+                                    step, client_id)
+        earlier = submit_in_context(pool, cached_promql_range_query, query_endpoint, promql_query, warmup_start - offset,
+                                    end - offset, step, client_id) if "seasonal" in detectors else None
+        response = range_result(current)
+        baseline_response = range_result(earlier) if earlier is not None else None
+    if not isinstance(response, dict) or response.get("status") != "success":
+        return to_tool_output(response)
+
+    # Without last week's window the seasonal detector is skipped; the others still run
+    baseline, baseline_note = None, None
+    if isinstance(baseline_response, dict) and baseline_response.get("status") == "success":
+        timestamps, _, metrics = series_matrix(response)
+        baseline = align_baseline(metrics, timestamps, baseline_response, offset)
+    elif baseline_response is not None:
+        error = baseline_response.get("error", "query failed") if isinstance(baseline_response, dict) else baseline_response
+        baseline_note = f"seasonal baseline unavailable ({error})"
+    table, stats = detect_anomalies(
+        response, detectors, baseline, settings["threshold"], settings["min_votes"], report_start=start,
+        max_intervals=settings["max_intervals"], window=settings["window_points"], alpha=settings["ewma_alpha"]
+    )
+    summary = (f"{stats['series']} series, {stats['points']} points checked with {', '.join(stats['detectors']) or 'no detectors'}; "
+               f"{table.row_count} anomalous intervals")
+    if baseline_note:
+        summary += f"; {baseline_note}"
+    body = to_tool_output(table) if table.row_count else "No anomalies found."
+    return with_preflight_note(body, f"{note}; {summary}" if note else summary)
+
+@tool
+def deployment_impact_tool(
+    deployment_id: str,
+    window: str = "1h",
+    metrics: Optional[list[str]] = None,
+    service: Optional[str] = None,
+    query_endpoint: str = DEFAULT_CONFIG["prometheus"]["query_endpoint"],
+    client_id: str = DEFAULT_CONFIG["prometheus"]["client_id"]
+) -> str:
+    """
+    Score the impact of one deployment from DeploymentEvents on the golden metrics.
+    Looks up the deployment, fetches every golden metric (cpu, memory, restarts, request_rate,
+    error_rate, latency_p95) for `window` before it started and `window` after it ended in
+    parallel, and returns the series that changed, ranked by effect size (Hedges' g) with
+    percentage change and the change point in minutes relative to the deployment start.
+    metrics: subset of the golden metric names; service: overrides the deployment's Service.
+    """
+    settings = DEFAULT_CONFIG["prometheus"]["deployment_impact"]
+    kusto, batch = DEFAULT_CONFIG["kusto"], DEFAULT_CONFIG["kusto"]["batch"]
+    golden = settings["golden_metrics"]
+    unknown = [name for name in metrics or [] if name not in golden]
+    if unknown:
+        return f"Unknown metrics {unknown}; choose from {list(golden)}"
+    try:
+        window_seconds = parse_step(window)
+    except ValueError as e:
+        return f"Invalid duration: {e}"
+
+    table = kusto["deployment_table"]
+    lookup = f"{table} | where DeploymentId == {kql_literal(deployment_id)} | take 1"
+    deployment = TabularResult.coerce(query_kusto_table(kusto["cluster_uri"], kusto["database"], table, kusto["client_id"],
+                                                        kusto["tenant_id"], lookup, "deployment_impact_tool")).to_records()
+    if not deployment:
+        return f"Deployment {deployment_id} not found in {table}"
+    deployment = deployment[0]
+    start, end = to_epoch_seconds([deployment.get(kusto_time_column(kusto["database"], table, batch["deployment_start_column"])),
+                                   deployment.get(batch["deployment_end_column"])])
+    end = start if np.isnan(end) else end
+    service = service or deployment.get(settings["service_column"])
+    if np.isnan(start) or not service:
+        return f"Deployment {deployment_id} has no start time or service: {json.dumps(deployment, default=str)}"
+
+    queries = {name: golden[name].replace("{service}", str(service)) for name in metrics or golden}
+    try:
+        for query in queries.values():
+            check_promql(query, query_endpoint)
+    except QueryValidationError as e:
+        return str(e)
+    ranges = {"before": (start - window_seconds, start), "after": (end, end + window_seconds)}
+    with ThreadPoolExecutor(max_workers=DEFAULT_CONFIG["prometheus"]["batch_workers"]) as pool:
+        futures = {(name, side): submit_in_context(pool, cached_promql_range_query, query_endpoint, query, first, last,
+                                                   settings["step"], client_id)
+                   for name, query in queries.items() for side, (first, last) in ranges.items()}
+        windows = {name: (range_result(futures[name, "before"]), range_result(futures[name, "after"])) for name in queries}
+
+    impact, stats = score_deployment_impact(windows, start, end, settings["min_effect"], max_rows=settings["max_rows"])
+    summary = (f"deployment {deployment_id} of {service}: {stats['series']} series in {len(queries)} metrics compared "
+               f"{window} before vs {window} after; {stats['impacted']} changed with |EffectSize| >= {settings['min_effect']}")
+    if stats["errors"]:
+        summary += "; failed: " + ", ".join(f"{name} ({error})" for name, error in stats["errors"].items())
+    body = to_tool_output(impact) if impact.row_count else "No metric changed noticeably."
+    return with_preflight_note(body, summary)
+
+@tool
+def metric_correlation_tool(
+    target_query: str,
+    start_time: str = "2025-08-08T09:00:00Z",
+    end_time: str = "2025-08-08T10:00:00Z",
+    candidate_queries: Optional[dict[str, str]] = None,
+    step: str = "1m",
+    max_lag: str = "15m",
+    top: int = 15,
+    query_endpoint: str = DEFAULT_CONFIG["prometheus"]["query_endpoint"],
+    client_id: str = DEFAULT_CONFIG["prometheus"]["client_id"]
+) -> str:
+    """
+    Find what else changed together with a metric, e.g. when latency spiked.
+    Fetches the target and the candidate metrics in parallel, aligns them and correlates
+    every candidate series with the target at every lag up to max_lag.
+    Returns the top correlated series with Correlation, LagSeconds and Relation
+    ('moves first' = the candidate changed before the target).
+    candidate_queries: {name: PromQL}; defaults to the configured cluster-wide candidates
+    (cpu, memory, restarts, network, requests, errors per namespace/container).
+    """
+    settings = DEFAULT_CONFIG["prometheus"]["correlation"]
+    candidates = candidate_queries or settings["candidates"]
+    try:
+        for query in [target_query, *candidates.values()]:
+            check_promql(query, query_endpoint)
+        start, end, step_seconds = parse_time(start_time), parse_time(end_time), parse_step(step)
+        max_lag_seconds = parse_step(max_lag)
+    except QueryValidationError as e:
+        return str(e)
+    except ValueError as e:
+        return f"Invalid time range: {e}"
+
+    queries = {"__target__": target_query, **candidates}
+    with ThreadPoolExecutor(max_workers=DEFAULT_CONFIG["prometheus"]["batch_workers"]) as pool:
+        futures = {name: submit_in_context(pool, cached_promql_range_query, query_endpoint, query, start, end, step, client_id)
+                   for name, query in queries.items()}
+        responses = {name: range_result(future) for name, future in futures.items()}
+    target = responses.pop("__target__")
+    if not isinstance(target, dict) or target.get("status") != "success":
+        return to_tool_output(target)
+    failed = [name for name, response in responses.items() if not isinstance(response, dict) or response.get("status") != "success"]
+
+    started = time.perf_counter()
+    ranked, stats = correlate_with_target(target, {name: responses[name] for name in responses if name not in failed},
+                                          step_seconds, max_lag_seconds, settings["difference"], top, settings["min_points"])
+    print(f"Correlated {stats['candidates']} series at {stats['lags']} lags in {(time.perf_counter() - started) * 1000:.1f} ms")
+    target_text = f"the mean of {stats['target_series']} target series" if stats["target_series"] > 1 else "the target"
+    changes = " (step-to-step changes)" if settings["difference"] else ""
+    summary = (f"{stats['candidates']} candidate series from {len(responses) - len(failed)} metrics correlated with "
+               f"{target_text}{changes} at lags up to {max_lag}")
+    if failed:
+        summary += f"; failed: {', '.join(failed)}"
+    body = to_tool_output(ranked) if ranked.row_count else "No candidate series overlaps the target."
+    return with_preflight_note(body, summary)
 
 # @tool - DISABLED
 # def format_prometheus_data_for_charts(prometheus_response: str) -> str:
@@ -418,19 +1493,11 @@ def promql_range_query_tool(
 #     pass
 
 # === Log Analytics Tools ===
-@tool
-def query_log_analytics_tool(
-    query: str,
-    workspace_id: str = DEFAULT_CONFIG["log_analytics"]["workspace_id"],
-    client_id: str = DEFAULT_CONFIG["log_analytics"]["client_id"]
-) -> list:
+def query_log_analytics(workspace_id, query, client_id):
     """
-    Tool to run Kusto queries on Azure Log Analytics using default configuration.
-    Only the query parameter is required. Other parameters use defaults unless overridden.
+    Runs a Kusto query against an Azure Log Analytics workspace.
+    Returns a TabularResult, or a list with a single error/exception entry.
     """
-    if not query:
-        raise ValueError("Query is required. The agent must generate one based on user intent.")
-
     credential = DefaultAzureCredential()
     client = LogsQueryClient(credential)
 
@@ -442,15 +1509,155 @@ def query_log_analytics_tool(
         )
         
         if response.status == LogsQueryStatus.SUCCESS:
-            table = response.tables[0]
-            columns = [col if isinstance(col, str) else col.name for col in table.columns]
-            rows = [dict(zip(columns, row)) for row in table.rows]
-            return rows
+            return TabularResult.from_log_analytics_table(response.tables[0])
         else:
             return [{"error": response.error.message}]
     except Exception as e:
         return [{"exception": str(e)}]
 
+def log_tool_output(result, compress=True, note=None):
+    """
+    Encode a Log Analytics result for the agent. Large log results (a message column and at
+    least min_rows rows) are replaced by their mined templates.
+    """
+    settings = DEFAULT_CONFIG["log_analytics"]["log_templates"]
+    if compress and settings["enabled"] and isinstance(result, TabularResult) and result.row_count >= settings["min_rows"] \
+            and find_message_column(result) is not None:
+        templates = mine_log_templates(
+            result, time_column=settings["time_column"], pod_column=settings["pod_column"], similarity=settings["similarity"],
+            depth=settings["depth"], max_children=settings["max_children"], max_templates=settings["max_templates"]
+        )
+        mined = f"{result.row_count} log lines mined into {templates.row_count} templates; pass compress_logs=False for raw rows"
+        note = f"{note}; {mined}" if note else mined
+        result = templates
+    return with_preflight_note(to_tool_output(result), note)
+
+@tool
+def query_log_analytics_tool(
+    query: str,
+    compress_logs: bool = True,
+    workspace_id: str = DEFAULT_CONFIG["log_analytics"]["workspace_id"],
+    client_id: str = DEFAULT_CONFIG["log_analytics"]["client_id"]
+):
+    """
+    Tool to run Kusto queries on Azure Log Analytics using default configuration.
+    Only the query parameter is required. Other parameters use defaults unless overridden.
+    Results are returned as a header row plus one comma-separated line per row.
+    Large log results come back as message templates with counts, first/last seen, example
+    parameters and pods; pass compress_logs=False to get the raw lines.
+    """
+    if not query:
+        raise ValueError("Query is required. The agent must generate one based on user intent.")
+    try:
+        check_kql("Log Analytics", query, workspace_id)
+    except QueryValidationError as e:
+        return str(e)
+    result = query_log_analytics(workspace_id, query, client_id)
+    source = re.match(r"\s*([A-Za-z_][A-Za-z0-9_]*)\s*(\||$)", query)
+    if isinstance(result, TabularResult) and source:
+        remember_table("Log Analytics", workspace_id, source.group(1))
+    return log_tool_output(result, compress_logs)
+
+def query_log_analytics_batch(workspace_id, queries, client_id, timespan_hours=1):
+    """
+    Runs several Log Analytics queries in one request through the batch query API.
+
+    Args:
+        workspace_id: Log Analytics workspace
+        queries: List of dicts with 'name' and 'query'
+        client_id: Client ID for authentication
+        timespan_hours: Time range applied to every query
+
+    Returns:
+        One dict per query, in input order: name, query, status ('success', 'partial' or 'error'),
+        result (TabularResult; the rows received for partial results) and error
+    """
+    credential = DefaultAzureCredential()
+    client = LogsQueryClient(credential)
+    batch = [LogsBatchQuery(workspace_id=workspace_id, query=item["query"], timespan=timedelta(hours=timespan_hours))
+             for item in queries]
+    try:
+        responses = client.query_batch(batch)
+    except Exception as e:
+        return [{"name": item["name"], "query": item["query"], "status": "error", "result": None, "error": str(e)}
+                for item in queries]
+
+    outcomes = []
+    for item, response in zip(queries, responses):
+        status = getattr(response, "status", None)
+        if status == LogsQueryStatus.SUCCESS:
+            tables, label, error = response.tables, "success", None
+        elif status == LogsQueryStatus.PARTIAL:
+            tables, label, error = response.partial_data, "partial", response.partial_error.message
+        else:
+            tables, label, error = [], "error", getattr(response, "message", str(response))
+        result = TabularResult.from_log_analytics_table(tables[0]) if tables else None
+        outcomes.append({"name": item["name"], "query": item["query"], "status": label, "result": result, "error": error})
+    return outcomes
+
+class LogAnalyticsBatchItem(BaseModel):
+    query: str = Field(description="Kusto query for the Log Analytics workspace")
+    name: Optional[str] = Field(default=None, description="Short label for this query, e.g. 'errors'")
+
+@tool
+def log_analytics_batch_query_tool(
+    queries: list[LogAnalyticsBatchItem],
+    timespan: str = "1h",
+    compress_logs: bool = True,
+    workspace_id: str = DEFAULT_CONFIG["log_analytics"]["workspace_id"],
+    client_id: str = DEFAULT_CONFIG["log_analytics"]["client_id"]
+) -> str:
+    """
+    Run several Log Analytics queries in one request, e.g. error counts, top exceptions and a
+    pod restart timeline for the same incident. Use this instead of repeated
+    query_log_analytics_tool calls when a question needs more than one query.
+    `timespan` (e.g. '1h', '1d') applies to every query. Large log results are returned as
+    message templates unless compress_logs=False.
+    Returns one section per query with its status; a failing query does not affect the others,
+    and partial results are returned with the error that cut them short.
+    """
+    items = [q.model_dump() if isinstance(q, BaseModel) else dict(q) for q in queries]
+    max_queries = DEFAULT_CONFIG["log_analytics"]["batch_max_queries"]
+    if not items:
+        return "No queries given."
+    if len(items) > max_queries:
+        return f"Too many queries ({len(items)}); send at most {max_queries} per batch."
+    try:
+        hours = parse_step(timespan) / 3600
+    except ValueError as e:
+        return f"Invalid timespan: {e}"
+
+    rejected, runnable = {}, []
+    for index, item in enumerate(items):
+        item["name"] = item.get("name") or f"q{index + 1}"
+        if any(other["name"] == item["name"] for other in items[:index]):
+            item["name"] = f"{item['name']}_{index + 1}"
+        try:
+            check_kql("Log Analytics", item["query"], workspace_id)
+            runnable.append(item)
+        except QueryValidationError as e:
+            rejected[item["name"]] = str(e)
+    outcomes = {o["name"]: o for o in query_log_analytics_batch(workspace_id, runnable, client_id, hours)} if runnable else {}
+
+    sections = []
+    for item in items:
+        name = item["name"]
+        if name in rejected:
+            sections.append(f"## {name} [rejected]\n{rejected[name]}")
+            continue
+        outcome = outcomes[name]
+        header = f"## {name} [{outcome['status']}]"
+        if outcome["result"] is None:
+            sections.append(f"{header}\nerror: {outcome['error']}")
+            continue
+        source = re.match(r"\s*([A-Za-z_][A-Za-z0-9_]*)\s*(\||$)", item["query"])
+        if outcome["status"] == "success" and source:
+            remember_table("Log Analytics", workspace_id, source.group(1))
+        note = f"partial result: {outcome['error']}" if outcome["status"] == "partial" else None
+        body = log_tool_output(outcome["result"], compress_logs, note)
+        sections.append(f"{header}\n{body if isinstance(body, str) else json.dumps(body)}")
+    return "\n\n".join(sections)
+
 # === Line Graph Visualization Tools === DISABLED
 # All chart creation tools have been disabled to resolve issues
 
@@ -501,71 +1708,107 @@ def query_log_analytics_tool(
 # ):
 #     """Create a chart showing deployment events and their impact on system metrics."""
 #     pass
+
+# === Agent Definitions ===
+KUSTO_TOOLS = [
+    kusto_schema_tool, 
+    kusto_query_tool,
+    kusto_incident_schema_tool, 
+    kusto_incident_query_tool,
+    kusto_deployment_schema_tool,
+    kusto_deployment_query_tool,
+    kusto_batch_query_tool,
+    incident_deployment_correlation_tool
+]
+
+PROMETHEUS_TOOLS = [prometheus_metrics_fetch_tool, prometheus_label_lookup_tool, promql_query_tool, promql_range_query_tool, promql_batch_query_tool, prometheus_anomaly_tool, deployment_impact_tool, metric_correlation_tool, prometheus_chart_tool]
+
+LOG_ANALYTICS_TOOLS = [query_log_analytics_tool, log_analytics_batch_query_tool]
+
+KUSTO_AGENT_PROMPT = (
+    "You are an Azure Data Explorer (Kusto) agent who can read Azure Data Explorer tables. "
+    "You have access to TWO tables with default configuration:\n"
+    "1. IcMDataWarehouse - Contains incident management data\n"
+    "2. DeploymentEvents - Contains deployment and release information\n\n"
+    "INSTRUCTIONS:\n"
+    "- Use kusto_incident_schema_tool() to get the schema of the incidents table\n"
+    "- Use kusto_deployment_schema_tool() to get the schema of the deployments table\n"
+    "- Generate Kusto queries based on user requests after getting the appropriate schema\n"
+    "- Use kusto_incident_query_tool(query='your_query_here') for incident-related queries\n"
+    "- Use kusto_deployment_query_tool(query='your_query_here') for deployment-related queries\n"
+    "- You can also use the generic kusto_schema_tool(table='TableName') and kusto_query_tool(query='...', table='TableName')\n"
+    "- To correlate an incident with deployments, use kusto_batch_query_tool(incident_id='...', window_before='6h') to get the incident and the deployments around it in one call; pass include_schemas=True if you have not seen the schemas yet\n"
+    "- Run several independent queries together with kusto_batch_query_tool(queries={'name': 'Table | ...'})\n"
+    "- To find which deployments caused incidents, use incident_deployment_correlation_tool(since='1d', lookback='6h', incident_filter='Severity <= 2'); it returns ranked candidates, so do not work out time overlaps yourself\n"
+    "- You can correlate data between both tables when needed\n"
+    "- Focus on helping users analyze incident data, deployment patterns, and their relationships\n"
+    "- Respond ONLY with the results of your work, do NOT include ANY other text."
+)
+
+PROMETHEUS_AGENT_PROMPT = (
+    "You are a Prometheus agent who can read Azure Monitor workspace (Prometheus environment). "
+    "You have default configuration values pre-configured, so you can work immediately without asking for connection details.\n\n"
+    "INSTRUCTIONS:\n"
+    "- Use prometheus_metrics_fetch_tool() to get available metrics from the default workspace\n"
+    "- Use prometheus_label_lookup_tool(search='checkout', label='pod') to find exact pod, namespace or container names before writing label filters\n"
+    "- Use promql_query_tool(promql_query='your_query_here') for instant snapshots of current values\n"
+    "- Use promql_range_query_tool(promql_query='your_query_here', start_time='...', end_time='...', step='5m') for time series data\n"
+    "- When a question needs several expressions (e.g. CPU, memory and restarts), run them together with promql_batch_query_tool(queries=[{'name': 'cpu', 'expr': '...'}, {'name': 'memory', 'expr': '...', 'range': True, 'start_time': '...', 'end_time': '...'}])\n"
+    "- To find anomalies, spikes or dips, use prometheus_anomaly_tool(promql_query='...', start_time='...', end_time='...') instead of reading raw series\n"
+    "- To check whether a deployment hurt anything, use deployment_impact_tool(deployment_id='...') to score all golden metrics before vs after it in one call\n"
+    "- To find what else changed when a metric spiked, use metric_correlation_tool(target_query='...', start_time='...', end_time='...'); it ranks hundreds of candidate series by lagged correlation\n"
+    "- Use prometheus_chart_tool(promql_query='...', start_time='...', end_time='...', title='...') when the user wants a chart or graph; copy the [artifact:...] reference it returns into your answer\n"
+    "- The default endpoint and authentication are already configured\n"
+    "- Focus on helping users analyze metrics and performance data\n"
+    "- Respond ONLY with the results of your work, do NOT include ANY other text."
+)
+
+LOG_ANALYTICS_AGENT_PROMPT = (
+    "You are a Log Analytics agent that queries Azure Monitor logs using Kusto query language. "
+    "You have default configuration values pre-configured, so you can work immediately without asking for connection details.\n\n"
+    "INSTRUCTIONS:\n"
+    "- Generate valid Kusto queries based on user requests\n"
+    "- Query logs from ContainerLogV2 and other Azure Monitor log tables\n"
+    "- Execute queries using query_log_analytics_tool(query='your_query_here')\n"
+    "- Run several related queries at once with log_analytics_batch_query_tool(queries=[{'name': '...', 'query': '...'}, ...]) instead of one call per query\n"
+    "- The default workspace ID and authentication are already configured\n"
+    "- Focus on retrieving logs, traces, and telemetry data for troubleshooting\n"
+    "- Respond ONLY with the results of your work, do NOT include ANY other text."
+)
+
+SUPERVISOR_PROMPT = (
+    "You are a supervisor managing the following agents:\n"
+    "- a kusto agent. Use this agent to get relevant data from azure data explorer(kusto). You can use this agent to get incident details from IcMDataWarehouse table and deployment information from DeploymentEvents table. It can correlate incidents with deployments to identify deployment-related issues.\n"
+    "- a prometheus agent. Use this agent to get relevant data from azure monitor workspace(prometheus). You can use this agent to get the metrics that are relevant to the icm, to run promql query for those selected metrics and to analyze the data the query returns, including scoring the impact of a deployment (by DeploymentId) on the golden metrics.\n"
+    "- a log analytics agent. Use this agent to query Azure Monitor Logs using Kusto language. It can retrieve logs like errors, health checks, request traces, and other structured logs from ContainerLogV2 and related tables\n"
+    "Assign work to one agent at a time, do not call agents in parallel.\n"
+    "Do not do any work yourself.\n"
+    "Agent results may contain artifact references like [artifact:chart-1] or [artifact:table-2]; copy them unchanged into your final answer and never reproduce chart or table data as JSON.\n"
+    "When users refer to 'that incident', 'the deployment', or 'the current issue', use any provided context to understand what they're referring to.\n"
+    "If a user asks follow-up questions without context, ask for clarification about which specific incident, deployment, or issue they mean."
+)
+
 # Define the Kusto agent
 kusto_agent = create_react_agent(
     model=model_to_use,
-    tools=[
-        kusto_schema_tool, 
-        kusto_query_tool,
-        kusto_incident_schema_tool, 
-        kusto_incident_query_tool,
-        kusto_deployment_schema_tool,
-        kusto_deployment_query_tool
-    ],
-    prompt=(
-        "You are an Azure Data Explorer (Kusto) agent who can read Azure Data Explorer tables. "
-        "You have access to TWO tables with default configuration:\n"
-        "1. IcMDataWarehouse - Contains incident management data\n"
-        "2. DeploymentEvents - Contains deployment and release information\n\n"
-        "INSTRUCTIONS:\n"
-        "- Use kusto_incident_schema_tool() to get the schema of the incidents table\n"
-        "- Use kusto_deployment_schema_tool() to get the schema of the deployments table\n"
-        "- Generate Kusto queries based on user requests after getting the appropriate schema\n"
-        "- Use kusto_incident_query_tool(query='your_query_here') for incident-related queries\n"
-        "- Use kusto_deployment_query_tool(query='your_query_here') for deployment-related queries\n"
-        "- You can also use the generic kusto_schema_tool(table='TableName') and kusto_query_tool(query='...', table='TableName')\n"
-        "- You can correlate data between both tables when needed\n"
-        "- Focus on helping users analyze incident data, deployment patterns, and their relationships\n"
-        "- Respond ONLY with the results of your work, do NOT include ANY other text."
-    ),
+    tools=KUSTO_TOOLS,
+    prompt=KUSTO_AGENT_PROMPT,
     name="kusto_agent",
 )
 
-# Define the Prometheus agent
-
 # Define the Prometheus agent
 prometheus_agent = create_react_agent(
     model=model_to_use,
-    tools=[prometheus_metrics_fetch_tool, promql_query_tool, promql_range_query_tool],
-    prompt=(
-        "You are a Prometheus agent who can read Azure Monitor workspace (Prometheus environment). "
-        "You have default configuration values pre-configured, so you can work immediately without asking for connection details.\n\n"
-        "INSTRUCTIONS:\n"
-        "- Use prometheus_metrics_fetch_tool() to get available metrics from the default workspace\n"
-        "- Use promql_query_tool(promql_query='your_query_here') for instant snapshots of current values\n"
-        "- Use promql_range_query_tool(promql_query='your_query_here', start_time='...', end_time='...', step='5m') for time series data\n"
-        "- The default endpoint and authentication are already configured\n"
-        "- Focus on helping users analyze metrics and performance data\n"
-        "- Respond ONLY with the results of your work, do NOT include ANY other text."
-    ),
+    tools=PROMETHEUS_TOOLS,
+    prompt=PROMETHEUS_AGENT_PROMPT,
     name="prometheus_agent",
 )
 
 # Define the Log Analytics agent
 log_analytics_agent = create_react_agent(
     model=model_to_use,
-    tools=[query_log_analytics_tool],
-    prompt=(
-        "You are a Log Analytics agent that queries Azure Monitor logs using Kusto query language. "
-        "You have default configuration values pre-configured, so you can work immediately without asking for connection details.\n\n"
-        "INSTRUCTIONS:\n"
-        "- Generate valid Kusto queries based on user requests\n"
-        "- Query logs from ContainerLogV2 and other Azure Monitor log tables\n"
-        "- Execute queries using query_log_analytics_tool(query='your_query_here')\n"
-        "- The default workspace ID and authentication are already configured\n"
-        "- Focus on retrieving logs, traces, and telemetry data for troubleshooting\n"
-        "- Respond ONLY with the results of your work, do NOT include ANY other text."
-    ),
+    tools=LOG_ANALYTICS_TOOLS,
+    prompt=LOG_ANALYTICS_AGENT_PROMPT,
     name="log_analytics_agent",
 )
 
@@ -602,23 +1845,31 @@ log_analytics_agent = create_react_agent(
 #     name="line_graph_agent",
 # )
 
+def create_standard_supervisor(model=None):
+    """
+    Create the standard (fixed temperature) supervisor graph.
+    By default the module-level agents are reused; passing a model rebuilds the agents around it.
+    """
+    if model is None:
+        model = model_to_use
+        agents = [kusto_agent, prometheus_agent, log_analytics_agent]
+    else:
+        agents = [
+            create_react_agent(model=model, tools=KUSTO_TOOLS, prompt=KUSTO_AGENT_PROMPT, name="kusto_agent"),
+            create_react_agent(model=model, tools=PROMETHEUS_TOOLS, prompt=PROMETHEUS_AGENT_PROMPT, name="prometheus_agent"),
+            create_react_agent(model=model, tools=LOG_ANALYTICS_TOOLS, prompt=LOG_ANALYTICS_AGENT_PROMPT, name="log_analytics_agent"),
+        ]
+    
+    return create_supervisor(
+        model=model,
+        agents=agents,
+        prompt=SUPERVISOR_PROMPT,
+        add_handoff_back_messages=True,
+        output_mode="last_message",
+    ).compile()
+
 # Define the supervisor agent
-supervisor = create_supervisor(
-    model=model_to_use,
-    agents=[kusto_agent, prometheus_agent, log_analytics_agent],
-    prompt=(
-        "You are a supervisor managing the following agents:\n"
-        "- a kusto agent. Use this agent to get relevant data from azure data explorer(kusto). You can use this agent to get incident details from IcMDataWarehouse table and deployment information from DeploymentEvents table. It can correlate incidents with deployments to identify deployment-related issues.\n"
-        "- a prometheus agent. Use this agent to get relevant data from azure monitor workspace(prometheus). You can use this agent to get the metrics that are relevant to the icm, to run promql query for those selected metrics and to analyze the data the query returns.\n"
-        "- a log analytics agent. Use this agent to query Azure Monitor Logs using Kusto language. It can retrieve logs like errors, health checks, request traces, and other structured logs from ContainerLogV2 and related tables\n"
-        "Assign work to one agent at a time, do not call agents in parallel.\n"
-        "Do not do any work yourself.\n"
-        "When users refer to 'that incident', 'the deployment', or 'the current issue', use any provided context to understand what they're referring to.\n"
-        "If a user asks follow-up questions without context, ask for clarification about which specific incident, deployment, or issue they mean."
-    ),
-    add_handoff_back_messages=True,
-    output_mode="last_message",
-).compile()
+supervisor = create_standard_supervisor()
 
 def create_context_aware_supervisor(session_context=None):
     """Create a supervisor that's aware of session context."""
@@ -642,10 +1893,11 @@ def create_context_aware_supervisor(session_context=None):
         prompt=(
             "You are a supervisor managing the following agents:\n"
             "- a kusto agent. Use this agent to get relevant data from azure data explorer(kusto). You can use this agent to get incident details from IcMDataWarehouse table and deployment information from DeploymentEvents table. It can correlate incidents with deployments to identify deployment-related issues.\n"
-            "- a prometheus agent. Use this agent to get relevant data from azure monitor workspace(prometheus). You can use this agent to get the metrics that are relevant to the icm, to run promql query for those selected metrics and to analyze the data the query returns\n"
+            "- a prometheus agent. Use this agent to get relevant data from azure monitor workspace(prometheus). You can use this agent to get the metrics that are relevant to the icm, to run promql query for those selected metrics and to analyze the data the query returns, including scoring the impact of a deployment (by DeploymentId) on the golden metrics\n"
             "- a log analytics agent. Use this agent to query Azure Monitor Logs using Kusto language. It can retrieve logs like errors, health checks, request traces, and other structured logs from ContainerLogV2 and related tables\n"
             "Assign work to one agent at a time, do not call agents in parallel.\n"
             "Do not do any work yourself.\n"
+            "Agent results may contain artifact references like [artifact:chart-1] or [artifact:table-2]; copy them unchanged into your final answer and never reproduce chart or table data as JSON.\n"
             "When users refer to 'that incident', 'the deployment', or 'the current issue', use the session context to understand what they're referring to."
             + context_prompt_addition
         ),
@@ -653,11 +1905,14 @@ def create_context_aware_supervisor(session_context=None):
         output_mode="last_message",
     ).compile()
 
-def create_dynamic_supervisor(temperature=0.1, session_context=None, custom_prompts=None):
-    """Create a supervisor with dynamic temperature, optional session context, and custom prompts."""
+def create_dynamic_supervisor(temperature=0.1, session_context=None, custom_prompts=None, model=None):
+    """
+    Create a supervisor with dynamic temperature, optional session context, and custom prompts.
+    A pre-built chat model can be passed in place of the temperature-based one (used for replays).
+    """
     
     # Create model with specified temperature
-    dynamic_model = create_model_with_temperature(temperature)
+    dynamic_model = model if model is not None else create_model_with_temperature(temperature)
     
     # Default prompts
     default_prompts = {
@@ -673,6 +1928,9 @@ def create_dynamic_supervisor(temperature=0.1, session_context=None, custom_prom
             "- Use kusto_incident_query_tool(query='your_query_here') for incident-related queries\n"
             "- Use kusto_deployment_query_tool(query='your_query_here') for deployment-related queries\n"
             "- You can also use the generic kusto_schema_tool(table='TableName') and kusto_query_tool(query='...', table='TableName')\n"
+            "- To correlate an incident with deployments, use kusto_batch_query_tool(incident_id='...', window_before='6h') to get the incident and the deployments around it in one call; pass include_schemas=True if you have not seen the schemas yet\n"
+            "- Run several independent queries together with kusto_batch_query_tool(queries={'name': 'Table | ...'})\n"
+            "- To find which deployments caused incidents, use incident_deployment_correlation_tool(since='1d', lookback='6h', incident_filter='Severity <= 2'); it returns ranked candidates, so do not work out time overlaps yourself\n"
             "- You can correlate data between both tables when needed\n"
             "- Focus on helping users analyze incident data, deployment patterns, and their relationships\n"
             "- Respond ONLY with the results of your work, do NOT include ANY other text."
@@ -682,8 +1940,14 @@ def create_dynamic_supervisor(temperature=0.1, session_context=None, custom_prom
             "You have default configuration values pre-configured, so you can work immediately without asking for connection details.\n\n"
             "INSTRUCTIONS:\n"
             "- Use prometheus_metrics_fetch_tool() to get available metrics from the default workspace\n"
+            "- Use prometheus_label_lookup_tool(search='...', label='pod') to find exact pod, namespace or container names\n"
             "- Create PromQL queries based on user requests\n"
             "- Execute PromQL queries using promql_query_tool(promql_query='your_query_here')\n"
+            "- Run several expressions at once with promql_batch_query_tool(queries=[{'name': '...', 'expr': '...'}, ...]) instead of one call per expression\n"
+            "- To find anomalies, spikes or dips, use prometheus_anomaly_tool(promql_query='...', start_time='...', end_time='...') instead of reading raw series\n"
+            "- To check whether a deployment hurt anything, use deployment_impact_tool(deployment_id='...') to score all golden metrics before vs after it in one call\n"
+            "- To find what else changed when a metric spiked, use metric_correlation_tool(target_query='...', start_time='...', end_time='...'); it ranks hundreds of candidate series by lagged correlation\n"
+            "- Use prometheus_chart_tool(promql_query='...', start_time='...', end_time='...', title='...') when the user wants a chart; copy the [artifact:...] reference it returns into your answer\n"
             "- The default endpoint and authentication are already configured\n"
             "- Focus on helping users analyze metrics and performance data\n"
             "- Respond ONLY with the results of your work, do NOT include ANY other text."
@@ -695,6 +1959,7 @@ def create_dynamic_supervisor(temperature=0.1, session_context=None, custom_prom
             "- Generate valid Kusto queries based on user requests\n"
             "- Query logs from ContainerLogV2 and other Azure Monitor log tables\n"
             "- Execute queries using query_log_analytics_tool(query='your_query_here')\n"
+            "- Run several related queries at once with log_analytics_batch_query_tool(queries=[{'name': '...', 'query': '...'}, ...]) instead of one call per query\n"
             "- The default workspace ID and authentication are already configured\n"
             "- Focus on retrieving logs, traces, and telemetry data for troubleshooting\n"
             "- Respond ONLY with the results of your work, do NOT include ANY other text."
@@ -707,28 +1972,21 @@ def create_dynamic_supervisor(temperature=0.1, session_context=None, custom_prom
     # Create agents with the dynamic model and custom prompts
     dynamic_kusto_agent = create_react_agent(
         model=dynamic_model,
-        tools=[
-            kusto_schema_tool, 
-            kusto_query_tool,
-            kusto_incident_schema_tool, 
-            kusto_incident_query_tool,
-            kusto_deployment_schema_tool,
-            kusto_deployment_query_tool
-        ],
+        tools=KUSTO_TOOLS,
         prompt=prompts["kusto"],
         name="kusto_agent",
     )
     
     dynamic_prometheus_agent = create_react_agent(
         model=dynamic_model,
-        tools=[prometheus_metrics_fetch_tool, promql_query_tool],
+        tools=PROMETHEUS_TOOLS,
         prompt=prompts["prometheus"],
         name="prometheus_agent",
     )
     
     dynamic_log_analytics_agent = create_react_agent(
         model=dynamic_model,
-        tools=[query_log_analytics_tool],
+        tools=LOG_ANALYTICS_TOOLS,
         prompt=prompts["log_analytics"],
         name="log_analytics_agent",
     )
@@ -782,10 +2040,11 @@ def create_dynamic_supervisor(temperature=0.1, session_context=None, custom_prom
         prompt=(
             "You are a supervisor managing the following agents:\n"
             "- a kusto agent. Use this agent to get relevant data from azure data explorer(kusto). You can use this agent to get incident details from IcMDataWarehouse table and deployment information from DeploymentEvents table. It can correlate incidents with deployments to identify deployment-related issues.\n"
-            "- a prometheus agent. Use this agent to get relevant data from azure monitor workspace(prometheus). You can use this agent to get the metrics that are relevant to the icm, to run promql query for those selected metrics and to analyze the data the query returns\n"
+            "- a prometheus agent. Use this agent to get relevant data from azure monitor workspace(prometheus). You can use this agent to get the metrics that are relevant to the icm, to run promql query for those selected metrics and to analyze the data the query returns, including scoring the impact of a deployment (by DeploymentId) on the golden metrics\n"
             "- a log analytics agent. Use this agent to query Azure Monitor Logs using Kusto language. It can retrieve logs like errors, health checks, request traces, and other structured logs from ContainerLogV2 and related tables\n"
             "Assign work to one agent at a time, do not call agents in parallel.\n"
             "Do not do any work yourself.\n"
+            "Agent results may contain artifact references like [artifact:chart-1] or [artifact:table-2]; copy them unchanged into your final answer and never reproduce chart or table data as JSON.\n"
             "When users refer to 'that incident', 'the deployment', or 'the current issue', use the session context to understand what they're referring to."
             + context_prompt_addition
         ),
@@ -0,0 +1,271 @@
+"""
+Columnar result type for tabular tool results (Kusto and Log Analytics).
+
+Tool helpers used to build one dictionary per row (`row.to_dict()` per Kusto row,
+`dict(zip(columns, row))` per Log Analytics row), repeating every column name in every
+row. TabularResult keeps one NumPy array per column instead: numeric columns are stored
+as int64/float64, datetimes as datetime64[ns] (UTC) and everything else as object arrays.
+
+Rows are only materialized on demand through lightweight row views, DataFrames share
+the numeric/datetime column buffers without copying, and compact JSON or CSV is only
+produced when the result has to go to the LLM.
+"""
+
+import csv
+import io
+import math
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+# Kusto / Log Analytics column types and the NumPy storage used for them
+_INTEGER_TYPES = {"int", "long", "int32", "int64"}
+_FLOAT_TYPES = {"real", "double", "decimal", "float"}
+_BOOL_TYPES = {"bool", "boolean"}
+_DATETIME_TYPES = {"datetime", "date"}
+# NumPy dtype names that to_payload() writes for columns without a source type
+_DTYPE_TYPES = {"int64": "long", "float64": "real", "bool": "bool", "datetime64[ns]": "datetime", "object": "string"}
+
+
+def _column_array(values, column_type=None):
+    """Convert a list of values into a compact NumPy column for the given Kusto type."""
+    column_type = (column_type or "").lower()
+    column_type = _DTYPE_TYPES.get(column_type, column_type)
+    has_nulls = any(v is None for v in values)
+
+    if column_type in _DATETIME_TYPES:
+        return pd.to_datetime(values, utc=True, errors="coerce").tz_localize(None).to_numpy(dtype="datetime64[ns]")
+    if column_type in _INTEGER_TYPES and not has_nulls:
+        return np.asarray(values, dtype=np.int64)
+    if column_type in _INTEGER_TYPES | _FLOAT_TYPES:
+        return np.asarray([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+    if column_type in _BOOL_TYPES and not has_nulls:
+        return np.asarray(values, dtype=bool)
+    if column_type:
+        return _object_array(values)
+
+    # Unknown type (e.g. plain records): infer from the values
+    sample = [v for v in values if v is not None]
+    if sample and all(isinstance(v, bool) for v in sample):
+        return np.asarray(values, dtype=bool) if not has_nulls else _object_array(values)
+    if sample and all(isinstance(v, (int, np.integer)) and not isinstance(v, bool) for v in sample):
+        return np.asarray(values, dtype=np.int64) if not has_nulls else np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+    if sample and all(isinstance(v, (int, float, np.number)) and not isinstance(v, bool) for v in sample):
+        return np.asarray([np.nan if v is None else v for v in values], dtype=np.float64)
+    if sample and all(isinstance(v, (pd.Timestamp, np.datetime64)) or hasattr(v, "isoformat") and hasattr(v, "hour") for v in sample):
+        return pd.to_datetime(values, utc=True, errors="coerce").tz_localize(None).to_numpy(dtype="datetime64[ns]")
+    return _object_array(values)
+
+
+def _object_array(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def to_python_value(value):
+    """Convert a NumPy scalar into a plain JSON-friendly Python value."""
+    if isinstance(value, np.datetime64):
+        if np.isnat(value):
+            return None
+        return np.datetime_as_string(value, unit="s") + "Z"
+    if isinstance(value, np.floating):
+        return None if math.isnan(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+class RowView(Mapping):
+    """Read-only view of one row; values are read from the column arrays on access."""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, column):
+        return to_python_value(self._table.columns[column][self._index])
+
+    def __iter__(self):
+        return iter(self._table.column_names)
+
+    def __len__(self):
+        return len(self._table.column_names)
+
+    def __repr__(self):
+        return f"RowView({dict(self)})"
+
+
+class TabularResult:
+    """
+    Columnar table with a schema, a row count and lazy row views.
+
+    Args:
+        columns: Mapping of column name -> NumPy array (all the same length)
+        column_types: Optional mapping of column name -> source type name (e.g. Kusto 'datetime')
+
+    `truncated` is set when the source stopped reading before the end of the result.
+    """
+
+    def __init__(self, columns, column_types=None):
+        self.columns = dict(columns)
+        self.column_types = dict(column_types or {})
+        self.truncated = False
+        lengths = {len(array) for array in self.columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"All columns must have the same length, got {sorted(lengths)}")
+        self.row_count = lengths.pop() if lengths else 0
+
+    # --- Construction ---
+    @classmethod
+    def from_rows(cls, column_names, rows, column_types=None):
+        """Build from column names and row sequences (lists/tuples in column order)."""
+        column_types = list(column_types) if column_types else [None] * len(column_names)
+        rows = list(rows)
+        transposed = list(zip(*rows)) if rows else [() for _ in column_names]
+        columns = {
+            name: _column_array(list(values), column_type)
+            for name, values, column_type in zip(column_names, transposed, column_types)
+        }
+        types = {name: t for name, t in zip(column_names, column_types) if t}
+        return cls(columns, types)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from a list of dictionaries (columns are the union of keys, in first-seen order)."""
+        names = []
+        for record in records:
+            for key in record:
+                if key not in names:
+                    names.append(key)
+        return cls.from_rows(names, ([record.get(name) for name in names] for record in records))
+
+    @classmethod
+    def from_kusto_table(cls, table):
+        """Build from a Kusto primary result table without creating per-row objects."""
+        names = [column.column_name for column in table.columns]
+        types = [column.column_type for column in table.columns]
+        return cls.from_rows(names, table.raw_rows, types)
+
+    @classmethod
+    def from_log_analytics_table(cls, table):
+        """Build from an azure-monitor-query LogsTable."""
+        names = [col if isinstance(col, str) else col.name for col in table.columns]
+        types = getattr(table, "columns_types", None) or None
+        return cls.from_rows(names, (list(row) for row in table.rows), types)
+
+    @classmethod
+    def concat(cls, parts, column_names=(), column_types=None):
+        """
+        Join results with the same columns row-wise, e.g. chunks read from a stream.
+        Column dtypes that differ between parts are widened by NumPy (int64 + float64 -> float64).
+        """
+        parts = list(parts)
+        if not parts:
+            column_types = list(column_types) if column_types else [None] * len(column_names)
+            return cls.from_rows(column_names, [], column_types)
+        if len(parts) == 1:
+            return parts[0]
+        names = parts[0].column_names
+        columns = {name: np.concatenate([part.columns[name] for part in parts]) for name in names}
+        return cls(columns, parts[0].column_types)
+
+    @classmethod
+    def coerce(cls, result):
+        """Return `result` as a TabularResult (accepts TabularResult, compact payloads or lists of dicts)."""
+        if isinstance(result, cls):
+            return result
+        if isinstance(result, dict) and "columns" in result and "rows" in result:
+            return cls.from_payload(result)
+        return cls.from_records(list(result or []))
+
+    # --- Schema / sizing ---
+    @property
+    def column_names(self):
+        return list(self.columns)
+
+    @property
+    def schema(self):
+        """List of (column name, source type or NumPy dtype) pairs."""
+        return [(name, self.column_types.get(name, str(array.dtype))) for name, array in self.columns.items()]
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the column buffers (object columns count pointer size only)."""
+        return sum(array.nbytes for array in self.columns.values())
+
+    def __len__(self):
+        return self.row_count
+
+    # --- Row access ---
+    def row(self, index):
+        if index < 0:
+            index += self.row_count
+        if not 0 <= index < self.row_count:
+            raise IndexError(f"Row {index} out of range for {self.row_count} rows")
+        return RowView(self, index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.row(i) for i in range(*index.indices(self.row_count))]
+        return self.row(index)
+
+    def __iter__(self):
+        for index in range(self.row_count):
+            yield RowView(self, index)
+
+    def head(self, n):
+        """First `n` rows as a new TabularResult sharing the column buffers."""
+        return TabularResult({name: array[:n] for name, array in self.columns.items()}, self.column_types)
+
+    def select(self, column_names):
+        """Subset of columns as a new TabularResult sharing the column buffers."""
+        return TabularResult({name: self.columns[name] for name in column_names if name in self.columns}, self.column_types)
+
+    # --- Conversion ---
+    def to_dataframe(self):
+        """DataFrame sharing the numeric and datetime column buffers (no copy)."""
+        return pd.DataFrame(self.columns, copy=False)
+
+    def to_records(self):
+        """Plain list of row dictionaries (the format tools used to return)."""
+        return [dict(row) for row in self]
+
+    def to_payload(self):
+        """Compact JSON-friendly form: column names once, rows as lists."""
+        columns = [[to_python_value(v) for v in array] for array in self.columns.values()]
+        return {
+            "columns": self.column_names,
+            "types": [t for _, t in self.schema],
+            "row_count": self.row_count,
+            "rows": [list(values) for values in zip(*columns)] if columns else [],
+        }
+
+    @classmethod
+    def from_payload(cls, payload):
+        """Inverse of to_payload(); columns typed only by their NumPy dtype get that dtype back."""
+        result = cls.from_rows(payload["columns"], payload["rows"], payload.get("types"))
+        result.column_types = {name: t for name, t in result.column_types.items()
+                               if t not in _DTYPE_TYPES or str(result.columns[name].dtype) != t}
+        return result
+
+    def to_csv(self, delimiter=","):
+        """CSV text with a header row, for handing large results to the LLM."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=delimiter, lineterminator="\n")
+        writer.writerow(self.column_names)
+        columns = [[to_python_value(v) for v in array] for array in self.columns.values()]
+        writer.writerows(["" if v is None else v for v in values] for values in zip(*columns))
+        return buffer.getvalue()
+
+    def __repr__(self):
+        return f"TabularResult({self.row_count} rows, columns={self.column_names})"
@@ -0,0 +1,182 @@
+"""
+Shared time index for metrics, logs and incidents.
+
+Prometheus returns epoch seconds, Kusto and Log Analytics return datetimes (or ISO strings
+once rows went through JSON), and some tables store epoch milliseconds. Every cross-source
+question used to parse these separately, and format_prometheus_range_data_for_charts even
+printed local time with a 'Z' suffix. Everything here works on one representation:
+
+- to_epoch_seconds() turns any of those into a float64 array of UTC epoch seconds (NaN when
+  missing); numbers are read as seconds, milliseconds, microseconds or nanoseconds by
+  magnitude,
+- format_utc() / format_utc_array() are the only way back to text ("...Z", always UTC),
+- time_grid() and resample() put a source on a step-aligned grid with a per-source
+  reduction (mean, sum, min, max, last, count), vectorized with np.bincount,
+- align_sources() resamples metric series (figure_rendering.prometheus_series) and table
+  rows (table_sources) onto one grid and returns an AlignedFrame: a (source, grid point)
+  matrix for correlation, a TabularResult for the model and (name, times, values) series
+  for create_timeseries_figure().
+"""
+
+import numpy as np
+import pandas as pd
+
+from tabular_result import TabularResult
+
+_ISO_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+REDUCTIONS = ("mean", "sum", "min", "max", "last", "count")
+
+
+def to_epoch_seconds(values):
+    """
+    Timestamps of any source -> float64 UTC epoch seconds (NaN for missing or unparsable values).
+
+    Accepts a scalar or a sequence of datetime64 values, datetimes (naive ones are UTC),
+    pandas Timestamps, ISO strings or epoch numbers in s/ms/us/ns.
+    """
+    scalar = np.ndim(values) == 0
+    array = np.atleast_1d(np.asarray(values) if not isinstance(values, pd.Series) else values.to_numpy())
+    if array.dtype.kind == "M":
+        seconds = array.astype("datetime64[ns]").astype(np.int64) / 1e9
+        seconds[np.isnat(array)] = np.nan
+    elif array.dtype.kind in "iuf":
+        seconds = array.astype(np.float64)
+        magnitude = np.abs(seconds)
+        seconds = np.where(magnitude > 1e17, seconds / 1e9,
+                           np.where(magnitude > 1e14, seconds / 1e6, np.where(magnitude > 1e11, seconds / 1e3, seconds)))
+    else:
+        numeric = pd.to_numeric(pd.Series(array, dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+        present = pd.notna(array)
+        if present.any() and not np.isnan(numeric[present]).any():  # epoch numbers (or their strings)
+            seconds = to_epoch_seconds(numeric)
+        else:
+            times = pd.to_datetime(pd.Series(array, dtype=object), utc=True, errors="coerce", format="mixed")
+            seconds = times.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]").astype(np.int64) / 1e9
+            seconds[times.isna().to_numpy()] = np.nan
+    return float(seconds[0]) if scalar else seconds
+
+
+def format_utc(seconds):
+    """Epoch seconds -> 'YYYY-MM-DDTHH:MM:SSZ' (UTC); None for NaN/None."""
+    if seconds is None or np.isnan(seconds):
+        return None
+    return pd.Timestamp(float(seconds), unit="s", tz="UTC").strftime(_ISO_FORMAT)
+
+
+def format_utc_array(seconds):
+    """Vectorized format_utc: object array of ISO strings (None for NaN)."""
+    seconds = np.asarray(seconds, dtype=np.float64)
+    valid = ~np.isnan(seconds)
+    text = np.full(len(seconds), None, dtype=object)
+    stamps = np.datetime_as_string(np.rint(seconds[valid] * 1e3).astype("datetime64[ms]"), unit="s")
+    text[valid] = np.char.add(stamps.astype(str), "Z").astype(object)
+    return text
+
+
+def time_grid(start, end, step):
+    """Grid points k * step covering [start, end] (start rounded down, end up)."""
+    first = np.floor(start / step) * step
+    last = np.ceil(end / step) * step
+    return first + np.arange(int(round((last - first) / step)) + 1) * step
+
+
+def resample(times, values, grid, how="mean"):
+    """
+    Reduce the samples (times, values) into the buckets [grid[i], grid[i] + step) of a regular
+    grid. Buckets without samples are NaN (0 for "count" and "sum").
+    """
+    if how not in REDUCTIONS:
+        raise ValueError(f"Unknown reduction '{how}', expected one of {REDUCTIONS}")
+    times = np.asarray(times, dtype=np.float64)
+    values = np.ones(len(times)) if values is None else np.asarray(values, dtype=np.float64)
+    empty_value = 0.0 if how in ("count", "sum") else np.nan
+    out = np.full(len(grid), empty_value)
+    if len(grid) == 0:
+        return out
+    step = grid[1] - grid[0] if len(grid) > 1 else 1.0
+    index = np.floor((times - grid[0]) / step + 1e-9)
+    keep = ~np.isnan(times) & ~np.isnan(values) & (index >= 0) & (index < len(grid))
+    index, values, times = index[keep].astype(np.int64), values[keep], times[keep]
+    if len(index) == 0:
+        return out
+    counts = np.bincount(index, minlength=len(grid))
+    filled = counts > 0
+    if how == "count":
+        return counts.astype(np.float64)
+    if how in ("sum", "mean"):
+        sums = np.bincount(index, weights=values, minlength=len(grid))
+        out[filled] = sums[filled] / counts[filled] if how == "mean" else sums[filled]
+    elif how == "last":
+        order = np.lexsort((times, index))
+        last = np.r_[index[order][1:] != index[order][:-1], True]
+        out[index[order][last]] = values[order][last]
+    else:
+        reduced = np.full(len(grid), np.inf if how == "min" else -np.inf)
+        (np.minimum if how == "min" else np.maximum).at(reduced, index, values)
+        out[filled] = reduced[filled]
+    return out
+
+
+def table_sources(result, time_column, value_column=None, group_column=None, name=None):
+    """
+    (name, epoch seconds, values) from Kusto / Log Analytics rows: one source per value of
+    `group_column` (or one in total). Without `value_column` every row counts as 1, so a "sum"
+    or "count" reduction gives events per bucket.
+    """
+    result = TabularResult.coerce(result)
+    name = name or value_column or "events"
+    if result.row_count == 0 or time_column not in result.columns:
+        return []
+    times = to_epoch_seconds(result.columns[time_column])
+    values = (pd.to_numeric(pd.Series(result.columns[value_column]), errors="coerce").to_numpy(dtype=np.float64)
+              if value_column else np.ones(len(times)))
+    if group_column is None or group_column not in result.columns:
+        return [(name, times, values)]
+    groups = pd.Series(result.columns[group_column]).astype(str).to_numpy()
+    return [(f"{name}_{group}", times[groups == group], values[groups == group]) for group in np.unique(groups)]
+
+
+class AlignedFrame:
+    """Sources resampled onto one UTC grid: `values[i]` is source `names[i]` at `grid` (epoch seconds)."""
+
+    def __init__(self, grid, values, names):
+        self.grid = grid
+        self.values = values
+        self.names = names
+
+    def series(self):
+        """(name, epoch seconds, values) list, for create_timeseries_figure()."""
+        return [(name, self.grid, row) for name, row in zip(self.names, self.values)]
+
+    def to_table(self):
+        """TabularResult with a UTC Time column and one column per source."""
+        columns = {"Time": np.rint(self.grid * 1e3).astype("datetime64[ms]").astype("datetime64[ns]")}
+        columns.update({name: row for name, row in zip(self.names, self.values)})
+        return TabularResult(columns)
+
+
+def align_sources(sources, step, start=None, end=None, how="mean"):
+    """
+    Resample (name, times, values) sources onto one grid.
+
+    Args:
+        sources: (name, epoch seconds, values) tuples, e.g. from prometheus_series / table_sources
+        step: Grid step in seconds
+        start / end: Grid bounds in epoch seconds (default: the span of all sources)
+        how: Reduction for every source, or {name: reduction} (default "mean")
+
+    Returns:
+        AlignedFrame
+    """
+    if start is None or end is None:
+        spans = [(np.nanmin(t), np.nanmax(t)) for _, t, _ in sources if len(t) and not np.isnan(t).all()]
+        if not spans:
+            return AlignedFrame(np.empty(0), np.empty((len(sources), 0)), [name for name, _, _ in sources])
+        start = min(s for s, _ in spans) if start is None else start
+        end = max(e for _, e in spans) if end is None else end
+    grid = time_grid(start, end, step)
+    reductions = how if isinstance(how, dict) else {}
+    values = np.empty((len(sources), len(grid)))
+    for row, (name, times, series_values) in enumerate(sources):
+        values[row] = resample(times, series_values, grid, reductions.get(name, "mean" if isinstance(how, dict) else how))
+    return AlignedFrame(grid, values, [name for name, _, _ in sources])
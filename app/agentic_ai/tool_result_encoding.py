@@ -0,0 +1,350 @@
+"""
+Token-efficient encodings for tool results that go into agent messages.
+
+Tool outputs used to reach the model as verbose JSON (a list of objects for tables, the raw
+Prometheus API response for metrics), repeating every key in every row. This module is the
+encoding stage between a backend result and the agent message:
+
+- Tabular results (TabularResult): header plus CSV or TSV rows, optional numeric rounding
+  and timestamps relative to the first one.
+- Prometheus query responses: labels shared by every series are listed once, each series
+  only carries its distinguishing labels, regular timestamps collapse into a start/step
+  header and values are rounded.
+
+Encoders are registered by name so new encodings can be added and benchmarked
+(tokens per row) without touching the tools:
+
+    python tool_result_encoding.py   # prints the benchmark for sample incident/metric data
+"""
+
+import json
+import math
+import re
+import sys
+
+import numpy as np
+
+from tabular_result import TabularResult, to_python_value
+from time_alignment import format_utc
+
+TABULAR_ENCODERS = {}
+PROMETHEUS_ENCODERS = {}
+
+
+def register_tabular_encoder(name):
+    """Register a function (TabularResult, **options) -> str as a tabular encoding."""
+    def decorator(func):
+        TABULAR_ENCODERS[name] = func
+        return func
+    return decorator
+
+
+def register_prometheus_encoder(name):
+    """Register a function (prometheus response dict, **options) -> str as a Prometheus encoding."""
+    def decorator(func):
+        PROMETHEUS_ENCODERS[name] = func
+        return func
+    return decorator
+
+
+# === Value formatting ===
+def round_number(value, digits):
+    """Round to `digits` significant digits; None leaves the value untouched."""
+    if digits is None or value is None or not isinstance(value, (int, float)) or isinstance(value, bool):
+        return value
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None if math.isnan(value) else value
+    if value == 0:
+        return 0
+    rounded = float(f"{value:.{digits}g}")
+    return int(rounded) if rounded.is_integer() and abs(rounded) < 1e15 else rounded
+
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    for unit, size in (("h", 3600), ("m", 60)):
+        if seconds >= size and seconds % size == 0:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+
+def is_prometheus_response(result):
+    return isinstance(result, dict) and isinstance(result.get("data"), dict) and "resultType" in result["data"]
+
+
+# === Tabular encodings ===
+def _tabular_cells(result, float_digits=None, relative_time=False):
+    """Column names, per-column Python values and an optional t0 note for delimited encodings."""
+    names = result.column_names
+    columns = []
+    t0 = None
+    if relative_time:
+        datetime_columns = [a for a in result.columns.values() if a.dtype.kind == "M" and len(a)]
+        if datetime_columns:
+            valid = np.concatenate([a[~np.isnat(a)] for a in datetime_columns])
+            t0 = valid.min() if len(valid) else None
+    for name, array in result.columns.items():
+        if t0 is not None and array.dtype.kind == "M":
+            offsets = (array - t0) / np.timedelta64(1, "s")
+            columns.append([None if np.isnan(v) else f"+{_format_duration(v) if v else '0s'}" for v in offsets])
+        elif array.dtype.kind == "f":
+            columns.append([round_number(to_python_value(v), float_digits) for v in array])
+        else:
+            columns.append([to_python_value(v) for v in array])
+    note = f"# times relative to t0={np.datetime_as_string(t0, unit='s')}Z" if t0 is not None else None
+    return names, columns, note
+
+
+def _delimited(result, delimiter, float_digits=None, relative_time=False, max_rows=None):
+    names, columns, note = _tabular_cells(result.head(max_rows) if max_rows else result, float_digits, relative_time)
+
+    def cell(value):
+        if value is None:
+            return ""
+        text = json.dumps(value, default=str) if isinstance(value, (dict, list)) else str(value)
+        if delimiter in text or "\n" in text or '"' in text:
+            text = '"' + text.replace('"', '""') + '"'
+        return text.replace("\n", " ") if delimiter == "\t" else text
+
+    lines = [f"# {result.row_count} rows"]
+    if note:
+        lines.append(note)
+    lines.append(delimiter.join(names))
+    lines.extend(delimiter.join(cell(v) for v in values) for values in zip(*columns))
+    if max_rows and result.row_count > max_rows:
+        lines.append(f"# ... {result.row_count - max_rows} more rows not shown")
+    return "\n".join(lines)
+
+
+@register_tabular_encoder("records")
+def encode_records(result, float_digits=None, **options):
+    """Verbose JSON list of objects (the original tool output format)."""
+    records = [{k: round_number(v, float_digits) for k, v in row.items()} for row in result]
+    return json.dumps(records, default=str)
+
+
+@register_tabular_encoder("compact_json")
+def encode_compact_json(result, float_digits=None, **options):
+    """JSON with column names listed once and rows as arrays."""
+    payload = result.to_payload()
+    if float_digits is not None:
+        payload["rows"] = [[round_number(v, float_digits) for v in row] for row in payload["rows"]]
+    return json.dumps(payload, separators=(",", ":"), default=str)
+
+
+@register_tabular_encoder("csv")
+def encode_csv(result, float_digits=None, relative_time=False, max_rows=None, **options):
+    """Header plus comma-separated rows."""
+    return _delimited(result, ",", float_digits, relative_time, max_rows)
+
+
+@register_tabular_encoder("tsv")
+def encode_tsv(result, float_digits=None, relative_time=False, max_rows=None, **options):
+    """Header plus tab-separated rows."""
+    return _delimited(result, "\t", float_digits, relative_time, max_rows)
+
+
+# === Prometheus encodings ===
+@register_prometheus_encoder("raw_json")
+def encode_prometheus_raw(response, **options):
+    """The Prometheus API response as JSON (the original tool output format)."""
+    return json.dumps(response, separators=(",", ":"), default=_json_array)
+
+
+def _json_array(obj):
+    # Streamed matrix values are float64 arrays (see prometheus_stream.py)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+
+def split_labels(series):
+    """Labels shared by every series, and the remaining labels of each series."""
+    label_sets = [s.get("metric", {}) for s in series]
+    if not label_sets:
+        return {}, []
+    common = dict(label_sets[0])
+    for labels in label_sets[1:]:
+        common = {k: v for k, v in common.items() if labels.get(k) == v}
+    if len(label_sets) == 1:
+        # With a single series keep only the metric name as "common"
+        common = {k: v for k, v in common.items() if k == "__name__"}
+    distinct = [{k: v for k, v in labels.items() if k not in common} for labels in label_sets]
+    return common, distinct
+
+
+def label_text(labels):
+    if not labels:
+        return "{}"
+    return "{" + ",".join(f"{k}={v}" for k, v in sorted(labels.items())) + "}"
+
+
+def _summary_text(series, float_digits):
+    """Per-series summary line attached by series_downsampling (full-resolution statistics)."""
+    summary = series.get("summary")
+    if not summary:
+        return None
+    stats = " ".join(f"{key}={round_number(summary[key], float_digits)}" for key in ("min", "max", "avg", "p95", "last"))
+    return f"  summary points={summary['points']} {stats}"
+
+
+@register_prometheus_encoder("compact")
+def encode_prometheus_compact(response, float_digits=4, relative_time=True, **options):
+    """
+    Deduplicated labels, one line per series (followed by its summary when the series was
+    downsampled). Matrix results on a regular grid are written as
+    a start/step header plus plain value lists; irregular series use time:value pairs
+    (offsets from the start when relative_time is set, epoch seconds otherwise).
+    """
+    data = response.get("data", {})
+    result_type = data.get("resultType")
+    series = data.get("result", [])
+    lines = [f"# status={response.get('status', 'unknown')} type={result_type} series={len(series) if isinstance(series, list) else 1}"]
+    lines.extend(f"# warning: {warning}" for warning in response.get("warnings", []))
+
+    if result_type == "scalar" or result_type == "string":
+        timestamp, value = series
+        lines.append(f"{format_utc(float(timestamp))} {round_number(float(value), float_digits) if result_type == 'scalar' else value}")
+        return "\n".join(lines)
+
+    common, distinct = split_labels(series)
+    if common:
+        lines.append(f"# common labels {label_text(common)}")
+
+    if result_type == "vector":
+        timestamps = {float(s["value"][0]) for s in series if "value" in s}
+        if len(timestamps) == 1:
+            lines.append(f"# at {format_utc(timestamps.pop())}")
+        for labels, s in zip(distinct, series):
+            timestamp, value = s.get("value", (None, "NaN"))
+            lines.append(f"{label_text(labels)} {round_number(float(value), float_digits)}")
+        return "\n".join(lines)
+
+    # Matrix: detect a shared regular grid
+    all_timestamps = [np.asarray([float(t) for t, _ in s.get("values", [])]) for s in series]
+    non_empty = [t for t in all_timestamps if len(t)]
+    if not non_empty:
+        return "\n".join(lines)
+    start = min(t[0] for t in non_empty)
+    steps = np.concatenate([np.diff(t) for t in non_empty if len(t) > 1]) if any(len(t) > 1 for t in non_empty) else np.array([])
+    step = float(np.min(steps)) if len(steps) else 0.0
+    regular = step > 0 and all(np.allclose(np.mod(t - start, step), 0) for t in non_empty)
+    points = int(round((max(t[-1] for t in non_empty) - start) / step)) + 1 if regular else 0
+    # Downsampled series keep grid timestamps but leave most slots empty; pairs are shorter then
+    regular = regular and sum(len(t) for t in non_empty) >= 0.5 * points * len(non_empty)
+
+    if regular:
+        lines.append(f"# start={format_utc(start)} step={_format_duration(step)} points={points} (missing points are empty)")
+        for labels, s, timestamps in zip(distinct, series, all_timestamps):
+            values = [""] * points
+            for t, (_, v) in zip(timestamps, s.get("values", [])):
+                values[int(round((t - start) / step))] = str(round_number(float(v), float_digits))
+            lines.append(f"{label_text(labels)} " + ",".join(values))
+            if _summary_text(s, float_digits):
+                lines.append(_summary_text(s, float_digits))
+    else:
+        base = f"start={format_utc(start)} " if relative_time else ""
+        lines.append(f"# {base}points are {'offset_seconds' if relative_time else 'epoch_seconds'}:value")
+        for labels, s, timestamps in zip(distinct, series, all_timestamps):
+            pairs = []
+            for t, (_, v) in zip(timestamps, s.get("values", [])):
+                t_text = int(t - start) if relative_time else int(t)
+                pairs.append(f"{t_text}:{round_number(float(v), float_digits)}")
+            lines.append(f"{label_text(labels)} " + " ".join(pairs))
+            if _summary_text(s, float_digits):
+                lines.append(_summary_text(s, float_digits))
+    return "\n".join(lines)
+
+
+# === Dispatch ===
+def encode_tool_result(result, tabular_encoding="csv", prometheus_encoding="compact", **options):
+    """
+    Encode a backend result for an agent message.
+    TabularResults and Prometheus responses are encoded with the named encodings;
+    anything else (errors, lists, schema rows) is returned unchanged.
+    """
+    if isinstance(result, TabularResult):
+        return TABULAR_ENCODERS[tabular_encoding](result, **options)
+    if is_prometheus_response(result) and result.get("status") == "success":
+        return PROMETHEUS_ENCODERS[prometheus_encoding](result, **options)
+    return result
+
+
+# === Benchmarking ===
+_tokenizer = None
+
+
+def count_tokens(text):
+    """
+    Count tokens with tiktoken (o200k_base, used by gpt-4.1) when its vocabulary is available;
+    otherwise estimate from words, numbers and punctuation (long runs split every 4 characters).
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            import tiktoken
+            _tokenizer = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _tokenizer = False
+    if _tokenizer:
+        return len(_tokenizer.encode(text))
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in re.findall(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]", text))
+
+
+def benchmark_encodings(result, encodings=None, **options):
+    """
+    Encode `result` with every applicable encoding and report size per row.
+    Rows are table rows for tabular results and samples for Prometheus responses.
+
+    Returns:
+        {encoding: {"chars", "tokens", "tokens_per_row"}}, smallest first
+    """
+    if isinstance(result, TabularResult):
+        registry, rows = TABULAR_ENCODERS, result.row_count
+    elif is_prometheus_response(result):
+        registry = PROMETHEUS_ENCODERS
+        rows = sum(len(s.get("values", [])) or 1 for s in result["data"].get("result", []))
+    else:
+        raise TypeError("benchmark_encodings expects a TabularResult or a Prometheus response")
+
+    report = {}
+    for name in encodings or registry:
+        text = registry[name](result, **options)
+        tokens = count_tokens(text)
+        report[name] = {"chars": len(text), "tokens": tokens, "tokens_per_row": round(tokens / max(rows, 1), 2)}
+    return dict(sorted(report.items(), key=lambda item: item[1]["tokens"]))
+
+
+def _sample_incidents(count=200):
+    return TabularResult.from_rows(
+        ["IncidentId", "Severity", "Status", "Title", "CreatedDate", "OwningTeam", "ImpactScore"],
+        [[400000 + i, 2 + i % 3, "Active" if i % 4 else "Mitigated", f"Pod restarts in checkout service ({i % 7})",
+          f"2025-08-08T{i % 24:02d}:{i % 60:02d}:00Z", "Argus", 0.123456 * i] for i in range(count)],
+        ["long", "int", "string", "string", "datetime", "string", "real"],
+    )
+
+
+def _sample_matrix(series=10, points=120):
+    return {
+        "status": "success",
+        "data": {"resultType": "matrix", "result": [
+            {"metric": {"__name__": "container_memory_rss", "namespace": "prod", "container": "app",
+                        "job": "cadvisor", "pod": f"checkout-7d9f8c-{s:05d}"},
+             "values": [[1723104000 + p * 30, str(104857600 + 12345.678 * p + s * 1000)] for p in range(points)]}
+            for s in range(series)
+        ]},
+    }
+
+
+def main():
+    exact = bool(count_tokens("probe") and _tokenizer)
+    print(f"📏 Token counts are {'exact (tiktoken o200k_base)' if exact else 'estimated (tiktoken vocabulary unavailable)'}")
+    for title, sample in (("Incidents (200 rows)", _sample_incidents()), ("Prometheus matrix (10 series x 120 points)", _sample_matrix())):
+        print(f"\n{title}")
+        for name, stats in benchmark_encodings(sample, float_digits=4).items():
+            print(f"   {name:<14} {stats['tokens']:>7} tokens {stats['tokens_per_row']:>7} tokens/row {stats['chars']:>8} chars")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
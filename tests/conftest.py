@@ -0,0 +1,41 @@
+"""
+Shared test fixtures.
+
+supervisor_agent reads its secrets from Key Vault at import time; the `supervisor_agent`
+fixture provides environment values instead, so the module imports offline, and unloads it
+after the test so patched helpers and config changes do not leak into the next test.
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+# Secrets normally read from Key Vault; environment values let supervisor_agent import offline
+OFFLINE_SECRETS = ["KUSTOCLIENTID", "TENANTID", "PROMETHEUSCLIENTID", "LOGANALYTICSCLIENTID", "AZUREOPENAIKEY"]
+
+
+@contextmanager
+def offline_supervisor():
+    """Import supervisor_agent with offline secrets; unload it (and the secrets) on exit."""
+    for name in OFFLINE_SECRETS:
+        os.environ.setdefault(name, "offline-test")
+    try:
+        import supervisor_agent
+        yield supervisor_agent
+    finally:
+        sys.modules.pop('supervisor_agent', None)
+        for name in OFFLINE_SECRETS:
+            if os.environ.get(name) == "offline-test":
+                del os.environ[name]
+
+
+@pytest.fixture
+def supervisor_agent():
+    """A freshly imported supervisor_agent module, unloaded after the test."""
+    with offline_supervisor() as module:
+        yield module
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+"""
+Test the vectorized anomaly detectors and the Prometheus anomaly tool.
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from anomaly_detection import align_baseline, detect_anomalies, ewma_residuals, rolling_zscore, series_matrix
+
+START = 1754643600  # 2025-08-08T09:00:00Z
+WEEK = 7 * 86400
+
+
+def matrix_response(series=50, points=288, start=START, step=300, anomalies=True, seed=0):
+    """Daily-cycle CPU series with noise; pod api-5 spikes and pod api-7 dips when `anomalies` is set."""
+    rng = np.random.default_rng(seed)
+    timestamps = start + np.arange(points) * step
+    result = []
+    for i in range(series):
+        values = 10 + 2 * np.sin(np.arange(points) / points * 8 * np.pi) + rng.normal(0, 0.2, points)
+        if anomalies and i == 5:
+            values[200:204] += 8
+        if anomalies and i == 7:
+            values[100:110] -= 3
+        result.append({"metric": {"__name__": "cpu", "pod": f"api-{i}"}, "values": np.column_stack([timestamps, values])})
+    return {"status": "success", "data": {"resultType": "matrix", "result": result}}
+
+
+def test_detectors_score_whole_matrix():
+    """Each detector returns a score per point for every series at once."""
+    print("🧪 Testing anomaly detectors...")
+    values = np.tile(np.r_[np.ones(40), 5.0, np.ones(9)], (3, 1)) + np.linspace(0, 0.01, 50)
+    values[2, 10] = np.nan
+    for detector in (rolling_zscore, ewma_residuals):
+        scores, expected = detector(values)
+        assert scores.shape == values.shape
+        assert (np.nan_to_num(np.abs(scores[:, 40])) > 10).all()
+        assert np.isnan(scores[:, 0]).all()  # nothing to compare the first point with
+    print("✅ Detectors scored")
+
+
+def test_intervals_only_for_real_anomalies():
+    """Noise alone is not reported; the spike and the dip come back as whole intervals."""
+    response = matrix_response(series=200)
+    baseline_response = matrix_response(series=200, start=START - WEEK, anomalies=False, seed=1)
+    timestamps, _, metrics = series_matrix(response)
+    baseline = align_baseline(metrics, timestamps, baseline_response, WEEK)
+    assert not np.isnan(baseline).any()
+
+    started = time.perf_counter()
+    table, stats = detect_anomalies(response, baseline=baseline, report_start=timestamps[30])
+    elapsed = time.perf_counter() - started
+    rows = table.to_records()
+    assert stats == {"series": 200, "points": 57600, "detectors": ["zscore", "ewma", "seasonal"]}
+    assert [r["Series"] for r in rows[:2]] == ["{pod=api-5}", "{pod=api-7}"]
+    # At most a borderline single-point blip among the 57600 noisy samples
+    assert all(r["Points"] == 1 and r["Score"] < 5 for r in rows[2:]) and len(rows) <= 3
+    spike, dip = rows[:2]
+    assert spike["Direction"] == "spike" and spike["Points"] == 4 and spike["Start"] == "2025-08-09T01:40:00Z"
+    assert dip["Direction"] == "dip" and dip["Points"] == 10 and spike["Score"] > dip["Score"]
+    assert spike["Detectors"] == "zscore,ewma,seasonal"
+    assert elapsed < 1.0, elapsed
+
+    quiet, _ = detect_anomalies(matrix_response(series=200, anomalies=False), report_start=timestamps[30])
+    assert quiet.row_count == 0
+    print(f"✅ 200 series checked in {elapsed * 1000:.0f} ms")
+
+
+def test_tool_fetches_window_and_last_week(supervisor_agent):
+    """The tool fetches the warmed-up window and the same window a week earlier, and returns only intervals."""
+    calls = []
+    supervisor_agent.count_prometheus_series = lambda *args, **kwargs: {}
+
+    def fake_range(query_endpoint, promql_query, start_time, end_time, step, client_id):
+        calls.append((start_time, end_time))
+        earlier = start_time < START - WEEK / 2
+        return matrix_response(start=start_time, points=int((end_time - start_time) / 300) + 1, anomalies=not earlier,
+                               seed=int(earlier))
+
+    supervisor_agent.cached_promql_range_query = fake_range
+    output = supervisor_agent.prometheus_anomaly_tool.invoke({
+        "promql_query": "cpu", "start_time": "2025-08-08T11:30:00Z", "end_time": "2025-08-09T08:55:00Z"})
+    invalid = supervisor_agent.prometheus_anomaly_tool.invoke({"promql_query": "cpu", "start_time": "yesterday"})
+
+    assert sorted(calls) == [(START - WEEK, START + 287 * 300 - WEEK), (START, START + 287 * 300)]
+    assert output.startswith("# 50 series, 14400 points checked with zscore, ewma, seasonal; 2 anomalous intervals")
+    assert "{pod=api-5}" in output and "{pod=api-7}" in output and "api-6" not in output
+    assert invalid.startswith("Invalid time range")
+
+    # Last week's window failing only drops the seasonal detector
+    def failing_earlier(query_endpoint, promql_query, start_time, end_time, step, client_id):
+        if start_time < START - WEEK / 2:
+            raise ConnectionError("connection reset")
+        return fake_range(query_endpoint, promql_query, start_time, end_time, step, client_id)
+
+    supervisor_agent.cached_promql_range_query = failing_earlier
+    partial = supervisor_agent.prometheus_anomaly_tool.invoke({
+        "promql_query": "cpu", "start_time": "2025-08-08T11:30:00Z", "end_time": "2025-08-09T08:55:00Z"})
+    assert partial.startswith("# 50 series, 14400 points checked with zscore, ewma; 2 anomalous intervals; "
+                              "seasonal baseline unavailable (connection reset)"), partial
+    print("✅ Tool returned two intervals")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_detectors_score_whole_matrix()
+    test_intervals_only_for_real_anomalies()
+    with offline_supervisor() as supervisor_agent:
+        test_tool_fetches_window_and_last_week(supervisor_agent)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+"""
+Test the per-turn artifact store: tools store charts/tables and return short references
+instead of routing figure JSON through the LLM.
+"""
+
+import sys
+import os
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from langchain_core.messages import AIMessage, message_to_dict
+
+from artifact_store import (
+    ArtifactStore,
+    artifact_turn,
+    current_store,
+    referenced_artifact_ids,
+    store_artifact,
+    strip_artifact_references,
+)
+from run_recorder import ReplayChatModel, RunRecorder
+from tabular_result import TabularResult
+
+
+def make_range_response(pods=3, points=2000):
+    return {
+        "status": "success",
+        "data": {"resultType": "matrix", "result": [
+            {"metric": {"__name__": "container_memory_rss", "pod": f"checkout-{p}"},
+             "values": [[1754643600 + i * 15, str(1000 + p * 10 + i % 50)] for i in range(points)]}
+            for p in range(pods)
+        ]},
+    }
+
+
+def test_store_and_references():
+    """Artifacts get short IDs; references are found in and stripped from response text."""
+    print("🧪 Testing artifact store basics...")
+    assert store_artifact("chart", object()) is None  # no turn open
+
+    with artifact_turn() as artifacts:
+        ref = store_artifact("chart", {"fig": 1}, "Memory by pod")
+        table_ref = store_artifact("table", TabularResult.from_records([{"a": 1}]))
+        assert current_store() is artifacts
+    assert current_store() is None
+
+    assert ref == "[artifact:chart-1]" and table_ref == "[artifact:table-2]"
+    assert artifacts.ids() == ["chart-1", "table-2"]
+    assert artifacts.get("chart-1")["description"] == "Memory by pod"
+
+    text = f"Memory grew steadily. {ref}\nSee also {table_ref} and {ref}."
+    assert referenced_artifact_ids(text) == ["chart-1", "table-2"]
+    assert strip_artifact_references(text) == "Memory grew steadily.\nSee also and."
+    print("✅ Store and references work")
+
+
+def test_store_visible_in_tool_threads():
+    """Tools run in worker threads with a copy of the caller's context see the turn's store."""
+    with artifact_turn() as artifacts:
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            refs = list(pool.map(lambda i: context.copy().run(store_artifact, "chart", i), range(4)))
+    assert sorted(refs) == [f"[artifact:chart-{i}]" for i in range(1, 5)]
+    assert len(artifacts) == 4
+    print("✅ Store visible from tool threads")
+
+
+def test_chart_turn_returns_reference_not_figure_json(supervisor_agent):
+    """A chart turn through the real supervisor graph stores the figure and passes only a reference."""
+    print("🧪 Testing a chart turn through the supervisor graph...")
+    original = supervisor_agent.run_promql_range_query
+    supervisor_agent.run_promql_range_query = lambda *args: make_range_response()
+    supervisor_agent.count_prometheus_series = lambda *args: {}
+    script = [
+        AIMessage(content="", tool_calls=[{"name": "transfer_to_prometheus_agent", "args": {}, "id": "call_1"}]),
+        AIMessage(content="", tool_calls=[{"name": "prometheus_chart_tool", "args": {"promql_query": "container_memory_rss", "title": "Memory by pod"}, "id": "call_2"}]),
+        AIMessage(content="Memory is stable across pods. [artifact:chart-1]"),
+        AIMessage(content="Memory is stable across pods. [artifact:chart-1]"),
+    ]
+    try:
+        graph = supervisor_agent.create_standard_supervisor(
+            model=ReplayChatModel(recorded=[{"request": [], "response": message_to_dict(m)} for m in script])
+        )
+        recorder = RunRecorder()
+        with artifact_turn() as artifacts:
+            result = graph.invoke({"messages": [("user", "Chart memory by pod")]}, config={"callbacks": [recorder]})
+    finally:
+        supervisor_agent.run_promql_range_query = original
+
+    chart = artifacts.get("chart-1")
+    assert chart["kind"] == "chart" and chart["description"] == "Memory by pod"
+    assert len(chart["data"].data) == 3
+    assert len(chart["data"].data[0].y) <= supervisor_agent.DEFAULT_CONFIG["prometheus"]["downsampling"]["chart_points"]
+
+    tool_output = next(call["output"] for call in recorder.tool_calls if call["name"] == "prometheus_chart_tool")
+    assert "[artifact:chart-1]" in tool_output
+    assert "plotly" not in tool_output and len(tool_output) < 4000
+    assert referenced_artifact_ids(result["messages"][-1].content) == ["chart-1"]
+    print(f"✅ Chart stored out of band; tool output is {len(tool_output)} chars")
+
+
+def test_large_tables_stored_as_artifacts(supervisor_agent):
+    """Large tables go to the store; the model sees the first rows plus a reference."""
+    table = TabularResult.from_records([{"IncidentId": i, "Severity": 2} for i in range(500)])
+    inline_rows = supervisor_agent.DEFAULT_CONFIG["artifacts"]["inline_rows"]
+
+    with artifact_turn() as artifacts:
+        text = supervisor_agent.to_tool_output(table)
+        small = supervisor_agent.to_tool_output(table.head(5))
+    assert artifacts.ids() == ["table-1"]
+    assert artifacts.get("table-1")["data"] is table
+    assert f"{500 - inline_rows} more rows not shown" in text and "[artifact:table-1]" in text
+    assert "artifact" not in small
+
+    # Without an open turn the table is encoded inline as before
+    assert "artifact" not in supervisor_agent.to_tool_output(table)
+    print("✅ Large tables stored as artifacts")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_store_and_references()
+    test_store_visible_in_tool_threads()
+    with offline_supervisor() as supervisor_agent:
+        test_chart_turn_returns_reference_not_figure_json(supervisor_agent)
+    with offline_supervisor() as supervisor_agent:
+        test_large_tables_stored_as_artifacts(supervisor_agent)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+"""
+Test deployment impact scoring and its tool.
+"""
+
+import sys
+import os
+import threading
+import time
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from deployment_impact import change_points, effect_sizes, score_deployment_impact
+from tabular_result import TabularResult
+
+START = 1754643600  # 2025-08-08T09:00:00Z, deployment start
+END = START + 600   # deployment finished 10 minutes later
+
+
+def window_response(first, last, shifts, seed=0):
+    """One series per container; `shifts` maps container -> (level, change after END)."""
+    rng = np.random.default_rng(seed + int(first) % 1000)
+    timestamps = np.arange(first, last + 1, 60, dtype=np.float64)
+    result = []
+    for container, (level, change) in shifts.items():
+        values = level + rng.normal(0, level * 0.02, len(timestamps)) + np.where(timestamps >= END, change, 0.0)
+        result.append({"metric": {"container": container}, "values": np.column_stack([timestamps, values])})
+    return {"status": "success", "data": {"resultType": "matrix", "result": result}}
+
+
+def test_effect_sizes_and_change_points():
+    """Hedges' g separates a real shift from noise; the change point lands on the shift."""
+    print("🧪 Testing effect sizes and change points...")
+    rng = np.random.default_rng(0)
+    values = rng.normal(10, 0.5, (3, 120))
+    values[0, 70:] += 5
+    values[2, ::7] = np.nan
+    before = np.arange(120) < 60
+    mean_b, mean_a, g, n_b, n_a = effect_sizes(values, before, ~before)
+    assert g[0] > 2 and abs(g[1]) < 0.5 and abs(g[2]) < 0.5
+    assert n_b[2] < 60 and n_b[0] == 60
+    split, strength = change_points(values)
+    assert split[0] == 70 and strength[0] > strength[1]
+    assert (change_points(np.full((1, 4), np.nan))[0] == -1).all()
+    print("✅ Effect sizes scored")
+
+
+def test_ranked_impact_table():
+    """Changed series are ranked by |EffectSize|; unchanged series and failed metrics are left out."""
+    windows = {
+        "cpu": (window_response(START - 3600, START, {"app": (2.0, 0), "sidecar": (0.1, 0)}),
+                window_response(END, END + 3600, {"app": (2.0, 1.0), "sidecar": (0.1, 0)})),
+        "latency_p95": (window_response(START - 3600, START, {"": (0.2, 0)}),
+                        window_response(END, END + 3600, {"": (0.2, -0.1)})),
+        "error_rate": ({"status": "error", "error": "unknown metric"}, {"status": "success", "data": {"result": []}}),
+    }
+    started = time.perf_counter()
+    table, stats = score_deployment_impact(windows, START, END)
+    elapsed = time.perf_counter() - started
+    rows = table.to_records()
+    assert sorted((r["Metric"], r["Direction"]) for r in rows) == [("cpu", "up"), ("latency_p95", "down")]
+    cpu = next(r for r in rows if r["Metric"] == "cpu")
+    assert cpu["Series"] == "{container=app}" and round(cpu["ChangePct"]) == 50
+    assert cpu["ChangePoint"] == "2025-08-08T09:10:00Z" and cpu["ChangePointMinutes"] == 10.0
+    assert abs(rows[0]["EffectSize"]) >= abs(rows[1]["EffectSize"])
+    assert stats["series"] == 3 and stats["compared"] == 3 and stats["impacted"] == 2
+    assert stats["errors"] == {"error_rate": "unknown metric"}
+    assert elapsed < 0.5, elapsed
+    print(f"✅ Impact table ranked in {elapsed * 1000:.1f} ms")
+
+
+def test_tool_fetches_windows_concurrently(supervisor_agent):
+    """The tool looks up the deployment once and fetches before/after windows of every golden metric in parallel."""
+    calls, lookups, threads = [], [], set()
+    def fake_kusto(cluster_uri, database, table, client_id, tenant_id, query, tool=None):
+        lookups.append(query)
+        if "missing" in query:
+            return TabularResult.from_records([])
+        return TabularResult.from_records([{"DeploymentId": "dep-42", "Service": "checkout",
+                                            "StartTime": "2025-08-08T09:00:00Z", "EndTime": "2025-08-08T09:10:00Z"}])
+
+    def fake_range(query_endpoint, promql_query, start_time, end_time, step, client_id):
+        calls.append((promql_query, start_time, end_time))
+        threads.add(threading.get_ident())
+        time.sleep(0.05)
+        change = 1.0 if promql_query.startswith("sum by (container) (rate(container_cpu") else 0.0
+        return window_response(start_time, end_time, {"checkout": (2.0, change)})
+
+    supervisor_agent.query_kusto_table = fake_kusto
+    supervisor_agent.cached_promql_range_query = fake_range
+    started = time.perf_counter()
+    output = supervisor_agent.deployment_impact_tool.invoke({"deployment_id": "dep-42"})
+    elapsed = time.perf_counter() - started
+    subset = supervisor_agent.deployment_impact_tool.invoke({"deployment_id": "dep-42", "metrics": ["memory"]})
+    missing = supervisor_agent.deployment_impact_tool.invoke({"deployment_id": "missing"})
+    unknown = supervisor_agent.deployment_impact_tool.invoke({"deployment_id": "dep-42", "metrics": ["disk"]})
+
+    assert lookups[0] == "DeploymentEvents | where DeploymentId == 'dep-42' | take 1"
+    assert len(calls) == 14 and len(threads) > 1 and elapsed < 0.5
+    assert all('pod=~"checkout.*"' in query for query, _, _ in calls)
+    assert {(start, end) for _, start, end in calls} == {(START - 3600, START), (END, END + 3600)}
+    assert output.startswith("# deployment dep-42 of checkout: 6 series in 6 metrics compared 1h before vs 1h after; 1 changed")
+    assert "cpu" in output and "memory" not in output.split("\n", 1)[1]
+    assert subset.endswith("No metric changed noticeably.")
+    assert missing == "Deployment missing not found in DeploymentEvents"
+    assert unknown.startswith("Unknown metrics ['disk']")
+
+    # A query that fails (bad PromQL, network error) is reported with the others instead of failing the tool
+    def failing_range(query_endpoint, promql_query, start_time, end_time, step, client_id):
+        if promql_query.startswith("histogram_quantile"):
+            raise ConnectionError("400 Client Error: bad_data")
+        return fake_range(query_endpoint, promql_query, start_time, end_time, step, client_id)
+
+    supervisor_agent.cached_promql_range_query = failing_range
+    partial = supervisor_agent.deployment_impact_tool.invoke({"deployment_id": "dep-42"})
+    assert "1 changed" in partial and "failed: latency_p95 (400 Client Error: bad_data)" in partial
+    print("✅ Tool scored 6 golden metrics")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_effect_sizes_and_change_points()
+    test_ranked_impact_table()
+    with offline_supervisor() as supervisor_agent:
+        test_tool_fetches_windows_concurrently(supervisor_agent)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""
+Test WebGL switching, binary array serialization and shared x-axes for time-series figures.
+"""
+
+import sys
+import os
+import json
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from figure_rendering import create_prometheus_figure, create_timeseries_figure, shared_x_axis, series_label
+
+
+def make_range_response(pods=3, points=100, step=15):
+    return {
+        "status": "success",
+        "data": {"resultType": "matrix", "result": [
+            {"metric": {"__name__": "container_memory_rss", "pod": f"checkout-{p}"},
+             "values": [[1754643600 + i * step, str(1e8 + p * 1000 + i)] for i in range(points)]}
+            for p in range(pods)
+        ]},
+    }
+
+
+def test_webgl_above_threshold():
+    """Traces switch from SVG Scatter to WebGL Scattergl above the point threshold."""
+    print("🧪 Testing WebGL switching...")
+    small = create_prometheus_figure(make_range_response(points=100), webgl_threshold=1000)
+    large = create_prometheus_figure(make_range_response(points=1000), webgl_threshold=1000)
+    assert {trace.type for trace in small.data} == {"scatter"}
+    assert {trace.type for trace in large.data} == {"scattergl"}
+    assert large.layout.xaxis.type == "date"
+    print("✅ WebGL used above threshold")
+
+
+def test_regular_grid_shares_x_axis_and_uses_binary_arrays():
+    """Series on one grid are written as x0/dx with binary y buffers, not JSON number lists."""
+    fig = create_prometheus_figure(make_range_response(pods=2, points=50))
+    spec = json.loads(fig.to_json())
+
+    for trace in spec["data"]:
+        assert "x" not in trace
+        assert trace["x0"] == 1754643600 * 1000.0 and trace["dx"] == 15000.0
+        assert trace["y"]["dtype"] == "f8" and "bdata" in trace["y"]
+    assert spec["data"][0]["name"] == "container_memory_rss_pod_checkout_0"
+    print("✅ x0/dx grid with typed y buffers")
+
+
+def test_gaps_and_irregular_series():
+    """Missing grid points become gaps; unrelated timestamps keep per-series binary x arrays."""
+    gappy = [("a", np.array([0.0, 15.0, 45.0, 60.0]), np.array([1.0, 2.0, 4.0, 5.0]))]
+    layout = shared_x_axis(gappy)
+    assert layout == ("grid", 0.0, 15.0, 5)
+    y = create_timeseries_figure(gappy).data[0].y
+    assert np.isnan(y[2]) and y[3] == 4.0
+
+    irregular = [
+        ("a", np.array([0.0, 7.0, 100.0]), np.array([1.0, 2.0, 3.0])),
+        ("b", np.array([3.0, 50.0]), np.array([1.0, 2.0])),
+    ]
+    assert shared_x_axis(irregular)[0] == "per_series"
+    spec = json.loads(create_timeseries_figure(irregular).to_json())
+    assert spec["data"][0]["x"]["dtype"] == "f8"
+
+    same = [("a", np.array([0.0, 7.0, 100.0]), np.ones(3)), ("b", np.array([0.0, 7.0, 100.0]), np.zeros(3))]
+    kind, shared = shared_x_axis(same)
+    assert kind == "shared" and np.array_equal(shared, [0.0, 7.0, 100.0])
+    traces = create_timeseries_figure(same).data
+    assert np.array_equal(traces[0].x, [0.0, 7000.0, 100000.0]) and np.array_equal(traces[1].x, traces[0].x)
+    print("✅ Gaps, shared and per-series x axes handled")
+
+
+def test_payload_smaller_than_string_timestamps():
+    """The binary/grid figure is much smaller than the same data as ISO strings and float lists."""
+    import plotly.graph_objects as go
+
+    response = make_range_response(pods=20, points=1000)
+    compact = len(create_prometheus_figure(response).to_json())
+
+    legacy = go.Figure()
+    for series in response["data"]["result"]:
+        legacy.add_trace(go.Scatter(
+            x=[f"{np.datetime64(int(t), 's')}Z" for t, _ in series["values"]],
+            y=[float(v) for _, v in series["values"]],
+            name=series_label(series["metric"]),
+        ))
+    legacy_size = len(legacy.to_json())
+    assert compact * 2 < legacy_size
+    print(f"✅ Figure JSON {compact} bytes vs {legacy_size} bytes with string timestamps")
+
+
+if __name__ == "__main__":
+    test_webgl_above_threshold()
+    test_regular_grid_shares_x_axis_and_uses_binary_arrays()
+    test_gaps_and_irregular_series()
+    test_payload_smaller_than_string_timestamps()
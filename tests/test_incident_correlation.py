@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""
+Test the vectorized incident / deployment correlation and its tool.
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from incident_correlation import correlate_incidents_with_deployments
+from tabular_result import TabularResult
+
+INCIDENTS = TabularResult.from_records([
+    {"IncidentId": 1, "Title": "Checkout latency spike", "OwningTeamName": "Payments", "CreateDate": "2025-08-08T10:00:00Z"},
+    {"IncidentId": 2, "Title": "Search errors", "OwningTeamName": "Discovery", "CreateDate": "2025-08-08T18:00:00Z"},
+    {"IncidentId": 3, "Title": "No deployments before this one", "OwningTeamName": "Core", "CreateDate": "2025-08-07T00:00:00Z"},
+    {"IncidentId": 4, "Title": "Missing time", "OwningTeamName": "Core", "CreateDate": None},
+])
+DEPLOYMENTS = TabularResult.from_records([
+    # 20 minutes before incident 1, finished before it
+    {"DeploymentId": "dep-cart", "Service": "cart", "Version": "2.0", "StartTime": "2025-08-08T09:40:00Z", "EndTime": "2025-08-08T09:50:00Z"},
+    # 3 hours before incident 1, service named in its title
+    {"DeploymentId": "dep-checkout", "Service": "checkout", "Version": "1.4.3", "StartTime": "2025-08-08T07:00:00Z", "EndTime": "2025-08-08T07:20:00Z"},
+    # Started 10 hours before incident 1 but still running when it was created
+    {"DeploymentId": "dep-long", "Service": "infra", "Version": "k8s-1.30", "StartTime": "2025-08-08T00:00:00Z", "EndTime": "2025-08-08T11:00:00Z"},
+    # After incident 1, 30 minutes before incident 2
+    {"DeploymentId": "dep-search", "Service": "search", "Version": "7", "StartTime": "2025-08-08T17:30:00Z", "EndTime": None},
+    # Too old for anything
+    {"DeploymentId": "dep-old", "Service": "search", "Version": "6", "StartTime": "2025-08-01T00:00:00Z", "EndTime": "2025-08-01T00:10:00Z"},
+])
+
+
+def test_candidates_ranked_per_incident():
+    """Deployments in the lookback (or still running) are ranked by recency, running state and service match."""
+    print("🧪 Testing incident/deployment correlation...")
+    ranked = correlate_incidents_with_deployments(INCIDENTS, DEPLOYMENTS, "CreateDate", "StartTime", "EndTime", 6 * 3600)
+    rows = ranked.to_records()
+    by_incident = {}
+    for row in rows:
+        by_incident.setdefault(row["IncidentId"], []).append(row)
+
+    assert set(by_incident) == {1, 2}
+    first = by_incident[1]
+    assert [r["DeploymentId"] for r in first] == ["dep-checkout", "dep-cart", "dep-long"]
+    assert first[0]["ServiceMentioned"] and first[0]["MinutesBeforeIncident"] == 180.0
+    assert first[1]["MinutesBeforeIncident"] == 20.0 and not first[1]["RunningAtIncident"]
+    assert first[2]["RunningAtIncident"] and first[2]["MinutesBeforeIncident"] == 600.0
+    assert [r["Rank"] for r in first] == [1, 2, 3]
+    assert [r["DeploymentId"] for r in by_incident[2]] == ["dep-search"]
+    assert by_incident[2][0]["ServiceMentioned"]
+
+    top1 = correlate_incidents_with_deployments(INCIDENTS, DEPLOYMENTS, "CreateDate", "StartTime", "EndTime", 6 * 3600, top=1)
+    assert top1.row_count == 2
+    # Without an end column long-running deployments are not known to overlap
+    no_end = correlate_incidents_with_deployments(INCIDENTS, DEPLOYMENTS, "CreateDate", "StartTime", None, 6 * 3600)
+    assert "dep-long" not in no_end.columns["DeploymentId"].tolist()
+    empty = correlate_incidents_with_deployments(INCIDENTS, TabularResult.from_records([]), "CreateDate", "StartTime")
+    assert empty.row_count == 0 and "Score" in empty.column_names
+    print("✅ Candidates ranked")
+
+
+def test_matches_pairwise_reference_and_is_fast():
+    """The searchsorted join finds the same pairs as a brute-force check, quickly."""
+    rng = np.random.default_rng(7)
+    base = np.datetime64("2025-08-01T00:00:00")
+    n_incidents, n_deployments = 2000, 20000
+    incident_times = base + rng.integers(0, 30 * 86400, n_incidents).astype("timedelta64[s]")
+    starts = base + rng.integers(0, 30 * 86400, n_deployments).astype("timedelta64[s]")
+    ends = starts + rng.integers(0, 4 * 3600, n_deployments).astype("timedelta64[s]")
+    incidents = TabularResult({"IncidentId": np.arange(n_incidents), "CreateDate": incident_times.astype("datetime64[ns]")})
+    deployments = TabularResult({"DeploymentId": np.arange(n_deployments), "StartTime": starts.astype("datetime64[ns]"),
+                                 "EndTime": ends.astype("datetime64[ns]")})
+
+    started = time.perf_counter()
+    ranked = correlate_incidents_with_deployments(incidents, deployments, "CreateDate", "StartTime", "EndTime", 3600, top=10000)
+    elapsed = time.perf_counter() - started
+
+    lookback = np.timedelta64(3600, "s")
+    expected = set()
+    for i, t in enumerate(incident_times):
+        hits = np.flatnonzero((starts <= t) & (ends >= t - lookback))
+        expected.update((i, int(d)) for d in hits)
+    found = set(zip(ranked.columns["IncidentId"].tolist(), ranked.columns["DeploymentId"].tolist()))
+    assert found == expected, (len(found), len(expected))
+    assert elapsed < 1.0, elapsed
+    print(f"✅ {len(found)} pairs from {n_incidents} x {n_deployments} in {elapsed * 1000:.0f} ms")
+
+
+def test_tool_fetches_once_and_returns_ranking(supervisor_agent):
+    """The tool sends one batch request and returns the ranked candidates."""
+    sent, limits = [], []
+    cut_deployments = TabularResult.from_records(DEPLOYMENTS.to_records())
+    cut_deployments.truncated = True
+    def fake_batch(cluster_uri, database, client_id, tenant_id, query, tool=None, max_rows=None):
+        sent.append(query)
+        limits.append(max_rows)
+        return [INCIDENTS, cut_deployments if "Service" in query else DEPLOYMENTS]
+    supervisor_agent.query_kusto_batch = fake_batch
+    output = supervisor_agent.incident_deployment_correlation_tool.invoke({"since": "2d", "incident_filter": "Severity <= 2"})
+    invalid = supervisor_agent.incident_deployment_correlation_tool.invoke({"lookback": "6 hours"})
+    truncated = supervisor_agent.incident_deployment_correlation_tool.invoke({"deployment_filter": "Service != ''"})
+
+    assert len(sent) == 2 and limits == [5000, 5000]
+    assert "IcMDataWarehouse | where CreateDate > ago(2d) | where Severity <= 2 | take 500" in sent[0]
+    assert "DeploymentEvents | where coalesce(EndTime, StartTime) > ago(2d) - 6h | take 5000" in sent[0]
+    assert output.startswith("# 4 incidents, 5 deployments, 2 incidents with candidate deployments")
+    assert "dep-checkout" in output and "dep-old" not in output
+    assert invalid.startswith("Invalid duration")
+    assert "results truncated" not in output
+    assert "; results truncated (deployments cut at 5 rows)" in truncated.split("\n", 1)[0]
+    print("✅ Tool ranked candidates from one request")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_candidates_ranked_per_incident()
+    test_matches_pairwise_reference_and_is_fast()
+    with offline_supervisor() as supervisor_agent:
+        test_tool_fetches_once_and_returns_ranking(supervisor_agent)
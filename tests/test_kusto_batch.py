@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+"""
+Test multi-query Kusto batches and the incident + deployment window pattern.
+"""
+
+import sys
+import os
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from kusto_batch import BatchError, build_batch, incident_deployment_window, kql_literal
+from kusto_stream import stream_kusto_batch
+from tabular_result import TabularResult
+
+
+def test_build_batch():
+    """Named queries are joined after the shared lets; malformed entries are rejected."""
+    print("🧪 Testing Kusto batch building...")
+    batch, names = build_batch({"sev2": "IcMDataWarehouse | where Severity == 2 | take 5;", "recent": "DeploymentEvents | take 3"},
+                               lets=["let since = ago(1d);"])
+    assert batch == "let since = ago(1d);\nIcMDataWarehouse | where Severity == 2 | take 5;\nDeploymentEvents | take 3"
+    assert names == ["sev2", "recent"]
+    # A ';' inside a string does not split a query
+    assert build_batch({"q": "IcMDataWarehouse | where Title has 'a;b'"})[0] == "IcMDataWarehouse | where Title has 'a;b'"
+
+    for queries, expected in [
+        ({}, "the batch has no queries"),
+        ({"two": "T | take 1; U | take 1"}, "query 'two' must be a single tabular statement"),
+        ({"let": "let x = 1"}, "query 'let' is a let statement"),
+        ({"bad name": "T"}, "result name 'bad name'"),
+    ]:
+        try:
+            build_batch(queries)
+            raise AssertionError(f"{queries} should be rejected")
+        except BatchError as e:
+            assert str(e).startswith(expected), e
+    print("✅ Batches built")
+
+
+def test_incident_deployment_window():
+    """The window pattern computes the incident time on the cluster and finds overlapping deployments."""
+    queries, lets = incident_deployment_window("100003", "IcMDataWarehouse", "DeploymentEvents", "CreateDate",
+                                               "StartTime", "EndTime", "2h", "30m", "Service == 'checkout'", 50)
+    assert lets == ["let _incident = IcMDataWarehouse | where IncidentId == 100003 | take 1",
+                    "let _t0 = toscalar(_incident | project CreateDate)"]
+    assert queries["incident"] == "_incident"
+    assert queries["deployments"] == (
+        "DeploymentEvents | where StartTime <= _t0 + 30m and coalesce(EndTime, StartTime) >= _t0 - 2h"
+        " | where Service == 'checkout' | extend MinutesBeforeIncident = round((_t0 - StartTime) / 1m, 1)"
+        " | order by StartTime desc | take 50")
+    queries, _ = incident_deployment_window("INC-7", "I", "D", "CreateDate", "StartTime")
+    assert "StartTime between ((_t0 - 6h) .. (_t0 + 1h))" in queries["deployments"]
+    assert kql_literal("INC-7") == "'INC-7'" and kql_literal("it's") == "'it\\'s'"
+    print("✅ Incident window built")
+
+
+def test_stream_batch_reads_every_result():
+    """Every primary result of a batch is read, each with its own row budget."""
+    class Column:
+        def __init__(self, name, column_type):
+            self.column_name, self.column_type = name, column_type
+
+    class Table:
+        def __init__(self, rows):
+            self.columns = [Column("Id", "long")]
+            self.raw_rows = iter([[i] for i in range(rows)])
+
+    class Client:
+        closed = False
+
+        def execute_streaming_query(self, database, query, properties=None):
+            tables = [Table(3), Table(10)]
+            return type("Response", (), {"iter_primary_results": lambda self: iter(tables),
+                                         "set_skip_incomplete_tables": lambda self, value: None})()
+
+        def close(self):
+            Client.closed = True
+
+    results = stream_kusto_batch(Client(), "db", "A; B", max_rows=5)
+    assert [r.row_count for r in results] == [3, 5] and [r.truncated for r in results] == [False, True]
+    assert Client.closed
+    print("✅ Every batch result read")
+
+
+def test_batch_tool_single_request(supervisor_agent):
+    """The batch tool sends one request and returns each result under its name."""
+    sent = []
+    def fake_batch(cluster_uri, database, client_id, tenant_id, query, tool=None):
+        sent.append(query)
+        return [
+            TabularResult.from_records([{"IncidentId": 7, "Severity": 2}]),
+            TabularResult.from_records([{"IncidentId": 100003, "CreateDate": "2025-08-08T10:00:00Z"}]),
+            TabularResult.from_records([{"DeploymentId": "dep-3", "MinutesBeforeIncident": 20.0}]),
+            TabularResult.from_records([{"ColumnName": "IncidentId", "ColumnType": "long"},
+                                        {"ColumnName": "CreatedDate", "ColumnType": "datetime"}]),
+            TabularResult.from_records([{"ColumnName": "StartTime", "ColumnType": "datetime"}]),
+        ]
+    supervisor_agent.query_kusto_batch = fake_batch
+    supervisor_agent.query_kusto_table = lambda *args: sent.append("single call")
+    output = supervisor_agent.kusto_batch_query_tool.invoke({
+        "queries": {"sev2": "IcMDataWarehouse | where Severity == 2 | take 10"},
+        "incident_id": "100003", "include_schemas": True})
+    # The schemas returned by the batch are cached: the next window uses CreatedDate and no EndTime
+    supervisor_agent.kusto_batch_query_tool.invoke({"incident_id": "100003"})
+    rejected = supervisor_agent.kusto_batch_query_tool.invoke({"queries": {"x": "IcMDataWarehouse | where Sevrity == 2"}})
+
+    assert len(sent) == 2 and "single call" not in sent
+    assert sent[0].startswith("let _incident = IcMDataWarehouse | where IncidentId == 100003 | take 1;\n")
+    assert "IcMDataWarehouse | getschema | project ColumnName, ColumnType" in sent[0]
+    for name in ["sev2", "incident", "deployments", "incident_schema", "deployment_schema"]:
+        assert f"## {name}\n" in output, name
+    assert "dep-3" in output
+    assert "project CreatedDate" in sent[1] and "EndTime" not in sent[1]
+    assert rejected.startswith("Query not sent to Kusto")
+    print("✅ Batch tool answered five results with one request")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_build_batch()
+    test_incident_deployment_window()
+    test_stream_batch_reads_every_result()
+    with offline_supervisor() as supervisor_agent:
+        test_batch_tool_single_request(supervisor_agent)
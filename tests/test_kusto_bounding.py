@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+"""
+Test the default time filter, row cap and projection of Kusto queries.
+"""
+
+import sys
+import os
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from kusto_bounding import bound_query, pick_time_column, source_table
+from query_validation import QueryValidationError
+from tabular_result import TabularResult
+
+INCIDENT_COLUMNS = ["IncidentId", "Title", "Severity", "Status", "CreateDate", "ModifiedDate", "OwningTeamName",
+                    "Summary", "Mitigation", "RootCause"]
+
+
+def unbounded_error(query, *args, **kwargs):
+    try:
+        bound_query(query, *args, **kwargs)
+    except QueryValidationError as e:
+        return str(e)
+    assert False, f"accepted without a time range: {query}"
+
+
+def test_time_filter_and_row_cap_added():
+    """A query without a time range gets the default time filter; one without a limit gets a row cap."""
+    print("🧪 Testing Kusto query bounding...")
+    query, changes = bound_query("IcMDataWarehouse | where Severity <= 2", "CreateDate", "3d", 500)
+    assert query == "IcMDataWarehouse | where CreateDate > ago(3d) | where Severity <= 2 | take 500"
+    assert changes == ["added time filter: where CreateDate > ago(3d)", "capped rows with take 500"]
+
+    # Any datetime comparison or a key lookup is a time range of its own
+    resolved = "IcMDataWarehouse | where ResolvedDate >= startofday(now()) and Severity == 1"
+    assert bound_query(resolved, "CreateDate")[0] == resolved + " | take 1000"
+    by_column = "IcMDataWarehouse | where ResolvedDate > LastWeek"
+    assert bound_query(by_column, "CreateDate", datetime_columns=["CreateDate", "ResolvedDate"])[1] == ["capped rows with take 1000"]
+    assert bound_query(by_column, "CreateDate")[0] == "IcMDataWarehouse | where CreateDate > ago(7d) | where ResolvedDate > LastWeek | take 1000"
+    assert "added time filter" in bound_query("IcMDataWarehouse | where isnotnull(ResolvedDate)", "CreateDate",
+                                              datetime_columns=["ResolvedDate"])[1][0]
+    lookup = "IcMDataWarehouse | where IncidentId == 12345"
+    assert bound_query(lookup, "CreateDate", lookup_columns=["IncidentId"]) == (lookup + " | take 1000", ["capped rows with take 1000"])
+    assert bound_query("IcMDataWarehouse | where IncidentId in (1, 2)", "CreateDate", lookup_columns=["IncidentId"])[1] == \
+        ["capped rows with take 1000"]
+    assert "added time filter" in bound_query("IcMDataWarehouse | where IncidentId > 5", "CreateDate", lookup_columns=["IncidentId"])[1][0]
+
+    # Without a known time column or schema the query is rejected (or allowed) as configured
+    error = unbounded_error("IcMDataWarehouse | where Severity <= 2", None, "3d", unknown_time_column="reject",
+                           lookup_columns=["IncidentId"])
+    assert "the time column of IcMDataWarehouse is not known yet: add a filter such as `| where <time column> > ago(3d)` " \
+           "right after the table, or look rows up by IncidentId" in error
+    assert bound_query("IcMDataWarehouse | where Ts > ago(1d)", None, unknown_time_column="reject")[1] == ["capped rows with take 1000"]
+    assert bound_query("IcMDataWarehouse", None, columns=["Title"], unknown_time_column="reject")[1] == ["capped rows with take 1000"]
+
+    # Bounded queries are left alone
+    bounded = "IcMDataWarehouse | where CreateDate between (ago(2d) .. now()) | take 20"
+    assert bound_query(bounded, "CreateDate") == (bounded, [])
+    # Aggregations return few rows: no cap after a summarize without by, or after count
+    assert bound_query("IcMDataWarehouse | where CreateDate > ago(1d) | summarize count()", "CreateDate")[1] == []
+    assert bound_query("IcMDataWarehouse | where CreateDate > ago(1d) | count", "CreateDate")[1] == []
+    print("✅ Time filter and row cap added")
+
+
+def test_existing_limits_and_render():
+    """Limits above the cap are lowered; the cap goes before a final render."""
+    query, changes = bound_query("IcMDataWarehouse | where CreateDate > ago(1d) | top 5000 by Severity asc", "CreateDate", max_rows=100)
+    assert query == "IcMDataWarehouse | where CreateDate > ago(1d) | top 100 by Severity asc"
+    assert changes == ["lowered top 5000 to 100"]
+
+    query, _ = bound_query("IcMDataWarehouse | where CreateDate > ago(7d) | summarize count() by bin(CreateDate, 1h) "
+                           "| render timechart", "CreateDate")
+    assert query.endswith("| summarize count() by bin(CreateDate, 1h) | take 1000 | render timechart")
+    print("✅ Limits lowered, render kept last")
+
+
+def test_strings_comments_and_statements():
+    """Pipes inside strings, trailing comments and let statements are handled."""
+    query, _ = bound_query("let sev = 2; IcMDataWarehouse | where Title has 'disk | full' and Severity == sev "
+                           "| where CreateDate > ago(1d) // recent", "CreateDate")
+    assert query == ("let sev = 2; IcMDataWarehouse | where Title has 'disk | full' and Severity == sev "
+                     "| where CreateDate > ago(1d) | take 1000")
+    # Dates inside strings are not time filters, and a time filter after the table was reshaped does not count
+    assert bound_query("IcMDataWarehouse | where Title has 'ago(1d) > 0'", "CreateDate")[0].startswith(
+        "IcMDataWarehouse | where CreateDate > ago(7d) | where Title")
+    query, _ = bound_query("IcMDataWarehouse | summarize Last = max(CreateDate) by OwningTeamName | where Last > ago(1d)", "CreateDate")
+    assert query.startswith("IcMDataWarehouse | where CreateDate > ago(7d) | summarize")
+    # Without a known time column only the row cap is added; non-table queries are untouched
+    assert bound_query("IcMDataWarehouse", None) == ("IcMDataWarehouse | take 1000", ["capped rows with take 1000"])
+    assert bound_query("print now()", "CreateDate") == ("print now()", [])
+    assert bound_query("IcMDataWarehouse | where Title has 'x", "CreateDate")[1] == []
+    assert source_table("let x = 1; DeploymentEvents | take 1") == "DeploymentEvents"
+    print("✅ Strings, comments and statements handled")
+
+
+def test_projection():
+    """Requested columns (plus key, time and used columns) are projected when rows are returned whole."""
+    query, changes = bound_query(
+        "IcMDataWarehouse | where Severity == 1 | extend AgeHours = (now() - CreateDate) / 1h",
+        None, columns=INCIDENT_COLUMNS, requested_columns=["Title"], key_columns=["IncidentId", "DeploymentId"])
+    assert "| project Title, IncidentId, CreateDate, Severity, AgeHours | take 1000" in query
+    assert "projected 5 of 10 columns" in changes
+
+    # Wide tables are projected without a request; narrow ones only on request
+    _, changes = bound_query("IcMDataWarehouse | take 5", None, columns=INCIDENT_COLUMNS, key_columns=["IncidentId"], max_columns=8)
+    assert changes == ["projected 1 of 10 columns"]
+    assert bound_query("IcMDataWarehouse | take 5", None, columns=INCIDENT_COLUMNS)[1] == []
+    # Queries that already choose their columns are not projected again
+    _, changes = bound_query("IcMDataWarehouse | project Title | take 5", None, columns=INCIDENT_COLUMNS, requested_columns=["Severity"])
+    assert changes == []
+    assert pick_time_column({"ModifiedDate", "CreateDate"}) == "CreateDate"
+    assert pick_time_column({"Zulu", "Alpha"}) == "Alpha"
+    print("✅ Projection applied")
+
+
+def test_tools_rewrite_using_cached_schema(supervisor_agent):
+    """The Kusto tools bound queries with the cached schema and note the rewrite in their output."""
+    sent = []
+    supervisor_agent.query_kusto_table = lambda *args: sent.append(args[5]) or TabularResult.from_records(
+        [{"IncidentId": 1, "Title": "x"}])
+    supervisor_agent.kusto_schema_fetcher = lambda cluster, db, table, *args: [
+        {"ColumnName": c, "ColumnType": "datetime" if c.endswith("Date") else "string"} for c in INCIDENT_COLUMNS]
+
+    # The incident table's time column is configured, so it is filtered even before its schema is cached
+    supervisor_agent.kusto_incident_query_tool.invoke({"query": "IcMDataWarehouse | where Severity == 1"})
+    supervisor_agent.kusto_incident_schema_tool.invoke({})
+    output = supervisor_agent.kusto_incident_query_tool.invoke(
+        {"query": "IcMDataWarehouse | where ModifiedDate > ago(1d) and Severity == 1", "columns": ["Title"]})
+    supervisor_agent.kusto_incident_query_tool.invoke({"query": "IcMDataWarehouse | where IncidentId == '12345'"})
+    supervisor_agent.kusto_query_tool.invoke({"query": "where CreateDate > ago(1h) | take 10"})
+    # A table whose time column is not known yet needs a time range
+    rejected = supervisor_agent.kusto_query_tool.invoke({"query": "where Actor == 'x'", "table": "AuditEvents"})
+
+    supervisor_agent.DEFAULT_CONFIG["kusto"]["bounding"]["enabled"] = False
+    supervisor_agent.kusto_incident_query_tool.invoke({"query": "IcMDataWarehouse"})
+
+    assert sent[0] == "IcMDataWarehouse | where CreateDate > ago(7d) | where Severity == 1 | take 1000"
+    assert sent[1] == ("IcMDataWarehouse | where ModifiedDate > ago(1d) and Severity == 1 "
+                       "| project Title, IncidentId, Severity, Status, CreateDate, ModifiedDate | take 1000")
+    assert output.startswith("# rewritten: projected 6 of 10 columns; capped rows with take 1000")
+    assert sent[2] == "IcMDataWarehouse | where IncidentId == '12345' | take 1000"
+    assert sent[3] == "IcMDataWarehouse | where CreateDate > ago(1h) | take 10"
+    assert rejected.startswith("Query not sent to Kusto") and "time column of AuditEvents is not known yet" in rejected
+    assert sent[4] == "IcMDataWarehouse"
+    print(f"✅ Tools sent {len(sent)} bounded queries")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_time_filter_and_row_cap_added()
+    test_existing_limits_and_render()
+    test_strings_comments_and_statements()
+    test_projection()
+    with offline_supervisor() as supervisor_agent:
+        test_tools_rewrite_using_cached_schema(supervisor_agent)
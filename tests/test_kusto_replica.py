@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+"""
+Test the local SQLite replica of the incident and deployment tables.
+"""
+
+import sys
+import os
+import re
+import time
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from kusto_replica import KustoReplica, UnsupportedQuery, iso_time, translate_kql
+from tabular_result import TabularResult
+
+NOW = 1754784000.0  # 2025-08-10T00:00:00Z
+TABLES = {"IcMDataWarehouse": {"time_column": "CreateDate", "key_columns": ["IncidentId"]}}
+COLUMNS = {"IncidentId": "long", "Severity": "long", "Title": "string", "Status": "string", "CreateDate": "datetime"}
+
+
+def incident(incident_id, severity, title, status, hours_ago, ingested_hours_ago, now=NOW):
+    return {"IncidentId": incident_id, "Severity": severity, "Title": title, "Status": status,
+            "CreateDate": iso_time(now - hours_ago * 3600), "_IngestedAt": iso_time(now - ingested_hours_ago * 3600)}
+
+
+class FakeCluster:
+    """
+    Answers the replica's sync queries from a list of ingested incident rows (other tables are
+    empty). Like query_kusto_table, it stops reading at `max_rows` and marks the result truncated.
+    """
+
+    def __init__(self, rows, max_rows=None):
+        self.rows = rows
+        self.max_rows = max_rows
+        self.queries = []
+
+    def __call__(self, query):
+        self.queries.append(query)
+        if not query.startswith("IcMDataWarehouse"):
+            return TabularResult.from_records([])
+        rows = sorted(self.rows, key=lambda r: r["_IngestedAt"])
+        since = re.search(r"ingestion_time\(\) (>=|>|==) datetime\(([^)]+)\)", query)
+        if since:
+            compare = {">=": str.__ge__, ">": str.__gt__, "==": str.__eq__}[since.group(1)]
+            rows = [r for r in rows if compare(r["_IngestedAt"], since.group(2))]
+        else:
+            start = re.search(r"CreateDate > datetime\(([^)]+)\)", query).group(1)
+            rows = [r for r in rows if r["CreateDate"] > start]
+        take = re.search(r"take (\d+)$", query)
+        if take:
+            rows = rows[:int(take.group(1))]
+        truncated = self.max_rows is not None and len(rows) > self.max_rows
+        rows = rows[:self.max_rows]
+        names = list(dict.fromkeys(name for row in rows for name in row))
+        types = [{**COLUMNS, "_IngestedAt": "datetime"}.get(name, "string") for name in names]
+        result = TabularResult.from_rows(names, [[row.get(name) for name in names] for row in rows], types)
+        result.truncated = truncated
+        return result
+
+
+def test_translation():
+    """The common KQL subset becomes SQL; the time filter's lower bound is reported."""
+    print("🧪 Testing KQL to SQL translation...")
+    sql, params, bound = translate_kql(
+        "IcMDataWarehouse | where CreateDate > ago(1d) and Title has 'cart' | summarize n = count() by Status | order by n desc",
+        "IcMDataWarehouse", COLUMNS, "CreateDate", NOW)
+    assert 'kql_has("Title", ?)' in sql and 'GROUP BY "Status"' in sql and 'ORDER BY "n" DESC' in sql
+    assert params == ["2025-08-09T00:00:00.000000Z", "cart"] and bound == NOW - 86400
+    # A bound under 'or' or after a take does not limit the rows read
+    assert translate_kql("IcMDataWarehouse | where CreateDate > ago(1d) or Severity == 1", "IcMDataWarehouse",
+                         COLUMNS, "CreateDate", NOW)[2] is None
+    assert translate_kql("IcMDataWarehouse | take 5 | where CreateDate > ago(1d)", "IcMDataWarehouse",
+                         COLUMNS, "CreateDate", NOW)[2] is None
+    for query in ["IcMDataWarehouse | extend x = 1", "IcMDataWarehouse | where Missing == 1",
+                  "IcMDataWarehouse | where CreateDate > ago(1d) // recent", "DeploymentEvents | take 1"]:
+        try:
+            translate_kql(query, "IcMDataWarehouse", COLUMNS, "CreateDate", NOW)
+            raise AssertionError(f"{query} should not translate")
+        except UnsupportedQuery:
+            pass
+    print("✅ Translation covers the common subset")
+
+
+def test_incremental_sync_and_answers():
+    """Rows are pulled by ingestion time, updated in place, and covered queries are answered locally."""
+    cluster = FakeCluster([
+        incident(1, 2, "Checkout latency", "Active", 30, 30),
+        incident(2, 3, "Search errors", "Active", 5, 5),
+        incident(3, 1, "Cart outage", "Active", 2, 2),
+        incident(4, 2, "Very old", "Resolved", 20 * 24, 1),
+    ])
+    clock = [NOW]
+    replica = KustoReplica(":memory:", TABLES, retention_seconds=7 * 86400, max_staleness_seconds=300,
+                           batch_rows=2, clock=lambda: clock[0])
+    assert replica.answer("IcMDataWarehouse | where CreateDate > ago(1d)", "IcMDataWarehouse") is None
+
+    # Two rows per pull; each later pull starts at the last ingestion time seen
+    replica.sync(cluster)
+    assert len(cluster.queries) == 4 and "CreateDate > datetime(2025-08-03T00:00:00.000000Z)" in cluster.queries[0]
+    assert replica.status("IcMDataWarehouse")["rows"] == 3  # the 20 day old incident is outside the retention
+
+    answered = replica.answer("IcMDataWarehouse | where CreateDate > ago(1d) and Severity <= 2 | project IncidentId, Title",
+                              "IcMDataWarehouse")
+    assert answered.to_records() == [{"IncidentId": 3, "Title": "Cart outage"}]
+    count = replica.answer("IcMDataWarehouse | where CreateDate > ago(3d) | summarize n = count() by Status", "IcMDataWarehouse")
+    assert count.to_records() == [{"Status": "Active", "n": 3}]
+    # Older than the replica, or not translatable: the cluster answers
+    assert replica.answer("IcMDataWarehouse | where CreateDate > ago(30d)", "IcMDataWarehouse") is None
+    assert replica.answer("IcMDataWarehouse | where CreateDate > ago(1d) | extend x = 1", "IcMDataWarehouse") is None
+
+    # Incident 3 is mitigated and re-ingested; a stale replica syncs before answering
+    cluster.rows.append({**incident(3, 1, "Cart outage", "Mitigated", 2, 0), "Owner": "cart-team"})
+    clock[0] = NOW + 600
+    answered = replica.answer("IcMDataWarehouse | where CreateDate > ago(1d)", "IcMDataWarehouse", cluster)
+    rows = {row["IncidentId"]: row for row in answered.to_records()}
+    assert answered.row_count == 2 and set(rows) == {2, 3}
+    assert rows[3]["Status"] == "Mitigated" and rows[3]["Owner"] == "cart-team" and rows[2]["Owner"] is None
+    assert str(answered.columns["CreateDate"].dtype) == "datetime64[ns]"
+    assert "ingestion_time() >= datetime(" in cluster.queries[-1]
+    print("✅ Incremental sync keeps the latest row per incident")
+
+
+def test_cut_short_pulls_keep_syncing():
+    """A batch cut at the read limit, or a full batch at a single ingestion time, is not the end of the table."""
+    print("🧪 Testing pulls cut short by the read limit...")
+    rows = [incident(i, 2, f"Incident {i}", "Active", 3, 3 - i / 1000) for i in range(120)]
+    cluster = FakeCluster(rows, max_rows=40)
+    replica = KustoReplica(":memory:", TABLES, batch_rows=50, clock=lambda: NOW)
+    replica.sync(cluster)
+    assert replica.status("IcMDataWarehouse")["rows"] == 120 and replica.is_fresh("IcMDataWarehouse")
+
+    # 120 rows ingested together: the tied time is pulled whole, then the sync moves past it
+    tied = [incident(i, 2, f"Incident {i}", "Active", 3, 3) for i in range(120)] + [incident(500, 1, "Later", "Active", 1, 1)]
+    cluster = FakeCluster(tied, max_rows=200)
+    replica = KustoReplica(":memory:", TABLES, batch_rows=50, clock=lambda: NOW)
+    replica.sync(cluster)
+    assert replica.status("IcMDataWarehouse")["rows"] == 121 and replica.is_fresh("IcMDataWarehouse")
+    assert any("ingestion_time() ==" in q for q in cluster.queries) and "ingestion_time() > datetime(" in cluster.queries[-1]
+
+    # A tied time larger than the read limit cannot be pulled whole: the table stays unsynced
+    replica = KustoReplica(":memory:", TABLES, batch_rows=50, clock=lambda: NOW)
+    replica.sync(FakeCluster(tied, max_rows=100))
+    assert not replica.is_fresh("IcMDataWarehouse")
+    assert replica.answer("IcMDataWarehouse | where CreateDate > ago(1d)", "IcMDataWarehouse") is None
+    print("✅ Only complete pulls mark the replica synced")
+
+
+def test_failed_sync_falls_back():
+    """A stale replica that cannot sync does not answer."""
+    replica = KustoReplica(":memory:", TABLES, clock=lambda: NOW)
+
+    def unreachable(query):
+        raise ConnectionError("cluster unreachable")
+
+    assert replica.answer("IcMDataWarehouse | where CreateDate > ago(1d)", "IcMDataWarehouse", unreachable) is None
+    print("✅ Failed sync falls back to the cluster")
+
+
+def test_tools_use_replica_when_enabled(supervisor_agent):
+    """Query tools answer from the replica for covered windows and go to the cluster otherwise."""
+    cluster_queries = []
+    supervisor_agent.DEFAULT_CONFIG["kusto"]["replica"].update({"enabled": True, "path": ":memory:"})
+    cluster = FakeCluster([incident(1, 2, "Checkout latency", "Active", 3, 3, now=time.time())])
+
+    def fake_query(cluster_uri, database, table, client_id, tenant_id, query, tool=None):
+        cluster_queries.append((tool, query))
+        if tool == "kusto_replica":
+            return cluster(query)
+        return TabularResult.from_records([{"IncidentId": 99}])
+
+    supervisor_agent.query_kusto_table = fake_query
+    local = supervisor_agent.kusto_incident_query_tool.invoke({"query": "IcMDataWarehouse | where CreateDate > ago(1d) | take 10"})
+    remote = supervisor_agent.kusto_incident_query_tool.invoke({"query": "IcMDataWarehouse | where CreateDate > ago(60d) | take 10"})
+
+    assert "answered from local replica" in local and "Checkout latency" in local
+    assert "99" in remote and "local replica" not in remote
+    # One sync of both tables, then only the 60 day query reaches the cluster
+    assert [tool for tool, _ in cluster_queries] == ["kusto_replica", "kusto_replica", "kusto_incident_query_tool"]
+    assert cluster_queries[1][1].startswith("DeploymentEvents | where StartTime > datetime(")
+    print("✅ Tools answer covered windows locally")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_translation()
+    test_incremental_sync_and_answers()
+    test_cut_short_pulls_keep_syncing()
+    test_failed_sync_falls_back()
+    with offline_supervisor() as supervisor_agent:
+        test_tools_use_replica_when_enabled(supervisor_agent)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""
+Test the client request properties (results cache, timeout, truncation, request id) sent with Kusto queries.
+"""
+
+import json
+import sys
+import os
+from datetime import timedelta
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+class FakeColumn:
+    def __init__(self, name, column_type):
+        self.column_name = name
+        self.column_type = column_type
+
+
+class FakeRow(dict):
+    def to_dict(self):
+        return dict(self)
+
+
+class FakeTable(list):
+    columns = [FakeColumn("ColumnName", "string"), FakeColumn("ColumnType", "string")]
+
+    @property
+    def raw_rows(self):
+        return [[row["ColumnName"], row["ColumnType"]] for row in self]
+
+
+class FakeKustoClient:
+    """Records the properties of every execute call."""
+    executed = []
+
+    def __init__(self, kcsb):
+        pass
+
+    def execute(self, database, query, properties=None):
+        FakeKustoClient.executed.append((query, properties))
+        table = FakeTable([FakeRow(ColumnName="IncidentId", ColumnType="long"), FakeRow(ColumnName="CreateDate", ColumnType="datetime")])
+        return type("Response", (), {"primary_results": [table]})()
+
+    def execute_streaming_query(self, database, query, properties=None):
+        response = self.execute(database, query, properties)
+        return type("StreamingResponse", (), {"iter_primary_results": lambda self: iter(response.primary_results)})()
+
+    def close(self):
+        pass
+
+
+def test_properties_from_config(supervisor_agent):
+    """Defaults and per-tool overrides become Kusto request options."""
+    print("🧪 Testing Kusto request properties...")
+    settings = supervisor_agent.DEFAULT_CONFIG["kusto"]["request_properties"]
+    default = supervisor_agent.kusto_request_properties()
+    schema = supervisor_agent.kusto_request_properties("kusto_schema_tool")
+    settings["tools"]["kusto_deployment_query_tool"] = {"truncation_max_records": None, "results_cache_max_age_seconds": 2 * 86400 + 61}
+    deployments = supervisor_agent.kusto_request_properties("kusto_deployment_query_tool")
+
+    assert default.get_option("query_results_cache_max_age", None) == "0.00:05:00"
+    assert default.get_option("servertimeout", None) == timedelta(seconds=120)
+    assert default.get_option("truncationmaxrecords", None) == 50000
+    assert default.client_request_id.startswith("HeyJarvis.query;") and default.application == "HeyJarvis"
+    assert schema.get_option("query_results_cache_max_age", None) == "0.01:00:00"
+    assert schema.client_request_id.startswith("HeyJarvis.kusto_schema_tool;")
+    assert schema.client_request_id != supervisor_agent.kusto_request_properties("kusto_schema_tool").client_request_id
+    assert deployments.get_option("query_results_cache_max_age", None) == "2.00:01:01"
+    assert not deployments.has_option("truncationmaxrecords")
+    assert json.loads(default.to_json())["Options"]["query_results_cache_max_age"] == "0.00:05:00"
+    print("✅ Request properties built from config")
+
+
+def test_tools_send_properties(supervisor_agent):
+    """Schema and query tools pass their request properties to the Kusto client."""
+    FakeKustoClient.executed = []
+    supervisor_agent.KustoClient = FakeKustoClient
+    supervisor_agent.kusto_incident_schema_tool.invoke({})
+    supervisor_agent.kusto_incident_query_tool.invoke({"query": "IcMDataWarehouse | where CreateDate > ago(1d) | take 5"})
+
+    (schema_query, schema_properties), (query, query_properties) = FakeKustoClient.executed
+    assert schema_query == "IcMDataWarehouse|getschema"
+    assert schema_properties.client_request_id.startswith("HeyJarvis.kusto_incident_schema_tool;")
+    assert query == "IcMDataWarehouse | where CreateDate > ago(1d) | take 5"
+    assert query_properties.client_request_id.startswith("HeyJarvis.kusto_incident_query_tool;")
+    assert query_properties.get_option("query_results_cache_max_age", None) == "0.00:10:00"
+    print(f"✅ Tools sent request ids {schema_properties.client_request_id.split(';')[0]} and {query_properties.client_request_id.split(';')[0]}")
+
+
+def test_read_limits_below_server_truncation(supervisor_agent):
+    """Every reader cut-off is below the server's truncation limit, so cut results are marked truncated."""
+    kusto = supervisor_agent.DEFAULT_CONFIG["kusto"]
+    limits = [kusto["request_properties"]["truncation_max_records"]]
+    limits += [options["truncation_max_records"] for options in kusto["request_properties"]["tools"].values()
+               if options.get("truncation_max_records")]
+    reads = [kusto["streaming"]["max_rows"], kusto["batch"]["max_rows_per_result"],
+             kusto["correlation"]["max_incidents"], kusto["correlation"]["max_deployments"]]
+
+    assert max(reads) < min(limits), (reads, limits)
+    print(f"✅ Reads stop at {max(reads)} rows, server truncates at {min(limits)}")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    with offline_supervisor() as supervisor_agent:
+        test_properties_from_config(supervisor_agent)
+    with offline_supervisor() as supervisor_agent:
+        test_tools_send_properties(supervisor_agent)
+    with offline_supervisor() as supervisor_agent:
+        test_read_limits_below_server_truncation(supervisor_agent)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+"""
+Test progressive reading of Kusto query results with a row budget.
+"""
+
+import sys
+import os
+import tracemalloc
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from kusto_stream import read_kusto_stream, stream_kusto_query
+from tabular_result import TabularResult
+
+COLUMNS = [("DeploymentId", "string"), ("Service", "string"), ("StartTime", "datetime"), ("DurationMinutes", "real"), ("Attempts", "long")]
+
+
+class FakeColumn:
+    def __init__(self, name, column_type):
+        self.column_name = name
+        self.column_type = column_type
+
+
+class FakeStreamingTable:
+    """Streaming primary result: rows are generated as they are read and counted."""
+
+    def __init__(self, count):
+        self.columns = [FakeColumn(name, column_type) for name, column_type in COLUMNS]
+        self.rows_read = 0
+        self.raw_rows = self._rows(count)
+
+    def _rows(self, count):
+        for i in range(count):
+            self.rows_read += 1
+            yield [f"dep-{i}", f"svc-{i % 7}", f"2025-08-0{1 + i % 9}T10:{i % 60:02d}:00Z",
+                   None if i % 11 == 0 else 12.5 + i % 5, None if i == 3 else i % 3]
+
+
+class FakeClient:
+    def __init__(self, table):
+        self.table = table
+        self.closed = False
+        self.calls = []
+
+    def execute_streaming_query(self, database, query, properties=None):
+        self.calls.append((database, query, properties))
+        tables = iter([self.table])
+        return type("StreamingResponse", (), {"iter_primary_results": lambda self: tables})()
+
+    def close(self):
+        self.closed = True
+
+
+def test_chunks_match_one_shot_conversion():
+    """Reading in chunks gives the same columns as converting all rows at once."""
+    print("🧪 Testing chunked Kusto result reading...")
+    table = FakeStreamingTable(1234)
+    chunks = []
+    result = read_kusto_stream(table, chunk_rows=500, on_chunk=lambda part, rows: chunks.append(rows))
+
+    expected_rows = list(FakeStreamingTable(1234).raw_rows)
+    expected = TabularResult.from_rows([n for n, _ in COLUMNS], expected_rows, [t for _, t in COLUMNS])
+    assert chunks == [500, 1000, 1234]
+    assert result.row_count == 1234 and not result.truncated
+    for name in result.column_names:
+        if result.columns[name].dtype == object:
+            assert list(result.columns[name]) == list(expected.columns[name]), name
+        else:
+            np.testing.assert_array_equal(result.columns[name], expected.columns[name])
+    # The long column has a null in the first chunk only; the chunks are widened to float64
+    assert result.columns["Attempts"].dtype == np.float64 and np.isnan(result.columns["Attempts"][3])
+    assert result.columns["StartTime"].dtype == np.dtype("datetime64[ns]")
+    print("✅ Chunks match one-shot conversion")
+
+
+def test_row_budget_stops_early():
+    """Reading stops at the row budget, the result is marked truncated and the client closed."""
+    table = FakeStreamingTable(100000)
+    client = FakeClient(table)
+    result = stream_kusto_query(client, "db", "DeploymentEvents", max_rows=2500, chunk_rows=1000)
+    assert result.row_count == 2500 and result.truncated
+    assert table.rows_read == 2501  # one row past the budget tells truncation apart from an exact fit
+    assert client.closed
+
+    exact = read_kusto_stream(FakeStreamingTable(2500), max_rows=2500, chunk_rows=1000)
+    assert exact.row_count == 2500 and not exact.truncated
+    empty = read_kusto_stream(FakeStreamingTable(0))
+    assert empty.row_count == 0 and empty.column_names == [n for n, _ in COLUMNS]
+    print(f"✅ Stopped after {table.rows_read} of 100000 rows")
+
+
+def test_peak_memory_below_materialized_rows():
+    """Chunked reading never holds all rows as Python lists."""
+    count = 100000
+    tracemalloc.start()
+    rows = list(FakeStreamingTable(count).raw_rows)
+    TabularResult.from_rows([n for n, _ in COLUMNS], rows, [t for _, t in COLUMNS])
+    full_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del rows
+
+    tracemalloc.start()
+    read_kusto_stream(FakeStreamingTable(count), chunk_rows=5000)
+    stream_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    assert stream_peak < full_peak / 2, (stream_peak, full_peak)
+    print(f"✅ Peak memory {stream_peak / 1e6:.1f} MB streamed vs {full_peak / 1e6:.1f} MB materialized")
+
+
+def test_tool_notes_truncation(supervisor_agent):
+    """The Kusto tools stream with the configured budget and tell the agent when rows were cut."""
+    clients = []
+    def make_client(kcsb):
+        clients.append(FakeClient(FakeStreamingTable(300)))
+        return clients[-1]
+    supervisor_agent.KustoClient = make_client
+    supervisor_agent.DEFAULT_CONFIG["kusto"]["streaming"]["max_rows"] = 120
+    output = supervisor_agent.kusto_deployment_query_tool.invoke({"query": "DeploymentEvents | where StartTime > ago(1d) | take 300"})
+
+    assert clients[0].closed and clients[0].calls[0][1] == "DeploymentEvents | where StartTime > ago(1d) | take 300"
+    assert output.startswith("# result truncated to 120 rows; narrow the time range or add filters")
+    print("✅ Tool notes truncation")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_chunks_match_one_shot_conversion()
+    test_row_budget_stops_early()
+    test_peak_memory_below_materialized_rows()
+    with offline_supervisor() as supervisor_agent:
+        test_tool_notes_truncation(supervisor_agent)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+"""
+Test the cached Prometheus label/label-value index and its lookup tool.
+"""
+
+import sys
+import os
+import time
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from label_index import BackgroundIndex, LabelIndex, format_lookup
+
+
+def make_payload():
+    rows = []
+    for namespace, pods in (("prod", ["checkout-7d9f-abcde", "checkout-7d9f-fghij", "payments-55c-xyz"]),
+                            ("staging", ["checkout-1a2b-qrstu"])):
+        for pod in pods:
+            for container, count in (("app", 300), ("istio-proxy", 100)):
+                rows.append({"labels": {"namespace": namespace, "pod": pod, "container": container},
+                             "count": count + (50 if pod.startswith("payments") else 0)})
+    return {
+        "label_names": ["__name__", "container", "instance", "job", "namespace", "pod"],
+        "values": {"job": ["cadvisor", "kube-state-metrics"], "namespace": ["prod", "staging", "kube-system"]},
+        "hierarchy": ["namespace", "pod", "container"],
+        "hierarchy_counts": rows,
+    }
+
+
+def test_index_counts_and_relations():
+    """Series counts and related labels are derived from the hierarchy counts."""
+    print("🧪 Testing label index build...")
+    index = LabelIndex.from_payload(make_payload())
+
+    assert index.series_count("namespace", "prod") == 3 * 400 + 100
+    assert index.series_count("pod", "checkout-7d9f-abcde") == 400
+    assert index.series_count("namespace", "kube-system") is None  # known value without hierarchy counts
+    assert index.related[("pod", "payments-55c-xyz")]["namespace"] == {"prod": 500}
+    assert set(index.related[("pod", "payments-55c-xyz")]["container"]) == {"app", "istio-proxy"}
+    print(f"✅ Index with {len(index)} label values")
+
+
+def test_prefix_substring_and_fuzzy_lookup():
+    """Prefix matches come first, then substring and fuzzy matches."""
+    index = LabelIndex.from_payload(make_payload())
+
+    results = index.lookup("checkout-7d9f", label="pod")
+    assert [r["value"] for r in results] == ["checkout-7d9f-abcde", "checkout-7d9f-fghij"]
+    assert all(r["match"] == "prefix" for r in results)
+
+    results = index.lookup("7d9f", label="pod")
+    assert {r["match"] for r in results} == {"substring"}
+
+    results = index.lookup("paymnts-55c-xyz", label="pod")
+    assert results[0]["value"] == "payments-55c-xyz" and results[0]["match"] == "fuzzy"
+
+    # Without a label every indexed label is searched
+    assert {(r["label"], r["value"]) for r in index.lookup("prod")} >= {("namespace", "prod")}
+    assert index.lookup_label_names("names")[0] == "namespace"
+    assert index.lookup_label_names("contaner")[0] == "container"
+
+    text = format_lookup(index.lookup("payments", label="pod"))
+    assert text == "pod=payments-55c-xyz series=500 container=app,istio-proxy namespace=prod"
+    print(f"✅ Lookup works: {text}")
+
+
+def test_lookup_is_fast_on_large_index():
+    """Lookups over tens of thousands of values stay well under a second."""
+    rows = [{"labels": {"namespace": f"ns-{i % 50}", "pod": f"service-{i}-pod-{i * 7 % 1000:04d}", "container": "app"}, "count": 10}
+            for i in range(20000)]
+    index = LabelIndex.from_payload({"hierarchy_counts": rows})
+    start = time.perf_counter()
+    results = index.lookup("service-1234", label="pod")
+    elapsed = time.perf_counter() - start
+    assert results[0]["value"].startswith("service-1234")
+    assert elapsed < 1.0, elapsed
+    print(f"✅ Lookup over {len(index)} values in {elapsed * 1000:.1f} ms")
+
+
+def test_background_index_keeps_last_good_index():
+    """A failed refresh keeps the previous index and records the error."""
+    calls = []
+
+    def loader():
+        calls.append(1)
+        if len(calls) > 1:
+            raise RuntimeError("workspace unavailable")
+        return LabelIndex.from_payload(make_payload())
+
+    holder = BackgroundIndex(loader, refresh_seconds=3600)
+    try:
+        first = holder.get()
+        assert first is not None and holder.get() is first and len(calls) == 1
+        assert holder.refresh() is first
+        assert holder.last_error == "workspace unavailable"
+    finally:
+        holder.stop()
+    print("✅ Background index keeps the last good index")
+
+
+def test_fetch_bounds_the_count_query(supervisor_agent):
+    """The hierarchy count query only covers the series matching hierarchy_match."""
+    calls = []
+
+    class FakeResponse:
+        def __init__(self, data):
+            self.data = data
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"status": "success", "data": self.data}
+
+    class FakeSession:
+        def get(self, url, params=None, headers=None):
+            calls.append((url, params))
+            if url.endswith("/api/v1/labels"):
+                return FakeResponse(["namespace", "pod", "container", "job"])
+            if url.endswith("/values"):
+                return FakeResponse(["cadvisor"])
+            return FakeResponse({"result": [{"metric": {"namespace": "prod", "pod": "api-1", "container": "app"},
+                                             "value": [0, "12"]}]})
+
+    supervisor_agent.get_prometheus_session = lambda: FakeSession()
+    supervisor_agent.DefaultAzureCredential = lambda: type("Credential", (), {
+        "get_token": lambda self, scope: type("Token", (), {"token": "t"})()})()
+    payload = supervisor_agent.fetch_prometheus_label_index(
+        "https://prom", "id", ["job", "region"], ["namespace", "pod", "container"], '__name__=~"container_.*"')
+
+    assert calls[-1] == ("https://prom/api/v1/query", {"query": 'count by (namespace, pod, container) '
+                                                                 '({namespace!="",pod!="",container!="",__name__=~"container_.*"})'})
+    assert payload["values"] == {"job": ["cadvisor"]} and payload["hierarchy_counts"][0]["count"] == 12
+    print("✅ Count query bounded by the matcher")
+
+
+def test_lookup_tool(supervisor_agent):
+    """prometheus_label_lookup_tool answers from the cached index."""
+    fetches = []
+    supervisor_agent.fetch_prometheus_label_index = lambda *args: fetches.append(args) or make_payload()
+    output = supervisor_agent.prometheus_label_lookup_tool.invoke({"search": "checkout", "label": "pod"})
+    again = supervisor_agent.prometheus_label_lookup_tool.invoke({"search": "staging", "label": "namespace"})
+    names = supervisor_agent.prometheus_label_lookup_tool.invoke({"search": "pod", "label": "__label__"})
+    unknown = supervisor_agent.prometheus_label_lookup_tool.invoke({"search": "x", "label": "region"})
+    supervisor_agent.prometheus_label_index.stop()
+
+    assert len(fetches) == 1
+    assert output.split("\n")[0].startswith("pod=checkout-")
+    assert again.startswith("namespace=staging series=400")
+    assert names == "pod"
+    assert unknown.startswith("Label 'region' is not indexed")
+    print(f"✅ Tool output:\n{output}")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_index_counts_and_relations()
+    test_prefix_substring_and_fuzzy_lookup()
+    test_lookup_is_fast_on_large_index()
+    test_background_index_keeps_last_good_index()
+    with offline_supervisor() as supervisor_agent:
+        test_fetch_bounds_the_count_query(supervisor_agent)
+    with offline_supervisor() as supervisor_agent:
+        test_lookup_tool(supervisor_agent)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+"""
+Test the load-test driver with a small, fast run against the real supervisor graph
+using the local LLM and backend stand-ins.
+"""
+
+import sys
+import os
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from load_test import OFFLINE_SECRETS, default_question_mix, percentiles, run_load_test
+
+
+def test_percentiles():
+    """Percentiles are computed over turn latencies and handle empty input."""
+    print("🧪 Testing latency percentiles...")
+
+    result = percentiles([i / 100 for i in range(1, 101)])
+    assert result == {"p50": 0.505, "p95": 0.95, "p99": 0.99}
+    assert percentiles([]) == {"p50": None, "p95": None, "p99": None}
+    print(f"✅ Percentiles: {result}")
+
+
+def test_question_mix_is_weighted():
+    """The built-in question mix covers all three agents with weights summing to 1."""
+    mix = default_question_mix()
+    assert abs(sum(w for w, _ in mix) - 1.0) < 1e-9
+    handoffs = {turn["llm"][0]["response"]["data"]["tool_calls"][0]["name"] for _, turn in mix}
+    assert handoffs == {"transfer_to_kusto_agent", "transfer_to_prometheus_agent", "transfer_to_log_analytics_agent"}
+    print(f"✅ {len(mix)} question types: {sorted(handoffs)}")
+
+
+def test_small_load_run():
+    """A short in-process run reports latency, queue depth, RSS and CPU."""
+    print("🧪 Running a small load test...")
+
+    try:
+        report = run_load_test(
+            users=4, workers=1, slots=2, min_turns=1, max_turns=2,
+            think_time=0, ramp_up=0, latency_scale=0.01, seed=7
+        )
+    finally:
+        sys.modules.pop('supervisor_agent', None)
+        for name in OFFLINE_SECRETS:
+            if os.environ.get(name) == "load-test":
+                del os.environ[name]
+
+    assert report["errors"] == 0, report
+    assert 4 <= report["turns"] <= 8
+    assert report["turn_latency"]["p50"] is not None
+    assert report["turn_latency"]["p99"] >= report["turn_latency"]["p50"]
+
+    worker = report["per_worker"][0]
+    assert worker["turns"] == report["turns"]
+    assert worker["rss_mb"]["peak"] > 0
+    assert worker["cpu_seconds"] >= 0
+    assert worker["queue_depth"]["max"] >= 0
+    print(f"✅ {report['turns']} turns, latency {report['turn_latency']}, worker {worker}")
+
+
+if __name__ == "__main__":
+    test_percentiles()
+    test_question_mix_is_weighted()
+    test_small_load_run()
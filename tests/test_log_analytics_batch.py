@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+"""
+Test the batch Log Analytics tool: several named queries in one request with per-query status.
+"""
+
+import sys
+import os
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from azure.monitor.query import LogsQueryStatus
+
+from run_recorder import _from_jsonable, _record_payload
+
+class FakeTable:
+    def __init__(self, columns, rows, types=None):
+        self.columns = columns
+        self.columns_types = types
+        self.rows = rows
+
+
+class FakeResult:
+    def __init__(self, status, tables=None, error=None):
+        self.status = status
+        if status == LogsQueryStatus.PARTIAL:
+            self.partial_data = tables
+            self.partial_error = type("Error", (), {"message": error})()
+        else:
+            self.tables = tables
+
+
+class FakeError:
+    status = LogsQueryStatus.FAILURE
+    message = "Failed to resolve table 'ContainerLogV3'"
+
+
+class FakeLogsQueryClient:
+    """Answers a batch by query text; records every request."""
+    requests = []
+
+    def __init__(self, credential):
+        pass
+
+    def query_batch(self, queries):
+        FakeLogsQueryClient.requests.append(queries)
+        answers = []
+        for query in queries:
+            if "ContainerLogV3" in query.body["query"]:
+                answers.append(FakeError())
+            elif "restarts" in query.body["query"]:
+                answers.append(FakeResult(LogsQueryStatus.PARTIAL, [FakeTable(["PodName", "Restarts"], [["api-0", 3]])],
+                                          "Query result exceeded the 64 MB limit"))
+            else:
+                answers.append(FakeResult(LogsQueryStatus.SUCCESS, [FakeTable(["LogLevel", "count_"], [["error", 42], ["warning", 7]])]))
+        return answers
+
+
+def test_batch_tool_one_request_per_call(supervisor_agent):
+    """All queries go out in one batch request; each section reports its own status."""
+    print("🧪 Testing Log Analytics batch queries...")
+    FakeLogsQueryClient.requests = []
+    supervisor_agent.LogsQueryClient = FakeLogsQueryClient
+    supervisor_agent.DefaultAzureCredential = lambda: None
+    output = supervisor_agent.log_analytics_batch_query_tool.invoke({"queries": [
+        {"name": "errors", "query": "ContainerLogV2 | summarize count() by LogLevel"},
+        {"name": "restarts", "query": "KubePodInventory | summarize restarts = max(PodRestartCount) by Name"},
+        {"name": "missing", "query": "ContainerLogV3 | take 5"},
+        {"query": "ContainerLogV2 | take 5"},
+    ], "timespan": "6h"})
+    too_many = supervisor_agent.log_analytics_batch_query_tool.invoke({"queries": [{"query": "T"}] * 11})
+    bad_timespan = supervisor_agent.log_analytics_batch_query_tool.invoke({"queries": [{"query": "T"}], "timespan": "six hours"})
+
+    assert len(FakeLogsQueryClient.requests) == 1 and len(FakeLogsQueryClient.requests[0]) == 4
+    assert FakeLogsQueryClient.requests[0][0].body["timespan"] == "PT21600.0S"
+    assert "## errors [success]\n" in output and "error,42" in output
+    assert "## restarts [partial]\n# partial result: Query result exceeded the 64 MB limit\n" in output and "api-0,3" in output
+    assert "## missing [error]\nerror: Failed to resolve table 'ContainerLogV3'" in output
+    assert "## q4 [success]" in output
+    assert too_many.startswith("Too many queries (11)")
+    assert bad_timespan.startswith("Invalid timespan")
+    print("✅ Four queries answered by one request")
+
+
+def test_batch_outcomes_replay(supervisor_agent):
+    """Recorded batch outcomes are rebuilt with their tables."""
+    supervisor_agent.LogsQueryClient = FakeLogsQueryClient
+    supervisor_agent.DefaultAzureCredential = lambda: None
+    outcomes = supervisor_agent.query_log_analytics_batch("ws", [{"name": "a", "query": "ContainerLogV2 | take 1"},
+                                                                 {"name": "b", "query": "ContainerLogV3"}], "client")
+    replayed = _from_jsonable(_record_payload("query_log_analytics_batch", outcomes))
+    assert replayed[0]["result"].to_records() == outcomes[0]["result"].to_records()
+    assert replayed[1]["result"] is None and replayed[1]["status"] == "error"
+    print("✅ Batch outcomes replay")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    with offline_supervisor() as supervisor_agent:
+        test_batch_tool_one_request_per_call(supervisor_agent)
+    with offline_supervisor() as supervisor_agent:
+        test_batch_outcomes_replay(supervisor_agent)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+"""
+Test log template mining and the compressed Log Analytics tool output.
+"""
+
+import sys
+import os
+import time
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from log_templates import LogTemplateMiner, mine_log_templates
+from tabular_result import TabularResult
+
+
+def container_logs(lines, seed=0):
+    rng = np.random.default_rng(seed)
+    patterns = [
+        "Request {id} to /api/orders/{n} failed after {ms}ms with status 503",
+        "Connection to 10.0.{a}.{b}:5432 timed out after {s}s",
+        "User {id} not authorized for resource orders/{n}",
+    ]
+    choice = rng.integers(len(patterns), size=lines)
+    messages = [patterns[i].format(id=f"{rng.integers(1 << 40):x}", n=rng.integers(10000), ms=rng.integers(1000),
+                                   a=rng.integers(256), b=rng.integers(256), s=rng.integers(60)) for i in choice]
+    base = np.datetime64("2025-08-08T09:00:00", "ns")
+    return TabularResult({
+        "TimeGenerated": base + (np.arange(lines) * 10**9).astype("timedelta64[ns]"),
+        "PodName": np.array([f"orders-{i % 3}" if c != 1 else "db-proxy-0" for i, c in enumerate(choice)], dtype=object),
+        "LogMessage": np.array(messages, dtype=object),
+    })
+
+
+def test_miner_groups_variable_tokens():
+    """Lines that differ in ids and numbers share a template; different wording does not."""
+    print("🧪 Testing Drain-style template mining...")
+    miner = LogTemplateMiner()
+    first = miner.add("Pod api-0 restarted after OOMKilled exit code 137")
+    assert miner.add("Pod api-7 restarted after OOMKilled exit code 137") == first
+    assert miner.add("Pod api-3 restarted after Error exit code 1") == first
+    assert miner.template(first) == "Pod <*> restarted after <*> exit code <*>"
+    assert miner.add("Health check passed") != first
+    # Same leading words, mostly different tokens: a separate template
+    assert miner.add("Pod api-0 evicted because node ran out of disk") != first
+    print("✅ Templates mined")
+
+
+def test_templates_with_counts_times_and_pods():
+    """Templates come with counts, first/last seen, pods and example parameters, most frequent first."""
+    logs = container_logs(3000)
+    templates = mine_log_templates(logs, max_pods=2)
+    rows = templates.to_records()
+    assert templates.row_count == 3 and sum(r["Count"] for r in rows) == 3000
+    assert [r["Count"] for r in rows] == sorted((r["Count"] for r in rows), reverse=True)
+    by_template = {r["Template"]: r for r in rows}
+    timeouts = by_template["Connection to <*> timed out after <*>"]
+    assert timeouts["Pods"] == "db-proxy-0" and timeouts["PodCount"] == 1
+    assert timeouts["FirstSeen"] < timeouts["LastSeen"]
+    orders = by_template["Request <*> to /api/orders/<*> failed after <*> with status <*>"]
+    assert orders["PodCount"] == 3 and orders["Pods"].endswith(", ...")
+    first_line = next(m for m in logs.columns["LogMessage"] if m.startswith("Request"))
+    assert orders["ExampleParams"].split(", ")[0] == first_line.split()[1]
+    print("✅ Template table built")
+
+
+def test_mining_is_fast():
+    """100k lines are mined in about a second."""
+    logs = container_logs(100_000, seed=1)
+    start = time.perf_counter()
+    templates = mine_log_templates(logs)
+    elapsed = time.perf_counter() - start
+    # A few ids happen to be all letters, so they are not masked and start their own template
+    assert templates.columns["Count"][:3].sum() > 99_900
+    assert elapsed < 3.0, elapsed
+    print(f"✅ 100k lines mined in {elapsed * 1000:.0f} ms")
+
+
+def test_tool_returns_templates(supervisor_agent):
+    """Large log results reach the model as templates unless compress_logs=False."""
+    supervisor_agent.query_log_analytics = lambda workspace_id, query, client_id: container_logs(500)
+    compressed = supervisor_agent.query_log_analytics_tool.invoke({"query": "ContainerLogV2 | where LogLevel == 'error'"})
+    raw = supervisor_agent.query_log_analytics_tool.invoke({"query": "ContainerLogV2 | take 500", "compress_logs": False})
+    assert compressed.startswith("# 500 log lines mined into 3 templates")
+    assert "Connection to <*> timed out after <*>" in compressed
+    assert "Connection to <*>" not in raw and "500 rows" in raw
+    print("✅ Tool output compressed")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_miner_groups_variable_tokens()
+    test_templates_with_counts_times_and_pods()
+    test_mining_is_fast()
+    with offline_supervisor() as supervisor_agent:
+        test_tool_returns_templates(supervisor_agent)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+"""
+Test the vectorized lagged metric correlation and its tool.
+"""
+
+import sys
+import os
+import threading
+import time
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from metric_correlation import correlate_with_target, lagged_correlations
+
+START = 1754643600  # 2025-08-08T09:00:00Z
+POINTS = 360
+
+
+def driver(seed=0):
+    """Random walk shared by the target and the related candidates (index i is minute i - 20)."""
+    return np.cumsum(np.random.default_rng(seed).normal(size=POINTS + 40))
+
+
+def matrix(series, start=START):
+    """{labels: values} -> Prometheus matrix response on a 1m grid."""
+    timestamps = start + 60 * np.arange(POINTS)
+    return {"status": "success", "data": {"resultType": "matrix", "result": [
+        {"metric": dict(labels), "values": np.column_stack([timestamps, values])} for labels, values in series.items()
+    ]}}
+
+
+def latency_response():
+    return matrix({(("__name__", "latency"),): driver()[20:20 + POINTS]})
+
+
+def candidate_responses(noise_series=300):
+    base = driver()
+    rng = np.random.default_rng(1)
+    cpu = {(("container", f"app-{i}"),): np.cumsum(rng.normal(size=POINTS)) for i in range(noise_series)}
+    cpu[(("container", "checkout"),)] = base[15:15 + POINTS] + rng.normal(0, 0.1, POINTS)  # follows 5 minutes later
+    errors = {(("service", "payments"),): base[23:23 + POINTS]}  # leads by 3 minutes
+    return {"cpu": matrix(cpu), "error_rate": matrix(errors)}
+
+
+def test_lagged_correlations_match_pearson():
+    """Every lag equals Pearson's r over the overlapping samples, with gaps masked."""
+    print("🧪 Testing lagged correlations...")
+    rng = np.random.default_rng(0)
+    target = rng.normal(size=200)
+    candidates = np.vstack([np.r_[np.zeros(4), target[:-4]], rng.normal(size=200), np.full(200, 3.0)])
+    target[::9] = np.nan
+    candidates[1, ::5] = np.nan
+    r = lagged_correlations(target, candidates, 10)
+    assert r.shape == (3, 21)
+    assert np.argmax(r[0]) - 10 == -4 and r[0, 6] > 0.99  # candidate 0 repeats the target 4 steps later
+    for lag in (-7, 0, 3):
+        a = target[max(lag, 0):200 + min(lag, 0)]
+        b = candidates[1, max(-lag, 0):200 - max(lag, 0)]
+        both = ~np.isnan(a) & ~np.isnan(b)
+        assert abs(np.corrcoef(a[both], b[both])[0, 1] - r[1, 10 + lag]) < 1e-9
+    assert np.isnan(r[2]).all()  # a flat series correlates with nothing
+    print("✅ Lagged correlations exact")
+
+
+def test_related_series_ranked_with_lag():
+    """Out of 300 random walks, the two related series come first with their lead and lag."""
+    started = time.perf_counter()
+    table, stats = correlate_with_target(latency_response(), candidate_responses(), 60, 900, top=5)
+    elapsed = time.perf_counter() - started
+    rows = table.to_records()
+    assert stats == {"candidates": 302, "target_series": 1, "lags": 31}
+    assert [(r["Metric"], r["Series"]) for r in rows[:2]] == [("error_rate", "{service=payments}"), ("cpu", "{container=checkout}")]
+    assert rows[0]["LagSeconds"] == 180.0 and rows[0]["Relation"] == "moves first" and rows[0]["Correlation"] == 1.0
+    assert rows[1]["LagSeconds"] == -300.0 and rows[1]["Relation"] == "moves after" and rows[1]["Correlation"] > 0.9
+    assert abs(rows[2]["Correlation"]) < 0.5 and len(rows) == 5
+    assert elapsed < 1.0, elapsed
+
+    # Levels of unrelated random walks correlate spuriously; changes do not
+    levels, _ = correlate_with_target(latency_response(), candidate_responses(), 60, 900, difference=False, top=3)
+    assert abs(levels.to_records()[2]["Correlation"]) > abs(rows[2]["Correlation"])
+    print(f"✅ 302 series ranked in {elapsed * 1000:.0f} ms")
+
+
+def test_tool_fetches_candidates_concurrently(supervisor_agent):
+    """The tool fetches the target and every candidate metric in parallel and returns the ranking."""
+    calls, threads = [], set()
+    def fake_range(query_endpoint, promql_query, start_time, end_time, step, client_id):
+        calls.append(promql_query)
+        threads.add(threading.get_ident())
+        time.sleep(0.05)
+        if promql_query == "latency":
+            return latency_response()
+        if promql_query == "broken":
+            return {"status": "error", "error": "bad_data"}
+        if promql_query == "unreachable":
+            raise ConnectionError("connection reset")
+        return candidate_responses(noise_series=20)["cpu" if "cpu" in promql_query else "error_rate"]
+
+    supervisor_agent.cached_promql_range_query = fake_range
+    output = supervisor_agent.metric_correlation_tool.invoke({
+        "target_query": "latency", "start_time": "2025-08-08T09:00:00Z", "end_time": "2025-08-08T15:00:00Z", "top": 3})
+    custom = supervisor_agent.metric_correlation_tool.invoke({
+        "target_query": "latency", "candidate_queries": {"cpu": "rate(cpu[5m])", "other": "broken", "down": "unreachable"}})
+    invalid = supervisor_agent.metric_correlation_tool.invoke({"target_query": "latency", "max_lag": "soon"})
+
+    assert len(calls) == 1 + 6 + 1 + 3 and len(threads) > 1
+    assert output.startswith("# 26 candidate series from 6 metrics correlated with the target (step-to-step changes) at lags up to 15m")
+    assert "{service=payments},1,180,moves first" in output
+    assert custom.startswith("# 21 candidate series from 1 metrics") and "failed: other, down" in custom
+    assert invalid.startswith("Invalid time range")
+    print("✅ Tool ranked candidates")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_lagged_correlations_match_pearson()
+    test_related_series_ranked_with_lag()
+    with offline_supervisor() as supervisor_agent:
+        test_tool_fetches_candidates_concurrently(supervisor_agent)
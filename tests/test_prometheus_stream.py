@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+"""
+Test the streaming decoder for large Prometheus query responses.
+"""
+
+import io
+import json
+import sys
+import os
+import tracemalloc
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+import prometheus_stream
+from prometheus_stream import parse_prometheus_response
+from series_downsampling import downsample_prometheus_response
+from tool_result_encoding import encode_tool_result
+
+
+def make_matrix(series=20, points=500):
+    return {"status": "success", "data": {"resultType": "matrix", "result": [
+        {"metric": {"__name__": "container_cpu_usage_seconds_total", "namespace": "prod", "pod": f"checkout-{s}"},
+         "values": [[1754643600 + p * 15, "NaN" if p == 7 else str(round(0.1 * s + 0.001 * p, 4))] for p in range(points)]}
+        for s in range(series)
+    ]}}
+
+
+class CountingStream(io.BytesIO):
+    """BytesIO that remembers how many bytes were read."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def as_stream(payload):
+    return CountingStream(json.dumps(payload).encode())
+
+
+def test_matrix_decoded_into_arrays():
+    """Matrix series come back as float64 [timestamp, value] arrays with their labels."""
+    print("🧪 Testing streamed matrix decoding...")
+    payload = make_matrix(series=3, points=10)
+    response = parse_prometheus_response(as_stream(payload))
+
+    assert response["status"] == "success" and response["data"]["resultType"] == "matrix"
+    result = response["data"]["result"]
+    assert [s["metric"] for s in result] == [s["metric"] for s in payload["data"]["result"]]
+    values = result[1]["values"]
+    assert isinstance(values, np.ndarray) and values.dtype == np.float64 and values.shape == (10, 2)
+    assert values[0, 0] == 1754643600 and values[3, 1] == 0.103
+    assert np.isnan(values[7, 1])
+    assert "truncated" not in response
+    print("✅ Matrix decoded")
+
+
+def test_vector_scalar_and_warnings():
+    """Vector samples keep the API form; scalar results and warnings are kept."""
+    vector = {"status": "success", "warnings": ["partial data"], "data": {"resultType": "vector", "result": [
+        {"metric": {"pod": "api-0"}, "value": [1754643600.5, "0.25"]}]}}
+    response = parse_prometheus_response(as_stream(vector))
+    assert response["data"]["result"] == [{"metric": {"pod": "api-0"}, "value": [1754643600.5, "0.25"]}]
+    assert response["warnings"] == ["partial data"]
+
+    scalar = {"status": "success", "data": {"resultType": "scalar", "result": [1754643600, "42"]}}
+    assert parse_prometheus_response(as_stream(scalar)) == scalar
+
+    empty = {"status": "success", "data": {"resultType": "matrix", "result": []}}
+    assert parse_prometheus_response(as_stream(empty)) == empty
+    print("✅ Vector, scalar and warnings kept")
+
+
+def test_budgets_stop_reading_early():
+    """Series and point budgets stop the parser before the rest of the body is read."""
+    payload = make_matrix(series=200, points=300)
+    stream = as_stream(payload)
+    total = len(stream.getvalue())
+
+    response = parse_prometheus_response(stream, max_series=10)
+    assert len(response["data"]["result"]) == 10
+    assert response["truncated"] == {"series": 10, "points": 3000}
+    assert "truncated to 10 series" in response["warnings"][0]
+    assert stream.bytes_read < total / 5, (stream.bytes_read, total)
+
+    response = parse_prometheus_response(as_stream(payload), max_points=1000)
+    assert [len(s["values"]) for s in response["data"]["result"]] == [300, 300, 300, 100]
+    assert response["truncated"] == {"series": 4, "points": 1000}
+
+    # A budget that is met exactly is not a truncation
+    response = parse_prometheus_response(as_stream(make_matrix(series=2, points=5)), max_series=2, max_points=10)
+    assert "truncated" not in response
+    print(f"✅ Stopped after {stream.bytes_read} of {total} bytes")
+
+
+def test_fallback_without_ijson():
+    """Without ijson the body is loaded with json and gives the same result."""
+    payload = make_matrix(series=4, points=50)
+    streamed = parse_prometheus_response(as_stream(payload), max_points=120)
+    original = prometheus_stream.ijson
+    prometheus_stream.ijson = None
+    try:
+        loaded = parse_prometheus_response(as_stream(payload), max_points=120)
+    finally:
+        prometheus_stream.ijson = original
+
+    assert loaded["truncated"] == streamed["truncated"]
+    for a, b in zip(loaded["data"]["result"], streamed["data"]["result"]):
+        assert a["metric"] == b["metric"]
+        np.testing.assert_array_equal(a["values"], b["values"])
+    print("✅ Fallback matches the streaming parser")
+
+
+def test_streamed_response_encodes_like_json():
+    """Encoders and downsampling give the same output for streamed and json-decoded responses."""
+    payload = make_matrix(series=5, points=400)
+    streamed = parse_prometheus_response(as_stream(payload))
+
+    assert encode_tool_result(streamed) == encode_tool_result(payload)
+    assert encode_tool_result(downsample_prometheus_response(streamed, 60)) == encode_tool_result(downsample_prometheus_response(payload, 60))
+    assert json.loads(encode_tool_result(streamed, prometheus_encoding="raw_json"))["data"]["result"][0]["values"][1] == [1754643615.0, 0.001]
+    print("✅ Streamed responses encode like json-decoded ones")
+
+
+def test_peak_memory_lower_than_json():
+    """Decoding into arrays needs a fraction of the memory of the Python object tree."""
+    body = json.dumps(make_matrix(series=100, points=1000)).encode()
+
+    tracemalloc.start()
+    loaded = json.loads(body)
+    json_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del loaded
+
+    tracemalloc.start()
+    streamed = parse_prometheus_response(io.BytesIO(body))
+    stream_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del streamed
+
+    assert stream_peak < json_peak / 2, (stream_peak, json_peak)
+    print(f"✅ Peak memory {stream_peak / 1e6:.1f} MB streamed vs {json_peak / 1e6:.1f} MB with json")
+
+
+def test_range_query_helper_streams_with_budget(supervisor_agent):
+    """The range and instant query helpers stream through the pooled session with encoded params and apply the budget."""
+    payload = make_matrix(series=30, points=20)
+
+    class FakeResponse:
+        def __init__(self):
+            self.raw = io.BytesIO(json.dumps(payload).encode())
+            self.closed = False
+
+        def raise_for_status(self):
+            pass
+
+        def close(self):
+            self.closed = True
+
+    class FakeCredential:
+        def get_token(self, scope):
+            return type("Token", (), {"token": "t"})()
+
+    class FakeSession:
+        def __init__(self):
+            self.calls = []
+
+        def get(self, url, params=None, headers=None, stream=False):
+            self.calls.append((url, params, stream, FakeResponse()))
+            return self.calls[-1][3]
+
+    session = FakeSession()
+    supervisor_agent.get_prometheus_session = lambda: session
+    supervisor_agent.DefaultAzureCredential = FakeCredential
+    supervisor_agent.DEFAULT_CONFIG["prometheus"]["response_budget"]["max_series"] = 25
+    query = 'sum by (pod) (rate(http_requests_total{code=~"5.."}[5m])) + 1'
+    response = supervisor_agent.run_promql_range_query("https://prom", query, 1754643600, 1754647200, "15s", "id")
+
+    (url, params, stream, raw), = session.calls
+    assert url == "https://prom/api/v1/query_range" and params["query"] == query and params["step"] == "15s"
+    assert stream is True and raw.closed
+    assert len(response["data"]["result"]) == 25 and response["truncated"]["series"] == 25
+
+    supervisor_agent.run_promql_query("https://prom", query, "id")
+    url, params, stream, raw = session.calls[-1]
+    assert url == "https://prom/api/v1/query" and params == {"query": query} and stream is True and raw.closed
+    print("✅ Query helpers stream with a budget")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_matrix_decoded_into_arrays()
+    test_vector_scalar_and_warnings()
+    test_budgets_stop_reading_early()
+    test_fallback_without_ijson()
+    test_streamed_response_encodes_like_json()
+    test_peak_memory_lower_than_json()
+    with offline_supervisor() as supervisor_agent:
+        test_range_query_helper_streams_with_budget(supervisor_agent)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+"""
+Test the batch PromQL tool: concurrent expressions over one shared session with per-expression status.
+"""
+
+import io
+import json
+import sys
+import os
+import time
+import threading
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return self.payload
+
+    @property
+    def raw(self):
+        return io.BytesIO(json.dumps(self.payload).encode())
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """Records requests; every request takes `delay` seconds."""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, headers=None, stream=False):
+        with self.lock:
+            self.requests.append((url, params))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        if params["query"] == "broken(":
+            return FakeResponse({"status": "error", "errorType": "bad_data", "error": "parse error"}, 400)
+        if url.endswith("query_range"):
+            return FakeResponse({"status": "success", "data": {"resultType": "matrix", "result": [
+                {"metric": {"pod": "api-0"}, "values": [[1754643600 + i * 60, str(i)] for i in range(5)]}]}})
+        return FakeResponse({"status": "success", "data": {"resultType": "vector", "result": [
+            {"metric": {"pod": "api-0"}, "value": [1754643600, "0.25"]}]}})
+
+
+class FakeCredential:
+    calls = 0
+
+    def get_token(self, scope):
+        FakeCredential.calls += 1
+        return type("Token", (), {"token": "t"})()
+
+
+def patched(supervisor_agent, session):
+    originals = (supervisor_agent.get_prometheus_session, supervisor_agent.DefaultAzureCredential, supervisor_agent.count_prometheus_series)
+    supervisor_agent.get_prometheus_session = lambda: session
+    supervisor_agent.DefaultAzureCredential = FakeCredential
+    # Series preflight is covered by test_promql_preflight.py
+    supervisor_agent.count_prometheus_series = lambda *args: {}
+    return originals
+
+
+def test_batch_runs_concurrently_with_per_expression_status(supervisor_agent):
+    """Expressions run in parallel with one token; failures are reported per expression."""
+    print("🧪 Testing run_promql_batch...")
+    session = FakeSession(delay=0.2)
+    originals = patched(supervisor_agent, session)
+    FakeCredential.calls = 0
+    try:
+        queries = [
+            {"name": "cpu", "expr": "rate(container_cpu_usage_seconds_total[5m])"},
+            {"name": "memory", "expr": "container_memory_rss", "range": True,
+             "start_time": "2025-08-08T09:00:00Z", "end_time": "2025-08-08T10:00:00Z", "step": "1m"},
+            {"expr": "broken("},
+            {"name": "restarts", "expr": "kube_pod_container_status_restarts_total"},
+        ]
+        start = time.perf_counter()
+        results = supervisor_agent.run_promql_batch("https://prom", queries, "client", max_workers=8)
+        elapsed = time.perf_counter() - start
+    finally:
+        supervisor_agent.get_prometheus_session, supervisor_agent.DefaultAzureCredential, supervisor_agent.count_prometheus_series = originals
+
+    assert [r["name"] for r in results] == ["cpu", "memory", "q3", "restarts"]
+    assert [r["status"] for r in results] == ["success", "success", "error", "success"]
+    assert "HTTP 400" in results[2]["error"]
+    assert results[1]["result"]["data"]["resultType"] == "matrix"
+    assert session.requests[0][1]["query"] == "rate(container_cpu_usage_seconds_total[5m])"
+    assert FakeCredential.calls == 1
+    assert session.max_in_flight == 4
+    assert elapsed < 0.6, elapsed
+    print(f"✅ 4 expressions in {elapsed:.2f}s (one request takes 0.2s)")
+
+
+def test_batch_tool_combines_sections(supervisor_agent):
+    """The tool returns one section per expression with its status."""
+    session = FakeSession(delay=0)
+    originals = patched(supervisor_agent, session)
+    try:
+        output = supervisor_agent.promql_batch_query_tool.invoke({"queries": [
+            {"name": "cpu", "expr": "up"},
+            {"name": "bad", "expr": "broken("},
+        ]})
+    finally:
+        supervisor_agent.get_prometheus_session, supervisor_agent.DefaultAzureCredential, supervisor_agent.count_prometheus_series = originals
+
+    sections = output.split("\n\n")
+    assert sections[0].startswith("## cpu [success] up\n# status=success type=vector")
+    # Malformed expressions are rejected by local validation and never sent
+    assert sections[1].startswith("## bad [rejected] broken(\nQuery not sent to Prometheus")
+    assert [params["query"] for _, params in session.requests] == ["up"]
+    print(f"✅ Combined output:\n{output}")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    with offline_supervisor() as supervisor_agent:
+        test_batch_runs_concurrently_with_per_expression_status(supervisor_agent)
+    with offline_supervisor() as supervisor_agent:
+        test_batch_tool_combines_sections(supervisor_agent)
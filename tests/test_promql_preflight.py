@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""
+Test the series-cardinality preflight for PromQL queries.
+"""
+
+import sys
+import os
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from promql_preflight import PreflightRejected, SeriesCountCache, extract_selectors, is_aggregated, preflight
+
+
+def test_extract_selectors():
+    """Selectors are found through functions, aggregations, ranges, offsets and binary operators."""
+    print("🧪 Testing selector extraction...")
+    cases = {
+        "container_memory_rss": ["container_memory_rss"],
+        'sum(rate(http_requests_total{job="api", code=~"5.."}[5m])) by (pod, namespace)':
+            ['http_requests_total{job="api", code=~"5.."}'],
+        "rate(node_cpu_seconds_total[5m] offset 1h) / on(instance) group_left(nodename) node_uname_info":
+            ["node_cpu_seconds_total", "node_uname_info"],
+        'label_replace(up{job="a"}, "dst", "$1", "src", "(.*)") > 0.5': ['up{job="a"}'],
+        'topk(5, max_over_time(container_memory_working_set_bytes{namespace="prod"}[1h:5m]))':
+            ['container_memory_working_set_bytes{namespace="prod"}'],
+        '{__name__=~"kube_pod_.*", namespace="prod"}': ['{__name__=~"kube_pod_.*", namespace="prod"}'],
+        "histogram_quantile(0.99, sum by (le) (rate(request_duration_seconds_bucket[5m])))":
+            ["request_duration_seconds_bucket"],
+        "time() - process_start_time_seconds": ["process_start_time_seconds"],
+    }
+    for expr, expected in cases.items():
+        assert extract_selectors(expr) == expected, (expr, extract_selectors(expr))
+    print(f"✅ {len(cases)} expressions parsed")
+
+
+def test_is_aggregated():
+    assert is_aggregated("sum(rate(x[5m])) by (pod)")
+    assert is_aggregated("sum by (pod) (x)")
+    assert is_aggregated("topk(5, x)")
+    assert not is_aggregated("rate(x[5m])")
+    assert not is_aggregated("summary_metric")
+    print("✅ Aggregation detection works")
+
+
+def test_preflight_rewrites_rejects_and_caches():
+    """Queries above the threshold are wrapped or rejected; counts are cached per selector."""
+    calls = []
+
+    def count_series(selectors):
+        calls.append(list(selectors))
+        return {s: (5000 if s == "container_memory_rss" else 12) for s in selectors}
+
+    cache = SeriesCountCache(ttl_seconds=60)
+    query, estimate, note = preflight('up{job="api"}', count_series, max_series=500, cache=cache)
+    assert (query, estimate, note) == ('up{job="api"}', 12, None)
+
+    query, estimate, note = preflight("container_memory_rss", count_series, max_series=500, action="topk", topk=10, cache=cache)
+    assert query == "topk(10, container_memory_rss)" and estimate == 5000
+    assert "more than 500 series" in note
+
+    query, _, _ = preflight("container_memory_rss", count_series, action="sum_by", sum_by=["namespace", "pod"], cache=cache)
+    assert query == "sum by (namespace, pod) (container_memory_rss)"
+    assert len(calls) == 2  # second lookup of container_memory_rss came from the cache
+
+    try:
+        preflight("container_memory_rss", count_series, action="reject", cache=cache)
+        assert False, "expected rejection"
+    except PreflightRejected as e:
+        assert "Add label filters" in str(e)
+
+    # Range vectors cannot be wrapped in topk, so they are rejected
+    try:
+        preflight("container_memory_rss[5m]", count_series, cache=cache)
+        assert False, "expected rejection"
+    except PreflightRejected:
+        pass
+
+    # Aggregated queries and failed counts pass through unchanged
+    assert preflight("sum(container_memory_rss)", count_series)[0] == "sum(container_memory_rss)"
+    assert preflight("other_metric", lambda selectors: {})[0] == "other_metric"
+    print("✅ Preflight rewrites, rejects and caches")
+
+
+def test_tool_runs_bounded_query(supervisor_agent):
+    """promql_query_tool runs the rewritten query and tells the agent why."""
+    print("🧪 Testing preflight inside promql_query_tool...")
+    executed = []
+    supervisor_agent.count_prometheus_series = lambda endpoint, selectors, *args: {s: 3000 for s in selectors}
+    supervisor_agent.run_promql_query = lambda endpoint, query, client_id: executed.append(query) or {
+        "status": "success", "data": {"resultType": "vector", "result": []}}
+
+    output = supervisor_agent.promql_query_tool.invoke({"promql_query": "container_memory_rss"})
+    assert executed == ["topk(20, container_memory_rss)"]
+    assert output.startswith("# preflight: container_memory_rss matches more than 500 series")
+
+    supervisor_agent.series_count_cache.clear()
+    supervisor_agent.DEFAULT_CONFIG["prometheus"]["preflight"]["action"] = "reject"
+    output = supervisor_agent.promql_query_tool.invoke({"promql_query": "container_memory_rss"})
+    assert output.startswith("Query rejected by series preflight")
+    assert executed == ["topk(20, container_memory_rss)"]
+    print(f"✅ {output}")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_extract_selectors()
+    test_is_aggregated()
+    test_preflight_rewrites_rejects_and_caches()
+    with offline_supervisor() as supervisor_agent:
+        test_tool_runs_bounded_query(supervisor_agent)
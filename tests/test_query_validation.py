@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+"""
+Test local PromQL/KQL validation and that rejected queries never reach a backend.
+"""
+
+import sys
+import os
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from label_index import LabelIndex
+from query_validation import NameCache, ValidationStats, validate_kql, validate_promql
+
+METRICS = {"container_cpu_usage_seconds_total", "container_memory_rss", "http_requests_total", "up"}
+LABELS = {"__name__", "namespace", "pod", "container", "job", "le", "instance"}
+SCHEMAS = {
+    "IcMDataWarehouse": ["IncidentId", "Title", "Severity", "Status", "CreateDate", "OwningTeamName"],
+    "DeploymentEvents": ["DeploymentId", "Service", "Version", "StartTime", "EndTime"],
+}
+
+
+def test_valid_promql_passes():
+    """Common PromQL shapes are accepted."""
+    print("🧪 Testing PromQL validation...")
+    for expr in [
+        'sum by (pod) (rate(container_cpu_usage_seconds_total{namespace="prod", pod=~"checkout-.*"}[5m]))',
+        'histogram_quantile(0.95, sum(rate(http_requests_total[5m])) by (le))',
+        'up{job="api"} and on(instance) up > bool 0',
+        'max_over_time(container_memory_rss[1h:5m]) offset 1d',
+        '{__name__="up", job!="x"}',
+        'topk(5, SUM by (namespace) (container_memory_rss))',
+        'label_replace(up, "svc", "$1", "job", "(.*)")',
+        'time() - 60',
+        'rate(http_requests_total[5m] @ end())',
+        'sum(rate(up[5m] @ start())) - sum(rate(up[5m] @1609746000))',
+        # Labels created inside the expression may be grouped on
+        'sum by (foo) (label_replace(up, "foo", "$1", "job", "(.*)"))',
+        'max by (owner) (label_join(up, "owner", "-", "namespace", "pod"))',
+        'count_values without (build) ("build", up)',
+    ]:
+        assert validate_promql(expr, METRICS, LABELS) == [], expr
+    print("✅ Valid PromQL accepted")
+
+
+def test_promql_errors_are_precise():
+    """Malformed PromQL gets one precise message per problem."""
+    cases = {
+        'sum(rate(up[5m])': "unclosed '(' at position 3",
+        'up{job="api}': "unterminated string starting at position 7",
+        'rates(http_requests_total[5m])': "unknown function 'rates' (did you mean 'rate'?)",
+        'rate(up[5 min])': "invalid range '[5 min]'",
+        'up{job=="api"}': "invalid label matcher 'job==\"api\"'",
+        'up +': "the query ends with a binary operator",
+        'container_cpu_usage_second_total': "unknown metric 'container_cpu_usage_second_total' (did you mean 'container_cpu_usage_seconds_total'?)",
+        'sum by (podname) (up)': "unknown label 'podname'",
+        'end() - 60': "unknown function 'end'",  # start() and end() only follow @
+    }
+    for expr, expected in cases.items():
+        errors = validate_promql(expr, METRICS, LABELS)
+        assert any(e.startswith(expected) for e in errors), (expr, errors)
+    # Without cached names only syntax is checked
+    assert validate_promql("some_new_metric{team=\"a\"}") == []
+    print("✅ PromQL errors are precise")
+
+
+def test_kql_validation():
+    """KQL syntax, operators, tables and (known) columns are checked."""
+    print("🧪 Testing KQL validation...")
+    tables = set(SCHEMAS)
+    for query in [
+        "IcMDataWarehouse | where CreateDate > ago(1d) and Severity <= 2 | project IncidentId, Title | take 10",
+        "IcMDataWarehouse | extend AgeHours = (now() - CreateDate) / 1h | where AgeHours > 24 | sort by AgeHours desc",
+        "let since = ago(7d); IcMDataWarehouse | where CreateDate > since | summarize count() by OwningTeamName",
+        "IcMDataWarehouse | where Title has 'disk | full' // trailing | comment",
+        "IcMDataWarehouse | join kind=inner (DeploymentEvents | project Service, StartTime) on $left.OwningTeamName == $right.Service",
+        "ContainerLogV2 | where LogLevel == 'error' | take 50",
+        "print now()",
+        # Subqueries have their own tables and columns
+        "DeploymentEvents | where Service in ((IcMDataWarehouse | where Severity == 2 | project Service))",
+        "IcMDataWarehouse | where Severity == toscalar(IcMDataWarehouse | summarize max(Severity))",
+        "IcMDataWarehouse | where CreateDate > toscalar(materialize(DeploymentEvents) | summarize min(StartTime))",
+    ]:
+        assert validate_kql(query, SCHEMAS, tables) == [], (query, validate_kql(query, SCHEMAS, tables))
+
+    cases = {
+        "SELECT * FROM IcMDataWarehouse": "this looks like SQL",
+        "IcMDataWarehouse | where Severity = 2": "'=' in where is an assignment",
+        "IcMDataWarehouse | wher Severity == 2": "unknown operator 'wher' (did you mean 'where'?)",
+        "IcMDataWarehouse | where Sevrity == 2": "unknown column 'Sevrity' in stage #2 (where) (did you mean 'Severity'?)",
+        "IcMDataWarehouse | project IncidentId | where Title has 'x'": "unknown column 'Title' in stage #3",
+        "IcmDataWarehouse | take 5": "unknown table 'IcmDataWarehouse' (did you mean 'IcMDataWarehouse'?)",
+        "IcMDataWarehouse | where Title has 'x' |": "empty pipe stage #3",
+        "IcMDataWarehouse | where (Severity == 2": "unclosed '('",
+        "DeploymentEvents | where Sevice in ((IcMDataWarehouse | project Service))": "unknown column 'Sevice'",
+    }
+    for query, expected in cases.items():
+        errors = validate_kql(query, SCHEMAS, tables)
+        assert any(e.startswith(expected) for e in errors), (query, errors)
+    print("✅ KQL validated")
+
+
+def test_name_cache_and_stats():
+    """Cached names expire; rejections are counted as saved calls."""
+    cache = NameCache(ttl_seconds=0)
+    cache.put("k", ["a"])
+    assert cache.get("k") is None
+    stats = ValidationStats()
+    stats.record("Kusto", [])
+    stats.record("Kusto", ["bad"])
+    stats.record("Prometheus", ["bad"])
+    assert stats.saved_calls == 2
+    assert stats.summary() == {"Kusto": {"validated": 2, "rejected": 1}, "Prometheus": {"validated": 1, "rejected": 1}}
+    print("✅ Name cache and stats")
+
+
+def test_tools_reject_without_backend_calls(supervisor_agent):
+    """Invalid queries are answered by the tools without calling Prometheus, Kusto or Log Analytics."""
+    calls = []
+    supervisor_agent.count_prometheus_series = lambda *args, **kwargs: {}
+    supervisor_agent.run_promql_query = lambda *args: calls.append("prometheus") or {"status": "success", "data": {"resultType": "vector", "result": []}}
+    supervisor_agent.query_kusto_table = lambda *args: calls.append("kusto") or []
+    supervisor_agent.query_log_analytics = lambda *args: calls.append("log_analytics") or []
+    supervisor_agent.kusto_schema_fetcher = lambda cluster, db, table, *args: [
+        {"ColumnName": c, "ColumnType": "string"} for c in SCHEMAS[table]]
+    # Names come from the label index once it has been built
+    supervisor_agent.prometheus_label_index._index = LabelIndex(
+        {"__name__": dict.fromkeys(METRICS), "pod": {}}, label_names=sorted(LABELS))
+
+    bad_promql = supervisor_agent.promql_query_tool.invoke({"promql_query": "sum(rate(container_memory_rs[5m]))"})
+    good_promql = supervisor_agent.promql_query_tool.invoke({"promql_query": "sum(rate(container_memory_rss[5m]))"})
+
+    supervisor_agent.kusto_incident_schema_tool.invoke({})
+    bad_kusto = supervisor_agent.kusto_incident_query_tool.invoke({"query": "IcMDataWarehouse | where Sevrity == 1"})
+    good_kusto = supervisor_agent.kusto_incident_query_tool.invoke({"query": "IcMDataWarehouse | where Severity == 1"})
+    bad_generic = supervisor_agent.kusto_query_tool.invoke({"query": "summarize count() by OwningTeam | order by count_"})
+
+    bad_logs = supervisor_agent.query_log_analytics_tool.invoke({"query": "ContainerLogV2 | where LogLevel = 'error'"})
+    saved = supervisor_agent.validation_stats.saved_calls
+
+    assert bad_promql.startswith("Query not sent to Prometheus") and "did you mean 'container_memory_rss'" in bad_promql
+    assert bad_kusto.startswith("Query not sent to Kusto") and "did you mean 'Severity'" in bad_kusto
+    assert bad_logs.startswith("Query not sent to Log Analytics")
+    assert "Query not sent" not in good_promql and "Query not sent" not in good_kusto
+    # The generic tool prefixes the table, so its columns are checked too
+    assert "unknown column 'OwningTeam' in stage #2 (summarize) (did you mean 'OwningTeamName'?)" in bad_generic
+    assert calls == ["prometheus", "kusto"], calls
+    assert saved == 4
+    print(f"✅ {saved} invalid queries answered locally; backends saw {calls}")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_valid_promql_passes()
+    test_promql_errors_are_precise()
+    test_kql_validation()
+    test_name_cache_and_stats()
+    with offline_supervisor() as supervisor_agent:
+        test_tools_reject_without_backend_calls(supervisor_agent)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+"""
+Test the incremental, step-aligned cache for Prometheus range queries.
+"""
+
+import sys
+import os
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from range_query_cache import RangeQueryCache, parse_step, parse_time
+
+NOW = 1754647200.0  # 2025-08-08T10:00:00Z
+
+
+class FakePrometheus:
+    """Range query backend with two pods and a deterministic value per timestamp."""
+
+    def __init__(self, step=60, now=NOW):
+        self.step = step
+        self.now = now
+        self.calls = []
+
+    def value(self, pod, timestamp):
+        return str(round((timestamp / self.step) % 17 + (10 if pod == "b" else 0), 3))
+
+    def fetch(self, start, end):
+        self.calls.append((start, end))
+        timestamps = range(int(start), int(min(end, self.now)) + 1, self.step)
+        return {"status": "success", "data": {"resultType": "matrix", "result": [
+            {"metric": {"__name__": "cpu", "pod": pod}, "values": [[t, self.value(pod, t)] for t in timestamps]}
+            for pod in ("a", "b")
+        ]}}
+
+
+def points(response):
+    """(labels, [[timestamp, value], ...]) per series with float values, to compare responses."""
+    return [(series["metric"], np.asarray(series["values"], dtype=np.float64).tolist()) for series in response["data"]["result"]]
+
+
+def test_parse_step_and_time():
+    """Durations and timestamps are parsed the way Prometheus accepts them."""
+    assert parse_step("5m") == 300
+    assert parse_step("1h30m") == 5400
+    assert parse_step(15) == 15 and parse_step("30") == 30
+    try:
+        parse_step("5 minutes")
+        assert False, "invalid step accepted"
+    except ValueError:
+        pass
+    assert parse_time("2025-08-08T10:00:00Z") == NOW
+    assert parse_time("2025-08-08T10:00:00") == NOW  # naive times are UTC
+    assert parse_time(str(NOW)) == NOW
+    print("✅ Steps and timestamps parsed")
+
+
+def test_repeat_and_refresh_fetch_only_the_tail():
+    """A repeated query is served from the cache except for the still-changing tail."""
+    backend = FakePrometheus()
+    clock = [NOW]
+    cache = RangeQueryCache(points_per_chunk=60, max_fresh_seconds=300, clock=lambda: clock[0])
+
+    first = cache.query("q", NOW - 3600, NOW, "1m", backend.fetch)
+    assert backend.calls == [(NOW - 3600, NOW)]
+    assert [len(s["values"]) for s in first["data"]["result"]] == [61, 61]
+
+    again = cache.query("q", NOW - 3600, NOW, "1m", backend.fetch)
+    assert points(again) == points(first)
+    assert backend.calls[-1][0] >= NOW - 300 - 60, backend.calls[-1]
+
+    # Ten minutes later: only the last few minutes are requested
+    clock[0] = backend.now = NOW + 600
+    refreshed = cache.query("q", NOW - 3000, NOW + 600, "1m", backend.fetch)
+    assert cache.last_stats["requests"] == 1
+    assert cache.last_stats["fetched_seconds"] <= 600 + 300 + 60, cache.last_stats
+    assert points(refreshed) == points(backend.fetch(NOW - 3000, NOW + 600))
+    print(f"✅ Refresh fetched {cache.last_stats['fetched_seconds']:.0f}s instead of 3600s")
+
+
+def test_extended_window_fetches_missing_range_once():
+    """Widening the window fetches only the older part, in one request across chunks."""
+    backend = FakePrometheus()
+    cache = RangeQueryCache(points_per_chunk=30, max_fresh_seconds=0, clock=lambda: NOW)
+
+    cache.query("q", NOW - 3600, NOW - 1800, "1m", backend.fetch)
+    backend.calls.clear()
+    wider = cache.query("q", NOW - 4 * 3600, NOW - 1800, "1m", backend.fetch)
+
+    assert backend.calls == [(NOW - 4 * 3600, NOW - 3600 - 60)]
+    assert cache.last_stats["chunks"] > 1
+    assert points(wider) == points(backend.fetch(NOW - 4 * 3600, NOW - 1800))
+    print(f"✅ Extended window merged over {cache.last_stats['chunks']} chunks with one request")
+
+
+def test_unaligned_times_and_separate_steps():
+    """Start/end are aligned down to the step; each step has its own cache entry."""
+    backend = FakePrometheus(step=300)
+    cache = RangeQueryCache(max_fresh_seconds=0, clock=lambda: NOW)
+
+    result = cache.query("q", "2025-08-08T08:02:10Z", "2025-08-08T09:58:00Z", "5m", backend.fetch)
+    assert backend.calls == [(NOW - 7200, NOW - 300)]
+    assert result["data"]["result"][0]["values"][0][0] == NOW - 7200
+
+    backend.step = 60
+    cache.query("q", NOW - 600, NOW, "1m", backend.fetch)
+    assert backend.calls[-1] == (NOW - 600, NOW)
+    print("✅ Aligned to the step, cached per step")
+
+
+def test_arrays_returned_and_points_bounded():
+    """Series come back as (n, 2) float arrays; the cache drops old queries beyond its point budget."""
+    backend = FakePrometheus()
+    cache = RangeQueryCache(points_per_chunk=60, max_fresh_seconds=0, max_points=300, clock=lambda: NOW)
+
+    result = cache.query("a", NOW - 3600, NOW, "1m", backend.fetch)
+    values = result["data"]["result"][0]["values"]
+    assert isinstance(values, np.ndarray) and values.dtype == np.float64 and values.shape == (61, 2)
+    assert (np.diff(values[:, 0]) == 60).all()
+    assert cache.points == 120  # the newest point is never kept
+
+    cache.query("b", NOW - 3600, NOW, "1m", backend.fetch)
+    cache.query("c", NOW - 3600, NOW, "1m", backend.fetch)
+    assert cache.points == 240  # "a" was dropped to stay within 300 points
+    backend.calls.clear()
+    cache.query("c", NOW - 3600, NOW, "1m", backend.fetch)
+    cache.query("a", NOW - 3600, NOW, "1m", backend.fetch)
+    assert backend.calls[0][0] >= NOW - 60 and backend.calls[1] == (NOW - 3600, NOW)
+    cache.clear()
+    assert cache.points == 0
+    print("✅ Arrays returned, point budget enforced")
+
+
+def test_errors_are_passed_through_and_not_cached():
+    """Failed fetches are returned as is and leave the cache untouched."""
+    cache = RangeQueryCache(max_fresh_seconds=0, clock=lambda: NOW)
+    error = {"status": "error", "errorType": "bad_data", "error": "parse error"}
+    assert cache.query("q", NOW - 600, NOW, "1m", lambda s, e: error) is error
+
+    backend = FakePrometheus()
+    cache.query("q", NOW - 600, NOW, "1m", backend.fetch)
+    assert backend.calls == [(NOW - 600, NOW)]
+
+    # A fetch cut short by the stream budget stays marked truncated and is fetched again next time
+    def truncated_fetch(start, end):
+        response = FakePrometheus().fetch(start, end)
+        response["data"]["result"] = response["data"]["result"][:1]
+        response["truncated"] = {"series": 1, "points": 11}
+        response["warnings"] = ["result truncated to 1 series / 11 points; narrow the selector or the time range"]
+        return response
+
+    partial = cache.query("cut", NOW - 600, NOW, "1m", truncated_fetch)
+    assert partial["truncated"] == {"series": 1, "points": 11} and partial["warnings"][0].startswith("result truncated")
+    backend = FakePrometheus()
+    assert "truncated" not in cache.query("cut", NOW - 600, NOW, "1m", backend.fetch)
+    assert backend.calls == [(NOW - 600, NOW)]
+    print("✅ Errors passed through")
+
+
+def test_range_tool_uses_cache(supervisor_agent):
+    """promql_range_query_tool asks the backend only for what the cache does not hold."""
+    backend = FakePrometheus(step=300, now=float("inf"))
+    supervisor_agent.count_prometheus_series = lambda *args, **kwargs: {}
+    supervisor_agent.run_promql_range_query = lambda endpoint, query, start, end, step, client: backend.fetch(start, end)
+    args = {"promql_query": "sum by (pod) (rate(cpu[5m]))", "start_time": "2025-08-08T06:00:00Z",
+            "end_time": "2025-08-08T10:00:00Z", "step": "5m"}
+    first = supervisor_agent.promql_range_query_tool.invoke(args)
+    second = supervisor_agent.promql_range_query_tool.invoke(args)
+    chart = supervisor_agent.prometheus_chart_tool.invoke(args)
+
+    assert len(backend.calls) == 1, backend.calls
+    assert first == second
+    assert "start=2025-08-08T06:00:00Z step=5m points=49" in first
+    assert "Charts are not available" in chart
+    print(f"✅ Tool served repeats from the cache ({len(backend.calls)} backend call)")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_parse_step_and_time()
+    test_repeat_and_refresh_fetch_only_the_tail()
+    test_extended_window_fetches_missing_range_once()
+    test_unaligned_times_and_separate_steps()
+    test_arrays_returned_and_points_bounded()
+    test_errors_are_passed_through_and_not_cached()
+    with offline_supervisor() as supervisor_agent:
+        test_range_tool_uses_cache(supervisor_agent)
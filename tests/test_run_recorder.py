@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+"""
+Test record-and-replay of supervisor runs.
+Records a scripted run against the real supervisor graph (no live LLM or backends)
+and replays it offline, checking routing and per-node timing reports.
+"""
+
+import sys
+import os
+import tempfile
+import threading
+import types
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from langchain_core.messages import AIMessage, message_to_dict
+
+from run_recorder import (RunRecorder, ReplayBackends, ReplayChatModel, compare_node_timings, install_backend_recording,
+                          load_recording, replay_run)
+from tabular_result import TabularResult
+
+
+def scripted_llm_calls():
+    """LLM responses for: supervisor -> kusto agent -> incident query -> answer -> supervisor answer."""
+    responses = [
+        AIMessage(content="", tool_calls=[{"name": "transfer_to_kusto_agent", "args": {}, "id": "call_1"}]),
+        AIMessage(content="", tool_calls=[{"name": "kusto_incident_query_tool", "args": {"query": "IcMDataWarehouse | where CreateDate > ago(1d) | take 1"}, "id": "call_2"}]),
+        AIMessage(content="Incident 12345 is Sev2 and active."),
+        AIMessage(content="Incident 12345 is Sev2 and active."),
+    ]
+    return [{"request": [], "response": message_to_dict(r)} for r in responses]
+
+
+def test_record_and_replay_supervisor_run(supervisor_agent):
+    """Record a run and replay it offline with identical routing."""
+    print("🧪 Testing record and replay of a supervisor run...")
+
+    backend_queries = []
+
+    def fake_query_kusto_table(cluster_uri, database, table, client_id, tenant_id, query, tool=None):
+        backend_queries.append(query)
+        return [{"IncidentId": 12345, "Severity": 2, "Status": "Active"}]
+
+    original = supervisor_agent.query_kusto_table
+    supervisor_agent.query_kusto_table = fake_query_kusto_table
+    try:
+        graph = supervisor_agent.create_standard_supervisor(model=ReplayChatModel(recorded=scripted_llm_calls()))
+        recorder = RunRecorder(graph="standard")
+        inputs = {"messages": [("user", "Show me incident 12345")]}
+        with recorder.capture_backends(supervisor_agent):
+            graph.invoke(inputs, config={"callbacks": [recorder]})
+    finally:
+        supervisor_agent.query_kusto_table = original
+
+    assert backend_queries == ["IcMDataWarehouse | where CreateDate > ago(1d) | take 1"]
+    assert len(recorder.llm_calls) == 4
+    assert len(recorder.backend_calls) == 1
+    assert any(call["name"] == "kusto_incident_query_tool" for call in recorder.tool_calls)
+    print(f"✅ Recorded {len(recorder.llm_calls)} LLM calls, {len(recorder.tool_calls)} tool calls, {len(recorder.backend_calls)} backend calls")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "run.jsonl.gz")
+        recorder.save(path, inputs)
+
+        recording = load_recording(path)
+        assert recording["meta"]["graph"] == "standard"
+        assert recording["meta"]["routing"] == ["transfer_to_kusto_agent", "kusto_incident_query_tool"]
+        assert recording["backend"][0]["result"] == [{"IncidentId": 12345, "Severity": 2, "Status": "Active"}]
+
+        # Replay against a freshly compiled graph; backends are served from the recording
+        report = replay_run(path)
+
+    assert report["routing_matches"], report["routing"]
+    assert report["llm_calls_replayed"] == 4
+    assert report["backend_calls_replayed"] == 1
+    assert report["divergences"] == []
+    assert "kusto_agent" in report["node_timings"]
+    assert "kusto_agent/tools" in report["node_timings"]
+    print(f"✅ Replay matched routing: {' -> '.join(report['routing'])}")
+    print(f"✅ Timed {len(report['node_timings'])} nodes in {report['total_seconds']:.3f}s")
+
+
+def test_compare_node_timings():
+    """Nodes that slow down past the threshold are flagged as regressions."""
+    print("🧪 Testing node timing regression detection...")
+
+    baseline = {
+        "supervisor": {"calls": 2, "total_seconds": 0.100},
+        "kusto_agent/tools": {"calls": 1, "total_seconds": 0.200},
+        "kusto_agent/agent": {"calls": 2, "total_seconds": 0.001},
+    }
+    current = {
+        "supervisor": {"calls": 2, "total_seconds": 0.110},
+        "kusto_agent/tools": {"calls": 1, "total_seconds": 0.400},
+        "kusto_agent/agent": {"calls": 2, "total_seconds": 0.003},  # 3x slower but below min delta
+    }
+
+    regressions = compare_node_timings(baseline, current, threshold=0.25)
+
+    assert [r["node"] for r in regressions] == ["kusto_agent/tools"]
+    assert regressions[0]["change"] == 1.0
+    print(f"✅ Flagged regressions: {regressions}")
+
+
+def test_replay_mixed_batch_outcomes():
+    """Batches with success and error outcomes replay as recorded; only Log Analytics results are rebuilt."""
+    print("🧪 Testing replay of mixed batch outcomes...")
+    table = TabularResult.from_records([{"Pod": "api-0", "Errors": 3}])
+    log_batch = [{"name": "errors", "status": "success", "result": table, "error": None},
+                 {"name": "bad", "status": "error", "result": None, "error": "syntax error"}]
+    promql_batch = [{"name": "cpu", "expr": "up", "status": "success", "result": {"status": "success"}, "seconds": 0.1},
+                    {"name": "mem", "expr": "x(", "status": "error", "error": "parse error", "seconds": 0.1}]
+    backend = types.SimpleNamespace(query_log_analytics_batch=lambda *args: log_batch, run_promql_batch=lambda *args: promql_batch)
+
+    recorder = RunRecorder()
+    with recorder.capture_backends(backend):
+        backend.query_log_analytics_batch("ws", ["q1", "q2"], "client")
+        backend.run_promql_batch("endpoint", [{"expr": "up"}, {"expr": "x("}], "client")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "run.jsonl.gz")
+        recorder.save(path, {"messages": [("user", "batch")]})
+        replay = ReplayBackends(load_recording(path)["backend"])
+
+    logs = replay.serve("query_log_analytics_batch", "ws", ["q1", "q2"], "client")
+    assert isinstance(logs[0]["result"], TabularResult) and logs[0]["result"].to_records() == table.to_records()
+    assert logs[1] == log_batch[1]
+    assert replay.serve("run_promql_batch", "endpoint", [{"expr": "up"}, {"expr": "x("}], "client") == promql_batch
+    print("✅ Mixed batch outcomes replayed")
+
+
+def test_concurrent_sessions_record_their_own_calls():
+    """Backend calls are recorded by the recorder of the calling context only; the helpers stay wrapped once."""
+    print("🧪 Testing per-session backend recording...")
+    backend = types.SimpleNamespace(query_kusto_table=lambda query: [{"Query": query}])
+    install_backend_recording(backend)
+    wrapped = backend.query_kusto_table
+    install_backend_recording(backend)
+    assert backend.query_kusto_table is wrapped
+
+    recorders = {name: RunRecorder() for name in ("alice", "bob")}
+    both_recording = threading.Barrier(2)
+
+    def session(name):
+        with recorders[name].capture_backends(backend):
+            both_recording.wait()
+            for i in range(3):
+                backend.query_kusto_table(f"{name}-{i}")
+
+    threads = [threading.Thread(target=session, args=(name,)) for name in recorders]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert backend.query_kusto_table("unrecorded") == [{"Query": "unrecorded"}]
+
+    assert backend.query_kusto_table is wrapped
+    for name, recorder in recorders.items():
+        assert [call["result"][0]["Query"] for call in recorder.backend_calls] == [f"{name}-{i}" for i in range(3)]
+    print("✅ Each session recorded only its own calls")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_compare_node_timings()
+    with offline_supervisor() as supervisor_agent:
+        test_record_and_replay_supervisor_run(supervisor_agent)
+    test_replay_mixed_batch_outcomes()
+    test_concurrent_sessions_record_their_own_calls()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+"""
+Test LTTB / min-max downsampling and per-series summaries for Prometheus range results.
+"""
+
+import sys
+import os
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from series_downsampling import (
+    downsample_prometheus_response,
+    lttb_indices,
+    minmax_indices,
+    summarize_values,
+)
+from tool_result_encoding import encode_tool_result
+
+
+def make_range_response(points=5000, spike_at=3210, pods=3):
+    timestamps = 1723104000 + np.arange(points) * 15
+    values = np.sin(np.arange(points) / 200.0)
+    values[spike_at] = 42.0
+    return {
+        "status": "success",
+        "data": {"resultType": "matrix", "result": [
+            {"metric": {"__name__": "container_cpu_usage", "pod": f"api-{p}"},
+             "values": [[int(t), str(v)] for t, v in zip(timestamps, values)]}
+            for p in range(pods)
+        ]},
+    }
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    """LTTB returns exactly the target count, keeps first/last points and the spike."""
+    print("🧪 Testing LTTB downsampling...")
+    x = np.arange(1000, dtype=float)
+    y = np.cos(x / 50.0)
+    y[617] = 10.0
+
+    indices = lttb_indices(x, y, 100)
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+    assert 617 in indices
+    assert len(lttb_indices(x[:50], y[:50], 100)) == 50
+    print("✅ LTTB keeps shape and spike")
+
+
+def test_minmax_keeps_extremes_per_bucket():
+    """Min/max mode keeps the extremes of every bucket in time order and skips gaps."""
+    x = np.arange(100, dtype=float)
+    y = np.arange(100, dtype=float) % 10
+    y[55] = -5.0
+    y[20:30] = np.nan
+
+    indices = minmax_indices(x, y, 20)
+    assert np.all(np.diff(indices) > 0)
+    assert 55 in indices
+    assert 9 in indices and 0 in indices
+    assert len(indices) <= 20
+    print(f"✅ Min/max kept {len(indices)} points")
+
+
+def test_summary_uses_full_resolution():
+    """Summaries ignore gaps and report min/max/avg/p95/last."""
+    summary = summarize_values(np.array([1.0, np.nan, 3.0, 2.0]))
+    assert summary == {"points": 4, "min": 1.0, "max": 3.0, "avg": 2.0, "p95": 2.9, "last": 2.0}
+    assert summarize_values(np.array([np.nan]))["max"] is None
+    print("✅ Summary statistics work")
+
+
+def test_downsample_response():
+    """Every matrix series is reduced, keeps the Prometheus value format and carries a summary."""
+    print("🧪 Testing response downsampling...")
+    response = make_range_response()
+    reduced = downsample_prometheus_response(response, target_points=200)
+
+    for series in reduced["data"]["result"]:
+        assert len(series["values"]) == 200
+        assert isinstance(series["values"][0][1], str)
+        assert series["summary"]["max"] == 42.0
+        assert series["summary"]["points"] == 5000
+        assert max(float(v) for _, v in series["values"]) == 42.0
+    # The original response is left untouched
+    assert len(response["data"]["result"][0]["values"]) == 5000
+
+    minmax = downsample_prometheus_response(response, target_points=200, method="minmax")
+    assert len(minmax["data"]["result"][0]["values"]) <= 200
+
+    vector = {"status": "success", "data": {"resultType": "vector", "result": []}}
+    assert downsample_prometheus_response(vector) is vector
+    print("✅ Response downsampled")
+
+
+def test_summary_reaches_llm_encoding():
+    """The compact encoding adds the per-series summary line."""
+    reduced = downsample_prometheus_response(make_range_response(points=500, spike_at=100, pods=1), target_points=20)
+    text = encode_tool_result(reduced, float_digits=3)
+    summary_lines = [line for line in text.split("\n") if line.strip().startswith("summary")]
+    assert len(summary_lines) == 1
+    assert "points=500" in summary_lines[0] and "max=42" in summary_lines[0]
+    print(f"✅ Encoded:\n{text}")
+
+
+if __name__ == "__main__":
+    test_lttb_keeps_endpoints_and_peaks()
+    test_minmax_keeps_extremes_per_bucket()
+    test_summary_uses_full_resolution()
+    test_downsample_response()
+    test_summary_reaches_llm_encoding()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+"""
+Test the columnar TabularResult used for Kusto and Log Analytics tool results.
+"""
+
+import sys
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from tabular_result import TabularResult
+
+
+def make_kusto_table(rows=3):
+    """Build a real KustoResultTable from a v1-style JSON table."""
+    from azure.kusto.data._models import KustoResultTable
+    return KustoResultTable({
+        "TableName": "PrimaryResult",
+        "Columns": [
+            {"ColumnName": "IncidentId", "ColumnType": "long"},
+            {"ColumnName": "Severity", "ColumnType": "int"},
+            {"ColumnName": "Title", "ColumnType": "string"},
+            {"ColumnName": "CreatedDate", "ColumnType": "datetime"},
+            {"ColumnName": "ImpactScore", "ColumnType": "real"},
+        ],
+        "Rows": [
+            [100 + i, 2, f"Pod restarts {i}", f"2025-08-08T09:{i:02d}:00Z", None if i == 1 else 0.5 * i]
+            for i in range(rows)
+        ],
+    })
+
+
+def test_from_kusto_table():
+    """Kusto rows are stored as typed columns with a schema and row count."""
+    print("🧪 Testing TabularResult.from_kusto_table...")
+
+    result = TabularResult.from_kusto_table(make_kusto_table())
+
+    assert len(result) == 3
+    assert result.column_names == ["IncidentId", "Severity", "Title", "CreatedDate", "ImpactScore"]
+    assert result.columns["IncidentId"].dtype == np.int64
+    assert result.columns["CreatedDate"].dtype == np.dtype("datetime64[ns]")
+    assert result.columns["ImpactScore"].dtype == np.float64
+    assert dict(result.schema)["CreatedDate"] == "datetime"
+
+    row = result[2]
+    assert row["IncidentId"] == 102
+    assert row["CreatedDate"] == "2025-08-08T09:02:00Z"
+    assert result[1]["ImpactScore"] is None
+    print(f"✅ {result} with schema {result.schema}")
+
+
+def test_log_analytics_style_rows():
+    """Log Analytics rows (already typed) convert the same way."""
+    from datetime import datetime, timezone
+
+    class FakeLogsTable:
+        columns = ["TimeGenerated", "PodName", "LogMessage"]
+        columns_types = ["datetime", "string", "string"]
+        rows = [
+            [datetime(2025, 8, 8, 9, 0, tzinfo=timezone.utc), "checkout-0", "ERROR timeout"],
+            [datetime(2025, 8, 8, 9, 5, tzinfo=timezone.utc), "checkout-1", "ERROR timeout"],
+        ]
+
+    result = TabularResult.from_log_analytics_table(FakeLogsTable())
+    assert result.to_records() == [
+        {"TimeGenerated": "2025-08-08T09:00:00Z", "PodName": "checkout-0", "LogMessage": "ERROR timeout"},
+        {"TimeGenerated": "2025-08-08T09:05:00Z", "PodName": "checkout-1", "LogMessage": "ERROR timeout"},
+    ]
+    print("✅ Log Analytics rows converted")
+
+
+def test_dataframe_shares_buffers():
+    """Numeric and datetime columns are handed to pandas without copying."""
+    result = TabularResult.from_kusto_table(make_kusto_table(rows=50))
+    df = result.to_dataframe()
+
+    assert np.shares_memory(df["IncidentId"].to_numpy(), result.columns["IncidentId"])
+    assert np.shares_memory(df["CreatedDate"].to_numpy(), result.columns["CreatedDate"])
+    assert len(df) == 50
+    print("✅ DataFrame shares numeric/datetime buffers")
+
+
+def test_compact_payload_and_csv():
+    """Compact payload names columns once and round-trips; CSV has a header row."""
+    result = TabularResult.from_kusto_table(make_kusto_table())
+    payload = result.to_payload()
+
+    assert payload["columns"] == result.column_names
+    assert payload["row_count"] == 3
+    assert payload["rows"][0] == [100, 2, "Pod restarts 0", "2025-08-08T09:00:00Z", 0.0]
+
+    records_json = json.dumps(result.to_records())
+    compact_json = json.dumps(payload)
+    assert len(compact_json) < len(records_json) + 100  # header overhead only
+
+    rebuilt = TabularResult.from_payload(payload)
+    assert rebuilt.to_records() == result.to_records()
+
+    # Columns without a source type keep their inferred dtype through a JSON round trip
+    records = TabularResult.from_records([
+        {"n": 1, "x": 0.5, "ok": True, "at": pd.Timestamp("2025-08-08T09:00:00Z"), "name": "a"},
+        {"n": 2, "x": None, "ok": False, "at": pd.Timestamp("2025-08-08T09:05:00Z"), "name": None},
+    ])
+    rebuilt = TabularResult.from_payload(json.loads(json.dumps(records.to_payload())))
+    assert rebuilt.schema == records.schema == [("n", "int64"), ("x", "float64"), ("ok", "bool"),
+                                                 ("at", "datetime64[ns]"), ("name", "object")]
+    assert rebuilt.to_records() == records.to_records()
+
+    csv_text = result.to_csv()
+    lines = csv_text.strip().split("\n")
+    assert lines[0] == "IncidentId,Severity,Title,CreatedDate,ImpactScore"
+    assert lines[2] == "101,2,Pod restarts 1,2025-08-08T09:01:00Z,"
+    print(f"✅ Compact JSON {len(compact_json)} chars vs {len(records_json)} chars as records")
+
+
+def test_coerce_and_views():
+    """coerce() accepts lists of dicts; head/select share buffers."""
+    result = TabularResult.coerce([{"a": 1, "b": "x"}, {"a": 2, "c": True}])
+    assert result.column_names == ["a", "b", "c"]
+    assert result.to_records() == [{"a": 1, "b": "x", "c": None}, {"a": 2, "b": None, "c": True}]
+
+    head = result.head(1)
+    assert len(head) == 1 and np.shares_memory(head.columns["a"], result.columns["a"])
+    assert result.select(["b"]).column_names == ["b"]
+    assert TabularResult.coerce([]).row_count == 0
+    print("✅ coerce/head/select work")
+
+
+if __name__ == "__main__":
+    test_from_kusto_table()
+    test_log_analytics_style_rows()
+    test_dataframe_shares_buffers()
+    test_compact_payload_and_csv()
+    test_coerce_and_views()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+"""
+Test the shared UTC time index for metrics, logs and incidents.
+"""
+
+import sys
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from figure_rendering import create_timeseries_figure, prometheus_series
+from tabular_result import TabularResult
+from time_alignment import align_sources, format_utc, format_utc_array, resample, table_sources, time_grid, to_epoch_seconds
+
+START = 1754643600  # 2025-08-08T09:00:00Z
+
+
+def test_every_timestamp_format_becomes_utc_seconds():
+    """ISO strings, offsets, datetimes, datetime64 and epoch s/ms all land on the same epoch second."""
+    print("🧪 Testing timestamp normalization...")
+    same_instant = [
+        "2025-08-08T09:00:00Z",
+        "2025-08-08T11:00:00+02:00",
+        "2025-08-08 09:00:00",
+        datetime(2025, 8, 8, 9, tzinfo=timezone.utc),
+        datetime(2025, 8, 8, 9),  # naive values are UTC
+    ]
+    assert (to_epoch_seconds(same_instant) == START).all()
+    assert to_epoch_seconds(np.array(["2025-08-08T09:00:00"], dtype="datetime64[ns]"))[0] == START
+    assert (to_epoch_seconds([START, START * 1000, START * 10**6, START * 10**9]) == START).all()
+    epoch_text = to_epoch_seconds([str(START), None])
+    assert epoch_text[0] == START and np.isnan(epoch_text[1])
+    assert to_epoch_seconds("2025-08-08T09:00:00Z") == START
+    assert np.isnan(to_epoch_seconds(["not a time", None])).all()
+
+    assert format_utc(START) == "2025-08-08T09:00:00Z" and format_utc(None) is None
+    assert format_utc_array([START, np.nan, START + 59.9]).tolist() == ["2025-08-08T09:00:00Z", None, "2025-08-08T09:00:59Z"]
+    print("✅ Timestamps normalized")
+
+
+def test_resample_reductions():
+    """Samples are bucketed on a step-aligned grid with the chosen reduction."""
+    grid = time_grid(START + 1, START + 299, 60)
+    assert grid[0] == START and grid[-1] == START + 300 and len(grid) == 6
+    times = [START, START + 10, START + 70, START - 60, np.nan]
+    values = [1.0, 3.0, 5.0, 100.0, 7.0]
+    means = resample(times, values, grid)
+    assert means[:2].tolist() == [2.0, 5.0] and np.isnan(means[2])
+    assert resample(times, values, grid, "sum")[:3].tolist() == [4.0, 5.0, 0.0]
+    assert resample(times, values, grid, "max")[0] == 3.0 and resample(times, values, grid, "min")[0] == 1.0
+    assert resample([START + 10, START], [3.0, 1.0], grid, "last")[0] == 3.0
+    assert resample(times, None, grid, "count")[:2].tolist() == [2.0, 1.0]
+    try:
+        resample(times, values, grid, "median")
+        assert False, "unknown reduction accepted"
+    except ValueError:
+        pass
+    print("✅ Resampled")
+
+
+def test_metrics_and_rows_aligned_on_one_grid():
+    """A Prometheus series, error log rows and incidents end up as columns of one frame and one chart."""
+    response = {"status": "success", "data": {"resultType": "matrix", "result": [
+        {"metric": {"__name__": "latency", "pod": "api-0"}, "values": [[START + 30 * i, str(0.2 + 0.01 * i)] for i in range(20)]},
+    ]}}
+    errors = TabularResult.from_records([
+        {"TimeGenerated": "2025-08-08T09:00:05Z", "PodName": "api-0"},
+        {"TimeGenerated": "2025-08-08T09:00:50Z", "PodName": "api-0"},
+        {"TimeGenerated": "2025-08-08T09:04:10Z", "PodName": "api-1"},
+    ])
+    incidents = TabularResult.from_records([{"CreateDate": np.datetime64("2025-08-08T09:03:00"), "Severity": 2}])
+
+    sources = prometheus_series(response) + table_sources(errors, "TimeGenerated", group_column="PodName", name="errors") \
+        + table_sources(incidents, "CreateDate", "Severity", name="incident_severity")
+    frame = align_sources(sources, 60, how={"latency_pod_api_0": "mean", "errors_api-0": "count", "errors_api-1": "count"})
+    assert frame.names == ["latency_pod_api_0", "errors_api-0", "errors_api-1", "incident_severity"]
+    assert frame.grid[0] == START and frame.values.shape == (4, len(frame.grid))
+    assert frame.values[1, :2].tolist() == [2.0, 0.0] and frame.values[2, 4] == 1.0
+    assert frame.values[3, 3] == 2.0 and np.isnan(frame.values[3, 0])
+    assert abs(frame.values[0, 0] - 0.205) < 1e-9
+
+    table = frame.to_table()
+    assert table.column_names[0] == "Time" and table.row_count == len(frame.grid)
+    assert str(table.columns["Time"][0]) == "2025-08-08T09:00:00.000000000"
+    figure = create_timeseries_figure(frame.series())
+    assert len(figure.data) == 4 and figure.data[0].x0 == START * 1000.0
+    print("✅ Sources aligned")
+
+
+def test_chart_rows_are_utc(supervisor_agent):
+    """format_prometheus_range_data_for_charts writes UTC times whatever the local time zone, and stays linear."""
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = "America/Los_Angeles"
+    time.tzset()
+    try:
+        points = 5000
+        response = {"status": "success", "data": {"resultType": "matrix", "result": [
+            {"metric": {"__name__": "cpu", "pod": f"api-{s}"}, "values": [[START + 15 * i, str(s + i)] for i in range(points)]}
+            for s in range(4)
+        ]}}
+        started = time.perf_counter()
+        rows = supervisor_agent.format_prometheus_range_data_for_charts(response)
+        elapsed = time.perf_counter() - started
+    finally:
+        if previous is None:
+            del os.environ["TZ"]
+        else:
+            os.environ["TZ"] = previous
+        time.tzset()
+    assert rows[0] == {"timestamp": "2025-08-08T09:00:00Z", "cpu_pod_api_0": 0.0, "cpu_pod_api_1": 1.0,
+                       "cpu_pod_api_2": 2.0, "cpu_pod_api_3": 3.0}
+    assert len(rows) == points and rows[-1]["timestamp"] == format_utc(START + 15 * (points - 1))
+    assert elapsed < 1.0, elapsed
+    print(f"✅ {points} chart rows in {elapsed * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    from conftest import offline_supervisor
+    test_every_timestamp_format_becomes_utc_seconds()
+    test_resample_reductions()
+    test_metrics_and_rows_aligned_on_one_grid()
+    with offline_supervisor() as supervisor_agent:
+        test_chart_rows_are_utc(supervisor_agent)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+"""
+Test the token-efficient tool result encodings (CSV/TSV tables, compact Prometheus series).
+"""
+
+import sys
+import os
+import json
+
+# Add the app directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app', 'agentic_ai'))
+
+from tabular_result import TabularResult
+from tool_result_encoding import (
+    benchmark_encodings,
+    encode_tool_result,
+    round_number,
+)
+
+
+def make_incidents():
+    return TabularResult.from_rows(
+        ["IncidentId", "Title", "CreatedDate", "ImpactScore"],
+        [
+            [101, "Pod restarts, checkout", "2025-08-08T09:00:00Z", 0.123456],
+            [102, "Latency spike", "2025-08-08T09:05:00Z", None],
+        ],
+        ["long", "string", "datetime", "real"],
+    )
+
+
+def make_matrix(regular=True):
+    values_a = [[1723104000 + i * 30, str(1.23456789 * i)] for i in range(4)]
+    values_b = [[1723104000 + i * 30, "2"] for i in range(4)]
+    if not regular:
+        values_b[2][0] += 7
+    return {
+        "status": "success",
+        "data": {"resultType": "matrix", "result": [
+            {"metric": {"__name__": "up", "job": "api", "pod": "api-0"}, "values": values_a},
+            {"metric": {"__name__": "up", "job": "api", "pod": "api-1"}, "values": values_b},
+        ]},
+    }
+
+
+def test_round_number():
+    """Significant-digit rounding keeps integers as integers."""
+    assert round_number(0.123456, 3) == 0.123
+    assert round_number(104857612.3, 4) == 104900000
+    assert round_number(7, 2) == 7
+    assert round_number(float("nan"), 3) is None
+    assert round_number("text", 3) == "text"
+    assert round_number(0.123456, None) == 0.123456
+    print("✅ round_number works")
+
+
+def test_csv_and_tsv():
+    """Delimited encodings write a row count, a header and quoted cells where needed."""
+    print("🧪 Testing CSV/TSV table encodings...")
+    result = make_incidents()
+
+    csv_text = encode_tool_result(result, tabular_encoding="csv", float_digits=3)
+    lines = csv_text.split("\n")
+    assert lines[0] == "# 2 rows"
+    assert lines[1] == "IncidentId,Title,CreatedDate,ImpactScore"
+    assert lines[2] == '101,"Pod restarts, checkout",2025-08-08T09:00:00Z,0.123'
+    assert lines[3] == "102,Latency spike,2025-08-08T09:05:00Z,"
+
+    tsv_text = encode_tool_result(result, tabular_encoding="tsv")
+    assert tsv_text.split("\n")[2] == "101\tPod restarts, checkout\t2025-08-08T09:00:00Z\t0.123456"
+    print(f"✅ CSV:\n{csv_text}")
+
+
+def test_relative_time_and_max_rows():
+    """Relative time replaces timestamps with offsets from t0; max_rows truncates with a note."""
+    text = encode_tool_result(make_incidents(), relative_time=True, max_rows=1)
+    lines = text.split("\n")
+    assert lines[1] == "# times relative to t0=2025-08-08T09:00:00Z"
+    assert lines[3].split(",")[-2] == "+0s"
+    assert lines[-1] == "# ... 1 more rows not shown"
+    print("✅ Relative timestamps and truncation work")
+
+
+def test_prometheus_compact():
+    """Common labels appear once and a regular grid becomes start/step plus value lists."""
+    print("🧪 Testing compact Prometheus encoding...")
+    text = encode_tool_result(make_matrix(), float_digits=3)
+    lines = text.split("\n")
+
+    assert lines[0] == "# status=success type=matrix series=2"
+    assert lines[1] == "# common labels {__name__=up,job=api}"
+    assert lines[2] == "# start=2024-08-08T08:00:00Z step=30s points=4 (missing points are empty)"
+    assert lines[3] == "{pod=api-0} 0,1.23,2.47,3.7"
+    assert lines[4] == "{pod=api-1} 2,2,2,2"
+    assert text.count("job=api") == 1
+    print(f"✅ Compact matrix:\n{text}")
+
+
+def test_prometheus_irregular_and_vector():
+    """Irregular series fall back to offset:value pairs; vectors share one timestamp."""
+    text = encode_tool_result(make_matrix(regular=False), relative_time=True)
+    assert "{pod=api-1} 0:2 30:2 67:2 90:2" in text
+
+    vector = {"status": "success", "data": {"resultType": "vector", "result": [
+        {"metric": {"job": "api", "pod": "api-0"}, "value": [1723104000, "0.5"]},
+        {"metric": {"job": "api", "pod": "api-1"}, "value": [1723104000, "1"]},
+    ]}}
+    lines = encode_tool_result(vector).split("\n")
+    assert lines[1:] == ["# common labels {job=api}", "# at 2024-08-08T08:00:00Z", "{pod=api-0} 0.5", "{pod=api-1} 1"]
+    print("✅ Irregular matrix and vector encodings work")
+
+
+def test_passthrough():
+    """Errors and non-tabular results are returned unchanged."""
+    error = {"status": "error", "error": "bad query"}
+    assert encode_tool_result(error) is error
+    assert encode_tool_result([{"exception": "boom"}]) == [{"exception": "boom"}]
+    print("✅ Errors pass through unchanged")
+
+
+def test_benchmark_prefers_compact():
+    """The compact encodings use fewer tokens per row than the verbose JSON they replace."""
+    table_report = benchmark_encodings(make_incidents())
+    assert table_report["csv"]["tokens"] < table_report["records"]["tokens"]
+
+    metric_report = benchmark_encodings(make_matrix())
+    assert metric_report["compact"]["tokens_per_row"] < metric_report["raw_json"]["tokens_per_row"]
+    assert len(json.dumps(make_matrix())) > metric_report["compact"]["chars"]
+    print(f"✅ Benchmark: {table_report}, {metric_report}")
+
+
+if __name__ == "__main__":
+    test_round_number()
+    test_csv_and_tsv()
+    test_relative_time_and_max_rows()
+    test_prometheus_compact()
+    test_prometheus_irregular_and_vector()
+    test_passthrough()
+    test_benchmark_prefers_compact()